@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 """Add map projects"""
 
+from sqlalchemy import func
+
 from database import SessionLocal
 from models import ProjectDB, UserDB, ProjectStatus
+from services import search  # noqa: F401 - indexes projects as they are flushed
 
 db = SessionLocal()
 
@@ -60,33 +63,30 @@ projects = [
     },
 ]
 
-added = 0
+existing_names = {
+    name for (name,) in db.query(ProjectDB.name).filter(
+        ProjectDB.name.in_([p["name"] for p in projects])
+    )
+}
+
+new_rows = []
 for p in projects:
-    existing = db.query(ProjectDB).filter(ProjectDB.name == p["name"]).first()
-    if existing:
+    if p["name"] in existing_names:
         print(f"[SKIP] {p['name']}")
         continue
-    
-    proj = ProjectDB(
-        name=p["name"],
-        description=p["description"],
-        icon=p["icon"],
-        goal_amount=p["goal_amount"],
-        current_amount=p["current_amount"],
-        latitude=p["latitude"],
-        longitude=p["longitude"],
-        owner_id=developer.id,
-        status=ProjectStatus.ACTIVE,
-        is_verified=True
-    )
-    db.add(proj)
-    added += 1
+    new_rows.append({
+        **p,
+        "owner_id": developer.id,
+        "status": ProjectStatus.ACTIVE,
+        "is_verified": True,
+    })
     print(f"[ADD] {p['name']}")
 
+# ORM objects, as the search index follows ORM flushes only
+db.add_all([ProjectDB(**row) for row in new_rows])
 db.commit()
-print(f"\nAdded {added} projects")
+print(f"\nAdded {len(new_rows)} projects")
 
-all_projects = db.query(ProjectDB).all()
-print(f"Total projects: {len(all_projects)}")
+print(f"Total projects: {db.query(func.count(ProjectDB.id)).scalar()}")
 
 db.close()
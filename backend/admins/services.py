@@ -3,6 +3,7 @@
 from sqlalchemy.orm import Session
 from models import UserDB
 from services.repository import user_repository
+from services.job_queue import job_queue
 from typing import List, Optional
 
 
@@ -19,7 +20,12 @@ class AdminService:
         """Ban user with optional reason"""
         user = user_repository.ban_user(db, user_id)
         if user:
-            print(f"User {user_id} ({user.email}) banned. Reason: {reason or 'No reason provided'}")
+            job_queue.enqueue("log_moderation_action", {
+                "action": "banned",
+                "user_id": user_id,
+                "email": user.email,
+                "reason": reason or "No reason provided"
+            })
         return user
     
     @staticmethod
@@ -27,7 +33,11 @@ class AdminService:
         """Unban user"""
         user = user_repository.unban_user(db, user_id)
         if user:
-            print(f"User {user_id} ({user.email}) unbanned")
+            job_queue.enqueue("log_moderation_action", {
+                "action": "unbanned",
+                "user_id": user_id,
+                "email": user.email
+            })
         return user
     
     @staticmethod
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import bcrypt
 import os
+import threading
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET")
@@ -30,6 +33,35 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         print(f"Error verifying password: {e}")
         return False
 
+# bcrypt is CPU-bound; run it on a bounded pool instead of the event loop
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", 4))
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_pending = 0
+_bcrypt_lock = threading.Lock()
+
+async def _run_in_bcrypt_pool(fn, *args):
+    global _bcrypt_pending
+    with _bcrypt_lock:
+        _bcrypt_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_pool, fn, *args)
+    finally:
+        with _bcrypt_lock:
+            _bcrypt_pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt pool"""
+    return await _run_in_bcrypt_pool(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt pool"""
+    return await _run_in_bcrypt_pool(verify_password, plain_password, hashed_password)
+
+def bcrypt_pool_pending() -> int:
+    """Number of bcrypt operations queued or running"""
+    return _bcrypt_pending
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
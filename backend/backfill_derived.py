@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Fill the derived tables for rows that bypassed the ORM hooks.
+
+The issue counters, the search index and the XP event log are kept in step
+by ORM hooks, so rows written before they existed, or by Core bulk inserts
+such as datagen.py's, are missing from them. backfill_rows() covers rows
+appended from known ids on, which is how datagen.py follows up its loads.
+backfill() fills a table that is empty while its source rows are not, the
+state of a database that predates it; the API queues it on start, once
+per state of the source tables. The rebuild_* scripts remain the way to
+repair a table that is neither.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from typing import Dict, List
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import CommentDB, IssueDB, IssueStatsDB, ProjectDB, UserDB, XpEventDB
+from rebuild_issue_stats import RebuildIssueStats
+from rebuild_search_index import RebuildSearchIndex
+from rebuild_xp import LogBaselineXp
+from services.maintenance import MaintenanceTask, TaskResult, run_task
+from services.search import COMMENT, ISSUE, PROJECT, search_index
+
+SEARCHED = ((PROJECT, ProjectDB), (ISSUE, IssueDB), (COMMENT, CommentDB))
+
+
+def _has_rows(db: Session, model, *criteria) -> bool:
+    return db.execute(select(literal(1)).select_from(model).where(*criteria).limit(1)).first() is not None
+
+
+def _run(db: Session, tasks: List[MaintenanceTask], first_ids: Dict[type, int],
+         progress: bool) -> List[TaskResult]:
+    results = []
+    for task in tasks:
+        if progress and task.description:
+            print(f"\n{task.description}")
+        results.append(run_task(task, progress=progress, db=db, after_id=first_ids.get(task.model, 1) - 1))
+    return results
+
+
+def state_key(db: Session) -> str:
+    """Changes whenever rows are added to a source table; index-only reads"""
+    high = [db.execute(select(func.max(model.id))).scalar() or 0 for model in (UserDB, ProjectDB, IssueDB, CommentDB)]
+    return "backfill_derived_data:" + ":".join(map(str, high))
+
+
+def backfill(db: Session, progress: bool = False) -> List[TaskResult]:
+    """Rebuild every empty derived table from its source rows; returns the tasks that ran"""
+    tasks = []
+    if not _has_rows(db, IssueStatsDB) and _has_rows(db, IssueDB):
+        tasks.append(RebuildIssueStats())
+    if search_index.is_empty(db.connection()) and any(_has_rows(db, model) for _, model in SEARCHED):
+        tasks += [RebuildSearchIndex(doc_type, model) for doc_type, model in SEARCHED]
+    # XP from before the event log becomes baseline events, so a rebuild_xp run keeps it
+    if not _has_rows(db, XpEventDB) and _has_rows(db, UserDB, UserDB.xp != 0):
+        tasks.append(LogBaselineXp())
+    db.rollback()
+    return _run(db, tasks, {}, progress)
+
+
+def backfill_rows(db: Session, first_ids: Dict[type, int], progress: bool = False) -> List[TaskResult]:
+    """
+    Count, index and log the rows bulk-inserted from first_ids[model] on,
+    for the users, projects, issues and comments among first_ids.
+    """
+    tasks = []
+    if IssueDB in first_ids:
+        tasks.append(RebuildIssueStats())
+    tasks += [RebuildSearchIndex(doc_type, model) for doc_type, model in SEARCHED if model in first_ids]
+    if UserDB in first_ids:
+        tasks.append(LogBaselineXp())
+    return _run(db, tasks, first_ids, progress)
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        ran = backfill(session, progress=True)
+    finally:
+        session.close()
+    print(f"\nRan {len(ran)} backfill tasks" if ran else "\nDerived tables already filled")
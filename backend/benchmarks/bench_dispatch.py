@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark delivery claiming under contention.
+
+Seeds N pending deliveries, then lets T courier threads race for them,
+either claiming random deliveries one at a time (every courier fighting over
+the same rows) or batch-claiming the nearest ones to random positions.
+Reports claims/sec and verifies that no delivery was won twice.
+
+Usage: python benchmarks/bench_dispatch.py [--deliveries 20000] [--threads 16] [--mode single|nearest]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--deliveries", type=int, default=20000)
+parser.add_argument("--threads", type=int, default=16)
+parser.add_argument("--mode", choices=("single", "nearest"), default="single")
+parser.add_argument("--batch", type=int, default=5, help="Deliveries per claim in nearest mode")
+parser.add_argument("--db-url", default=None, help="Database URL (default: temp SQLite file)")
+args = parser.parse_args()
+
+if args.db_url:
+    os.environ["DATABASE_URL"] = args.db_url
+else:
+    _tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from database import SessionLocal, init_db
+from datagen import CityClusters
+from models import UserDB, ProjectDB, DeliveryDB
+from services.dispatch import dispatch_engine
+
+
+def seed(deliveries: int, couriers: int):
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"email": f"courier{i}@bench.local", "name": f"Courier {i}", "password_hash": "x"}
+            for i in range(couriers)
+        ])
+        for start in range(0, deliveries, 10000):
+            end = min(start + 10000, deliveries)
+            projects = []
+            for i in range(start, end):
+                lat, lon = clusters.point(rng)
+                projects.append({"id": i + 1, "name": f"Order {i}", "owner_id": 1, "goal_amount": 0,
+                                 "latitude": lat, "longitude": lon})
+            db.execute(insert(ProjectDB), projects)
+            db.execute(insert(DeliveryDB), [
+                {"project_id": i + 1, "status": "pending"} for i in range(start, end)
+            ])
+        db.commit()
+    finally:
+        db.close()
+    return clusters
+
+
+def main():
+    init_db()
+    clusters = seed(args.deliveries, args.threads)
+    won = [[] for _ in range(args.threads)]
+    attempts = [0] * args.threads
+    remaining = list(range(1, args.deliveries + 1))
+    start_gate = threading.Barrier(args.threads)
+
+    def courier(index: int):
+        rng = random.Random(index)
+        courier_id = index + 1
+        db = SessionLocal()
+        start_gate.wait()
+        try:
+            if args.mode == "single":
+                # Everyone samples from the same shrinking pool to force collisions
+                while remaining:
+                    try:
+                        delivery_id = rng.choice(remaining)
+                    except IndexError:
+                        break
+                    attempts[index] += 1
+                    result = dispatch_engine.claim(db, delivery_id, courier_id)
+                    if result.won:
+                        won[index].append(delivery_id)
+                    if result.status != "pending":
+                        try:
+                            remaining.remove(delivery_id)
+                        except ValueError:
+                            pass
+            else:
+                empty_rounds = 0
+                while empty_rounds < 3:
+                    lat, lon = clusters.point(rng)
+                    attempts[index] += 1
+                    result = dispatch_engine.claim_nearest(db, courier_id, lat, lon, count=args.batch)
+                    won[index].extend(result.delivery_ids)
+                    empty_rounds = 0 if result.delivery_ids else empty_rounds + 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=courier, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_won = [d for claims in won for d in claims]
+    db = SessionLocal()
+    try:
+        accepted = db.query(func.count(DeliveryDB.id)).filter(DeliveryDB.status == "accepted").scalar()
+        pending = db.query(func.count(DeliveryDB.id)).filter(DeliveryDB.status == "pending").scalar()
+    finally:
+        db.close()
+
+    print(f"Mode:               {args.mode} ({args.threads} couriers, {args.deliveries} deliveries)")
+    print(f"Claim calls:        {sum(attempts)}")
+    print(f"Deliveries won:     {len(all_won)} ({len(all_won) / elapsed:,.0f} claims/sec)")
+    print(f"Elapsed:            {elapsed:.2f}s")
+    print(f"Accepted in DB:     {accepted}, still pending: {pending}")
+
+    duplicates = len(all_won) - len(set(all_won))
+    if duplicates or accepted != len(all_won):
+        print(f"FAILED: {duplicates} deliveries won twice, {accepted - len(all_won)} unaccounted")
+        sys.exit(1)
+    print("OK: every delivery has exactly one winner")
+
+
+if __name__ == "__main__":
+    main()
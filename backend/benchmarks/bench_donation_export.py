@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark the streaming donation ledger export.
+
+Seeds one project with N donations from a pool of donors (a share of them
+anonymous), then streams the ledger as CSV and NDJSON and reports rows per
+second and output size, then peak Python memory of a traced pass (tracing
+slows it, so it is not timed) next to loading the ledger as ORM objects
+with a lazy user load per row, the way the old public list did.
+
+Usage: python benchmarks/bench_donation_export.py [--donations 1000000] [--donors 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--donations", type=int, default=1000000)
+parser.add_argument("--donors", type=int, default=10000)
+parser.add_argument("--orm-rows", type=int, default=50000, help="Rows for the ORM comparison")
+parser.add_argument("--budget-mb", type=float, default=50.0, help="Fail if an export's peak memory is higher")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, DonationDB
+from services.donation_export import CSV, NDJSON, stream_public_donations
+
+BATCH = 50000
+PROJECT_ID = 1
+
+
+def seed(rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"id": user_id, "email": f"user{user_id}@bench.local", "name": f"Донор {user_id}",
+             "password_hash": "-", "xp": 0, "rating_level": "Bronze"}
+            for user_id in range(1, args.donors + 1)
+        ])
+        db.execute(insert(ProjectDB), [{"id": PROJECT_ID, "name": "Ledger", "owner_id": 1, "goal_amount": 0}])
+        started = datetime(2024, 1, 1)
+        for start in range(0, args.donations, BATCH):
+            db.execute(insert(DonationDB), [
+                {"id": donation_id, "amount": round(rng.uniform(10, 5000), 2),
+                 "is_anonymous": rng.random() < 0.2, "user_id": rng.randint(1, args.donors),
+                 "project_id": PROJECT_ID, "created_at": started + timedelta(minutes=donation_id)}
+                for donation_id in range(start + 1, min(start + BATCH, args.donations) + 1)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(label: str, operation):
+    started = time.perf_counter()
+    rows, size = operation()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<34} {rows:>9,} rows {elapsed:7.2f} s  {rows / elapsed:>9,.0f} rows/s  "
+          f"{size / 2 ** 20:7.1f} MiB out")
+
+
+def peak_memory(label: str, operation) -> float:
+    tracemalloc.start()
+    rows, _ = operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<34} {rows:>9,} rows  peak {peak / 2 ** 20:7.1f} MiB")
+    return peak / 2 ** 20
+
+
+def export(export_format: str):
+    def run():
+        size = lines = 0
+        for chunk in stream_public_donations(PROJECT_ID, export_format):
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+        return lines - (export_format == CSV), size
+    return run
+
+
+def orm_list():
+    """The old path without its 100-row cap: ORM objects plus a lazy donor load per row"""
+    db = SessionLocal()
+    try:
+        donations = db.execute(
+            select(DonationDB).where(DonationDB.project_id == PROJECT_ID).order_by(DonationDB.id).limit(args.orm_rows)
+        ).scalars().all()
+        result = [{"id": donation.id, "amount": donation.amount,
+                   "donor_name": None if donation.is_anonymous else donation.user.name,
+                   "project_id": donation.project_id, "created_at": donation.created_at}
+                  for donation in donations]
+        return len(result), 0
+    finally:
+        db.close()
+
+
+def main():
+    init_db()
+    started = time.perf_counter()
+    seed(random.Random(42))
+    print(f"Seeded {args.donations:,} donations from {args.donors:,} donors in {time.perf_counter() - started:.1f}s")
+    size = os.path.getsize(os.environ["DATABASE_URL"].removeprefix("sqlite:///"))
+    print(f"Database file: {size / 2 ** 20:.0f} MiB")
+
+    measure("stream CSV", export(CSV))
+    measure("stream NDJSON", export(NDJSON))
+    print("Peak Python memory:")
+    peaks = {
+        "CSV": peak_memory("stream CSV", export(CSV)),
+        "NDJSON": peak_memory("stream NDJSON", export(NDJSON)),
+    }
+    peak_memory("ORM list with lazy donor loads", orm_list)
+
+    failed = [label for label, peak in peaks.items() if peak > args.budget_mb]
+    if failed:
+        print(f"FAILED: peak memory above {args.budget_mb:.0f} MiB for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
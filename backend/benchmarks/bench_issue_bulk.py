@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk issue operations against the one-issue-at-a-time path.
+
+Seeds projects with open issues, then assigns and closes N of them the way
+a coordinator does after an event: once through crud.assign_volunteer and
+crud.close_issue per issue, and once as a single bulk request. Prints time
+and SQL statement counts; both must leave the same XP and issue counters.
+
+Usage: python benchmarks/bench_issue_bulk.py [--issues 500] [--volunteers 50]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--issues", type=int, default=500)
+parser.add_argument("--volunteers", type=int, default=50)
+parser.add_argument("--budget-ms", type=float, default=500.0, help="Fail if the bulk request is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, func, insert, select
+import crud
+from database import SessionLocal, engine, init_db
+from models import UserDB, ProjectDB, IssueDB
+from rebuild_issue_stats import RebuildIssueStats
+from services import issue_bulk, issue_stats, xp
+from services.maintenance import run_task
+
+PRIORITIES = ["low", "medium", "high"]
+OWNER_ID = 1
+
+
+def seed():
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"id": user_id, "email": f"user{user_id}@bench.local", "name": f"User {user_id}",
+             "password_hash": "-", "xp": 0, "rating_level": "Bronze"}
+            for user_id in range(1, args.volunteers + 2)
+        ])
+        db.execute(insert(ProjectDB), [{"id": 1, "name": "Event", "owner_id": OWNER_ID, "goal_amount": 0},
+                                       {"id": 2, "name": "Event 2", "owner_id": OWNER_ID, "goal_amount": 0}])
+        # Two equal halves, one per path
+        db.execute(insert(IssueDB), [
+            {"id": issue_id, "title": f"Issue {issue_id}", "project_id": 1 if issue_id <= args.issues else 2,
+             "reporter_id": OWNER_ID, "priority": rng.choice(PRIORITIES), "status": "open"}
+            for issue_id in range(1, 2 * args.issues + 1)
+        ])
+        db.commit()
+        run_task(RebuildIssueStats(), progress=False, db=db)
+    finally:
+        db.close()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *_):
+        self.count += 1
+
+
+def measure(label: str, counter: StatementCounter, operation) -> float:
+    counter.count = 0
+    started = time.perf_counter()
+    operation()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"  {label:<28} {elapsed:9.1f} ms  {counter.count:6d} statements")
+    return elapsed
+
+
+def main():
+    init_db()
+    seed()
+    volunteer_of = lambda issue_id: 2 + issue_id % args.volunteers
+    print(f"Assigning and closing {args.issues:,} issues over {args.volunteers} volunteers")
+
+    counter = StatementCounter()
+    db = SessionLocal()
+    try:
+        owner = crud.get_user_by_id(db, OWNER_ID)
+        one_by_one = list(range(1, args.issues + 1))
+        bulk = list(range(args.issues + 1, 2 * args.issues + 1))
+
+        def each():
+            for issue_id in one_by_one:
+                crud.assign_volunteer(db, issue_id, volunteer_of(issue_id))
+            for issue_id in one_by_one:
+                crud.close_issue(db, issue_id)
+
+        def at_once():
+            by_volunteer = {}
+            for issue_id in bulk:
+                by_volunteer.setdefault(volunteer_of(issue_id), []).append(issue_id)
+            operations = [issue_bulk.IssueOperation(issue_bulk.ASSIGN, ids, assignee_id)
+                          for assignee_id, ids in by_volunteer.items()]
+            operations.append(issue_bulk.IssueOperation(issue_bulk.CLOSE, bulk))
+            results = issue_bulk.apply(db, owner, operations)
+            assert all(result.ok for result in results)
+
+        measure("one issue at a time", counter, each)
+        bulk_ms = measure("one bulk request", counter, at_once)
+
+        # Every closed issue awarded exactly once, whichever path closed it
+        closed = {issue_id: priority for issue_id, priority in db.execute(
+            select(IssueDB.id, IssueDB.priority).where(IssueDB.status == "closed")).tuples()}
+        expected = sum(xp.ISSUE_CLOSE_XP[priority] for priority in closed.values())
+        assert len(closed) == 2 * args.issues, "not every issue was closed"
+        assert db.execute(select(func.sum(UserDB.xp))).scalar() == expected, "XP differs from the closes"
+        for project_id in (1, 2):
+            assert issue_stats.breakdown(db, issue_stats.PROJECT, project_id, use_counters=True) == \
+                issue_stats.breakdown(db, issue_stats.PROJECT, project_id, use_counters=False), "counters drifted"
+        print(f"Total XP awarded: {expected:,}")
+    finally:
+        db.close()
+
+    if bulk_ms > args.budget_ms:
+        print(f"FAILED: bulk request slower than {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark volunteer issue recommendations.
+
+Seeds N open issues spread over projects in a city-sized area plus a
+history of assigned issues for a pool of volunteers, loads the recommender,
+then times top-K for a volunteer near a point, near their usual projects
+and with no location at all, cold profile reads, and the naive approach of
+scoring every open issue fetched with SQL.
+
+Usage: python benchmarks/bench_issue_recommendations.py [--issues 100000] [--projects 20000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--issues", type=int, default=100000)
+parser.add_argument("--projects", type=int, default=20000)
+parser.add_argument("--volunteers", type=int, default=1000)
+parser.add_argument("--top", type=int, default=10)
+parser.add_argument("--queries", type=int, default=500)
+parser.add_argument("--budget-ms", type=float, default=20.0, help="Fail if any recommendation p95 is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, IssueDB, IssueCategory
+from rebuild_issue_stats import RebuildIssueStats
+from services.issue_recommendations import IssueRecommender, W_DISTANCE, proximity
+from services.geo import haversine_km
+from services.maintenance import run_task
+
+BATCH = 10000
+# Moscow-sized box
+LAT0, LAT1, LON0, LON1 = 55.55, 55.95, 37.35, 37.85
+PRIORITIES = ["low", "medium", "high"]
+
+
+def seed(rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"id": user_id, "email": f"user{user_id}@bench.local", "name": f"User {user_id}",
+             "password_hash": "-", "xp": 0, "rating_level": "Bronze"}
+            for user_id in range(1, args.volunteers + 2)
+        ])
+        for start in range(0, args.projects, BATCH):
+            db.execute(insert(ProjectDB), [
+                {"id": project_id, "name": f"Project {project_id}", "owner_id": 1, "goal_amount": 0,
+                 "latitude": rng.uniform(LAT0, LAT1), "longitude": rng.uniform(LON0, LON1)}
+                for project_id in range(start + 1, min(start + BATCH, args.projects) + 1)
+            ])
+        now = datetime.utcnow()
+        # Open issues, then a history of ten assigned issues per volunteer, each with a favourite category
+        categories = list(IssueCategory)
+        history = [(volunteer_id, rng.choice(categories)) for volunteer_id in range(2, args.volunteers + 2)
+                   for _ in range(10)]
+        total = args.issues + len(history)
+        for start in range(0, total, BATCH):
+            rows = []
+            for issue_id in range(start + 1, min(start + BATCH, total) + 1):
+                row = {"id": issue_id, "title": f"Issue {issue_id}", "project_id": rng.randint(1, args.projects),
+                       "reporter_id": 1, "status": "open", "assignee_id": None,
+                       "priority": rng.choice(PRIORITIES), "category": rng.choice(categories),
+                       "due_date": now + timedelta(hours=rng.randint(-48, 60 * 24)) if rng.random() < 0.7 else None}
+                if issue_id > args.issues:
+                    volunteer_id, favourite = history[issue_id - args.issues - 1]
+                    row.update(status="closed", assignee_id=volunteer_id,
+                               category=favourite if rng.random() < 0.8 else rng.choice(categories))
+                rows.append(row)
+            db.execute(insert(IssueDB), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(label: str, operation, failed: list, queries: int = None, budget: bool = True):
+    timings = []
+    for _ in range(queries or args.queries):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"  {label:<34} median {statistics.median(timings):8.3f} ms  p95 {p95:8.3f} ms")
+    if budget and p95 > args.budget_ms:
+        failed.append(label)
+
+
+def naive(db, recommender, user_id, profile, latitude, longitude):
+    """Score every open issue fetched with its project's coordinates"""
+    now = datetime.utcnow()
+    rows = db.execute(
+        select(IssueDB.id, IssueDB.project_id, IssueDB.reporter_id, IssueDB.category, IssueDB.priority,
+               IssueDB.due_date, IssueDB.status, IssueDB.assignee_id, ProjectDB.latitude, ProjectDB.longitude)
+        .join(ProjectDB, ProjectDB.id == IssueDB.project_id)
+        .where(IssueDB.status == "open", IssueDB.assignee_id.is_(None))
+    ).tuples()
+    scored = []
+    for row in rows:
+        entry = recommender._issues.get(row[0])
+        if entry is None or entry.reporter_id == user_id:
+            continue
+        distance = haversine_km(latitude, longitude, row[8], row[9])
+        scored.append((W_DISTANCE * proximity(distance) + recommender._base_score(entry, profile, now), row[0]))
+    scored.sort(reverse=True)
+    return scored[:args.top]
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    started = time.perf_counter()
+    seed(rng)
+    print(f"Seeded {args.issues:,} open issues over {args.projects:,} projects in {time.perf_counter() - started:.1f}s")
+
+    recommender = IssueRecommender()
+    db = SessionLocal()
+    try:
+        run_task(RebuildIssueStats(), progress=False, db=db)
+        started = time.perf_counter()
+        recommender.load(db)
+        print(f"Recommender loaded in {time.perf_counter() - started:.2f}s")
+
+        failed = []
+        volunteer = lambda: rng.randint(2, args.volunteers + 1)
+        point = lambda: (rng.uniform(LAT0, LAT1), rng.uniform(LON0, LON1))
+        profiles = {user_id: recommender.profile(db, user_id) for user_id in range(2, args.volunteers + 2)}
+
+        def near_point():
+            user_id = volunteer()
+            recommender.recommend(user_id, profiles[user_id], args.top, *point())
+
+        def near_history():
+            user_id = volunteer()
+            recommender.recommend(user_id, profiles[user_id], args.top)
+
+        def anywhere():
+            user_id = volunteer()
+            profile = profiles[user_id]
+            recommender.recommend(user_id, type(profile)(profile.categories), args.top)
+
+        def cold_profile():
+            user_id = volunteer()
+            recommender.forget_profile(user_id)
+            recommender.profile(db, user_id)
+
+        def churn():
+            # An issue taken and a new one posted, as the routes refresh them
+            issue_id = rng.randint(1, args.issues)
+            recommender.refresh(db, [issue_id])
+
+        timed(f"top {args.top} near a point", near_point, failed)
+        timed(f"top {args.top} near usual projects", near_history, failed)
+        timed(f"top {args.top} without location", anywhere, failed)
+        timed("profile, cache miss", cold_profile, failed)
+        timed("refresh one issue", churn, failed)
+
+        print("Naive SQL for comparison:")
+        timed("score every open issue", lambda: naive(db, recommender, volunteer(), profiles[2], *point()),
+              failed, queries=5, budget=False)
+    finally:
+        db.close()
+
+    if failed:
+        print(f"FAILED: p95 slower than {args.budget_ms} ms for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the project and volunteer issue stats.
+
+Seeds projects of growing size (one volunteer assigned to every issue of
+each), fills the counters with rebuild_issue_stats, then times a project's
+and the volunteer's breakdown from the counters table and from the GROUP BY,
+next to the old volunteer path that loaded every assigned issue to count the
+closed ones. Counter reads should stay flat as a project grows.
+
+Usage: python benchmarks/bench_issue_stats.py [--sizes 1000,10000,100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--sizes", default="1000,10000,100000", help="Issues per project, comma separated")
+parser.add_argument("--queries", type=int, default=200)
+parser.add_argument("--budget-ms", type=float, default=2.0, help="Fail if a counters read's p95 is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+import crud
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, IssueDB, IssueCategory
+from rebuild_issue_stats import RebuildIssueStats
+from services import issue_stats
+from services.maintenance import run_task
+
+BATCH = 10000
+STATUSES = ["open", "in-progress", "closed"]
+PRIORITIES = ["low", "medium", "high"]
+
+
+def seed(sizes):
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        # User 1 reports everything; user N+1 volunteers on project N
+        db.execute(insert(UserDB), [
+            {"id": user_id, "email": f"user{user_id}@bench.local", "name": f"User {user_id}",
+             "password_hash": "-", "xp": 0, "rating_level": "Bronze"}
+            for user_id in range(1, len(sizes) + 2)
+        ])
+        db.execute(insert(ProjectDB), [
+            {"id": project_id, "name": f"Project {project_id}", "owner_id": 1, "goal_amount": 0}
+            for project_id in range(1, len(sizes) + 1)
+        ])
+        issue_id = 0
+        for project_id, size in enumerate(sizes, start=1):
+            for start in range(0, size, BATCH):
+                rows = []
+                for _ in range(start, min(start + BATCH, size)):
+                    issue_id += 1
+                    rows.append({"id": issue_id, "title": f"Issue {issue_id}", "project_id": project_id,
+                                 "reporter_id": 1, "assignee_id": project_id + 1,
+                                 "status": rng.choice(STATUSES), "priority": rng.choice(PRIORITIES),
+                                 "category": rng.choice(list(IssueCategory))})
+                db.execute(insert(IssueDB), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(label: str, operation, queries: int, failed: list, budget: bool = True):
+    timings = []
+    for _ in range(queries):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"    {label:<32} median {statistics.median(timings):8.3f} ms  p95 {p95:8.3f} ms")
+    if budget and p95 > args.budget_ms:
+        failed.append(label)
+
+
+def old_closed_count(db, user_id: int) -> int:
+    """The old assignee-stats path: load every assigned issue to count the closed ones"""
+    user = crud.get_user_by_id(db, user_id)
+    count = len([issue for issue in user.issues_assigned if issue.status == "closed"])
+    db.expire_all()
+    return count
+
+
+def main():
+    sizes = [int(size) for size in args.sizes.split(",")]
+    init_db()
+    started = time.perf_counter()
+    seed(sizes)
+    print(f"Seeded {sum(sizes):,} issues in {time.perf_counter() - started:.1f}s")
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        run_task(RebuildIssueStats(), progress=False, db=db)
+        print(f"Counters rebuilt in {time.perf_counter() - started:.1f}s")
+
+        failed = []
+        for project_id, size in enumerate(sizes, start=1):
+            volunteer_id = project_id + 1
+            counters = issue_stats.breakdown(db, issue_stats.PROJECT, project_id, use_counters=True)
+            assert counters == issue_stats.breakdown(db, issue_stats.PROJECT, project_id, use_counters=False), \
+                "counters disagree with GROUP BY"
+            assert issue_stats.closed_count(db, volunteer_id) == old_closed_count(db, volunteer_id)
+
+            print(f"  project with {size:,} issues")
+            timed(f"project, counters ({size:,})", lambda: issue_stats.breakdown(
+                db, issue_stats.PROJECT, project_id, use_counters=True), args.queries, failed)
+            timed(f"volunteer, counters ({size:,})", lambda: issue_stats.breakdown(
+                db, issue_stats.ASSIGNEE, volunteer_id, use_counters=True), args.queries, failed)
+            timed("project, GROUP BY", lambda: issue_stats.breakdown(
+                db, issue_stats.PROJECT, project_id, use_counters=False), max(args.queries // 10, 5), failed, False)
+            timed("closed count, old path", lambda: old_closed_count(db, volunteer_id), 5, failed, False)
+    finally:
+        db.close()
+
+    if failed:
+        print(f"FAILED: p95 slower than {args.budget_ms} ms for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark XP leaderboard reads and updates.
+
+Seeds N users with Pareto-distributed XP and a month of XP events, loads
+the leaderboards, then times top-N, a user's rank, the window around a
+user and XP updates against the in-memory boards, and the incremental sync
+a writer runs after each award, next to the SQL a naive implementation
+would run (ORDER BY xp and a COUNT of users ahead).
+
+Usage: python benchmarks/bench_leaderboard.py [--users 1000000] [--events 1000000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--users", type=int, default=1000000)
+parser.add_argument("--events", type=int, default=1000000)
+parser.add_argument("--queries", type=int, default=2000)
+parser.add_argument("--budget-ms", type=float, default=1.0, help="Fail if any board operation's p95 is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from database import SessionLocal, init_db
+from models import UserDB, UserRole, XpEventDB
+from services.leaderboard import Leaderboard, rating_level_for
+
+BATCH = 10000
+ROLES = [UserRole.DONOR, UserRole.RECIPIENT, UserRole.COURIER]
+
+
+def seed(rng: random.Random):
+    db = SessionLocal()
+    try:
+        for start in range(0, args.users, BATCH):
+            rows = []
+            for user_id in range(start + 1, min(start + BATCH, args.users) + 1):
+                xp = int(rng.paretovariate(1.5) * 20)
+                rows.append({"id": user_id, "email": f"user{user_id}@bench.local", "name": f"User {user_id}",
+                             "password_hash": "-", "role": rng.choice(ROLES), "xp": xp,
+                             "rating_level": rating_level_for(xp)})
+            db.execute(insert(UserDB), rows)
+        now = datetime.utcnow()
+        for start in range(0, args.events, BATCH):
+            db.execute(insert(XpEventDB), [
+                {"user_id": rng.randint(1, args.users), "amount": rng.choice((10, 25, 50)),
+                 "created_at": now - timedelta(minutes=rng.randint(0, 30 * 24 * 60))}
+                for _ in range(start, min(start + BATCH, args.events))
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(label: str, operation, failed: list, budget: bool = True):
+    timings = []
+    for _ in range(args.queries):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"  {label:<34} median {statistics.median(timings):8.3f} ms  p95 {p95:8.3f} ms")
+    if budget and p95 > args.budget_ms:
+        failed.append(label)
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    started = time.perf_counter()
+    seed(rng)
+    print(f"Seeded {args.users:,} users and {args.events:,} XP events in {time.perf_counter() - started:.1f}s")
+
+    boards = Leaderboard()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        boards.load(db)
+        print(f"Leaderboards loaded in {time.perf_counter() - started:.1f}s")
+
+        failed = []
+        user = lambda: rng.randint(1, args.users)
+        timed("top 20 (all)", lambda: boards.top("all", None, 20), failed)
+        timed("top 20, page 500 (all)", lambda: boards.top("all", None, 20, 10000), failed)
+        timed("top 20 (week, couriers)", lambda: boards.top("week", UserRole.COURIER.value, 20), failed)
+        timed("rank of a user (all)", lambda: boards.position(user()), failed)
+        timed("rank of a user (month)", lambda: boards.position(user(), "month"), failed)
+        timed("5 around a user (all)", lambda: boards.around(user()), failed)
+
+        board = boards._boards["all"]
+        roles = boards._roles
+
+        def move():
+            user_id = user()
+            board.set(user_id, board.score(user_id) + 25, roles[user_id])
+        timed("XP update (all, in memory)", move, failed)
+
+        def award_and_sync():
+            user_id = user()
+            db.execute(update(UserDB).where(UserDB.id == user_id).values(xp=UserDB.xp + 25))
+            db.execute(insert(XpEventDB).values(user_id=user_id, amount=25))
+            db.commit()
+            started = time.perf_counter()
+            boards.sync(db)
+            return (time.perf_counter() - started) * 1000
+        syncs = sorted(award_and_sync() for _ in range(min(args.queries, 500)))
+        print(f"  {'sync after one award (writer path)':<34} median {statistics.median(syncs):8.3f} ms"
+              f"  p95 {syncs[int(len(syncs) * 0.95)]:8.3f} ms")
+
+        print("Naive SQL for comparison:")
+        timed("ORDER BY xp LIMIT 20", lambda: db.execute(
+            select(UserDB.id, UserDB.xp).order_by(UserDB.xp.desc(), UserDB.id).limit(20)).all(), failed, False)
+
+        def sql_rank():
+            row = db.execute(select(UserDB.xp, UserDB.id).where(UserDB.id == user())).one()
+            db.execute(select(func.count()).select_from(UserDB).where(
+                or_(UserDB.xp > row.xp, and_(UserDB.xp == row.xp, UserDB.id < row.id)))).scalar()
+        saved, args.queries = args.queries, min(args.queries, 20)
+        timed("COUNT of users ahead", sql_rank, failed, False)
+        args.queries = saved
+    finally:
+        db.close()
+
+    if failed:
+        print(f"FAILED: p95 slower than {args.budget_ms} ms for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
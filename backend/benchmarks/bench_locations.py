@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark courier location ingestion.
+
+Feeds synthetic pings for C couriers (each with one accepted delivery to
+geofence against) through the location store and geofence monitor, then
+through POST /api/deliveries/location over ASGI, and reports pings/sec and
+track memory per courier.
+
+Usage: python benchmarks/bench_locations.py [--couriers 2000] [--pings 200000] [--http-pings 5000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--couriers", type=int, default=2000)
+parser.add_argument("--pings", type=int, default=200000, help="Pings through the services directly")
+parser.add_argument("--http-pings", type=int, default=5000, help="Pings through the HTTP endpoint")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ["MATCHING_INTERVAL_SECONDS"] = "0"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import insert
+from auth import create_access_token
+from database import SessionLocal, init_db
+from datagen import CityClusters
+from models import UserDB, ProjectDB, DeliveryDB
+from services.courier_locations import courier_locations
+from services.geofence import geofence_monitor
+
+
+def seed(couriers: int, clusters: CityClusters, rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"id": i, "email": f"courier{i}@bench.local", "name": f"Courier {i}", "password_hash": "x"}
+            for i in range(1, couriers + 1)
+        ])
+        projects = []
+        for i in range(1, couriers + 1):
+            lat, lon = clusters.point(rng)
+            projects.append({"id": i, "name": f"Order {i}", "owner_id": 1, "goal_amount": 0,
+                             "latitude": lat, "longitude": lon})
+        db.execute(insert(ProjectDB), projects)
+        db.execute(insert(DeliveryDB), [
+            {"project_id": i, "courier_id": i, "status": "accepted"} for i in range(1, couriers + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    seed(args.couriers, clusters, rng)
+    starts = {i: clusters.point(rng) for i in range(1, args.couriers + 1)}
+
+    # Warm destination caches so the run measures steady state
+    for courier_id, (lat, lon) in starts.items():
+        geofence_monitor.check(courier_id, lat, lon)
+
+    started = time.perf_counter()
+    now = time.time()
+    for n in range(args.pings):
+        courier_id = n % args.couriers + 1
+        lat, lon = starts[courier_id]
+        jitter = n / args.pings * 0.01
+        position = courier_locations.update(courier_id, lat + jitter, lon + jitter, now + n * 0.001)
+        geofence_monitor.check(courier_id, position.latitude, position.longitude)
+    elapsed = time.perf_counter() - started
+    print(f"Service path: {args.pings:,} pings in {elapsed:.2f}s = {args.pings / elapsed:,.0f} pings/sec")
+
+    track_bytes = courier_locations.capacity * 3 * 8
+    print(f"Track memory: {track_bytes:,} bytes/courier ({courier_locations.capacity} points), "
+          f"{track_bytes * len(courier_locations) / 1e6:.1f} MB for {len(courier_locations):,} couriers")
+
+    import main as app_main
+
+    async def http_run():
+        transport = httpx.ASGITransport(app=app_main.app)
+        headers = {i: {"Authorization": f"Bearer {create_access_token({'sub': str(i)})}"}
+                   for i in range(1, min(args.couriers, 200) + 1)}
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            for n in range(args.http_pings):
+                courier_id = n % len(headers) + 1
+                lat, lon = starts[courier_id]
+                response = await client.post("/api/deliveries/location", headers=headers[courier_id],
+                                             json={"latitude": lat, "longitude": lon})
+                response.raise_for_status()
+            return time.perf_counter() - started
+
+    elapsed = asyncio.run(http_run())
+    print(f"HTTP path:    {args.http_pings:,} pings in {elapsed:.2f}s = {args.http_pings / elapsed:,.0f} pings/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark pending-delivery to parcel-locker assignment.
+
+Seeds N pending deliveries and L lockers around the synthetic city clusters,
+with total free slots a bit below N so capacity binds, then times a full
+LockerAssigner.run (pending query, planning and reservation writes) for each
+strategy and compares total pickup-to-locker distance.
+
+Usage: python benchmarks/bench_locker_assignment.py [--deliveries 3000] [--lockers 300] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--deliveries", type=int, default=3000)
+parser.add_argument("--lockers", type=int, default=300)
+parser.add_argument("--repeat", type=int, default=3)
+parser.add_argument("--budget-ms", type=float, default=3000.0, help="Fail if the optimal run is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, insert, update
+from database import SessionLocal, init_db
+from datagen import CityClusters
+from models import ProjectDB, DeliveryDB, ParcelLockerDB, LockerReservationDB
+from services.locker_assignment import LockerAssigner
+
+
+def seed(deliveries: int, lockers: int):
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    # About 90% as many free slots as deliveries, spread unevenly
+    mean_capacity = max(1, int(deliveries * 0.9 / lockers))
+    db = SessionLocal()
+    try:
+        projects = []
+        for i in range(deliveries):
+            lat, lon = clusters.point(rng)
+            projects.append({"id": i + 1, "name": f"Order {i}", "owner_id": 1, "goal_amount": 0,
+                             "latitude": lat, "longitude": lon})
+        db.execute(insert(ProjectDB), projects)
+        db.execute(insert(DeliveryDB), [{"project_id": i + 1, "status": "pending"} for i in range(deliveries)])
+        rows = []
+        for i in range(lockers):
+            lat, lon = clusters.point(rng)
+            rows.append({"id": i + 1, "name": f"Locker {i}", "address": f"Street {i}",
+                         "latitude": lat, "longitude": lon, "is_active": True, "current_occupancy": 0,
+                         "total_capacity": rng.randint(max(1, mean_capacity // 2), mean_capacity * 3 // 2)})
+        db.execute(insert(ParcelLockerDB), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def reset(db):
+    db.execute(delete(LockerReservationDB))
+    db.execute(update(ParcelLockerDB).values(current_occupancy=0))
+    db.commit()
+
+
+def main():
+    init_db()
+    seed(args.deliveries, args.lockers)
+    print(f"{args.deliveries} pending deliveries, {args.lockers} lockers, best of {args.repeat}")
+
+    failed = False
+    for strategy in ("optimal", "greedy"):
+        timings = []
+        for _ in range(args.repeat):
+            db = SessionLocal()
+            try:
+                reset(db)
+                started = time.perf_counter()
+                summary = LockerAssigner().run(db, limit=args.deliveries, strategy=strategy)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+        print(f"  {strategy:<8} {min(timings):8.1f} ms best, {statistics.median(timings):8.1f} ms median"
+              f"  assigned={summary.assigned}  total={summary.total_km:,.1f} km"
+              f"  avg={summary.total_km / max(summary.assigned, 1):.2f} km")
+        if strategy == "optimal" and min(timings) > args.budget_ms:
+            failed = True
+
+    if failed:
+        print(f"FAILED: optimal assignment slower than {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
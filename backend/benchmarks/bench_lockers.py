@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark nearest-available parcel locker lookups.
+
+Seeds L lockers around the synthetic city clusters, a share of them full,
+then times LockerIndex.nearest directly and GET /api/parcel-lockers/nearest
+over ASGI, and checks the index answer against a brute-force scan.
+
+Usage: python benchmarks/bench_lockers.py [--lockers 50000] [--queries 20000] [--full 0.3]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--lockers", type=int, default=50000)
+parser.add_argument("--queries", type=int, default=20000, help="Lookups through the index directly")
+parser.add_argument("--http-queries", type=int, default=2000, help="Lookups through the HTTP endpoint")
+parser.add_argument("--k", type=int, default=5)
+parser.add_argument("--full", type=float, default=0.3, help="Share of lockers with no free slot")
+parser.add_argument("--budget-us", type=float, default=1000.0, help="Fail if the median lookup is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ["MATCHING_INTERVAL_SECONDS"] = "0"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import insert
+from database import SessionLocal, init_db
+from datagen import CityClusters
+from models import ParcelLockerDB
+from services.geo import KM_PER_DEGREE
+from services.locker_index import locker_index
+
+
+def seed(lockers: int, clusters: CityClusters, rng: random.Random):
+    db = SessionLocal()
+    try:
+        rows = []
+        for i in range(1, lockers + 1):
+            lat, lon = clusters.point(rng)
+            full = rng.random() < args.full
+            rows.append({"id": i, "name": f"Locker {i}", "address": f"Street {i}",
+                         "latitude": lat, "longitude": lon, "total_capacity": 20,
+                         "current_occupancy": 20 if full else rng.randint(0, 19), "is_active": True})
+        db.execute(insert(ParcelLockerDB), rows)
+        db.commit()
+    finally:
+        db.close()
+
+
+def brute_force(lat: float, lon: float, k: int):
+    lon_scale = KM_PER_DEGREE * math.cos(math.radians(lat))
+    scored = []
+    for locker in locker_index._lockers.values():
+        if locker.free_slots < 1:
+            continue
+        dy = (locker.latitude - lat) * KM_PER_DEGREE
+        dx = (locker.longitude - lon) * lon_scale
+        scored.append((math.sqrt(dx * dx + dy * dy), locker.id))
+    return sorted(scored)[:k]
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    seed(args.lockers, clusters, rng)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        locker_index.load(db)
+        print(f"Index load: {len(locker_index):,} lockers in {(time.perf_counter() - started) * 1000:.0f} ms")
+    finally:
+        db.close()
+
+    queries = [clusters.point(rng) for _ in range(args.queries)]
+    for lat, lon in queries[:200]:
+        expected = [locker_id for _, locker_id in brute_force(lat, lon, args.k)]
+        got = [locker.id for _, locker in locker_index.nearest(lat, lon, k=args.k)]
+        if got != expected:
+            print(f"MISMATCH at ({lat:.5f}, {lon:.5f}): {got} != {expected}")
+            sys.exit(1)
+
+    timings = []
+    for lat, lon in queries:
+        started = time.perf_counter()
+        locker_index.nearest(lat, lon, k=args.k, min_slots=1)
+        timings.append((time.perf_counter() - started) * 1e6)
+    timings.sort()
+    median = statistics.median(timings)
+    print(f"Index path: {args.queries:,} lookups, k={args.k}: median {median:.0f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.0f} us")
+
+    import main as app_main
+
+    async def http_run():
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            for lat, lon in queries[:args.http_queries]:
+                response = await client.get("/api/parcel-lockers/nearest",
+                                            params={"lat": lat, "lon": lon, "k": args.k})
+                response.raise_for_status()
+            return time.perf_counter() - started
+
+    elapsed = asyncio.run(http_run())
+    print(f"HTTP path:  {args.http_queries:,} lookups in {elapsed:.2f}s = "
+          f"{elapsed / args.http_queries * 1000:.2f} ms/request")
+
+    if median > args.budget_us:
+        print(f"FAILED: median lookup slower than {args.budget_us:.0f} us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark map cluster tiles against sending every marker.
+
+Seeds N projects and M parcel lockers in a city-sized area, loads the
+cluster index, then times tile and bounding-box queries at city, district
+and street zooms (cold, then from the tile cache), a project move with the
+tile invalidation it causes, and the full marker lists the map page used to
+fetch. Prints latency and JSON payload sizes.
+
+Usage: python benchmarks/bench_map_clusters.py [--projects 50000] [--lockers 5000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--projects", type=int, default=50000)
+parser.add_argument("--lockers", type=int, default=5000)
+parser.add_argument("--queries", type=int, default=500)
+parser.add_argument("--budget-ms", type=float, default=10.0, help="Fail if any cluster query p95 is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataclasses import asdict
+from sqlalchemy import insert, select
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, ParcelLockerDB
+from services.map_clusters import MapClusterIndex, PROJECT, tile_of
+
+BATCH = 10000
+# Moscow-sized box
+LAT0, LAT1, LON0, LON1 = 55.55, 55.95, 37.35, 37.85
+# Map zooms of a city overview, a district and a few streets
+ZOOMS = (10, 13, 16)
+
+
+def seed(rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [{"id": 1, "email": "owner@bench.local", "name": "Owner",
+                                     "password_hash": "-", "xp": 0, "rating_level": "Bronze"}])
+        for start in range(0, args.projects, BATCH):
+            db.execute(insert(ProjectDB), [
+                {"id": project_id, "name": f"Project {project_id}", "owner_id": 1, "goal_amount": 0,
+                 "latitude": rng.uniform(LAT0, LAT1), "longitude": rng.uniform(LON0, LON1)}
+                for project_id in range(start + 1, min(start + BATCH, args.projects) + 1)
+            ])
+        db.execute(insert(ParcelLockerDB), [
+            {"id": locker_id, "name": f"Locker {locker_id}", "address": "-", "is_active": True,
+             "latitude": rng.uniform(LAT0, LAT1), "longitude": rng.uniform(LON0, LON1),
+             "total_capacity": 50, "available_capacity": 50}
+            for locker_id in range(1, args.lockers + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def payload(clusters) -> int:
+    return len(json.dumps([asdict(cluster) for cluster in clusters]))
+
+
+def timed(label: str, operation, failed: list, queries: int = None, budget: bool = True):
+    timings = []
+    for _ in range(queries or args.queries):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95)]
+    print(f"  {label:<34} median {statistics.median(timings):8.3f} ms  p95 {p95:8.3f} ms")
+    if budget and p95 > args.budget_ms:
+        failed.append(label)
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    seed(rng)
+    print(f"Seeded {args.projects:,} projects and {args.lockers:,} lockers")
+
+    index = MapClusterIndex()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        index.load(db)
+        print(f"Cluster index loaded in {time.perf_counter() - started:.2f}s")
+
+        failed = []
+        point = lambda: (rng.uniform(LAT0, LAT1), rng.uniform(LON0, LON1))
+        for zoom in ZOOMS:
+            def cold():
+                # A moved project drops its tiles, so this tile is rebuilt from the index
+                latitude, longitude = point()
+                index.put(PROJECT, rng.randint(1, args.projects), latitude, longitude)
+                index.tile(zoom, *tile_of(latitude, longitude, zoom))
+
+            def cached():
+                index.tile(zoom, *tile_of(*point(), zoom))
+
+            def screen():
+                # A 1280x800 viewport around a point: about 5x4 tiles
+                x, y = tile_of(*point(), zoom)
+                for tile_y in range(y - 2, y + 2):
+                    for tile_x in range(x - 2, x + 3):
+                        index.tile(zoom, tile_x, tile_y)
+
+            timed(f"zoom {zoom}: move + uncached tile", cold, failed)
+            timed(f"zoom {zoom}: cached tile", cached, failed)
+            timed(f"zoom {zoom}: 20-tile screen", screen, failed)
+            x, y = tile_of((LAT0 + LAT1) / 2, (LON0 + LON1) / 2, zoom)
+            clusters = [cluster for tile_y in range(y - 2, y + 2) for tile_x in range(x - 2, x + 3)
+                        for cluster in index.tile(zoom, tile_x, tile_y)]
+            print(f"    {len(clusters):,} clusters, {payload(clusters) / 1024:,.1f} KiB for a centre screen")
+
+        print("Every marker, as the map page fetched them:")
+        timed("select all projects and lockers", lambda: (
+            db.execute(select(ProjectDB.id, ProjectDB.name, ProjectDB.latitude, ProjectDB.longitude)).all(),
+            db.execute(select(ParcelLockerDB.id, ParcelLockerDB.name, ParcelLockerDB.latitude,
+                              ParcelLockerDB.longitude)).all()
+        ), failed, queries=5, budget=False)
+        rows = db.execute(select(ProjectDB.id, ProjectDB.name, ProjectDB.latitude, ProjectDB.longitude)).all()
+        print(f"    {len(rows) + args.lockers:,} markers, "
+              f"{len(json.dumps([list(row) for row in rows])) / 1024:,.1f} KiB for projects alone")
+    finally:
+        db.close()
+
+    if failed:
+        print(f"FAILED: p95 slower than {args.budget_ms} ms for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark the binary map points export against JSON project lists.
+
+Seeds N projects and M parcel lockers, loads the points snapshot, checks
+that decoding the payload gives back the database rows, then prints payload
+sizes (binary, gzipped binary, JSON ProjectResponse list, and a JSON list
+of only the point fields) and the time to re-encode after a write and to
+serve the cached payload.
+
+Usage: python benchmarks/bench_map_points.py [--projects 100000] [--lockers 5000]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import struct
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--projects", type=int, default=100000)
+parser.add_argument("--lockers", type=int, default=5000)
+parser.add_argument("--queries", type=int, default=50)
+parser.add_argument("--budget-kb", type=float, default=800.0, help="Fail if the gzipped payload is larger")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from array import array
+from datetime import datetime
+from sqlalchemy import insert, select
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, ParcelLockerDB, ProjectResponse, ProjectStatus
+from services.map_points import MAGIC, PROJECT, MapPointsExport, project_point
+
+BATCH = 10000
+# Moscow-sized box
+LAT0, LAT1, LON0, LON1 = 55.55, 55.95, 37.35, 37.85
+STATUSES = list(ProjectStatus)
+
+
+def seed(rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [{"id": 1, "email": "owner@bench.local", "name": "Owner",
+                                     "password_hash": "-", "xp": 0, "rating_level": "Bronze"}])
+        for start in range(0, args.projects, BATCH):
+            db.execute(insert(ProjectDB), [
+                {"id": project_id, "name": f"Project {project_id}", "owner_id": 1,
+                 "description": "Collecting food for the shelter on the corner, every weekend",
+                 "goal_amount": rng.choice([0, 1000, 5000]), "current_amount": rng.uniform(0, 5000),
+                 "status": rng.choice(STATUSES), "is_verified": rng.random() < 0.3,
+                 "latitude": rng.uniform(LAT0, LAT1), "longitude": rng.uniform(LON0, LON1),
+                 "created_at": datetime.utcnow()}
+                for project_id in range(start + 1, min(start + BATCH, args.projects) + 1)
+            ])
+        db.execute(insert(ParcelLockerDB), [
+            {"id": locker_id, "name": f"Locker {locker_id}", "address": "-", "is_active": True,
+             "latitude": rng.uniform(LAT0, LAT1), "longitude": rng.uniform(LON0, LON1),
+             "total_capacity": 50, "current_occupancy": rng.randint(0, 50)}
+            for locker_id in range(1, args.lockers + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def unshuffle(data: bytes, offset: int, count: int, typecode: str):
+    """Inverse of the byte shuffle; returns the column and the offset after it"""
+    column = array(typecode)
+    size = column.itemsize * count
+    planes = [data[offset + plane * count:offset + (plane + 1) * count] for plane in range(column.itemsize)]
+    raw = bytearray(size)
+    for plane, values in enumerate(planes):
+        raw[plane::column.itemsize] = values
+    column.frombytes(bytes(raw))
+    return column, offset + size
+
+
+def decode(payload: bytes):
+    """Reference decoder of the payload format: {kind code: [(id, lat units, lon units, flags, progress)]}"""
+    assert payload[:4] == MAGIC
+    sections, offset = {}, 6
+    for _ in range(payload[5]):
+        kind, count, _units = struct.unpack_from("<BII", payload, offset)
+        offset += 9
+        deltas, offset = unshuffle(payload, offset, count, "I")
+        latitudes, offset = unshuffle(payload, offset, count, "i")
+        longitudes, offset = unshuffle(payload, offset, count, "i")
+        flags, progress = payload[offset:offset + count], payload[offset + count:offset + 2 * count]
+        offset += 2 * count
+        ids, current = [], 0
+        for delta in deltas:
+            current += delta
+            ids.append(current)
+        sections[kind] = list(zip(ids, latitudes, longitudes, flags, progress))
+    return sections
+
+
+def timed(label: str, operation):
+    timings = []
+    for _ in range(args.queries):
+        started = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"  {label:<34} median {statistics.median(timings):8.3f} ms  p95 "
+          f"{timings[int(len(timings) * 0.95)]:8.3f} ms")
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    seed(rng)
+    print(f"Seeded {args.projects:,} projects and {args.lockers:,} lockers")
+
+    export = MapPointsExport()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        export.load(db)
+        print(f"Snapshot loaded in {time.perf_counter() - started:.2f}s")
+
+        _, raw = export.payload(db, compressed=False)
+        _, packed = export.payload(db)
+        expected = sorted(point for point in (project_point(*row) for row in db.execute(select(
+            ProjectDB.id, ProjectDB.latitude, ProjectDB.longitude, ProjectDB.status, ProjectDB.is_verified,
+            ProjectDB.current_amount, ProjectDB.goal_amount)).tuples()) if point is not None)
+        decoded = decode(gzip.decompress(packed))
+        assert decoded[0] == expected, "decoded projects differ from the database"
+        assert len(decoded[1]) == args.lockers, "locker count differs"
+
+        projects = db.execute(select(ProjectDB)).scalars().all()
+        full_json = json.dumps([ProjectResponse.model_validate(project).model_dump(mode="json")
+                                for project in projects]).encode()
+        points_json = json.dumps([list(point) for point in expected]).encode()
+        print("Payload for every project and locker:")
+        for label, size in (("binary", len(raw)), ("binary, gzip", len(packed)),
+                            ("JSON ProjectResponse list", len(full_json)),
+                            ("JSON ProjectResponse list, gzip", len(gzip.compress(full_json))),
+                            ("JSON point fields only, gzip", len(gzip.compress(points_json)))):
+            print(f"  {label:<34} {size / 1024:10,.1f} KiB")
+
+        def write_then_export():
+            # A donation moves a project's progress: one re-read, one re-encode
+            export.mark(PROJECT, [rng.randint(1, args.projects)])
+            db.execute(select(ProjectDB.id).limit(1)).all()
+            export._payloads.clear()
+            export.payload(db)
+
+        timed("re-encode after a write", write_then_export)
+        timed("cached payload", lambda: export.payload(db))
+    finally:
+        db.close()
+
+    if len(packed) / 1024 > args.budget_kb:
+        print(f"FAILED: gzipped payload larger than {args.budget_kb:.0f} KiB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark courier-to-delivery matching.
+
+Seeds N pending deliveries and C courier positions around the synthetic
+city clusters, then times a full CourierMatcher.run (pending query, index
+build and assignment) for each strategy and compares total pickup distance.
+
+Usage: python benchmarks/bench_matching.py [--deliveries 1000] [--couriers 300] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--deliveries", type=int, default=1000)
+parser.add_argument("--couriers", type=int, default=300)
+parser.add_argument("--repeat", type=int, default=5)
+parser.add_argument("--budget-ms", type=float, default=1000.0, help="Fail if the optimal run is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from database import SessionLocal, init_db
+from datagen import CityClusters
+from models import ProjectDB, DeliveryDB
+from services.courier_locations import CourierLocationStore
+from services.courier_matching import CourierMatcher
+
+
+def seed(deliveries: int, couriers: int) -> CourierLocationStore:
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    db = SessionLocal()
+    try:
+        projects = []
+        for i in range(deliveries):
+            lat, lon = clusters.point(rng)
+            projects.append({"id": i + 1, "name": f"Order {i}", "owner_id": 1, "goal_amount": 0,
+                             "latitude": lat, "longitude": lon})
+        db.execute(insert(ProjectDB), projects)
+        db.execute(insert(DeliveryDB), [{"project_id": i + 1, "status": "pending"} for i in range(deliveries)])
+        db.commit()
+    finally:
+        db.close()
+
+    locations = CourierLocationStore(ttl_seconds=3600)
+    now = time.time()
+    for courier_id in range(1, couriers + 1):
+        lat, lon = clusters.point(rng)
+        locations.update(courier_id, lat, lon, recorded_at=now - rng.random() * 60)
+    return locations
+
+
+def main():
+    init_db()
+    locations = seed(args.deliveries, args.couriers)
+    print(f"{args.couriers} couriers, {args.deliveries} pending deliveries, best of {args.repeat}")
+
+    failed = False
+    for strategy in ("optimal", "greedy"):
+        timings = []
+        for _ in range(args.repeat):
+            # Fresh matcher each time so no courier already holds an offer
+            matcher = CourierMatcher(locations=locations)
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                summary = matcher.run(db, strategy=strategy)
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                db.close()
+        print(f"  {strategy:<8} {min(timings):8.1f} ms best, {statistics.median(timings):8.1f} ms median"
+              f"  offers={summary.offers}  total pickup={summary.total_km:,.1f} km"
+              f"  avg={summary.total_km / max(summary.offers, 1):.2f} km")
+        if strategy == "optimal" and min(timings) > args.budget_ms:
+            failed = True
+
+    if failed:
+        print(f"FAILED: optimal matching slower than {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
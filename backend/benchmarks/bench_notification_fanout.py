@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark notification fan-out for a single popular project.
+
+Creates a throwaway SQLite database with N subscribers, then measures
+how long publish() blocks the caller and how long the fan-out jobs need to
+write every inbox row, run on this thread one chunk per job.
+
+Usage: python benchmarks/bench_notification_fanout.py [--subscribers 100000] [--chunk-size 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, SubscriptionDB, NotificationDB
+from services.job_queue import job_queue
+import services.jobs  # noqa: F401 - registers the fan-out handler
+from services.notification_service import notification_fanout
+
+
+def seed(subscribers: int):
+    db = SessionLocal()
+    try:
+        batch = 10000
+        for start in range(0, subscribers + 1, batch):
+            db.execute(insert(UserDB), [
+                {
+                    "email": f"user{i}@bench.local",
+                    "name": f"User {i}",
+                    "password_hash": "x",
+                }
+                for i in range(start, min(start + batch, subscribers + 1))
+            ])
+        db.commit()
+
+        project = ProjectDB(name="Popular project", owner_id=1, goal_amount=1000)
+        db.add(project)
+        db.commit()
+
+        for start in range(2, subscribers + 2, batch):
+            db.execute(insert(SubscriptionDB), [
+                {"user_id": i, "project_id": project.id}
+                for i in range(start, min(start + batch, subscribers + 2))
+            ])
+        db.commit()
+        return project.id
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    init_db()
+    t0 = time.perf_counter()
+    project_id = seed(args.subscribers)
+    print(f"Seeded {args.subscribers} subscribers in {time.perf_counter() - t0:.2f}s")
+
+    notification_fanout.chunk_size = args.chunk_size
+
+    t0 = time.perf_counter()
+    notification_fanout.publish(project_id=project_id, title="Новое пожертвование", message="bench",
+                                type="donation", event_key="bench:1")
+    publish_ms = (time.perf_counter() - t0) * 1000
+    jobs = job_queue.run_pending()
+    fanout_s = time.perf_counter() - t0
+
+    db = SessionLocal()
+    try:
+        written = db.query(func.count(NotificationDB.id)).scalar()
+    finally:
+        db.close()
+
+    print(f"publish() blocked the caller for {publish_ms:.3f} ms")
+    print(f"Fan-out wrote {written} inbox rows in {jobs} jobs, {fanout_s:.2f}s ({written / fanout_s:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
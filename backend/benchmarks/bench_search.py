@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text and geo+text search.
+
+Seeds projects, issues and comments (about 1M documents by default) with
+Russian and English text drawn from a skewed vocabulary around the
+synthetic city clusters, builds the search index the way
+rebuild_search_index.py does, then times SearchIndex.search for common,
+rare, multi-word and "within 3 km" queries, first pages and deeper ones.
+
+Usage: python benchmarks/bench_search.py [--projects 200000] [--issues 400000] [--comments 400000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--projects", type=int, default=200000)
+parser.add_argument("--issues", type=int, default=400000)
+parser.add_argument("--comments", type=int, default=400000)
+parser.add_argument("--queries", type=int, default=200, help="Queries per scenario")
+parser.add_argument("--budget-ms", type=float, default=20.0, help="Fail if any scenario's p95 is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from database import SessionLocal, engine, init_db
+from datagen import CityClusters
+from models import UserDB, ProjectDB, IssueDB, CommentDB
+from services.search import COMMENT, ISSUE, PROJECT, search_index
+
+WORDS = [
+    "хлеб", "хлеба", "хлебом", "молоко", "молока", "овощи", "овощей", "фрукты", "обеды", "обедов",
+    "продукты", "продуктов", "приют", "приюта", "детей", "школа", "школы", "волонтеры", "волонтеров",
+    "доставка", "доставки", "водитель", "коробки", "сортировка", "склад", "пекарня", "консервы",
+    "bread", "bakery", "milk", "vegetables", "fruit", "meals", "shelter", "school", "children",
+    "volunteers", "delivery", "driver", "boxes", "sorting", "warehouse", "canned", "soup", "fresh",
+    "weekend", "evening", "morning", "kitchen", "packing", "donation", "family", "elderly", "help",
+]
+# Zipf-like: the first words are very common, the tail is rare
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+BATCH = 10000
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(WORDS, weights=WEIGHTS, k=words))
+
+
+def seed(clusters: CityClusters, rng: random.Random):
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [{"id": 1, "email": "bench@example.com", "name": "Bench", "password_hash": "-"}])
+        for start in range(0, args.projects, BATCH):
+            rows = []
+            for project_id in range(start + 1, min(start + BATCH, args.projects) + 1):
+                lat, lon = clusters.point(rng)
+                rows.append({"id": project_id, "name": sentence(rng, 3), "description": sentence(rng, 15),
+                             "owner_id": 1, "goal_amount": 0, "latitude": lat, "longitude": lon})
+            db.execute(insert(ProjectDB), rows)
+        for model, count, make in (
+            (IssueDB, args.issues, lambda i: {"id": i, "title": sentence(rng, 4), "description": sentence(rng, 12),
+                                              "project_id": rng.randint(1, args.projects), "reporter_id": 1}),
+            (CommentDB, args.comments, lambda i: {"id": i, "content": sentence(rng, 10),
+                                                  "project_id": rng.randint(1, args.projects), "user_id": 1}),
+        ):
+            for start in range(0, count, BATCH):
+                db.execute(insert(model), [make(i) for i in range(start + 1, min(start + BATCH, count) + 1)])
+        db.commit()
+    finally:
+        db.close()
+
+
+def build_index():
+    with engine.begin() as conn:
+        for doc_type, count in ((PROJECT, args.projects), (ISSUE, args.issues), (COMMENT, args.comments)):
+            for start in range(0, count, BATCH):
+                search_index.index(conn, search_index.documents(conn, doc_type, range(start + 1, start + BATCH + 1)))
+
+
+def main():
+    init_db()
+    rng = random.Random(42)
+    clusters = CityClusters(rng)
+    started = time.perf_counter()
+    seed(clusters, rng)
+    print(f"Seeded {args.projects + args.issues + args.comments:,} documents in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    build_index()
+    print(f"Index built in {time.perf_counter() - started:.1f}s")
+
+    common = WORDS[:5]
+    rare = WORDS[-10:]
+    scenarios = {
+        "common word": lambda: {"query": rng.choice(common)},
+        "rare word": lambda: {"query": rng.choice(rare)},
+        "two words": lambda: {"query": f"{rng.choice(WORDS[:20])} {rng.choice(WORDS)}"},
+        "three words": lambda: {"query": " ".join(rng.choices(WORDS, k=3))},
+        "common, page 10": lambda: {"query": rng.choice(common), "page": 10},
+        "issues only": lambda: {"query": rng.choice(common), "types": [ISSUE]},
+        "common within 3 km": lambda: dict(zip(("latitude", "longitude"), clusters.point(rng)),
+                                           query=rng.choice(common), radius_km=3.0),
+        "rare within 3 km": lambda: dict(zip(("latitude", "longitude"), clusters.point(rng)),
+                                         query=rng.choice(rare), radius_km=3.0),
+        "common within 25 km": lambda: dict(zip(("latitude", "longitude"), clusters.point(rng)),
+                                            query=rng.choice(common), radius_km=25.0),
+    }
+
+    failed = []
+    with engine.connect() as conn:
+        # The first query for a term also counts its documents; that figure is cached
+        started = time.perf_counter()
+        for word in WORDS:
+            search_index.search(conn, word)
+        print(f"Cold queries: {(time.perf_counter() - started) * 1000 / len(WORDS):.1f} ms each "
+              f"over the {len(WORDS)} vocabulary words")
+        for name, make in scenarios.items():
+            timings, hits = [], 0
+            for _ in range(args.queries):
+                params = make()
+                started = time.perf_counter()
+                page = search_index.search(conn, **params)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += len(page.hits)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95)]
+            print(f"  {name:<22} median {statistics.median(timings):6.2f} ms  p95 {p95:6.2f} ms"
+                  f"  hits/page {hits / args.queries:5.1f}")
+            if p95 > args.budget_ms:
+                failed.append(name)
+
+    if failed:
+        print(f"FAILED: p95 slower than {args.budget_ms:.0f} ms for {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark mass-closing issues and the XP awards that come with it.
+
+Seeds N assigned issues spread over a pool of volunteers, then closes all
+of them three ways: the old per-award path (read the user, add XP, commit
+for every issue), close_issue one issue at a time, and one close_issues
+batch. A repeated batch must award nothing, and rebuild_xp must arrive at
+the same totals from the event log.
+
+Usage: python benchmarks/bench_xp_awards.py [--issues 5000] [--volunteers 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+parser.add_argument("--issues", type=int, default=5000)
+parser.add_argument("--volunteers", type=int, default=500)
+parser.add_argument("--budget-ms", type=float, default=2000.0, help="Fail if the batch close is slower")
+args = parser.parse_args()
+
+_tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ["ENVIRONMENT"] = "benchmark"
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, insert, select, update
+import crud
+from database import SessionLocal, init_db
+from models import UserDB, ProjectDB, IssueDB, XpEventDB
+from rebuild_xp import RebuildXp
+from services.leaderboard import rating_level_for
+from services import xp
+from services.maintenance import run_task
+
+PRIORITIES = ["low", "medium", "high"]
+
+
+def seed():
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        db.execute(insert(UserDB), [
+            {"id": user_id, "email": f"user{user_id}@bench.local", "name": f"User {user_id}",
+             "password_hash": "-", "xp": 0, "rating_level": "Bronze"}
+            for user_id in range(1, args.volunteers + 2)
+        ])
+        db.execute(insert(ProjectDB), [{"id": 1, "name": "Bench", "owner_id": 1, "goal_amount": 0}])
+        db.execute(insert(IssueDB), [
+            {"id": issue_id, "title": f"Issue {issue_id}", "project_id": 1, "reporter_id": 1,
+             "assignee_id": rng.randint(2, args.volunteers + 1), "priority": rng.choice(PRIORITIES),
+             "status": "in-progress"}
+            for issue_id in range(1, args.issues + 1)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def reset(db):
+    db.execute(update(IssueDB).values(status="in-progress"))
+    db.execute(delete(XpEventDB))
+    db.execute(update(UserDB).values(xp=0, rating_level="Bronze"))
+    db.commit()
+
+
+def total_xp(db) -> int:
+    return db.execute(select(func.coalesce(func.sum(UserDB.xp), 0))).scalar()
+
+
+def legacy_close(db, issue_id: int):
+    """The old path: status change, then a separate read-modify-commit of the user per award"""
+    issue = crud.get_issue_by_id(db, issue_id)
+    issue.status = "closed"
+    db.commit()
+    user = crud.get_user_by_id(db, issue.assignee_id)
+    user.xp += xp.ISSUE_CLOSE_XP.get(issue.priority, xp.DEFAULT_ISSUE_CLOSE_XP)
+    user.rating_level = rating_level_for(user.xp)
+    db.commit()
+    db.refresh(user)
+
+
+def timed(label: str, operation) -> float:
+    started = time.perf_counter()
+    operation()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"  {label:<34} {elapsed:10.1f} ms  ({elapsed * 1000 / args.issues:7.1f} us per issue)")
+    return elapsed
+
+
+def main():
+    init_db()
+    seed()
+    ids = list(range(1, args.issues + 1))
+    print(f"Closing {args.issues:,} issues assigned to {args.volunteers:,} volunteers")
+
+    db = SessionLocal()
+    try:
+        # Loops rather than comprehensions: holding on to the returned issues would make
+        # every commit expire a growing identity map
+        def close_each(close):
+            for issue_id in ids:
+                close(db, issue_id)
+
+        timed("per-award commit (old path)", lambda: close_each(legacy_close))
+        expected = total_xp(db)
+
+        reset(db)
+        timed("close_issue, one at a time", lambda: close_each(crud.close_issue))
+        assert total_xp(db) == expected, "one-at-a-time close awarded a different total"
+
+        reset(db)
+        batch_ms = timed("close_issues, one batch", lambda: crud.close_issues(db, ids))
+        assert total_xp(db) == expected, "batch close awarded a different total"
+
+        timed("close_issues again (no new XP)", lambda: crud.close_issues(db, ids))
+        assert total_xp(db) == expected, "closing twice awarded XP twice"
+
+        db.execute(update(UserDB).values(xp=0))
+        db.commit()
+        timed("rebuild_xp from the log", lambda: run_task(RebuildXp(), progress=False, db=db))
+        assert total_xp(db) == expected, "rebuild disagrees with the awarded total"
+        print(f"Total XP awarded: {expected:,}")
+    finally:
+        db.close()
+
+    if batch_ms > args.budget_ms:
+        print(f"FAILED: batch close slower than {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+API hot-path benchmark suite.
+
+Loads a synthetic dataset into a throwaway database (temp SQLite by default,
+or any --db-url such as Postgres), drives the main endpoints concurrently
+in-process over ASGI with a stubbed OSRM backend, and writes throughput and
+latency percentiles to a JSON file that can be diffed between commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale small --concurrency 16 --output bench.json
+    python benchmarks/run_benchmarks.py --scale tiny --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = [
+    "nearby", "project_detail", "feed_donations", "feed_projects", "feed_volunteers",
+    "login", "donate", "route", "distance_matrix", "optimize", "available_orders",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Save Food API hot paths")
+    parser.add_argument("--scale", default="small", help="tiny, small, medium or large")
+    parser.add_argument("--db-url", default=None, help="Database URL (default: temp SQLite file)")
+    parser.add_argument("--seed", type=int, default=42, help="Dataset and request-mix seed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="Previous results file to diff against")
+    return parser.parse_args()
+
+
+def configure_environment(args):
+    """Point the app at the benchmark database before any app module is imported"""
+    if args.db_url:
+        os.environ["DATABASE_URL"] = args.db_url
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="savefood-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ["ENVIRONMENT"] = "benchmark"
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+    os.environ.setdefault("PROFILER_SAMPLE_RATE", "0")
+    sys.path.insert(0, BACKEND_DIR)
+
+
+# ---------- stub routing backend ----------
+
+def osrm_stub(request):
+    """Answer Valhalla health checks and OSRM route calls without the network"""
+    import httpx
+
+    if request.url.path.endswith("/status"):
+        return httpx.Response(200, json={"status": "ok"})
+
+    coords_part = request.url.path.rsplit("/", 1)[-1]
+    coordinates = [[float(v) for v in pair.split(",")] for pair in coords_part.split(";")]
+    return httpx.Response(200, json={
+        "code": "Ok",
+        "routes": [{
+            "distance": 1000.0 * len(coordinates),
+            "duration": 120.0 * len(coordinates),
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+        }],
+    })
+
+
+# ---------- request mix ----------
+
+def _locations(clusters, rng: random.Random, count: int) -> List[dict]:
+    result = []
+    for i in range(count):
+        lat, lon = clusters.point(rng)
+        result.append({"id": i, "lat": lat, "lon": lon})
+    return result
+
+
+def build_scenarios(ctx: dict) -> Dict[str, Callable[[random.Random], dict]]:
+    """Each scenario returns keyword arguments for httpx.AsyncClient.request"""
+    projects = ctx["projects"]
+    users = ctx["users"]
+    clusters = ctx["clusters"]
+
+    def auth_headers(rng):
+        return ctx["tokens"][rng.randrange(len(ctx["tokens"]))]
+
+    def nearby(rng):
+        lat, lon = clusters.point(rng)
+        return {"method": "GET", "url": "/api/projects/nearby/all",
+                "params": {"latitude": lat, "longitude": lon, "radius_km": 3}}
+
+    def project_detail(rng):
+        return {"method": "GET", "url": f"/api/projects/{rng.randint(*projects)}"}
+
+    def feed_donations(rng):
+        return {"method": "GET", "url": "/api/notifications/donations/new"}
+
+    def feed_projects(rng):
+        return {"method": "GET", "url": "/api/notifications/projects/new"}
+
+    def feed_volunteers(rng):
+        return {"method": "GET", "url": "/api/notifications/volunteers/completed"}
+
+    def login(rng):
+        return {"method": "POST", "url": "/api/auth/login",
+                "json": {"email": ctx["email_pattern"].format(id=rng.randint(*users)),
+                         "password": ctx["password"]}}
+
+    def donate(rng):
+        project_id = rng.randint(*projects)
+        return {"method": "POST", "url": f"/api/projects/{project_id}/donations",
+                "json": {"amount": round(rng.uniform(1, 100), 2), "project_id": project_id},
+                "headers": auth_headers(rng)}
+
+    def available_orders(rng):
+        lat, lon = clusters.point(rng)
+        return {"method": "GET", "url": "/api/donations",
+                "params": {"available": "true", "latitude": lat, "longitude": lon, "limit": 20}}
+
+    def route(rng):
+        return {"method": "POST", "url": "/api/routes/route",
+                "json": {"locations": _locations(clusters, rng, rng.randint(2, 6))}}
+
+    def distance_matrix(rng):
+        return {"method": "POST", "url": "/api/routes/distance-matrix",
+                "json": {"locations": _locations(clusters, rng, 25)}}
+
+    def optimize(rng):
+        return {"method": "POST", "url": "/api/routes/optimize",
+                "params": {"num_couriers": 3}, "json": _locations(clusters, rng, 12)}
+
+    return {
+        "nearby": nearby, "project_detail": project_detail,
+        "feed_donations": feed_donations, "feed_projects": feed_projects,
+        "feed_volunteers": feed_volunteers, "login": login, "donate": donate,
+        "route": route, "distance_matrix": distance_matrix, "optimize": optimize,
+        "available_orders": available_orders,
+    }
+
+
+# ---------- load generation ----------
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+async def drive(client, make_request, total: int, concurrency: int, seed: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(**make_request(rng))
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import main
+    from auth import create_access_token
+    from database import SessionLocal, init_db
+    from services.routing_service import routing_service
+    import datagen
+
+    if args.scale not in datagen.SCALES:
+        raise SystemExit(f"Unknown scale '{args.scale}', choose from {', '.join(datagen.SCALES)}")
+    scale = datagen.SCALES[args.scale]
+
+    init_db()
+    db = SessionLocal()
+    try:
+        load_started = time.perf_counter()
+        ctx = datagen.generate(db, scale, seed=args.seed, email_domain="bench.local")
+        load_seconds = time.perf_counter() - load_started
+    finally:
+        db.close()
+    print(f"Loaded '{args.scale}' dataset in {load_seconds:.1f}s")
+
+    rng = random.Random(args.seed)
+    ctx["clusters"] = datagen.CityClusters(random.Random(args.seed))
+    ctx["tokens"] = [
+        {"Authorization": f"Bearer {create_access_token({'sub': str(rng.randint(*ctx['users']))})}"}
+        for _ in range(50)
+    ]
+
+    routing_service.session = httpx.AsyncClient(transport=httpx.MockTransport(osrm_stub))
+    await main.startup_event()
+
+    scenarios = build_scenarios(ctx)
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for index, name in enumerate(selected):
+                if name not in scenarios:
+                    raise SystemExit(f"Unknown scenario '{name}'")
+                results[name] = await drive(client, scenarios[name], args.requests,
+                                            args.concurrency, args.seed + index)
+                r = results[name]
+                print(f"{name:<16} {r['throughput_rps']:>9} rps  p50 {r['p50_ms']:>9} ms  "
+                      f"p95 {r['p95_ms']:>9} ms  p99 {r['p99_ms']:>9} ms  errors {r['errors']}")
+    finally:
+        await main.shutdown_event()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "dataset": vars(scale),
+            "dataset_load_seconds": round(load_seconds, 2),
+            "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_comparison(previous: dict, current: dict):
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('scale')}):")
+    for name, now in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if before.get(key) and now.get(key) is not None:
+                deltas.append(f"{key} {100 * (now[key] - before[key]) / before[key]:+.1f}%")
+        print(f"  {name:<16} " + "  ".join(deltas))
+
+
+def main():
+    args = parse_args()
+    configure_environment(args)
+    results = asyncio.run(run(args))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
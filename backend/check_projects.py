@@ -1,133 +1,166 @@
 #!/usr/bin/env python3
 
+import argparse
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import case, func, insert, select
+
 from database import SessionLocal, settings
-from models import ProjectDB, UserDB
-import json
+from models import ProjectDB, UserDB, ProjectStatus
+from services.maintenance import DEFAULT_BATCH_SIZE
+
+TEST_PROJECTS = [
+    {
+        "name": "Bakery Donation",
+        "description": "Distributing bread and buns to those in need",
+        "icon": "bread",
+        "color": "#D4A574",
+        "goal_amount": 5000.0,
+        "latitude": 55.7536,
+        "longitude": 37.6201,
+        "is_verified": True
+    },
+    {
+        "name": "Charity Canteen",
+        "description": "Free meals for low-income citizens",
+        "icon": "food",
+        "color": "#FF6B6B",
+        "goal_amount": 10000.0,
+        "latitude": 55.7596,
+        "longitude": 37.6150,
+        "is_verified": True
+    },
+    {
+        "name": "Dairy Shop",
+        "description": "Milk product distribution",
+        "icon": "milk",
+        "color": "#95E1D3",
+        "goal_amount": 3000.0,
+        "latitude": 55.7466,
+        "longitude": 37.6261,
+        "is_verified": False
+    },
+    {
+        "name": "Vegetable Garden",
+        "description": "Fresh vegetables and fruits distribution",
+        "icon": "vegetables",
+        "color": "#38A169",
+        "goal_amount": 7000.0,
+        "latitude": 55.7606,
+        "longitude": 37.5950,
+        "is_verified": True
+    },
+    {
+        "name": "Clothing Store",
+        "description": "Collection and distribution of clean clothes",
+        "icon": "clothes",
+        "color": "#9F7AEA",
+        "goal_amount": 2000.0,
+        "latitude": 55.7436,
+        "longitude": 37.6351,
+        "is_verified": False
+    }
+]
+
+
+def print_summary(db):
+    """One aggregate query instead of loading every project"""
+    total, verified, no_coords, no_icon, goal, raised = db.execute(
+        select(
+            func.count(ProjectDB.id),
+            func.sum(case((ProjectDB.is_verified == True, 1), else_=0)),
+            func.sum(case(((ProjectDB.latitude.is_(None)) | (ProjectDB.longitude.is_(None)), 1), else_=0)),
+            func.sum(case((ProjectDB.icon.is_(None) | ProjectDB.color.is_(None), 1), else_=0)),
+            func.coalesce(func.sum(ProjectDB.goal_amount), 0),
+            func.coalesce(func.sum(ProjectDB.current_amount), 0),
+        )
+    ).one()
+    by_status = db.execute(
+        select(ProjectDB.status, func.count(ProjectDB.id)).group_by(ProjectDB.status)
+    ).all()
+
+    print(f"\n{'='*60}")
+    print(f"Current projects in database: {total}")
+    print(f"{'='*60}\n")
+    if not total:
+        return 0
+    print(f"  Verified:             {verified or 0}")
+    print(f"  Missing coordinates:  {no_coords or 0}  (fix with fix_projects.py)")
+    print(f"  Missing icon/color:   {no_icon or 0}  (fix with fix_null_values.py)")
+    print(f"  Goal total:           ${goal:,.2f} | Raised: ${raised:,.2f}")
+    for status, count in by_status:
+        label = status.value if isinstance(status, ProjectStatus) else status
+        print(f"  Status {label}: {count}")
+    print()
+    return total
+
+
+def list_projects(db, batch_size):
+    """Stream projects in id order without materialising the table"""
+    rows = db.execute(
+        select(ProjectDB.id, ProjectDB.name, ProjectDB.latitude, ProjectDB.longitude,
+               ProjectDB.goal_amount, ProjectDB.current_amount, ProjectDB.is_verified)
+        .order_by(ProjectDB.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        print(f"{row.id}\t{row.name}\t({row.latitude}, {row.longitude})\t"
+              f"${row.current_amount}/${row.goal_amount}\tverified={row.is_verified}")
 
-def check_and_seed_projects():
+
+def seed_test_projects(db):
+    admin = db.query(UserDB).filter(UserDB.is_admin == True).first()
+
+    if not admin:
+        print("\nNo admin user found. Creating test admin user...")
+        from auth import hash_password
+        test_admin = UserDB(
+            email="admin@savefood.local",
+            name="System Admin",
+            password_hash=hash_password("admin123"),
+            is_admin=True,
+            role="Administrator"
+        )
+        db.add(test_admin)
+        db.commit()
+        db.refresh(test_admin)
+        print(f"Admin user created (ID: {test_admin.id})")
+        admin = test_admin
+
+    print(f"\nAdding {len(TEST_PROJECTS)} test projects...\n")
+    db.execute(insert(ProjectDB), [
+        {
+            **project_data,
+            "owner_id": admin.id,
+            "current_amount": project_data["goal_amount"] * 0.6,
+            "status": ProjectStatus.ACTIVE,
+        }
+        for project_data in TEST_PROJECTS
+    ])
+    db.commit()
+    for project_data in TEST_PROJECTS:
+        print(f"Added: {project_data['name']}")
+    print(f"\nTest projects added successfully!")
+
+
+def check_and_seed_projects(list_all=False, batch_size=DEFAULT_BATCH_SIZE):
     db = SessionLocal()
     
     try:
-        projects = db.query(ProjectDB).all()
-        print(f"\n{'='*60}")
-        print(f"Current projects in database: {len(projects)}")
-        print(f"{'='*60}\n")
-        
-        if projects:
-            for i, project in enumerate(projects, 1):
-                print(f"{i}. {project.name}")
-                print(f"   ID: {project.id}")
-                print(f"   Description: {project.description}")
-                print(f"   Location: ({project.latitude}, {project.longitude})")
-                print(f"   Goal: ${project.goal_amount} | Current: ${project.current_amount}")
-                print(f"   Verified: {project.is_verified}")
-                print()
-        else:
+        total = print_summary(db)
+        if total and list_all:
+            list_projects(db, batch_size)
+        elif not total:
             print("No projects found in database!")
             print("\nDo you want to add test projects? (y/n): ", end="")
             response = input().lower().strip()
             
             if response == 'y':
-                admin = db.query(UserDB).filter(UserDB.is_admin == True).first()
-                
-                if not admin:
-                    print("\nNo admin user found. Creating test admin user...")
-                    from auth import hash_password
-                    test_admin = UserDB(
-                        email="admin@savefood.local",
-                        name="System Admin",
-                        password_hash=hash_password("admin123"),
-                        is_admin=True,
-                        role="Administrator"
-                    )
-                    db.add(test_admin)
-                    db.commit()
-                    db.refresh(test_admin)
-                    print(f"Admin user created (ID: {test_admin.id})")
-                    admin = test_admin
-                
-                test_projects = [
-                    {
-                        "name": "Bakery Donation",
-                        "description": "Distributing bread and buns to those in need",
-                        "icon": "bread",
-                        "color": "#D4A574",
-                        "goal_amount": 5000.0,
-                        "latitude": 55.7536,
-                        "longitude": 37.6201,
-                        "is_verified": True
-                    },
-                    {
-                        "name": "Charity Canteen",
-                        "description": "Free meals for low-income citizens",
-                        "icon": "food",
-                        "color": "#FF6B6B",
-                        "goal_amount": 10000.0,
-                        "latitude": 55.7596,
-                        "longitude": 37.6150,
-                        "is_verified": True
-                    },
-                    {
-                        "name": "Dairy Shop",
-                        "description": "Milk product distribution",
-                        "icon": "milk",
-                        "color": "#95E1D3",
-                        "goal_amount": 3000.0,
-                        "latitude": 55.7466,
-                        "longitude": 37.6261,
-                        "is_verified": False
-                    },
-                    {
-                        "name": "Vegetable Garden",
-                        "description": "Fresh vegetables and fruits distribution",
-                        "icon": "vegetables",
-                        "color": "#38A169",
-                        "goal_amount": 7000.0,
-                        "latitude": 55.7606,
-                        "longitude": 37.5950,
-                        "is_verified": True
-                    },
-                    {
-                        "name": "Clothing Store",
-                        "description": "Collection and distribution of clean clothes",
-                        "icon": "clothes",
-                        "color": "#9F7AEA",
-                        "goal_amount": 2000.0,
-                        "latitude": 55.7436,
-                        "longitude": 37.6351,
-                        "is_verified": False
-                    }
-                ]
-                
-                print(f"\nAdding {len(test_projects)} test projects...\n")
-                
-                for project_data in test_projects:
-                    new_project = ProjectDB(
-                        owner_id=admin.id,
-                        name=project_data["name"],
-                        description=project_data["description"],
-                        icon=project_data["icon"],
-                        color=project_data["color"],
-                        goal_amount=project_data["goal_amount"],
-                        current_amount=project_data["goal_amount"] * 0.6,
-                        latitude=project_data["latitude"],
-                        longitude=project_data["longitude"],
-                        is_verified=project_data["is_verified"],
-                        status="Active"
-                    )
-                    db.add(new_project)
-                    print(f"Added: {project_data['name']}")
-                
-                db.commit()
-                print(f"\nTest projects added successfully!")
-                
-                projects = db.query(ProjectDB).all()
-                print(f"\nTotal projects now: {len(projects)}")
+                seed_test_projects(db)
+                print_summary(db)
     
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -135,5 +168,10 @@ def check_and_seed_projects():
         db.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise projects and seed test data into an empty database")
+    parser.add_argument("--list", action="store_true", help="Stream every project, one line each")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
     print(f"Database: {settings.database_url}")
-    check_and_seed_projects()
+    check_and_seed_projects(list_all=args.list, batch_size=args.batch_size)
@@ -5,49 +5,66 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import delete, func, select
+
+import crud
 from database import SessionLocal
-from models import ProjectDB
+from models import (
+    ProjectDB, IssueDB, DonationDB, CommentDB, SubscriptionDB, NotificationDB, DeliveryDB, LockerReservationDB,
+)
+from services import issue_stats
+from services.locker_reservations import LIVE
+from services.search import search_index
+from services.maintenance import MaintenanceTask, build_parser, run_cli
+
+# Rows referencing projects, deleted first so no foreign key is left dangling
+DEPENDENT_MODELS = [IssueDB, DonationDB, CommentDB, SubscriptionDB, NotificationDB, DeliveryDB]
+
+
+class ClearProjects(MaintenanceTask):
+    name = "clear_projects"
+    description = "Deleting projects together with their issues, donations, comments, deliveries and locker holds"
+    model = ProjectDB
+
+    def apply(self, db, ids):
+        # Core deletes skip the ORM hooks that keep the search index and issue counters in step
+        search_index.remove_projects(db.connection(), ids)
+        issue_stats.forget(db.connection(), IssueDB.project_id.in_(ids))
+        # Locker reservations reference deliveries; live ones give their slots back first
+        delivery_ids = select(DeliveryDB.id).where(DeliveryDB.project_id.in_(ids))
+        held = db.execute(
+            select(LockerReservationDB.locker_id, func.count())
+            .where(LockerReservationDB.delivery_id.in_(delivery_ids), LockerReservationDB.status.in_(LIVE))
+            .group_by(LockerReservationDB.locker_id)
+        ).all()
+        for locker_id, count in held:
+            crud.free_locker_slots(db, locker_id, count)
+        db.execute(delete(LockerReservationDB).where(LockerReservationDB.delivery_id.in_(delivery_ids)))
+        for model in DEPENDENT_MODELS:
+            db.execute(delete(model).where(model.project_id.in_(ids)))
+        db.execute(delete(ProjectDB).where(ProjectDB.id.in_(ids)))
+
+
+if __name__ == "__main__":
+    parser = build_parser("Delete ALL projects and the rows that reference them")
+    parser.add_argument("--yes", action="store_true", help="Skip the confirmation prompt")
+    args = parser.parse_args()
 
-def clear_projects():
     db = SessionLocal()
-    
     try:
-        count = db.query(ProjectDB).count()
-        print(f"\n{'='*60}")
-        print(f"Clearing projects from database...")
-        print(f"Found {count} projects to delete")
-        print(f"{'='*60}\n")
-        
-        if count == 0:
-            print("Database is already empty - no projects to delete")
-            return
-        
-        projects = db.query(ProjectDB).all()
-        print("Projects to be deleted:")
-        for i, project in enumerate(projects, 1):
-            print(f"  {i}. {project.name} (ID: {project.id})")
-        print()
-        
+        count = db.query(func.count(ProjectDB.id)).scalar()
+    finally:
+        db.close()
+
+    print(f"Found {count} projects to delete")
+    if count == 0:
+        print("Database is already empty - no projects to delete")
+        sys.exit(0)
+
+    if not args.dry_run and not args.yes:
         response = input("Are you sure you want to delete ALL projects? (yes/no): ").lower().strip()
-        
         if response != 'yes':
             print("Deletion cancelled")
-            return
-        
-        db.query(ProjectDB).delete()
-        db.commit()
-        
-        remaining = db.query(ProjectDB).count()
-        print(f"\nSuccessfully deleted {count} projects!")
-        print(f"Remaining projects in database: {remaining}")
-        print(f"{'='*60}\n")
-        
-    except Exception as e:
-        db.rollback()
-        print(f"\nError: {str(e)}")
-        sys.exit(1)
-    finally:
-        db.close()
+            sys.exit(0)
 
-if __name__ == "__main__":
-    clear_projects()
+    run_cli([ClearProjects()], args)
@@ -1,23 +1,34 @@
 """CRUD operations for database models"""
 
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, func, literal, or_, update
 from models import (
     UserDB, ProjectDB, IssueDB, DonationDB, CommentDB, SubscriptionDB, DeliveryDB, ParcelLockerDB,
-    ProjectStatus, IssueCategory, UserRole
+    NotificationDB, ProjectStatus, IssueCategory, UserRole
 )
 from auth import hash_password, verify_password
+from services.job_queue import job_queue
+from services import xp
+from services import issue_stats  # noqa: F401 - registers the hooks that keep issue counters in step
+from services import search  # noqa: F401 - registers the hooks that keep the search index in step
+from services.issue_recommendations import issue_recommender
+from services.leaderboard import leaderboard
+from services.locker_index import locker_index
+from services.map_points import LOCKER, mark_after_commit
+from services.geo import bounding_box, distance_key_sql, distance_key_to_km, km_to_distance_key
+from services.donation_export import public_donations_query
 from typing import Optional, List
 
 
 # ============ USER CRUD ============
 
-def create_user(db: Session, email: str, name: str, password: str, role: Optional[str] = None) -> UserDB:
-    """Create a new user"""
+def create_user(db: Session, email: str, name: str, password: Optional[str] = None,
+                role: Optional[str] = None, password_hash: Optional[str] = None) -> UserDB:
+    """Create a new user from a plain password or an already computed hash"""
     db_user = UserDB(
         email=email,
         name=name,
-        password_hash=hash_password(password),
+        password_hash=password_hash or hash_password(password),
         role=role or UserRole.DONOR,
         xp=0,
         rating_level="Bronze",
@@ -26,6 +37,7 @@ def create_user(db: Session, email: str, name: str, password: str, role: Optiona
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    leaderboard.sync(db)
     return db_user
 
 
@@ -55,20 +67,15 @@ def update_user(db: Session, user_id: int, name: Optional[str] = None,
     return db_user
 
 
-def add_xp_to_user(db: Session, user_id: int, xp_amount: int) -> UserDB:
-    """Add XP to user for gamification"""
+def add_xp_to_user(db: Session, user_id: int, xp_amount: int, reason: Optional[str] = None,
+                   idempotency_key: Optional[str] = None) -> UserDB:
+    """Add XP to user for gamification; an award whose key is already logged adds nothing"""
     db_user = get_user_by_id(db, user_id)
     if db_user:
-        db_user.xp += xp_amount
-        # Update rating level based on XP
-        if db_user.xp >= 1000:
-            db_user.rating_level = "Gold"
-        elif db_user.xp >= 500:
-            db_user.rating_level = "Silver"
-        else:
-            db_user.rating_level = "Bronze"
+        xp.award(db, [xp.XpAward(user_id, xp_amount, reason, idempotency_key)])
         db.commit()
         db.refresh(db_user)
+        leaderboard.sync(db)
     return db_user
 
 
@@ -139,6 +146,8 @@ def update_project(db: Session, project_id: int, name: Optional[str] = None,
             db_project.longitude = longitude
         db.commit()
         db.refresh(db_project)
+        if latitude is not None or longitude is not None:
+            issue_recommender.move_project(db_project.id, db_project.latitude, db_project.longitude)
     return db_project
 
 
@@ -221,20 +230,93 @@ def get_donations_by_project(db: Session, project_id: int, skip: int = 0,
     ).offset(skip).limit(limit).all()
 
 
-def get_public_donations(db: Session, project_id: int) -> List[dict]:
-    """Get public donation list (hides anonymous donor names)"""
-    donations = get_donations_by_project(db, project_id)
-    result = []
-    for donation in donations:
-        donor_name = None if donation.is_anonymous else donation.user.name
-        result.append({
-            "id": donation.id,
-            "amount": donation.amount,
-            "donor_name": donor_name,
-            "project_id": donation.project_id,
-            "created_at": donation.created_at
-        })
-    return result
+def get_public_donations(db: Session, project_id: int, after_id: Optional[int] = None,
+                         limit: int = 100) -> List[dict]:
+    """Get a page of the public donation list in id order (hides anonymous donor names)"""
+    rows = db.execute(public_donations_query(project_id, after_id).limit(limit))
+    return [dict(row._mapping) for row in rows]
+
+
+CLAIMED_DELIVERY_STATUSES = ("accepted", "completed")
+# Search rings tried in turn when sorting by distance without a radius
+ORDER_SEARCH_RADII_KM = (0.5, 2.0, 8.0, 32.0, 128.0)
+
+
+def get_donation_orders(db: Session, user_id: Optional[int] = None, available: bool = False,
+                        latitude: Optional[float] = None, longitude: Optional[float] = None,
+                        radius_km: Optional[float] = None, after: Optional[tuple] = None,
+                        limit: int = 20) -> List:
+    """
+    Page through donations joined to their project in one query.
+
+    available keeps only orders whose project has no accepted or completed
+    delivery. With a position, rows are ordered nearest first by an
+    equirectangular distance computed in SQL and `after` is the
+    (distance_key, id) of the previous page's last row; otherwise rows are
+    newest first and `after` is (id,). Each row carries distance_key, the
+    squared distance in degrees (None without a position).
+    """
+    query = db.query(
+        DonationDB.id,
+        DonationDB.created_at,
+        DonationDB.project_id,
+        ProjectDB.name,
+        ProjectDB.description,
+        ProjectDB.latitude,
+        ProjectDB.longitude,
+    ).join(ProjectDB, ProjectDB.id == DonationDB.project_id)
+
+    if user_id is not None:
+        query = query.filter(DonationDB.user_id == user_id)
+
+    if available:
+        claimed = db.query(DeliveryDB.id).filter(
+            DeliveryDB.project_id == DonationDB.project_id,
+            DeliveryDB.status.in_(CLAIMED_DELIVERY_STATUSES)
+        ).exists()
+        query = query.filter(~claimed)
+
+    if latitude is None or longitude is None:
+        if after:
+            query = query.filter(DonationDB.id < after[0])
+        query = query.add_columns(literal(None).label("distance_key"))
+        return query.order_by(DonationDB.id.desc()).limit(limit).all()
+
+    distance_key = distance_key_sql(ProjectDB.latitude, ProjectDB.longitude, latitude, longitude)
+    query = query.add_columns(distance_key.label("distance_key")).filter(
+        ProjectDB.latitude.isnot(None),
+        ProjectDB.longitude.isnot(None)
+    )
+
+    if radius_km is None:
+        # A full page inside radius r is exactly the nearest page overall, so
+        # widen the ring until it fills instead of sorting the whole table
+        min_km = distance_key_to_km(after[0]) if after else 0.0
+        for ring_km in ORDER_SEARCH_RADII_KM:
+            if ring_km <= min_km:
+                continue
+            rows = get_donation_orders(db, user_id, available, latitude, longitude,
+                                       ring_km, after, limit)
+            if len(rows) == limit:
+                return rows
+
+    if radius_km is not None:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        # Bounding box first so an index on coordinates can narrow the scan
+        query = query.filter(
+            ProjectDB.latitude.between(min_lat, max_lat),
+            ProjectDB.longitude.between(min_lon, max_lon),
+            distance_key <= km_to_distance_key(radius_km)
+        )
+
+    if after:
+        last_key, last_id = after
+        query = query.filter(or_(
+            distance_key > last_key,
+            and_(distance_key == last_key, DonationDB.id > last_id)
+        ))
+
+    return query.order_by(distance_key, DonationDB.id).limit(limit).all()
 
 
 # ============ ISSUE CRUD ============
@@ -257,6 +339,7 @@ def create_issue(db: Session, project_id: int, reporter_id: int, title: str,
     db.add(db_issue)
     db.commit()
     db.refresh(db_issue)
+    issue_recommender.refresh(db, [db_issue.id])
     return db_issue
 
 
@@ -281,30 +364,31 @@ def assign_volunteer(db: Session, issue_id: int, volunteer_id: int) -> Optional[
         db_issue.status = "in-progress"
         db.commit()
         db.refresh(db_issue)
+        issue_recommender.refresh(db, [issue_id])
+        issue_recommender.forget_profile(volunteer_id)
     return db_issue
 
 
-def close_issue(db: Session, issue_id: int) -> Optional[IssueDB]:
+def close_issues(db: Session, issue_ids: List[int]) -> List[IssueDB]:
     """
-    Close an issue and award XP to assignee:
-    1. Update issue status
-    2. Award XP to volunteer
+    Close assigned issues and award their assignees XP in one transaction.
+    Unassigned issues are left open. Each issue's award is logged under its
+    own idempotency key, so closing an issue again awards nothing.
     """
-    db_issue = get_issue_by_id(db, issue_id)
-    if db_issue and db_issue.assignee_id:
-        db_issue.status = "closed"
-        
-        # Award XP based on priority
-        xp_reward = {
-            "low": 10,
-            "medium": 25,
-            "high": 50
-        }.get(db_issue.priority, 25)
-        
-        add_xp_to_user(db, db_issue.assignee_id, xp_reward)
-        db.commit()
-        db.refresh(db_issue)
-    return db_issue
+    issues = db.query(IssueDB).filter(IssueDB.id.in_(issue_ids), IssueDB.assignee_id.isnot(None)).all()
+    for issue in issues:
+        issue.status = "closed"
+    xp.award(db, [xp.issue_closed(issue.id, issue.assignee_id, issue.priority) for issue in issues])
+    db.commit()
+    leaderboard.sync(db)
+    issue_recommender.refresh(db, [issue.id for issue in issues])
+    return issues
+
+
+def close_issue(db: Session, issue_id: int) -> Optional[IssueDB]:
+    """Close an issue and award XP to its assignee (once per issue)"""
+    close_issues(db, [issue_id])
+    return get_issue_by_id(db, issue_id)
 
 
 def update_issue(db: Session, issue_id: int, title: Optional[str] = None,
@@ -326,6 +410,7 @@ def update_issue(db: Session, issue_id: int, title: Optional[str] = None,
             db_issue.priority = priority
         db.commit()
         db.refresh(db_issue)
+        issue_recommender.refresh(db, [issue_id])
     return db_issue
 
 
@@ -411,6 +496,80 @@ def get_project_subscribers(db: Session, project_id: int) -> List[UserDB]:
     return [sub.user for sub in subscriptions]
 
 
+# ============ NOTIFICATION CRUD ============
+
+def create_notification(db: Session, user_id: int, title: str, message: str = "",
+                        type: str = "info", order: Optional[str] = None,
+                        street: Optional[str] = None,
+                        project_id: Optional[int] = None) -> NotificationDB:
+    """Create a notification in a single user's inbox"""
+    db_notification = NotificationDB(
+        user_id=user_id,
+        project_id=project_id,
+        title=title,
+        message=message,
+        type=type,
+        order_name=order,
+        street=street,
+        is_read=False
+    )
+    db.add(db_notification)
+    db.commit()
+    db.refresh(db_notification)
+    return db_notification
+
+
+def get_notifications(db: Session, user_id: int, before_id: Optional[int] = None,
+                      limit: int = 50, unread_only: bool = False) -> List[NotificationDB]:
+    """Get a page of a user's inbox, newest first, starting below before_id"""
+    query = db.query(NotificationDB).filter(NotificationDB.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(NotificationDB.id < before_id)
+    if unread_only:
+        query = query.filter(NotificationDB.is_read == False)
+    return query.order_by(NotificationDB.id.desc()).limit(limit).all()
+
+
+def count_unread_notifications(db: Session, user_id: int) -> int:
+    """Count unread notifications for a user"""
+    return db.query(func.count(NotificationDB.id)).filter(
+        NotificationDB.user_id == user_id,
+        NotificationDB.is_read == False
+    ).scalar()
+
+
+def mark_notification_read(db: Session, user_id: int, notification_id: int) -> bool:
+    """Mark one of the user's notifications as read"""
+    result = db.execute(
+        update(NotificationDB)
+        .where(NotificationDB.id == notification_id, NotificationDB.user_id == user_id)
+        .values(is_read=True)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+
+def mark_all_notifications_read(db: Session, user_id: int) -> int:
+    """Mark every unread notification of the user as read"""
+    result = db.execute(
+        update(NotificationDB)
+        .where(NotificationDB.user_id == user_id, NotificationDB.is_read == False)
+        .values(is_read=True)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def delete_notification(db: Session, user_id: int, notification_id: int) -> bool:
+    """Delete one of the user's notifications"""
+    deleted = db.query(NotificationDB).filter(
+        NotificationDB.id == notification_id,
+        NotificationDB.user_id == user_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+
 def create_delivery(db: Session, project_id: int) -> DeliveryDB:
     """Create a new delivery order"""
     db_delivery = DeliveryDB(
@@ -423,23 +582,8 @@ def create_delivery(db: Session, project_id: int) -> DeliveryDB:
     return db_delivery
 
 
-def accept_delivery(db: Session, delivery_id: int, courier_id: int) -> Optional[DeliveryDB]:
-    """Accept delivery order"""
-    from datetime import datetime
-    db_delivery = db.query(DeliveryDB).filter(DeliveryDB.id == delivery_id).first()
-    
-    if db_delivery:
-        db_delivery.courier_id = courier_id
-        db_delivery.status = "accepted"
-        db_delivery.accepted_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_delivery)
-    
-    return db_delivery
-
-
 def complete_delivery(db: Session, delivery_id: int, delivery_time_minutes: int, rating: float) -> Optional[DeliveryDB]:
-    """Complete delivery and update courier stats"""
+    """Complete delivery and enqueue its courier stats update"""
     from datetime import datetime
     db_delivery = db.query(DeliveryDB).filter(DeliveryDB.id == delivery_id).first()
     
@@ -449,22 +593,41 @@ def complete_delivery(db: Session, delivery_id: int, delivery_time_minutes: int,
         db_delivery.rating = rating
         db_delivery.completed_at = datetime.utcnow()
         
-        courier = get_user_by_id(db, db_delivery.courier_id)
-        if courier:
-            old_deliveries = courier.courier_deliveries
-            old_rating = courier.courier_rating
-            old_time = courier.courier_avg_delivery_time
-            
-            courier.courier_deliveries += 1
-            courier.courier_rating = (old_rating * old_deliveries + rating) / courier.courier_deliveries
-            courier.courier_avg_delivery_time = (old_time * old_deliveries + delivery_time_minutes) / courier.courier_deliveries
-        
+        # Enqueued in the same transaction; the key makes the stats update exactly-once
+        job_queue.enqueue(
+            "record_courier_delivery",
+            {"delivery_id": delivery_id},
+            idempotency_key=f"delivery-complete:{delivery_id}",
+            db=db
+        )
         db.commit()
         db.refresh(db_delivery)
     
     return db_delivery
 
 
+def recompute_courier_stats(db: Session, courier_id: int) -> None:
+    """Recompute courier stats from completed deliveries (idempotent)"""
+    count, avg_rating, avg_time = db.query(
+        func.count(DeliveryDB.id),
+        func.avg(DeliveryDB.rating),
+        func.avg(DeliveryDB.delivery_time_minutes)
+    ).filter(
+        DeliveryDB.courier_id == courier_id,
+        DeliveryDB.status == "completed"
+    ).one()
+    
+    db.execute(
+        update(UserDB)
+        .where(UserDB.id == courier_id)
+        .values(
+            courier_deliveries=count,
+            courier_rating=avg_rating if avg_rating is not None else 5.0,
+            courier_avg_delivery_time=avg_time if avg_time is not None else 0.0
+        )
+    )
+
+
 def get_all_pending_deliveries(db: Session) -> List[DeliveryDB]:
     """Get all pending delivery orders"""
     return db.query(DeliveryDB).filter(DeliveryDB.status == "pending").all()
@@ -475,6 +638,18 @@ def get_delivery_by_id(db: Session, delivery_id: int) -> Optional[DeliveryDB]:
     return db.query(DeliveryDB).filter(DeliveryDB.id == delivery_id).first()
 
 
+def get_deliveries_by_ids(db: Session, delivery_ids: List[int]) -> List[DeliveryDB]:
+    """Get deliveries by ID, keeping the order of delivery_ids"""
+    if not delivery_ids:
+        return []
+    deliveries = db.query(DeliveryDB).options(
+        selectinload(DeliveryDB.project),
+        selectinload(DeliveryDB.courier)
+    ).filter(DeliveryDB.id.in_(delivery_ids))
+    by_id = {d.id: d for d in deliveries}
+    return [by_id[i] for i in delivery_ids if i in by_id]
+
+
 # ============ PARCEL LOCKER CRUD ============
 
 def create_parcel_locker(db: Session, name: str, address: str, latitude: float,
@@ -492,6 +667,7 @@ def create_parcel_locker(db: Session, name: str, address: str, latitude: float,
     db.add(db_locker)
     db.commit()
     db.refresh(db_locker)
+    locker_index.upsert(db_locker)
     return db_locker
 
 
@@ -514,27 +690,60 @@ def update_locker_occupancy(db: Session, locker_id: int, occupancy: int) -> Opti
         db_locker.current_occupancy = occupancy
         db.commit()
         db.refresh(db_locker)
+        locker_index.upsert(db_locker)
     return db_locker
 
 
+def take_locker_slots(db: Session, locker_id: int, count: int = 1) -> bool:
+    """
+    Atomically take count free slots of an active locker, without committing.
+
+    The capacity check is part of the UPDATE, so concurrent callers can never
+    push occupancy past total_capacity.
+    """
+    result = db.execute(
+        update(ParcelLockerDB)
+        .where(
+            ParcelLockerDB.id == locker_id,
+            ParcelLockerDB.is_active == True,
+            ParcelLockerDB.current_occupancy + count <= ParcelLockerDB.total_capacity
+        )
+        .values(current_occupancy=ParcelLockerDB.current_occupancy + count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        # Occupancy shows on the map points; this UPDATE bypasses their ORM hooks
+        mark_after_commit(db, LOCKER, [locker_id])
+    return result.rowcount == 1
+
+
+def free_locker_slots(db: Session, locker_id: int, count: int = 1) -> bool:
+    """Atomically give back count slots, without committing; never goes below zero"""
+    result = db.execute(
+        update(ParcelLockerDB)
+        .where(ParcelLockerDB.id == locker_id, ParcelLockerDB.current_occupancy >= count)
+        .values(current_occupancy=ParcelLockerDB.current_occupancy - count)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        mark_after_commit(db, LOCKER, [locker_id])
+    return result.rowcount == 1
+
+
 def increment_locker_occupancy(db: Session, locker_id: int) -> Optional[ParcelLockerDB]:
-    """Increment locker occupancy by 1"""
-    db_locker = get_parcel_locker_by_id(db, locker_id)
-    if db_locker and db_locker.current_occupancy < db_locker.total_capacity:
-        db_locker.current_occupancy += 1
-        db.commit()
-        db.refresh(db_locker)
-    return db_locker
+    """Increment locker occupancy by 1; None if the locker is full, inactive or missing"""
+    taken = take_locker_slots(db, locker_id)
+    db.commit()
+    locker_index.refresh(db, [locker_id])
+    return get_parcel_locker_by_id(db, locker_id) if taken else None
 
 
 def decrement_locker_occupancy(db: Session, locker_id: int) -> Optional[ParcelLockerDB]:
-    """Decrement locker occupancy by 1"""
-    db_locker = get_parcel_locker_by_id(db, locker_id)
-    if db_locker and db_locker.current_occupancy > 0:
-        db_locker.current_occupancy -= 1
-        db.commit()
-        db.refresh(db_locker)
-    return db_locker
+    """Decrement locker occupancy by 1; None if it is already empty or missing"""
+    freed = free_locker_slots(db, locker_id)
+    db.commit()
+    locker_index.refresh(db, [locker_id])
+    return get_parcel_locker_by_id(db, locker_id) if freed else None
 
 
 def deactivate_parcel_locker(db: Session, locker_id: int, admin_id: int) -> Optional[ParcelLockerDB]:
@@ -548,4 +757,5 @@ def deactivate_parcel_locker(db: Session, locker_id: int, admin_id: int) -> Opti
         db_locker.is_active = False
         db.commit()
         db.refresh(db_locker)
+        locker_index.remove(locker_id)
     return db_locker
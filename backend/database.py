@@ -1,6 +1,6 @@
 """Database configuration and session management for SQLite3 using SQLAlchemy"""
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from pydantic_settings import BaseSettings
 from typing import Generator
@@ -20,6 +20,40 @@ class Settings(BaseSettings):
     jwt_secret: str = os.getenv("JWT_SECRET", "save-food-secret-key-2024")
     environment: str = os.getenv("ENVIRONMENT", "development")
     port: int = int(os.getenv("PORT", 5000))
+    job_workers: int = int(os.getenv("JOB_WORKERS", 2))
+    # A running job whose worker stops renewing its lease for this long is handed to another worker
+    job_lease_seconds: float = float(os.getenv("JOB_LEASE_SECONDS", 300))
+
+    # Query profiler
+    profiler_sample_rate: float = float(os.getenv("PROFILER_SAMPLE_RATE", 0.1))
+    slow_request_ms: float = float(os.getenv("SLOW_REQUEST_MS", 500))
+    n_plus_one_threshold: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))
+    server_timing: bool = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+    # Courier matching (0 disables the background batch)
+    matching_interval_seconds: float = float(os.getenv("MATCHING_INTERVAL_SECONDS", 10))
+
+    # Courier tracking: points kept per courier and arrival geofence radius
+    courier_track_capacity: int = int(os.getenv("COURIER_TRACK_CAPACITY", 360))
+    geofence_radius_m: float = float(os.getenv("GEOFENCE_RADIUS_M", 20))
+
+    # Parcel locker reservations: how long a slot is held, and how often lapsed holds are swept (0 disables)
+    locker_hold_minutes: float = float(os.getenv("LOCKER_HOLD_MINUTES", 30))
+    locker_sweep_interval_seconds: float = float(os.getenv("LOCKER_SWEEP_INTERVAL_SECONDS", 30))
+
+    # Issue stats: serve from the maintained counters table (false: GROUP BY over issues on every request)
+    issue_stats_counters: bool = os.getenv("ISSUE_STATS_COUNTERS", "true").lower() == "true"
+
+    # Response compression: smallest body worth compressing, and per-request effort (static assets are precompressed)
+    compression_min_bytes: int = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 5))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+    # Built React app served at / when present (empty disables)
+    frontend_dir: str = os.getenv(
+        "FRONTEND_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "project", "build")
+    )
 
     class Config:
         env_file = ".env"
@@ -50,9 +84,25 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def _add_missing_columns():
+    """Add nullable columns that existing tables predate; anything else needs a hand-written migration"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable and column.server_default is None:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+
+
 def init_db():
-    """Initialize database by creating all tables"""
+    """Initialize database by creating all tables, and the nullable columns and indexes missing on existing ones"""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 
 def drop_all_tables():
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator
+Produces users, projects, donations, issues, deliveries, subscriptions and
+parcel lockers at any scale with chunked bulk inserts. Project and locker
+coordinates are clustered around hotspots in a handful of Russian cities.
+The same seed always yields the same rows, so benchmark datasets are
+reproducible.
+
+Usage:
+    python datagen.py --scale medium --seed 42
+    python datagen.py --users 100000 --projects 200000 --donations 1000000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from auth import hash_password
+from models import (
+    UserDB, ProjectDB, DonationDB, IssueDB, DeliveryDB, SubscriptionDB, ParcelLockerDB,
+    UserRole, ProjectStatus, IssueCategory,
+)
+from services.leaderboard import rating_level_for
+
+DEFAULT_PASSWORD = "password123"
+CHUNK_SIZE = 10000
+EPOCH = datetime(2024, 1, 1)
+
+# (name, latitude, longitude, weight, hotspot count)
+CITIES = [
+    ("Moscow", 55.7558, 37.6173, 0.55, 40),
+    ("St. Petersburg", 59.9311, 30.3609, 0.20, 20),
+    ("Yekaterinburg", 56.8389, 60.6057, 0.08, 8),
+    ("Novosibirsk", 55.0415, 82.9346, 0.07, 8),
+    ("Kazan", 55.7887, 49.1221, 0.10, 10),
+]
+CITY_RADIUS_KM = 15.0
+HOTSPOT_SPREAD_KM = 1.2
+
+FIRST_NAMES = ["Anna", "Ivan", "Maria", "Dmitry", "Olga", "Sergey", "Elena", "Alexey",
+               "Natalia", "Pavel", "Irina", "Nikolay", "Tatiana", "Mikhail", "Svetlana", "Andrey"]
+LAST_NAMES = ["Ivanov", "Smirnov", "Kuznetsov", "Popov", "Sokolov", "Lebedev", "Kozlov",
+              "Novikov", "Morozov", "Petrov", "Volkov", "Solovyov", "Vasiliev", "Zaytsev"]
+PROJECT_KINDS = [
+    ("Bread Donation", "Fresh bread ready for delivery", "🍞", "#f59e0b"),
+    ("Vegetables Pack", "Assorted vegetables from a local farm", "🥕", "#10b981"),
+    ("Hot Meals", "Hot meals and drinks for those in need", "🍽️", "#ef4444"),
+    ("Dairy Products", "Milk and yogurt for social institutions", "🥛", "#3b82f6"),
+    ("Canned Food", "Various canned food items", "🥫", "#6b7280"),
+    ("School Meals", "Nutritious meals for school children", "🍎", "#ec4899"),
+    ("Food Bank", "Food bank and distribution center", "🏦", "#8b5cf6"),
+]
+ISSUE_TITLES = {
+    IssueCategory.HANDS: ["Volunteers needed for sorting", "Help packing food boxes", "Kitchen shift"],
+    IssueCategory.TRANSPORT: ["Driver needed for pickup", "Deliver boxes to shelter", "Van for weekend run"],
+    IssueCategory.ITEMS: ["Need insulated bags", "Containers for hot meals", "Shelving for storage"],
+}
+
+
+@dataclass
+class Scale:
+    users: int
+    projects: int
+    donations: int
+    issues: int
+    deliveries: int
+    subscriptions: int
+    lockers: int
+
+
+SCALES = {
+    "tiny": Scale(users=200, projects=500, donations=2000, issues=500, deliveries=200,
+                  subscriptions=1000, lockers=20),
+    "small": Scale(users=2000, projects=10000, donations=50000, issues=10000, deliveries=2000,
+                   subscriptions=10000, lockers=100),
+    "medium": Scale(users=10000, projects=50000, donations=250000, issues=50000, deliveries=10000,
+                    subscriptions=50000, lockers=500),
+    "large": Scale(users=50000, projects=100000, donations=1000000, issues=100000, deliveries=50000,
+                   subscriptions=200000, lockers=2000),
+}
+
+
+# ---------- coordinates ----------
+
+class CityClusters:
+    """Weighted cities, each with fixed hotspots that points scatter around"""
+
+    def __init__(self, rng: random.Random):
+        self._weights = [city[3] for city in CITIES]
+        self._hotspots: List[List[Tuple[float, float]]] = []
+        for _, lat, lon, _, count in CITIES:
+            self._hotspots.append([_offset(lat, lon, rng.uniform(0, CITY_RADIUS_KM), rng.uniform(0, 2 * math.pi))
+                                   for _ in range(count)])
+
+    def point(self, rng: random.Random) -> Tuple[float, float]:
+        city = rng.choices(range(len(CITIES)), weights=self._weights)[0]
+        lat, lon = rng.choice(self._hotspots[city])
+        return _offset(lat, lon, abs(rng.gauss(0, HOTSPOT_SPREAD_KM)), rng.uniform(0, 2 * math.pi))
+
+
+def _offset(lat: float, lon: float, distance_km: float, bearing: float) -> Tuple[float, float]:
+    dlat = distance_km / 111.32 * math.cos(bearing)
+    dlon = distance_km / (111.32 * math.cos(math.radians(lat))) * math.sin(bearing)
+    return round(lat + dlat, 6), round(lon + dlon, 6)
+
+
+# ---------- loading ----------
+
+def _chunks(total: int, size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def _next_id(db: Session, model) -> int:
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _bulk_load(db: Session, model, total: int, make_row, chunk_size: int,
+               progress: bool) -> Tuple[int, int]:
+    """
+    Insert total rows built by make_row(row_id) in chunked transactions.
+    Ids are assigned explicitly so later entities can reference them without
+    reading anything back. Returns the inclusive id range.
+    """
+    first_id = _next_id(db, model)
+    table = model.__table__
+    started = time.perf_counter()
+    for start, end in _chunks(total, chunk_size):
+        db.execute(insert(table), [make_row(first_id + i) for i in range(start, end)])
+        db.commit()
+        if progress:
+            rate = end / max(time.perf_counter() - started, 1e-9)
+            print(f"\r  {table.name:<14} {end:>10}/{total} ({rate:,.0f} rows/s)", end="", flush=True)
+    if progress and total:
+        print()
+    if total and db.get_bind().dialect.name == "postgresql":
+        # Explicit ids leave the serial sequence behind; move it past them so normal inserts don't collide
+        db.execute(select(func.setval(func.pg_get_serial_sequence(table.name, "id"),
+                                      select(func.max(table.c.id)).scalar_subquery())))
+        db.commit()
+    return first_id, first_id + total - 1
+
+
+def password_templates(passwords: Optional[List[str]] = None) -> List[str]:
+    """Hash each template password once; generated users share these hashes"""
+    return [hash_password(p) for p in (passwords or [DEFAULT_PASSWORD])]
+
+
+def generate(db: Session, scale: Scale, seed: int = 42, chunk_size: int = CHUNK_SIZE,
+             email_domain: str = "example.test", password: str = DEFAULT_PASSWORD,
+             progress: bool = False) -> Dict[str, object]:
+    """
+    Bulk-load a dataset and return the id ranges that were created, plus
+    the shared password and the email pattern, so callers can sample rows.
+    """
+    rng = random.Random(seed)
+    clusters = CityClusters(rng)
+    password_hash = password_templates([password])[0]
+    ranges: Dict[str, object] = {}
+
+    roles = [UserRole.DONOR, UserRole.RECIPIENT, UserRole.COURIER]
+    role_weights = [0.6, 0.25, 0.15]
+
+    def make_user(user_id: int) -> dict:
+        role = rng.choices(roles, weights=role_weights)[0]
+        xp = int(rng.paretovariate(1.5) * 20)
+        is_courier = role == UserRole.COURIER
+        return {
+            "id": user_id,
+            "email": f"user{user_id}@{email_domain}",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "password_hash": password_hash,
+            "avatar": "👤",
+            "role": role,
+            "xp": xp,
+            "rating_level": rating_level_for(xp),
+            "is_admin": False,
+            "is_banned": False,
+            "courier_deliveries": rng.randint(0, 300) if is_courier else 0,
+            "courier_rating": round(rng.uniform(3.5, 5.0), 2) if is_courier else 5.0,
+            "courier_avg_delivery_time": round(rng.uniform(15, 90), 1) if is_courier else 0.0,
+            "created_at": EPOCH - timedelta(minutes=rng.randint(0, 525600)),
+        }
+
+    users = ranges["users"] = _bulk_load(db, UserDB, scale.users, make_user, chunk_size, progress)
+    statuses = [ProjectStatus.ACTIVE, ProjectStatus.IN_PROGRESS, ProjectStatus.COMPLETED, ProjectStatus.ARCHIVED]
+    status_weights = [0.6, 0.2, 0.15, 0.05]
+
+    def make_project(project_id: int) -> dict:
+        name, description, icon, color = rng.choice(PROJECT_KINDS)
+        lat, lon = clusters.point(rng)
+        goal = float(rng.choice([1000, 5000, 10000, 50000]))
+        created = EPOCH - timedelta(minutes=rng.randint(0, 525600))
+        return {
+            "id": project_id,
+            "name": f"{name} #{project_id}",
+            "description": description,
+            "icon": icon,
+            "color": color,
+            "goal_amount": goal,
+            "current_amount": round(goal * rng.random(), 2),
+            "status": rng.choices(statuses, weights=status_weights)[0],
+            "is_verified": rng.random() < 0.5,
+            "latitude": lat,
+            "longitude": lon,
+            "owner_id": rng.randint(*users),
+            "created_at": created,
+            "updated_at": created,
+        }
+
+    projects = ranges["projects"] = _bulk_load(db, ProjectDB, scale.projects, make_project, chunk_size, progress)
+
+    def make_donation(donation_id: int) -> dict:
+        return {
+            "id": donation_id,
+            "amount": round(rng.lognormvariate(4, 1), 2),
+            "is_anonymous": rng.random() < 0.2,
+            "user_id": rng.randint(*users),
+            "project_id": rng.randint(*projects),
+            "created_at": EPOCH - timedelta(seconds=rng.randint(0, 31536000)),
+        }
+
+    ranges["donations"] = _bulk_load(db, DonationDB, scale.donations, make_donation, chunk_size, progress)
+    categories = list(IssueCategory)
+
+    def make_issue(issue_id: int) -> dict:
+        category = rng.choice(categories)
+        status = rng.choices(["open", "in-progress", "closed"], weights=[0.5, 0.2, 0.3])[0]
+        created = EPOCH - timedelta(minutes=rng.randint(0, 525600))
+        return {
+            "id": issue_id,
+            "title": rng.choice(ISSUE_TITLES[category]),
+            "description": "Generated issue",
+            "category": category,
+            "status": status,
+            "priority": rng.choices(["low", "medium", "high"], weights=[0.3, 0.5, 0.2])[0],
+            "project_id": rng.randint(*projects),
+            "reporter_id": rng.randint(*users),
+            "assignee_id": rng.randint(*users) if status != "open" else None,
+            "created_at": created,
+            "updated_at": created,
+            "due_date": created + timedelta(days=rng.randint(1, 30)),
+        }
+
+    ranges["issues"] = _bulk_load(db, IssueDB, scale.issues, make_issue, chunk_size, progress)
+
+    def make_delivery(delivery_id: int) -> dict:
+        status = rng.choices(["pending", "accepted", "completed"], weights=[0.5, 0.1, 0.4])[0]
+        created = EPOCH - timedelta(minutes=rng.randint(0, 525600))
+        accepted = created + timedelta(minutes=rng.randint(1, 120)) if status != "pending" else None
+        minutes = rng.randint(10, 120) if status == "completed" else None
+        return {
+            "id": delivery_id,
+            "project_id": rng.randint(*projects),
+            "courier_id": rng.randint(*users) if status != "pending" else None,
+            "status": status,
+            "rating": round(rng.uniform(3, 5), 1) if status == "completed" else None,
+            "delivery_time_minutes": minutes,
+            "created_at": created,
+            "accepted_at": accepted,
+            "completed_at": accepted + timedelta(minutes=minutes) if minutes else None,
+        }
+
+    ranges["deliveries"] = _bulk_load(db, DeliveryDB, scale.deliveries, make_delivery, chunk_size, progress)
+
+    def make_subscription(subscription_id: int) -> dict:
+        return {
+            "id": subscription_id,
+            "user_id": rng.randint(*users),
+            "project_id": rng.randint(*projects),
+            "created_at": EPOCH,
+        }
+
+    ranges["subscriptions"] = _bulk_load(db, SubscriptionDB, scale.subscriptions, make_subscription,
+                                         chunk_size, progress)
+
+    def make_locker(locker_id: int) -> dict:
+        lat, lon = clusters.point(rng)
+        capacity = rng.choice([20, 30, 50, 80])
+        return {
+            "id": locker_id,
+            "name": f"Locker {locker_id}",
+            "address": f"{lat:.4f}, {lon:.4f}",
+            "latitude": lat,
+            "longitude": lon,
+            "total_capacity": capacity,
+            "current_occupancy": rng.randint(0, capacity),
+            "is_active": rng.random() < 0.95,
+            "created_at": EPOCH,
+            "updated_at": EPOCH,
+        }
+
+    ranges["lockers"] = _bulk_load(db, ParcelLockerDB, scale.lockers, make_locker, chunk_size, progress)
+
+    ranges["password"] = password
+    ranges["email_pattern"] = f"user{{id}}@{email_domain}"
+    return ranges
+
+
+# ---------- CLI ----------
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Save Food dataset")
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES))
+    for field in fields(Scale):
+        parser.add_argument(f"--{field.name}", type=int, default=None,
+                            help=f"Override the number of {field.name}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--email-domain", default="example.test")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--db-url", default=None, help="Overrides DATABASE_URL")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.db_url:
+        os.environ["DATABASE_URL"] = args.db_url
+
+    # Imported late so --db-url takes effect before the engine is created
+    from database import SessionLocal, init_db
+    from backfill_derived import backfill_rows
+
+    scale = replace(SCALES[args.scale], **{
+        field.name: getattr(args, field.name)
+        for field in fields(Scale) if getattr(args, field.name) is not None
+    })
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "sqlite":
+            # Bulk loads into a scratch database do not need per-commit fsync
+            db.connection().exec_driver_sql("PRAGMA synchronous = OFF")
+        started = time.perf_counter()
+        ranges = generate(db, scale, seed=args.seed, chunk_size=args.chunk_size,
+                          email_domain=args.email_domain, password=args.password, progress=True)
+        elapsed = time.perf_counter() - started
+        # Core inserts skip the hooks behind the issue counters, search index and XP log
+        backfill_rows(db, {model: ranges[name][0] for name, model in
+                           (("users", UserDB), ("projects", ProjectDB), ("issues", IssueDB))}, progress=True)
+    finally:
+        db.close()
+
+    total = sum(getattr(scale, field.name) for field in fields(Scale))
+    print(f"\nLoaded {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    for name in ("users", "projects", "donations", "issues", "deliveries", "subscriptions", "lockers"):
+        print(f"  {name:<14} ids {ranges[name][0]}..{ranges[name][1]}")
+    print(f"  login as {ranges['email_pattern']} with password '{ranges['password']}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,48 +5,33 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal
+from sqlalchemy import func, or_, update
+
 from models import ProjectDB
+from services.maintenance import MaintenanceTask, build_parser, run_cli
+
+
+class FixNullProjectFields(MaintenanceTask):
+    name = "fix_null_project_fields"
+    description = "Filling NULL icon, color and is_verified on projects"
+    model = ProjectDB
+
+    def criteria(self):
+        return or_(ProjectDB.icon.is_(None), ProjectDB.color.is_(None), ProjectDB.is_verified.is_(None))
+
+    def apply(self, db, ids):
+        db.execute(
+            update(ProjectDB)
+            .where(ProjectDB.id.in_(ids))
+            .values(
+                icon=func.coalesce(ProjectDB.icon, "box"),
+                color=func.coalesce(ProjectDB.color, "#6b7280"),
+                is_verified=func.coalesce(ProjectDB.is_verified, False),
+            )
+            .execution_options(synchronize_session=False)
+        )
 
-def fix_null_values():
-    db = SessionLocal()
-    
-    try:
-        projects_no_icon = db.query(ProjectDB).filter(ProjectDB.icon.is_(None)).all()
-        for project in projects_no_icon:
-            project.icon = "box"
-            print(f"Fixed icon for {project.name}")
-        
-        projects_no_color = db.query(ProjectDB).filter(ProjectDB.color.is_(None)).all()
-        for project in projects_no_color:
-            project.color = "#6b7280"
-            print(f"Fixed color for {project.name}")
-        
-        projects_no_verified = db.query(ProjectDB).filter(ProjectDB.is_verified.is_(None)).all()
-        for project in projects_no_verified:
-            project.is_verified = False
-            print(f"Fixed is_verified for {project.name}")
-        
-        db.commit()
-        print("\nAll NULL values fixed successfully!")
-        
-        all_projects = db.query(ProjectDB).all()
-        print(f"\n{'='*60}")
-        print(f"Final project list ({len(all_projects)} total):")
-        print(f"{'='*60}\n")
-        
-        for i, project in enumerate(all_projects, 1):
-            print(f"{i}. {project.name} (ID: {project.id})")
-            print(f"   Icon: {project.icon}")
-            print(f"   Color: {project.color}")
-            print(f"   Verified: {project.is_verified}")
-            print()
-    
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        db.rollback()
-    finally:
-        db.close()
 
 if __name__ == "__main__":
-    fix_null_values()
+    args = build_parser("Fill NULL project fields with their defaults").parse_args()
+    run_cli([FixNullProjectFields()], args)
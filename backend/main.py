@@ -1,17 +1,35 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import sys
 import os
 from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import init_db, settings, SessionLocal
+from database import init_db, settings, SessionLocal, engine
 from models import UserDB, ParcelLockerDB
-from routes import auth, users, projects, issues, notifications, adminpanel, routing, donations, deliveries, parcel_lockers
+from routes import auth, users, projects, issues, notifications, adminpanel, routing, donations, deliveries, couriers, parcel_lockers, metrics, search, leaderboards, map_clusters as map_routes
 from middleware.ban_middleware import BanCheckMiddleware
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.profiler_middleware import QueryProfilerMiddleware
+from middleware.compression_middleware import CompressionMiddleware
+from services.query_profiler import attach_profiler
+from services import metrics as app_metrics
+from auth import bcrypt_pool_pending
 from services.routing_service import routing_service
+from services.job_queue import job_queue
+from services.courier_matching import courier_matcher
+from services.locker_reservations import locker_reservations
+from services.locker_index import locker_index
+from services.leaderboard import leaderboard
+from services.issue_recommendations import issue_recommender
+from services.map_clusters import map_clusters
+from services.map_points import map_points
+from services.static_files import FrontendFiles
+from backfill_derived import backfill, state_key
+import services.jobs  # noqa: F401 - registers job handlers
 import bcrypt
 app = FastAPI(
     title="Save Food API",
@@ -19,6 +37,12 @@ app = FastAPI(
     version="2.0.0"
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_bytes,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+)
 app.add_middleware(BanCheckMiddleware)
 app.add_middleware(
     CORSMiddleware,
@@ -33,6 +57,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(QueryProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app_metrics.instrument_engine(engine)
+attach_profiler(engine)
+
+
+def collect_runtime_metrics():
+    """Refresh pool, bcrypt and job queue gauges before each scrape"""
+    app_metrics.collect_pool_usage(engine)
+    app_metrics.bcrypt_pool_pending.set(bcrypt_pool_pending())
+    db = SessionLocal()
+    try:
+        for job_status, count in job_queue.stats(db)["depth"].items():
+            app_metrics.jobs_depth.set(count, status=job_status)
+    finally:
+        db.close()
+
+
+app_metrics.registry.on_collect(collect_runtime_metrics)
 
 def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
@@ -154,12 +198,42 @@ def init_preset_parcel_lockers():
         print(f"Warning: Could not initialize preset parcel lockers: {e}")
 
 
+@job_queue.task("seed_presets")
+def seed_presets(db):
+    """Create preset accounts and parcel lockers"""
+    init_preset_users()
+    init_preset_parcel_lockers()
+    # Warm the in-memory indexes so the first lookup does not pay for the load
+    locker_index.load(db)
+    leaderboard.load(db)
+    issue_recommender.load(db)
+    map_clusters.load(db)
+    map_points.load(db)
+
+
+@job_queue.task("backfill_derived_data")
+def backfill_derived_data(db):
+    """Fill the issue counters, search index and XP log of a database that predates them"""
+    backfill(db)
+
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     print(f"SQLite3 database initialized (Environment: {settings.environment})")
-    init_preset_users()
-    init_preset_parcel_lockers()
+    job_queue.start()
+    job_queue.enqueue("seed_presets")
+    # Keyed by the source tables' high-water marks: workers starting together queue one job, as the
+    # counter rebuild adds to what it finds, while a start after new rows checks again
+    db = SessionLocal()
+    try:
+        backfill_key = state_key(db)
+    finally:
+        db.close()
+    job_queue.enqueue("backfill_derived_data", idempotency_key=backfill_key)
+    courier_matcher.start(settings.matching_interval_seconds)
+    locker_reservations.start(settings.locker_sweep_interval_seconds)
+    app.state.loop_lag_task = asyncio.create_task(app_metrics.monitor_event_loop_lag())
     await routing_service.init_session()
     is_healthy = await routing_service.check_valhalla_health()
     if is_healthy:
@@ -169,8 +243,12 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    app.state.loop_lag_task.cancel()
     await routing_service.close_session()
     print("Routing service cleaned up")
+    courier_matcher.stop()
+    locker_reservations.stop()
+    job_queue.stop()
 
 
 @app.get("/health")
@@ -182,7 +260,6 @@ async def health_check():
         "features": ["Transparent Charity", "Gamification", "Volunteer Matching"]
     }
 
-@app.get("/")
 async def root():
     return {
         "message": "Welcome to Save Food API v2.0.0",
@@ -212,7 +289,19 @@ app.include_router(adminpanel.router)
 app.include_router(routing.router)
 app.include_router(donations.router)
 app.include_router(deliveries.router)
+app.include_router(couriers.router)
 app.include_router(parcel_lockers.router)
+app.include_router(metrics.router)
+app.include_router(search.router)
+app.include_router(leaderboards.router)
+app.include_router(map_routes.router)
+
+# The built frontend answers whatever no API route matches; without a build "/" is the API summary
+app.add_api_route("/api", root, methods=["GET"])
+if settings.frontend_dir and os.path.isdir(settings.frontend_dir):
+    app.router.default = FrontendFiles(settings.frontend_dir, not_found=app.router.default)
+else:
+    app.add_api_route("/", root, methods=["GET"])
 
 
 @app.exception_handler(Exception)
@@ -1,16 +1,55 @@
 """Middleware for checking banned users"""
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, HTTPException, status
-from sqlalchemy.orm import Session
+import time
+from typing import Dict, Optional, Tuple
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
 from database import SessionLocal
 from models import UserDB
 
+# Ban flags are cached briefly so hot endpoints such as location pings do not
+# query users on every request; ban/unban invalidate the entry right away
+BAN_CACHE_TTL_SECONDS = 30.0
+_ban_cache: Dict[int, Tuple[bool, float]] = {}
+
+
+def invalidate_ban_cache(user_id: Optional[int] = None):
+    """Forget the cached ban flag for one user, or for everyone"""
+    if user_id is None:
+        _ban_cache.clear()
+    else:
+        _ban_cache.pop(user_id, None)
 
-class BanCheckMiddleware(BaseHTTPMiddleware):
+
+def is_user_banned(user_id: int) -> bool:
+    cached = _ban_cache.get(user_id)
+    now = time.monotonic()
+    if cached is not None and now - cached[1] < BAN_CACHE_TTL_SECONDS:
+        return cached[0]
+    
+    db = SessionLocal()
+    try:
+        banned = db.query(UserDB.is_banned).filter(UserDB.id == user_id).scalar()
+    finally:
+        db.close()
+    _ban_cache[user_id] = (bool(banned), now)
+    return bool(banned)
+
+
+class BanCheckMiddleware:
     """Middleware to block banned users from accessing the API"""
     
-    async def dispatch(self, request: Request, call_next):
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # Skip check for public endpoints
         public_paths = [
             "/docs",
@@ -22,11 +61,12 @@ class BanCheckMiddleware(BaseHTTPMiddleware):
             "/redoc"
         ]
         
-        if any(request.url.path.startswith(path) for path in public_paths):
-            return await call_next(request)
+        if any(scope["path"].startswith(path) for path in public_paths):
+            await self.app(scope, receive, send)
+            return
         
         # Extract token from Authorization header
-        auth_header = request.headers.get("Authorization")
+        auth_header = Headers(scope=scope).get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             try:
                 token = auth_header.split(" ")[1]
@@ -35,23 +75,15 @@ class BanCheckMiddleware(BaseHTTPMiddleware):
                 from routes.auth import verify_token
                 payload = verify_token(token)
                 
-                if payload and "sub" in payload:
-                    user_id = int(payload["sub"])
-                    db = SessionLocal()
-                    try:
-                        user = db.query(UserDB).filter(UserDB.id == user_id).first()
-                        
-                        if user and user.is_banned:
-                            raise HTTPException(
-                                status_code=status.HTTP_403_FORBIDDEN,
-                                detail="User account is banned"
-                            )
-                    finally:
-                        db.close()
-            except HTTPException:
-                raise
+                if payload and "sub" in payload and is_user_banned(int(payload["sub"])):
+                    response = JSONResponse(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        content={"detail": "User account is banned"}
+                    )
+                    await response(scope, receive, send)
+                    return
             except Exception as e:
                 # Log but don't block - let normal auth handling take care
                 pass
         
-        return await call_next(request)
+        await self.app(scope, receive, send)
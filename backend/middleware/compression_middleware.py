@@ -0,0 +1,181 @@
+"""Middleware compressing text responses with brotli or gzip"""
+
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Already-compressed types (images, the gzipped map points) are left alone
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/manifest+json",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+})
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Content codings of an Accept-Encoding header with their q-values"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br when available and accepted, else gzip, else None (identity)"""
+    accepted = accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for coding in candidates:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of a representation in a content coding: the identity tag with the coding appended inside the quotes"""
+    suffix = f'-{encoding}"'
+    if not etag.endswith('"') or etag.endswith(suffix):
+        return etag
+    return etag[:-1] + suffix
+
+
+class _Encoder:
+    """Incremental compressor; flush() makes everything so far decodable for streamed bodies"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._brotli.process(data) if self.encoding == "br" else self._gzip.compress(data)
+
+    def flush(self) -> bytes:
+        return self._brotli.flush() if self.encoding == "br" else self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._brotli.finish() if self.encoding == "br" else self._gzip.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Middleware to compress text responses above a size threshold"""
+
+    # Plain ASGI rather than BaseHTTPMiddleware: streamed bodies pass through chunk by chunk
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 5, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Compressed bodies go out under their own ETag (a strong validator names one exact
+        # representation); revalidations of them are handed to the app with the identity tag
+        encoded_suffix = f'-{encoding}"'
+        if_none_match = request_headers.get("if-none-match", "")
+        revalidating_encoded = encoded_suffix in if_none_match
+        if revalidating_encoded:
+            scope = dict(scope, headers=[
+                (name, value.replace(encoded_suffix.encode(), b'"') if name == b"if-none-match" else value)
+                for name, value in scope["headers"]
+            ])
+
+        # The start message is held back until the first body chunk shows whether to compress
+        start = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if message["status"] == 304 and revalidating_encoded and "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                if media_type in COMPRESSIBLE_TYPES:
+                    headers.add_vary_header("Accept-Encoding")
+                if (message["status"] != 200 or media_type not in COMPRESSIBLE_TYPES
+                        or "content-encoding" in headers
+                        or "no-transform" in headers.get("cache-control", "")
+                        or int(headers.get("content-length", self.minimum_size)) < self.minimum_size):
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(scope=start)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    # Whole body known and too small to be worth it
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    # Streamed: length unknown until the end, chunked transfer instead
+                    del headers["Content-Length"]
+                    await send(start)
+                else:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+            if more_body:
+                # Flush each chunk so streamed rows reach the client as they are produced
+                chunk = encoder.compress(body) + encoder.flush()
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.compress(body) + encoder.finish()})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,49 @@
+"""Middleware recording per-route request metrics"""
+
+import time
+
+from services.metrics import (
+    RequestDBStats, current_request_db,
+    http_requests_total, http_request_duration_seconds,
+    http_request_db_queries, http_request_db_seconds
+)
+
+
+class MetricsMiddleware:
+    """Middleware to time requests and count their database statements"""
+    
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        
+        db_stats = RequestDBStats()
+        token = current_request_db.set(db_stats)
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_db.reset(token)
+            
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            
+            http_requests_total.inc(method=method, route=route_path, status=status_code)
+            http_request_duration_seconds.observe(elapsed, method=method, route=route_path, status=status_code)
+            http_request_db_queries.observe(db_stats.count, method=method, route=route_path)
+            http_request_db_seconds.observe(db_stats.seconds, method=method, route=route_path)
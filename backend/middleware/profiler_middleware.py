@@ -0,0 +1,72 @@
+"""Middleware emitting slow-request logs and Server-Timing from the query profiler"""
+
+import json
+import logging
+import random
+import time
+from starlette.datastructures import MutableHeaders
+
+from database import settings
+from services.query_profiler import RequestProfile, current_profile
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """Middleware to profile a sample of requests' database activity"""
+    
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task per request
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        sampled = settings.server_timing or random.random() < settings.profiler_sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        # Measured when the response starts, like the handler's own timing
+        response = {"status": 500, "total_ms": None}
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["total_ms"] = (time.perf_counter() - started) * 1000
+                if settings.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", (
+                        f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries", '
+                        f'app;dur={response["total_ms"]:.1f}'
+                    ))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+        total_ms = response["total_ms"]
+        if total_ms is None:
+            total_ms = (time.perf_counter() - started) * 1000
+        db_ms = profile.seconds * 1000
+        
+        repeated = profile.repeated(settings.n_plus_one_threshold)
+        if total_ms >= settings.slow_request_ms or repeated:
+            route = scope.get("route")
+            logger.warning(json.dumps({
+                "event": "slow_request" if total_ms >= settings.slow_request_ms else "n_plus_one",
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": response["status"],
+                "duration_ms": round(total_ms, 1),
+                "db_ms": round(db_ms, 1),
+                "db_queries": profile.count,
+                "slowest": profile.slowest(),
+                "repeated": repeated
+            }, ensure_ascii=False))
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Enum, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Float, Date, DateTime, ForeignKey, Enum, Text, Index, LargeBinary, text
+from sqlalchemy.orm import mapped_column, relationship
 from sqlalchemy.sql import func
 from pydantic import BaseModel, EmailStr, ConfigDict
 from typing import Optional, List
@@ -31,6 +31,12 @@ class IssueCategory(str, PyEnum):
 
 class UserDB(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Leaderboard order: most XP first, the earlier account first among equals
+        Index("ix_users_xp_id", text("xp DESC"), "id"),
+        # Lets the leaderboards catch up with changed users without a scan
+        Index("ix_users_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -67,6 +73,9 @@ class UserDB(Base):
 class ProjectDB(Base):
     """Charity project database model"""
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_latitude_longitude", "latitude", "longitude"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -105,22 +114,30 @@ class ProjectDB(Base):
 class IssueDB(Base):
     """Volunteer task database model"""
     __tablename__ = "issues"
+    __table_args__ = (
+        # Cover the stats GROUP BY: a project's or volunteer's breakdown reads index entries only
+        Index("ix_issues_project_breakdown", "project_id", "status", "category", "priority"),
+        Index("ix_issues_assignee_breakdown", "assignee_id", "status", "category", "priority"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     
+    # Columns counted in services.issue_stats keep active_history: assigning one loads
+    # the old value even when expired, so an update knows which counter to leave
+    
     # Category for volunteer type
-    category = Column(Enum(IssueCategory), default=IssueCategory.HANDS)
+    category = mapped_column(Enum(IssueCategory), default=IssueCategory.HANDS, active_history=True)
     
     # Status
-    status = Column(String, default="open")
-    priority = Column(String, default="medium")
+    status = mapped_column(String, default="open", active_history=True)
+    priority = mapped_column(String, default="medium", active_history=True)
     
     # Foreign keys
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = mapped_column(Integer, ForeignKey("projects.id"), nullable=False, active_history=True)
     reporter_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    assignee_id = mapped_column(Integer, ForeignKey("users.id"), nullable=True, active_history=True)
     
     # Timestamps
     created_at = Column(DateTime, server_default=func.now())
@@ -136,6 +153,10 @@ class IssueDB(Base):
 class DonationDB(Base):
     """Donation transaction history for transparency"""
     __tablename__ = "donations"
+    __table_args__ = (
+        Index("ix_donations_project_id", "project_id"),
+        Index("ix_donations_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
@@ -176,6 +197,9 @@ class CommentDB(Base):
 class SubscriptionDB(Base):
     """User subscriptions to project notifications"""
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        Index("ix_subscriptions_project_id_id", "project_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -191,9 +215,74 @@ class SubscriptionDB(Base):
     project = relationship("ProjectDB", back_populates="subscriptions")
 
 
+class NotificationDB(Base):
+    """Persistent per-user notification inbox"""
+    __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_id_id", "user_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
+
+    type = Column(String, default="info")
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=True)
+    order_name = Column(String, nullable=True)
+    street = Column(String, nullable=True)
+    is_read = Column(Boolean, default=False, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class JobDB(Base):
+    """Deferred background job persisted for the in-process job runner"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")
+    idempotency_key = Column(String, unique=True, nullable=True)
+
+    # queued -> running -> done | failed (retries go back to queued)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    last_error = Column(Text, nullable=True)
+
+    # Lease of a running job: the process running it, which renews it until the job ends
+    worker_id = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+
+    # Timestamps
+    run_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class MaintenanceCheckpointDB(Base):
+    """Resume point of an interrupted maintenance task"""
+    __tablename__ = "maintenance_checkpoints"
+
+    task = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+
 class DeliveryDB(Base):
     """Courier delivery orders"""
     __tablename__ = "deliveries"
+    __table_args__ = (
+        Index("ix_deliveries_project_id_status", "project_id", "status"),
+        Index("ix_deliveries_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -213,6 +302,65 @@ class DeliveryDB(Base):
     courier = relationship("UserDB", back_populates="deliveries", foreign_keys=[courier_id])
 
 
+class CourierStatsDB(Base):
+    """Pre-aggregated courier delivery statistics per time window"""
+    __tablename__ = "courier_stats"
+    __table_args__ = (
+        Index("ix_courier_stats_window_deliveries", "period", "window_start", "deliveries"),
+    )
+
+    # courier_id 0 aggregates all couriers; period is "all", "week" or "day"
+    courier_id = Column(Integer, primary_key=True)
+    period = Column(String, primary_key=True)
+    window_start = Column(Date, primary_key=True)
+
+    deliveries = Column(Integer, nullable=False, default=0)
+    # Delivery time in minutes: Welford mean / sum of squared deviations and a t-digest
+    time_mean = Column(Float, nullable=False, default=0.0)
+    time_m2 = Column(Float, nullable=False, default=0.0)
+    time_min = Column(Float, nullable=True)
+    time_max = Column(Float, nullable=True)
+    time_digest = Column(LargeBinary, nullable=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+
+    # Bumped on every write; updates are compare-and-swap on it
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class IssueStatsDB(Base):
+    """Maintained issue counts of a project or volunteer per status, category and priority"""
+    __tablename__ = "issue_stats"
+
+    # scope is "project" (owner_id a project) or "assignee" (owner_id a user)
+    scope = Column(String, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    priority = Column(String, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+
+class XpEventDB(Base):
+    """One XP award, append-only; users.xp is the running total of a user's events"""
+    __tablename__ = "xp_events"
+    __table_args__ = (
+        Index("ix_xp_events_created_at", "created_at"),
+        Index("ix_xp_events_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Integer, nullable=False)
+    # What earned it, e.g. "issue_closed"
+    reason = Column(String, nullable=True)
+    # The action an award is for, e.g. "issue-close:42"; it is awarded at most once
+    idempotency_key = Column(String, unique=True, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
 class ParcelLockerDB(Base):
     """Parcel locker storage locations"""
     __tablename__ = "parcel_lockers"
@@ -235,6 +383,31 @@ class ParcelLockerDB(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
+class LockerReservationDB(Base):
+    """A parcel locker slot held for a drop-off, then occupied until pickup"""
+    __tablename__ = "locker_reservations"
+    __table_args__ = (
+        Index("ix_locker_reservations_status_expires_at", "status", "expires_at"),
+        Index("ix_locker_reservations_locker_id_status", "locker_id", "status"),
+        # A delivery holds at most one live slot, however many optimiser runs race
+        Index("uq_locker_reservations_live_delivery", "delivery_id", unique=True,
+              sqlite_where=text("status IN ('held', 'occupied')"),
+              postgresql_where=text("status IN ('held', 'occupied')")),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    locker_id = Column(Integer, ForeignKey("parcel_lockers.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    delivery_id = Column(Integer, ForeignKey("deliveries.id"), nullable=True)
+
+    # held -> occupied -> released, or held -> expired / released.
+    # held and occupied reservations are counted in the locker's current_occupancy
+    status = Column(String, nullable=False, default="held")
+    expires_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
 
 class UserBase(BaseModel):
     name: str
@@ -450,6 +623,26 @@ class SubscriptionResponse(BaseModel):
         from_attributes = True
 
 
+class NotificationCreate(BaseModel):
+    title: str = "Notification"
+    message: Optional[str] = ""
+    type: str = "info"
+    order: Optional[str] = ""
+    street: Optional[str] = ""
+
+
+class NotificationResponse(BaseModel):
+    id: int
+    title: str
+    message: Optional[str] = ""
+    type: str = "info"
+    order: Optional[str] = ""
+    street: Optional[str] = ""
+    project_id: Optional[int] = None
+    read: bool = False
+    created_at: datetime
+
+
 class DeliveryCreate(BaseModel):
     project_id: int
 
@@ -484,6 +677,7 @@ class ParcelLockerResponse(BaseModel):
     current_occupancy: int
     is_active: bool
     available_slots: int
+    reserved_slots: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -495,6 +689,19 @@ class ParcelLockerResponse(BaseModel):
         return self.total_capacity - self.current_occupancy
 
 
+class LockerReservationResponse(BaseModel):
+    id: int
+    locker_id: int
+    user_id: Optional[int] = None
+    delivery_id: Optional[int] = None
+    status: str
+    expires_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class ErrorResponse(BaseModel):
     error: str
 
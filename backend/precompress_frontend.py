@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Write .gz (and, with the brotli package installed, .br) siblings next to the
+built frontend's text assets, at maximum compression, for the static mount
+to serve without compressing per request. Run after every frontend build;
+files whose siblings are already newer than themselves are skipped.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import settings
+from middleware.compression_middleware import brotli
+
+EXTENSIONS = (".html", ".js", ".css", ".json", ".svg", ".txt", ".map", ".ico")
+# Below this the encoding headers cost about what compression saves
+MINIMUM_SIZE = 1024
+
+
+def _stale(source: str, target: str) -> bool:
+    return not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source)
+
+
+def precompress(directory: str, force: bool = False):
+    written = skipped = 0
+    original_total = compressed_total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(EXTENSIONS) or os.path.getsize(path) < MINIMUM_SIZE:
+                continue
+            with open(path, "rb") as source:
+                data = source.read()
+            encoders = [(".gz", lambda raw: gzip.compress(raw, 9, mtime=0))]
+            if brotli is not None:
+                encoders.append((".br", lambda raw: brotli.compress(raw, quality=11)))
+            for suffix, encode in encoders:
+                target = path + suffix
+                if not force and not _stale(path, target):
+                    skipped += 1
+                    continue
+                compressed = encode(data)
+                with open(target, "wb") as out:
+                    out.write(compressed)
+                written += 1
+                original_total += len(data)
+                compressed_total += len(compressed)
+                print(f"  {os.path.relpath(target, directory)}: {len(data) / 1024:,.1f} -> "
+                      f"{len(compressed) / 1024:,.1f} KiB")
+    print(f"Wrote {written} files ({original_total / 1024:,.0f} -> {compressed_total / 1024:,.0f} KiB), "
+          f"{skipped} up to date")
+    if brotli is None:
+        print("brotli is not installed: wrote gzip siblings only")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress the built frontend's assets")
+    parser.add_argument("--dir", default=settings.frontend_dir, help="Frontend build directory")
+    parser.add_argument("--force", action="store_true", help="Rewrite siblings that are up to date")
+    args = parser.parse_args()
+    if not os.path.isdir(args.dir):
+        sys.exit(f"No frontend build at {args.dir}; run npm run build in project/ first")
+    precompress(args.dir, args.force)
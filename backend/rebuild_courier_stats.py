@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Rebuild the pre-aggregated courier statistics from completed deliveries.
+
+Needed once after upgrading (deliveries completed before the stats tables
+existed are not counted) and whenever the aggregates are suspected to drift.
+Run it while the job queue is drained: a record_courier_delivery job still
+pending for an already rebuilt delivery would count it twice.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import delete, select
+
+from database import SessionLocal
+from models import CourierStatsDB, DeliveryDB
+from services import courier_stats
+from services.maintenance import MaintenanceTask, build_parser, load_checkpoint, run_cli
+
+
+class RebuildCourierStats(MaintenanceTask):
+    name = "rebuild_courier_stats"
+    description = "Folding completed deliveries into courier statistics"
+    model = DeliveryDB
+
+    def criteria(self):
+        return (DeliveryDB.status == "completed") & DeliveryDB.courier_id.isnot(None)
+
+    def apply(self, db, ids):
+        rows = db.execute(
+            select(DeliveryDB.courier_id, DeliveryDB.delivery_time_minutes,
+                   DeliveryDB.rating, DeliveryDB.completed_at)
+            .where(DeliveryDB.id.in_(ids), DeliveryDB.completed_at.isnot(None))
+        ).all()
+        # One merge per aggregate row per batch instead of one per delivery
+        courier_stats.apply(db, courier_stats.aggregate_deliveries(rows))
+
+
+if __name__ == "__main__":
+    args = build_parser("Rebuild courier statistics from completed deliveries").parse_args()
+    task = RebuildCourierStats()
+
+    if not args.dry_run:
+        db = SessionLocal()
+        try:
+            # A fresh run starts from empty aggregates; a resumed one keeps what it already folded in
+            if args.restart or load_checkpoint(db, task.name) is None:
+                deleted = db.execute(delete(CourierStatsDB)).rowcount
+                db.commit()
+                print(f"Cleared {deleted} courier stats rows")
+        finally:
+            db.close()
+
+    run_cli([task], args)
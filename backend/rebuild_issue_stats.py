@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Rebuild the issue counters behind the project and volunteer stats endpoints.
+
+Needed once after upgrading (issues written before the counters existed are
+not counted) and after bulk writes that bypass the ORM, such as datagen.py's
+Core inserts. A fresh run empties the counters first, so stats read from
+them are incomplete until it finishes; set ISSUE_STATS_COUNTERS=false to
+serve them from GROUP BY meanwhile.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import delete
+
+from database import SessionLocal
+from models import IssueDB, IssueStatsDB
+from services import issue_stats
+from services.maintenance import MaintenanceTask, build_parser, load_checkpoint, run_cli
+
+
+class RebuildIssueStats(MaintenanceTask):
+    name = "rebuild_issue_stats"
+    description = "Counting issues into project and volunteer stats"
+    model = IssueDB
+
+    def apply(self, db, ids):
+        # One counter update per (owner, status, category, priority) per batch, not one per issue
+        connection = db.connection()
+        issue_stats.apply(connection, issue_stats.grouped_counts(connection, IssueDB.id.in_(ids)))
+
+
+if __name__ == "__main__":
+    args = build_parser("Rebuild issue counters from the issues table").parse_args()
+    task = RebuildIssueStats()
+
+    if not args.dry_run:
+        db = SessionLocal()
+        try:
+            # A fresh run starts from empty counters; a resumed one keeps what it already counted
+            if args.restart or load_checkpoint(db, task.name) is None:
+                deleted = db.execute(delete(IssueStatsDB)).rowcount
+                db.commit()
+                print(f"Cleared {deleted} issue counter rows")
+        finally:
+            db.close()
+
+    run_cli([task], args)
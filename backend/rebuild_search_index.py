@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text search index from projects, issues and comments.
+
+Needed once after upgrading (rows written before the index existed are not
+searchable) and after bulk writes that bypass the ORM, such as imports done
+with Core inserts. The index is updated in place, so search keeps working
+while it runs; a resumed run picks up after the last indexed batch.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+from models import ProjectDB, IssueDB, CommentDB
+from services.maintenance import MaintenanceTask, build_parser, load_checkpoint, run_cli
+from services.search import PROJECT, ISSUE, COMMENT, search_index
+
+
+class RebuildSearchIndex(MaintenanceTask):
+    def __init__(self, doc_type: str, model):
+        self.doc_type = doc_type
+        self.model = model
+        self.name = f"rebuild_search_index_{doc_type}s"
+        self.description = f"Indexing {doc_type}s for search"
+
+    def apply(self, db, ids):
+        search_index.reindex(db.connection(), self.doc_type, ids)
+
+
+if __name__ == "__main__":
+    parser = build_parser("Rebuild the full-text search index")
+    parser.add_argument("--clear", action="store_true",
+                        help="Empty the index first (drops entries of rows deleted behind the ORM's back)")
+    args = parser.parse_args()
+    tasks = [RebuildSearchIndex(PROJECT, ProjectDB), RebuildSearchIndex(ISSUE, IssueDB),
+             RebuildSearchIndex(COMMENT, CommentDB)]
+
+    if args.clear and not args.dry_run:
+        db = SessionLocal()
+        try:
+            # Only a fresh run starts from an empty index; a resumed one keeps what it already wrote
+            if args.restart or all(load_checkpoint(db, task.name) is None for task in tasks):
+                search_index.clear(db.connection())
+                db.commit()
+                print("Cleared the search index")
+        finally:
+            db.close()
+
+    run_cli(tasks, args)
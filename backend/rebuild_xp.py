@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Recompute users' XP and rating level from the xp_events log.
+
+Users are rewritten in batches, each user's total coming from one indexed
+sum over their events, so the run streams through any number of users and
+can be interrupted and resumed. XP earned before the log existed is not in
+it: run once with --baseline after upgrading, which first logs each user's
+unexplained XP as a "baseline" event so the rebuild keeps it. Baseline
+events are dated to the epoch: when that XP was earned is unknown, and it
+must count towards the all-time board only, not this week's or month's.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import func, select, update
+
+from models import UserDB, XpEventDB
+from services import xp
+from services.maintenance import MaintenanceTask, build_parser, run_cli
+
+BASELINE = "baseline"
+# Before every rolling leaderboard window
+BASELINE_AT = datetime(1970, 1, 1)
+
+
+def _logged_xp():
+    """Sum of the current user's events, correlated to the users row being written"""
+    return (
+        select(func.coalesce(func.sum(XpEventDB.amount), 0))
+        .where(XpEventDB.user_id == UserDB.id)
+        .scalar_subquery()
+    )
+
+
+class LogBaselineXp(MaintenanceTask):
+    name = "log_baseline_xp"
+    description = "Logging XP that predates the event log as baseline events"
+    model = UserDB
+
+    def apply(self, db, ids):
+        logged = dict(db.execute(
+            select(XpEventDB.user_id, func.sum(XpEventDB.amount))
+            .where(XpEventDB.user_id.in_(ids))
+            .group_by(XpEventDB.user_id)
+        ).tuples().all())
+        rows = db.execute(select(UserDB.id, UserDB.xp).where(UserDB.id.in_(ids))).tuples()
+        # Keyed per user, so a second --baseline run adds nothing
+        xp.log_events(db, [
+            xp.XpAward(user_id, (total or 0) - logged.get(user_id, 0), BASELINE, f"baseline:{user_id}")
+            for user_id, total in rows if (total or 0) != logged.get(user_id, 0)
+        ])
+        # Also re-dates baseline events logged with the time of the run by earlier versions
+        db.execute(
+            update(XpEventDB)
+            .where(XpEventDB.user_id.in_(ids), XpEventDB.reason == BASELINE, XpEventDB.created_at != BASELINE_AT)
+            .values(created_at=BASELINE_AT)
+            .execution_options(synchronize_session=False)
+        )
+
+
+class RebuildXp(MaintenanceTask):
+    name = "rebuild_xp"
+    description = "Recomputing XP and rating levels from the event log"
+    model = UserDB
+
+    def apply(self, db, ids):
+        logged = _logged_xp()
+        db.execute(
+            update(UserDB)
+            .where(UserDB.id.in_(ids))
+            .values(xp=logged, rating_level=xp.rating_level_case(logged))
+            .execution_options(synchronize_session=False)
+        )
+
+
+if __name__ == "__main__":
+    parser = build_parser("Recompute XP and rating levels from the XP event log")
+    parser.add_argument("--baseline", action="store_true",
+                        help="First log XP the log does not explain, so the rebuild keeps it (once, after upgrading)")
+    args = parser.parse_args()
+
+    tasks = [LogBaselineXp(), RebuildXp()] if args.baseline else [RebuildXp()]
+    run_cli(tasks, args)
@@ -7,6 +7,9 @@ import crud
 from models import UserResponse, UserDB
 from database import get_db
 from routes.auth import get_current_user
+from services.job_queue import job_queue
+from middleware.ban_middleware import invalidate_ban_cache
+from services.leaderboard import leaderboard
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -75,6 +78,8 @@ async def ban_user(
     user.is_banned = True
     db.commit()
     db.refresh(user)
+    invalidate_ban_cache(user.id)
+    leaderboard.sync(db)
     
     return {
         "message": f"User {user.name} has been banned",
@@ -105,6 +110,8 @@ async def unban_user(
     user.is_banned = False
     db.commit()
     db.refresh(user)
+    invalidate_ban_cache(user.id)
+    leaderboard.sync(db)
     
     return {
         "message": f"User {user.name} has been unbanned",
@@ -208,4 +215,13 @@ async def demote_from_admin(
         "user": UserResponse.from_orm(user)
     }
     
-    
\ No newline at end of file
+    
+
+
+@router.get("/jobs/stats")
+async def get_job_stats(
+    current_user = Depends(check_admin_access),
+    db: Session = Depends(get_db)
+):
+    """Get background job queue depth, latency and failure counters"""
+    return job_queue.stats(db)
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Header
 from typing import Optional
 from sqlalchemy.orm import Session
-from auth import create_access_token, verify_token, verify_password
+from auth import create_access_token, verify_token, hash_password_async, verify_password_async
 import crud
 from models import UserCreate, UserResponse, LoginRequest, AuthResponse
 from database import get_db
@@ -11,11 +11,8 @@ from database import get_db
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
-def get_current_user(
-    authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
-):
-    """Dependency to get current authenticated user"""
+def get_current_user_id(authorization: Optional[str] = Header(None)) -> int:
+    """Dependency resolving the caller's user id from the token alone, without a DB lookup"""
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -46,7 +43,15 @@ def get_current_user(
             detail="Invalid token payload"
         )
     
-    user = crud.get_user_by_id(db, int(user_id))
+    return int(user_id)
+
+
+def get_current_user(
+    user_id: int = Depends(get_current_user_id),
+    db: Session = Depends(get_db)
+):
+    """Dependency to get current authenticated user"""
+    user = crud.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,8 +77,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         db,
         email=user_data.email,
         name=user_data.name,
-        password=user_data.password,
-        role=user_data.role
+        role=user_data.role,
+        password_hash=await hash_password_async(user_data.password)
     )
     
     # Generate token
@@ -90,7 +95,7 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
     """Login with email and password"""
     user = crud.get_user_by_email(db, credentials.email)
     
-    if not user or not verify_password(credentials.password, user.password_hash):
+    if not user or not await verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
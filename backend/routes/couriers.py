@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from datetime import date, datetime
+from pydantic import BaseModel
+
+from database import get_db
+from services import courier_stats
+from services.courier_stats import ALL_COURIERS, Aggregate
+
+router = APIRouter(prefix="/api/couriers", tags=["couriers"])
+
+Period = Literal["all", "week", "day"]
+
+
+class CourierStatsSummary(BaseModel):
+    deliveries: int = 0
+    avg_time_minutes: Optional[float] = None
+    stddev_time_minutes: Optional[float] = None
+    min_time_minutes: Optional[float] = None
+    max_time_minutes: Optional[float] = None
+    p50_time_minutes: Optional[float] = None
+    p90_time_minutes: Optional[float] = None
+    p99_time_minutes: Optional[float] = None
+    avg_rating: Optional[float] = None
+    ratings: int = 0
+
+
+class CourierStatsWindow(CourierStatsSummary):
+    period: str
+    window_start: date
+
+
+class LeaderboardEntry(CourierStatsSummary):
+    rank: int
+    courier_id: int
+    name: str
+
+
+class LeaderboardResponse(BaseModel):
+    period: str
+    window_start: date
+    metric: str
+    entries: List[LeaderboardEntry]
+
+
+class CourierStatsHistory(BaseModel):
+    courier_id: int
+    period: str
+    windows: List[CourierStatsWindow]
+
+
+def _window(period: str, start: date, aggregate: Optional[Aggregate]) -> CourierStatsWindow:
+    summary = aggregate.summary() if aggregate is not None else {}
+    return CourierStatsWindow(period=period, window_start=start, **summary)
+
+
+@router.get("/leaderboard", response_model=LeaderboardResponse)
+async def get_courier_leaderboard(
+    period: Period = Query("week"),
+    metric: Literal["deliveries", "rating", "speed"] = Query("deliveries"),
+    limit: int = Query(20, ge=1, le=100),
+    min_deliveries: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Top couriers of the current window, read from pre-aggregated stats"""
+    start = courier_stats.window_start(period, datetime.utcnow())
+    rows = courier_stats.leaderboard(db, period, start, metric, limit, min_deliveries)
+    return LeaderboardResponse(
+        period=period,
+        window_start=start,
+        metric=metric,
+        entries=[
+            LeaderboardEntry(rank=rank, courier_id=courier_id, name=name, **aggregate.summary())
+            for rank, (courier_id, name, aggregate) in enumerate(rows, start=1)
+        ]
+    )
+
+
+@router.get("/stats", response_model=CourierStatsWindow)
+async def get_overall_courier_stats(
+    period: Period = Query("week"),
+    db: Session = Depends(get_db)
+):
+    """Delivery stats across all couriers for the current window"""
+    start = courier_stats.window_start(period, datetime.utcnow())
+    return _window(period, start, courier_stats.get_window(db, ALL_COURIERS, period, start))
+
+
+@router.get("/{courier_id}/stats", response_model=CourierStatsHistory)
+async def get_courier_stats(
+    courier_id: int,
+    period: Period = Query("week"),
+    windows: int = Query(8, ge=1, le=366),
+    db: Session = Depends(get_db)
+):
+    """A courier's stats for the most recent windows that had deliveries, newest first"""
+    history = courier_stats.get_history(db, courier_id, period, windows)
+    return CourierStatsHistory(
+        courier_id=courier_id,
+        period=period,
+        windows=[_window(period, start, aggregate) for start, aggregate in history]
+    )
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pydantic import BaseModel, Field
 
 from database import get_db
-from routes.auth import get_current_user
+from routes.auth import get_current_user, get_current_user_id
 from models import DeliveryResponse, DeliveryDetailResponse, UserResponse, ProjectResponse
+from services.dispatch import dispatch_engine
+from services.courier_locations import courier_locations
+from services.geofence import CourierEvent, Destination, geofence_monitor
+from services.courier_matching import DeliveryOffer, courier_matcher
 import crud
 
 router = APIRouter(prefix="/api/deliveries", tags=["deliveries"])
@@ -15,40 +21,236 @@ class AcceptDeliveryRequest(BaseModel):
     delivery_id: int
 
 
+class ClaimNearestRequest(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    count: int = Field(1, ge=1, le=20)
+    radius_km: Optional[float] = Field(None, gt=0)
+
+
+class CourierLocationRequest(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    recorded_at: Optional[datetime] = None
+
+
+class CourierLocationBatchRequest(BaseModel):
+    points: List[CourierLocationRequest] = Field(..., min_length=1, max_length=500)
+
+
+class CourierEventResponse(BaseModel):
+    type: str
+    delivery_id: int
+    project_id: int
+    distance_m: float
+    eta_seconds: Optional[float] = None
+    at: datetime
+
+
+class TrackPointResponse(BaseModel):
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+
+
+class DeliveryTrackResponse(BaseModel):
+    delivery_id: int
+    courier_id: Optional[int] = None
+    status: str
+    last_event: Optional[CourierEventResponse] = None
+    points: List[TrackPointResponse]
+
+
+class DeliveryOfferResponse(BaseModel):
+    delivery_id: int
+    project_id: int
+    latitude: float
+    longitude: float
+    distance_km: float
+    expires_at: datetime
+
+
+class LocationPingResponse(BaseModel):
+    offer: Optional[DeliveryOfferResponse] = None
+    events: List[CourierEventResponse] = []
+
+
+class MatchRunResponse(BaseModel):
+    strategy: str
+    couriers: int
+    deliveries: int
+    offers: int
+    total_km: float
+    elapsed_ms: float
+
+
 class CompleteDeliveryRequest(BaseModel):
     delivery_id: int
     delivery_time_minutes: int
     rating: float
 
 
+def _offer_response(offer: Optional[DeliveryOffer]) -> Optional[DeliveryOfferResponse]:
+    if offer is None:
+        return None
+    return DeliveryOfferResponse(
+        delivery_id=offer.delivery_id,
+        project_id=offer.project_id,
+        latitude=offer.latitude,
+        longitude=offer.longitude,
+        distance_km=offer.distance_km,
+        expires_at=datetime.utcfromtimestamp(offer.expires_at)
+    )
+
+
+def _event_response(event: CourierEvent) -> CourierEventResponse:
+    return CourierEventResponse(
+        type=event.type,
+        delivery_id=event.delivery_id,
+        project_id=event.project_id,
+        distance_m=event.distance_m,
+        eta_seconds=event.eta_seconds,
+        at=datetime.utcfromtimestamp(event.at)
+    )
+
+
+def _watch_deliveries(courier_id: int, deliveries) -> None:
+    """Register claimed deliveries with the geofence monitor"""
+    for delivery in deliveries:
+        project = delivery.project
+        if project is not None and project.latitude is not None and project.longitude is not None:
+            geofence_monitor.watch(courier_id, Destination(
+                delivery.id, delivery.project_id, project.latitude, project.longitude
+            ))
+
+
+def _timestamp(recorded_at: Optional[datetime]) -> Optional[float]:
+    if recorded_at is None:
+        return None
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    return recorded_at.timestamp()
+
+
 @router.get("", response_model=List[DeliveryDetailResponse])
 async def get_all_pending_deliveries(db: Session = Depends(get_db)):
     deliveries = crud.get_all_pending_deliveries(db)
     return deliveries
 
 
+@router.post("/location", response_model=LocationPingResponse)
+def report_courier_location(
+    request: CourierLocationRequest,
+    courier_id: int = Depends(get_current_user_id)
+):
+    """
+    Record the courier's position (in memory only), run geofence checks
+    against their accepted deliveries and return any arrival/ETA events
+    together with their current offer. A plain def: the geofence check
+    reloads destinations and publishes arrivals through the database now
+    and then, which must not block the event loop.
+    """
+    position = courier_locations.update(
+        courier_id, request.latitude, request.longitude, _timestamp(request.recorded_at)
+    )
+    events = geofence_monitor.check(courier_id, position.latitude, position.longitude)
+    return LocationPingResponse(
+        offer=_offer_response(courier_matcher.offer_for(courier_id)),
+        events=[_event_response(event) for event in events]
+    )
+
+
+@router.post("/location/batch", response_model=LocationPingResponse)
+def report_courier_locations(
+    request: CourierLocationBatchRequest,
+    courier_id: int = Depends(get_current_user_id)
+):
+    """Upload points buffered while offline; geofences are checked at the newest one"""
+    for point in sorted(request.points, key=lambda p: _timestamp(p.recorded_at) or 0.0):
+        position = courier_locations.update(
+            courier_id, point.latitude, point.longitude, _timestamp(point.recorded_at)
+        )
+    events = geofence_monitor.check(courier_id, position.latitude, position.longitude)
+    return LocationPingResponse(
+        offer=_offer_response(courier_matcher.offer_for(courier_id)),
+        events=[_event_response(event) for event in events]
+    )
+
+
+@router.get("/offer", response_model=DeliveryOfferResponse)
+async def get_delivery_offer(courier_id: int = Depends(get_current_user_id)):
+    """Delivery matched to the courier; accept it through /accept"""
+    offer = courier_matcher.offer_for(courier_id)
+    if offer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No delivery offer available"
+        )
+    return _offer_response(offer)
+
+
+@router.post("/match", response_model=MatchRunResponse)
+async def run_courier_matching(
+    strategy: Literal["auto", "optimal", "greedy"] = Query("auto"),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run a batch matching pass now (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return asdict(courier_matcher.run(db, strategy=strategy))
+
+
 @router.post("/accept", response_model=DeliveryDetailResponse)
 async def accept_delivery(
     request: AcceptDeliveryRequest,
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    delivery = crud.get_delivery_by_id(db, request.delivery_id)
+    result = dispatch_engine.claim(db, request.delivery_id, current_user.id)
     
-    if not delivery:
+    if not result.found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Delivery not found"
         )
     
-    if delivery.status != "pending":
+    # A retried accept by the courier who already holds it is not a conflict
+    if not result.won and not (result.status == "accepted" and result.courier_id == current_user.id):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_409_CONFLICT,
             detail="Delivery is not available"
         )
     
-    updated_delivery = crud.accept_delivery(db, request.delivery_id, current_user.id)
-    return updated_delivery
+    courier_matcher.release(request.delivery_id)
+    delivery = crud.get_delivery_by_id(db, request.delivery_id)
+    _watch_deliveries(current_user.id, [delivery])
+    return delivery
+
+
+@router.post("/claim-nearest", response_model=List[DeliveryDetailResponse])
+async def claim_nearest_deliveries(
+    request: ClaimNearestRequest,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Claim up to `count` pending deliveries nearest to the courier"""
+    result = dispatch_engine.claim_nearest(
+        db,
+        current_user.id,
+        request.latitude,
+        request.longitude,
+        count=request.count,
+        radius_km=request.radius_km
+    )
+    for delivery_id in result.delivery_ids:
+        courier_matcher.release(delivery_id)
+    deliveries = crud.get_deliveries_by_ids(db, result.delivery_ids)
+    _watch_deliveries(current_user.id, deliveries)
+    return deliveries
 
 
 @router.post("/complete", response_model=DeliveryDetailResponse)
@@ -77,4 +279,49 @@ async def complete_delivery(
         request.delivery_time_minutes,
         request.rating
     )
+    geofence_monitor.unwatch(current_user.id, request.delivery_id)
     return updated_delivery
+
+
+@router.get("/{delivery_id}/track", response_model=DeliveryTrackResponse)
+async def get_delivery_track(
+    delivery_id: int,
+    since: Optional[datetime] = Query(None, description="Only points recorded after this time"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Recent courier track for a delivery, for live maps and replay"""
+    delivery = crud.get_delivery_by_id(db, delivery_id)
+    if not delivery:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Delivery not found"
+        )
+    
+    owner_id = delivery.project.owner_id if delivery.project else None
+    if current_user.id not in (delivery.courier_id, owner_id) and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to track this delivery"
+        )
+    
+    points = []
+    if delivery.courier_id is not None and delivery.accepted_at is not None:
+        # Only the part of the track since the courier took this delivery
+        start = _timestamp(delivery.accepted_at)
+        if since is not None:
+            start = max(start, _timestamp(since))
+        points = courier_locations.track(delivery.courier_id, since=start, limit=limit)
+    
+    last_event = geofence_monitor.last_eta(delivery_id)
+    return DeliveryTrackResponse(
+        delivery_id=delivery.id,
+        courier_id=delivery.courier_id,
+        status=delivery.status,
+        last_event=_event_response(last_event) if last_event else None,
+        points=[
+            TrackPointResponse(latitude=lat, longitude=lon, recorded_at=datetime.utcfromtimestamp(t))
+            for t, lat, lon in points
+        ]
+    )
@@ -1,7 +1,7 @@
 """
 Routes for donations/orders management
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
@@ -9,6 +9,10 @@ from pydantic import BaseModel
 from database import get_db
 from routes.auth import get_current_user
 from models import DonationDB, ProjectDB
+from services.dispatch import dispatch_engine
+from services.courier_matching import courier_matcher
+from services.geo import distance_key_to_km
+import crud
 
 router = APIRouter(prefix="/api/donations", tags=["donations"])
 
@@ -21,80 +25,79 @@ class DeclineOrderRequest(BaseModel):
     courierId: int
 
 
+def _order_to_dict(row, order_status: str) -> dict:
+    return {
+        "id": row.id,
+        "project_id": row.project_id,
+        "product_name": row.name,
+        "name": row.name,
+        "description": row.description or "",
+        "status": order_status,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "delivery_address": None,
+        "thumb_url": None,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "distance_km": distance_key_to_km(row.distance_key),
+    }
+
+
+def _parse_cursor(cursor: Optional[str], by_distance: bool) -> Optional[tuple]:
+    if cursor is None:
+        return None
+    try:
+        if by_distance:
+            distance_key, last_id = cursor.split(":")
+            return float(distance_key), int(last_id)
+        return (int(cursor),)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
 @router.get("")
 async def get_donations(
+    response: Response,
     userId: Optional[int] = Query(None, description="Filter by user ID"),
     available: Optional[bool] = Query(None, description="Get available orders for couriers"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90, description="Courier position, sorts nearest first"),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only orders within this distance"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
-    """Get donations/orders"""
-    if userId:
-        # Получить донации конкретного пользователя (для донора)
-        donations = db.query(DonationDB).filter(DonationDB.user_id == userId).all()
-        result = []
-        for donation in donations:
-            result.append({
-                "id": donation.id,
-                "product_name": donation.project.name if donation.project else "Unknown",
-                "name": donation.project.name if donation.project else "Unknown",
-                "description": donation.project.description if donation.project else "",
-                "status": "Активен",
-                "created_at": donation.created_at.isoformat() if donation.created_at else None,
-                "delivery_address": donation.project.address if donation.project and hasattr(donation.project, 'address') else None,
-                "thumb_url": donation.project.thumb_url if donation.project and hasattr(donation.project, 'thumb_url') else None
-            })
-        return result
-    elif available:
-        # Получить все доступные заказы для доставщика (все донации)
-        # Если донаций нет, возвращаем все проекты как доступные заказы
-        donations = db.query(DonationDB).all()
-        result = []
-        for donation in donations:
-            if donation.project:
-                result.append({
-                    "id": donation.id,
-                    "product_name": donation.project.name,
-                    "name": donation.project.name,
-                    "description": donation.project.description or "",
-                    "status": "Доступен",
-                    "created_at": donation.created_at.isoformat() if donation.created_at else None,
-                    "delivery_address": getattr(donation.project, 'address', None) or getattr(donation.project, 'location', None) or "",
-                    "thumb_url": getattr(donation.project, 'thumb_url', None) or getattr(donation.project, 'image_url', None)
-                })
-        
-        # Если донаций нет, возвращаем все проекты
-        if not result:
-            from models import ProjectDB
-            projects = db.query(ProjectDB).all()
-            for project in projects:
-                result.append({
-                    "id": project.id,
-                    "product_name": project.name,
-                    "name": project.name,
-                    "description": project.description or "",
-                    "status": "Доступен",
-                    "created_at": project.created_at.isoformat() if hasattr(project, 'created_at') and project.created_at else None,
-                    "delivery_address": getattr(project, 'address', None) or getattr(project, 'location', None) or "",
-                    "thumb_url": getattr(project, 'thumb_url', None) or getattr(project, 'image_url', None)
-                })
-        
-        return result
-    else:
-        # Получить все донации
-        donations = db.query(DonationDB).all()
-        result = []
-        for donation in donations:
-            result.append({
-                "id": donation.id,
-                "product_name": donation.project.name if donation.project else "Unknown",
-                "name": donation.project.name if donation.project else "Unknown",
-                "description": donation.project.description if donation.project else "",
-                "status": "Активен",
-                "created_at": donation.created_at.isoformat() if donation.created_at else None,
-                "delivery_address": donation.project.address if donation.project and hasattr(donation.project, 'address') else None,
-                "thumb_url": donation.project.thumb_url if donation.project and hasattr(donation.project, 'thumb_url') else None
-            })
-        return result
+    """Get donations/orders, one page at a time"""
+    by_distance = latitude is not None and longitude is not None
+    if radius_km is not None and not by_distance:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="radius_km requires latitude and longitude"
+        )
+
+    # Доступные заказы для доставщика: без принятой или завершённой доставки
+    only_available = bool(available) and not userId
+    rows = crud.get_donation_orders(
+        db,
+        user_id=userId,
+        available=only_available,
+        latitude=latitude,
+        longitude=longitude,
+        radius_km=radius_km,
+        after=_parse_cursor(cursor, by_distance),
+        limit=limit
+    )
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = (
+            f"{last.distance_key!r}:{last.id}" if by_distance else str(last.id)
+        )
+
+    order_status = "Доступен" if only_available else "Активен"
+    return [_order_to_dict(row, order_status) for row in rows]
 
 
 class DonationCreateRequest(BaseModel):
@@ -185,7 +188,7 @@ async def accept_order(
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Accept an order by courier"""
+    """Accept an order by courier; exactly one courier wins a contested order"""
     donation = db.query(DonationDB).filter(DonationDB.id == donation_id).first()
     
     if not donation:
@@ -194,12 +197,26 @@ async def accept_order(
             detail="Order not found"
         )
     
-    # Здесь можно добавить логику обновления статуса заказа
-    # Например, добавить поле courier_id в DonationDB или создать отдельную таблицу для отслеживания
+    if request.courierId != current_user.id and not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Couriers can only accept orders for themselves"
+        )
+    
+    result = dispatch_engine.claim_for_project(db, donation.project_id, request.courierId)
+    # Only a retry by the courier already holding the open delivery succeeds; a completed one is gone
+    if not result.won and not (result.status == "accepted" and result.courier_id == request.courierId):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Order already delivered" if result.status == "completed"
+            else "Order already accepted by another courier"
+        )
     
+    courier_matcher.release(result.delivery_id)
     return {
         "message": "Order accepted successfully",
         "donation_id": donation_id,
+        "delivery_id": result.delivery_id,
         "courier_id": request.courierId
     }
 
@@ -1,19 +1,78 @@
 """Volunteer task and issue management routes"""
 
-from fastapi import APIRouter, Depends, HTTPException, Header, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
 import crud
 from models import (
     IssueCreate, IssueUpdate, IssueResponse, IssueDetailResponse,
-    IssueCategory, IssueStatusUpdate
+    IssueCategory
 )
 from database import get_db
 from routes.auth import get_current_user
+from services import issue_bulk, issue_stats
+from services.issue_recommendations import issue_recommender
 
 router = APIRouter(prefix="/api/issues", tags=["issues"])
 
 
+class IssueRecommendation(IssueResponse):
+    score: float
+    # None when ranked without a location
+    distance_km: Optional[float] = None
+
+
+class BulkIssueOperation(BaseModel):
+    op: Literal["assign", "close", "set_priority"]
+    issue_ids: List[int] = Field(..., min_length=1)
+    # assign: the volunteer to assign (yourself if omitted)
+    assignee_id: Optional[int] = None
+    # set_priority: the new priority
+    priority: Optional[Literal["low", "medium", "high"]] = None
+
+
+class BulkIssueRequest(BaseModel):
+    operations: List[BulkIssueOperation] = Field(..., min_length=1, max_length=20)
+
+
+class BulkIssueResult(BaseModel):
+    issue_id: int
+    op: str
+    ok: bool
+    error: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    assignee_id: Optional[int] = None
+
+
+class BulkIssueResponse(BaseModel):
+    applied: int
+    failed: int
+    results: List[BulkIssueResult]
+
+
+class IssueCounts(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+
+
+class IssueStats(IssueCounts):
+    by_category: Dict[str, IssueCounts]
+
+
+class ProjectIssueStats(IssueStats):
+    project_id: int
+
+
+class VolunteerIssueStats(IssueStats):
+    user_id: int
+    name: str
+    xp: int
+    rating_level: Optional[str] = None
+
+
 @router.get("", response_model=List[IssueResponse])
 async def get_issues(
     project_id: Optional[int] = None,
@@ -31,6 +90,51 @@ async def get_issues(
     return [IssueResponse.from_orm(issue) for issue in issues]
 
 
+@router.get("/recommended", response_model=List[IssueRecommendation])
+async def get_recommended_issues(
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    max_km: Optional[float] = Query(None, gt=0, description="Only issues of projects this close"),
+    category: Optional[IssueCategory] = None,
+    limit: int = Query(10, ge=1, le=50),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Open issues for the current user, best first: near the given point (or
+    the projects they usually help), in their usual categories, urgent and
+    high priority first
+    """
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass both latitude and longitude, or neither"
+        )
+    
+    issue_recommender.ensure_loaded(db)
+    profile = issue_recommender.profile(db, current_user.id)
+    ranked = issue_recommender.recommend(
+        current_user.id, profile, k=limit, latitude=latitude, longitude=longitude,
+        max_km=max_km, category=category
+    )
+    if not ranked:
+        return []
+    
+    from models import IssueDB
+    issues = {
+        issue.id: issue
+        for issue in db.query(IssueDB).filter(IssueDB.id.in_([item.issue_id for item in ranked])).all()
+    }
+    return [
+        IssueRecommendation(
+            **IssueResponse.from_orm(issues[item.issue_id]).model_dump(),
+            score=item.score,
+            distance_km=item.distance_km
+        )
+        for item in ranked if item.issue_id in issues
+    ]
+
+
 @router.post("", response_model=IssueResponse)
 async def create_issue(
     issue_data: IssueCreate,
@@ -60,6 +164,36 @@ async def create_issue(
     return IssueResponse.from_orm(db_issue)
 
 
+@router.post("/bulk", response_model=BulkIssueResponse)
+async def bulk_update_issues(
+    request: BulkIssueRequest,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Assign, close or reprioritise many issues in one transaction. Operations
+    run in order; issues an operation cannot apply to are reported and
+    skipped, the rest are applied.
+    """
+    try:
+        results = issue_bulk.apply(db, current_user, [
+            issue_bulk.IssueOperation(operation.op, operation.issue_ids, operation.assignee_id, operation.priority)
+            for operation in request.operations
+        ])
+    except issue_bulk.BulkIssueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    applied = sum(1 for result in results if result.ok)
+    return BulkIssueResponse(
+        applied=applied,
+        failed=len(results) - applied,
+        results=[BulkIssueResult(**vars(result)) for result in results]
+    )
+
+
 @router.get("/{issue_id}", response_model=IssueDetailResponse)
 async def get_issue_detail(issue_id: int, db: Session = Depends(get_db)):
     """Get issue details with all relationships"""
@@ -190,10 +324,43 @@ async def get_assignee_stats(issue_id: int, db: Session = Depends(get_db)):
         "assignee_name": issue.assignee.name,
         "xp": issue.assignee.xp,
         "rating_level": issue.assignee.rating_level,
-        "issues_completed": len([i for i in issue.assignee.issues_assigned if i.status == "closed"])
+        "issues_completed": issue_stats.closed_count(db, issue.assignee.id)
     }
 
 
+@router.get("/project/{project_id}/stats", response_model=ProjectIssueStats)
+async def get_project_stats(project_id: int, db: Session = Depends(get_db)):
+    """Issue counts of a project by status, priority and category"""
+    if not crud.get_project_by_id(db, project_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    counts = issue_stats.breakdown(db, issue_stats.PROJECT, project_id)
+    return ProjectIssueStats(project_id=project_id, **issue_stats.summarize(counts))
+
+
+@router.get("/volunteer/{user_id}/stats", response_model=VolunteerIssueStats)
+async def get_volunteer_stats(user_id: int, db: Session = Depends(get_db)):
+    """Counts of the issues assigned to a volunteer by status, priority and category"""
+    user = crud.get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    counts = issue_stats.breakdown(db, issue_stats.ASSIGNEE, user_id)
+    return VolunteerIssueStats(
+        user_id=user.id,
+        name=user.name,
+        xp=user.xp or 0,
+        rating_level=user.rating_level,
+        **issue_stats.summarize(counts)
+    )
+
+
 @router.delete("/{issue_id}")
 async def delete_issue(
     issue_id: int,
@@ -218,150 +385,6 @@ async def delete_issue(
     from models import IssueDB
     db.delete(issue)
     db.commit()
+    issue_recommender.refresh(db, [issue_id])
     
     return {"message": "Issue deleted"}
-
-    return new_issue
-
-
-@router.get("/{issue_id}", response_model=dict)
-async def get_issue(issue_id: str, authorization: Optional[str] = Header(None)):
-    """Get issue details"""
-    user_id = get_user_from_token(authorization)
-    
-    issue = issues_db.get(issue_id)
-    if not issue:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Issue not found"
-        )
-    
-    # Check if user has access to project
-    project = projects_db.get(issue["projectId"])
-    if project and user_id not in project["members"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to view this issue"
-        )
-    
-    return issue
-
-
-@router.put("/{issue_id}", response_model=dict)
-async def update_issue(issue_id: str, updates: IssueUpdate, authorization: Optional[str] = Header(None)):
-    """Update issue"""
-    user_id = get_user_from_token(authorization)
-    
-    issue = issues_db.get(issue_id)
-    if not issue:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Issue not found"
-        )
-    
-    # Check if user is issue creator
-    if issue["createdBy"] != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only issue creator can update"
-        )
-    
-    if updates.title:
-        issue["title"] = updates.title
-    if updates.description is not None:
-        issue["description"] = updates.description
-    if updates.priority:
-        issue["priority"] = updates.priority
-    if updates.assignedTo is not None:
-        issue["assignedTo"] = updates.assignedTo
-    
-    return issue
-
-
-@router.patch("/{issue_id}/status", response_model=dict)
-async def update_issue_status(issue_id: str, update: IssueStatusUpdate, authorization: Optional[str] = Header(None)):
-    """Update issue status"""
-    user_id = get_user_from_token(authorization)
-    
-    issue = issues_db.get(issue_id)
-    if not issue:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Issue not found"
-        )
-    
-    # Check if user is in project
-    project = projects_db.get(issue["projectId"])
-    if project and user_id not in project["members"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to update this issue"
-        )
-    
-    issue["status"] = update.status
-    
-    return issue
-
-
-@router.delete("/{issue_id}", response_model=dict)
-async def delete_issue(issue_id: str, authorization: Optional[str] = Header(None)):
-    """Delete issue"""
-    user_id = get_user_from_token(authorization)
-    
-    issue = issues_db.get(issue_id)
-    if not issue:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Issue not found"
-        )
-    
-    # Only creator can delete
-    if issue["createdBy"] != user_id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only issue creator can delete"
-        )
-    
-    del issues_db[issue_id]
-    
-    return {"message": f"Issue {issue_id} deleted"}
-
-
-@router.get("/project/{project_id}/stats", response_model=dict)
-async def get_project_stats(project_id: str, authorization: Optional[str] = Header(None)):
-    """Get issue statistics for a project"""
-    user_id = get_user_from_token(authorization)
-    
-    project = projects_db.get(project_id)
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
-    if user_id not in project["members"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized"
-        )
-    
-    open_count = 0
-    closed_count = 0
-    in_progress_count = 0
-    
-    for issue in issues_db.values():
-        if issue["projectId"] == project_id:
-            if issue["status"] == "open":
-                open_count += 1
-            elif issue["status"] == "closed":
-                closed_count += 1
-            elif issue["status"] == "in-progress":
-                in_progress_count += 1
-    
-    return {
-        "projectId": project_id,
-        "open": open_count,
-        "closed": closed_count,
-        "inProgress": in_progress_count,
-        "total": open_count + closed_count + in_progress_count
-    }
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+from database import get_db
+from models import UserDB, UserRole
+from services.leaderboard import LeaderboardEntry, leaderboard, rating_level_for
+
+router = APIRouter(prefix="/api/leaderboard", tags=["leaderboard"])
+
+Period = Literal["all", "week", "month"]
+
+
+class XpLeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    name: str
+    avatar: Optional[str] = None
+    role: str
+    xp: int
+    # Level reached by all-time XP, whatever the board's period
+    rating_level: str
+
+
+class XpLeaderboardResponse(BaseModel):
+    period: str
+    role: Optional[str] = None
+    total: int
+    entries: List[XpLeaderboardEntry]
+
+
+class XpLeaderboardPosition(BaseModel):
+    period: str
+    role: Optional[str] = None
+    total: int
+    # None when the user is not on the board, e.g. no XP earned this week
+    position: Optional[XpLeaderboardEntry] = None
+    around: List[XpLeaderboardEntry]
+
+
+def _entries(db: Session, found: List[LeaderboardEntry]) -> List[XpLeaderboardEntry]:
+    """Attach names and avatars to board entries with one query"""
+    if not found:
+        return []
+    users = {
+        row.id: row for row in db.execute(
+            select(UserDB.id, UserDB.name, UserDB.avatar, UserDB.role, UserDB.xp)
+            .where(UserDB.id.in_([entry.user_id for entry in found]))
+        )
+    }
+    return [
+        XpLeaderboardEntry(
+            rank=entry.rank,
+            user_id=entry.user_id,
+            name=users[entry.user_id].name,
+            avatar=users[entry.user_id].avatar,
+            role=UserRole(users[entry.user_id].role or UserRole.DONOR).value,
+            xp=entry.xp,
+            rating_level=rating_level_for(users[entry.user_id].xp or 0)
+        )
+        for entry in found if entry.user_id in users
+    ]
+
+
+@router.get("", response_model=XpLeaderboardResponse)
+def get_leaderboard(
+    period: Period = Query("all"),
+    role: Optional[UserRole] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Users with the most XP overall or over the last 7 / 30 days, optionally of one role"""
+    leaderboard.ensure_loaded(db)
+    role_name = role.value if role else None
+    return XpLeaderboardResponse(
+        period=period,
+        role=role_name,
+        total=leaderboard.size(period, role_name),
+        entries=_entries(db, leaderboard.top(period, role_name, limit, offset))
+    )
+
+
+@router.get("/users/{user_id}", response_model=XpLeaderboardPosition)
+def get_leaderboard_position(
+    user_id: int,
+    period: Period = Query("all"),
+    role: Optional[UserRole] = Query(None),
+    radius: int = Query(5, ge=0, le=50, description="Neighbours shown above and below"),
+    db: Session = Depends(get_db)
+):
+    """A user's rank on a board and the users just above and below them"""
+    leaderboard.ensure_loaded(db)
+    role_name = role.value if role else None
+    around = _entries(db, leaderboard.around(user_id, period, role_name, radius))
+    return XpLeaderboardPosition(
+        period=period,
+        role=role_name,
+        total=leaderboard.size(period, role_name),
+        position=next((entry for entry in around if entry.user_id == user_id), None),
+        around=around
+    )
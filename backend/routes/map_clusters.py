@@ -0,0 +1,146 @@
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from typing import List, Literal
+from pydantic import BaseModel
+
+from database import get_db
+from middleware.compression_middleware import accepted_encodings, encoded_etag
+from services.map_clusters import MAX_ZOOM, Cluster, map_clusters, tile_bounds
+from services.map_points import map_points
+
+router = APIRouter(prefix="/api/map", tags=["map"])
+
+Kind = Literal["project", "locker"]
+
+# Beyond this many tiles a bbox query is a whole-world fetch in disguise
+MAX_BBOX_TILES = 64
+POINTS_MEDIA_TYPE = "application/vnd.savefood.map-points"
+# Clients revalidate with If-None-Match after this; writes change the ETag at once
+CACHE_CONTROL = "public, max-age=30"
+
+
+class MapMarker(BaseModel):
+    kind: Kind
+    id: int
+    latitude: float
+    longitude: float
+
+
+class MapCluster(BaseModel):
+    # "z/cx/cy" for a cluster cell, "kind/id" for a marker past the clustering zooms
+    key: str
+    # Centroid of the cluster, or the marker itself when count is 1
+    latitude: float
+    longitude: float
+    count: int
+    projects: int
+    lockers: int
+    # A real marker inside the cluster, e.g. for its icon or a preview
+    representative: MapMarker
+
+
+class MapClusterResponse(BaseModel):
+    zoom: int
+    total: int
+    clusters: List[MapCluster]
+
+
+def _cluster(found: Cluster) -> MapCluster:
+    marker = found.representative
+    return MapCluster(
+        key=found.key,
+        latitude=found.latitude,
+        longitude=found.longitude,
+        count=found.count,
+        projects=found.projects,
+        lockers=found.lockers,
+        representative=MapMarker(kind=marker.kind, id=marker.id, latitude=marker.latitude,
+                                 longitude=marker.longitude)
+    )
+
+
+def _not_modified(request: Request, response: Response, etag: str) -> bool:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return request.headers.get("if-none-match") == etag
+
+
+@router.get("/tiles/{z}/{x}/{y}", response_model=MapClusterResponse)
+async def get_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    response: Response,
+    kinds: List[Kind] = Query(default=["project", "locker"]),
+    db: Session = Depends(get_db)
+):
+    """Project and locker clusters of one XYZ map tile (Web Mercator, 256 px)"""
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    map_clusters.ensure_loaded(db)
+    if _not_modified(request, response, map_clusters.etag(z, x, y, kinds)):
+        return Response(status_code=304, headers=dict(response.headers))
+    clusters = map_clusters.tile(z, x, y, kinds)
+    return MapClusterResponse(zoom=z, total=sum(found.count for found in clusters),
+                              clusters=[_cluster(found) for found in clusters])
+
+
+@router.get("/clusters", response_model=MapClusterResponse)
+async def get_clusters(
+    request: Request,
+    response: Response,
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM),
+    kinds: List[Kind] = Query(default=["project", "locker"]),
+    db: Session = Depends(get_db)
+):
+    """Clusters inside a bounding box at a map zoom, assembled from the cached tiles"""
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="Bounding box must have south <= north and west <= east")
+    tiles = map_clusters.tiles_covering(south, west, north, east, zoom)
+    if len(tiles) > MAX_BBOX_TILES:
+        raise HTTPException(status_code=400, detail="Bounding box too large for this zoom")
+    map_clusters.ensure_loaded(db)
+    # Stable across workers, unlike hash(); any tile's content change changes it
+    tile_etags = " ".join(map_clusters.etag(*tile, kinds) for tile in tiles)
+    etag = '"' + hashlib.sha1(tile_etags.encode()).hexdigest()[:16] + '"'
+    if _not_modified(request, response, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+    clusters = []
+    for tile in tiles:
+        tile_south, tile_west, tile_north, tile_east = tile_bounds(*tile)
+        found = map_clusters.tile(*tile, kinds)
+        if tile_south < south or tile_north > north or tile_west < west or tile_east > east:
+            # Edge tile: only the clusters whose position falls inside the box
+            found = [cluster for cluster in found
+                     if south <= cluster.latitude <= north and west <= cluster.longitude <= east]
+        clusters.extend(found)
+    return MapClusterResponse(zoom=zoom, total=sum(found.count for found in clusters),
+                              clusters=[_cluster(found) for found in clusters])
+
+
+@router.get("/points")
+async def get_points(
+    request: Request,
+    kinds: List[Kind] = Query(default=["project", "locker"]),
+    db: Session = Depends(get_db)
+):
+    """Every project and active locker position as the packed binary format of services.map_points"""
+    accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+    gzipped = accepted.get("gzip", accepted.get("*", 0.0)) > 0
+    content_hash, payload = map_points.payload(db, kinds, compressed=gzipped)
+    etag = f'"{content_hash}"'
+    headers = {"ETag": encoded_etag(etag, "gzip") if gzipped else etag, "Cache-Control": CACHE_CONTROL,
+               "Vary": "Accept-Encoding"}
+    # When the middleware negotiated gzip too it hands a revalidation of the gzip tag over as the plain one
+    if request.headers.get("if-none-match") in (etag, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=payload, media_type=POINTS_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,17 @@
+"""Prometheus metrics endpoint"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import registry
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose application metrics in Prometheus text format"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
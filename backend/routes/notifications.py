@@ -1,34 +1,115 @@
 """Notification management routes"""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import crud
-from models import SubscriptionResponse
+from models import SubscriptionResponse, NotificationCreate, NotificationResponse
 from database import get_db
 from routes.auth import get_current_user
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
 
-@router.post("/")
+def _notification_to_dict(notification) -> dict:
+    return {
+        "id": notification.id,
+        "title": notification.title,
+        "message": notification.message or "",
+        "type": notification.type,
+        "order": notification.order_name or "",
+        "street": notification.street or "",
+        "project_id": notification.project_id,
+        "read": notification.is_read,
+        "created_at": notification.created_at
+    }
+
+
+@router.get("", response_model=List[NotificationResponse])
+async def get_my_notifications(
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Return notifications older than this id"),
+    limit: int = Query(50, ge=1, le=200),
+    unread_only: bool = False,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user's inbox, newest first, with cursor paging"""
+    notifications = crud.get_notifications(
+        db, current_user.id, before_id=cursor, limit=limit, unread_only=unread_only
+    )
+    if len(notifications) == limit:
+        response.headers["X-Next-Cursor"] = str(notifications[-1].id)
+    return [_notification_to_dict(n) for n in notifications]
+
+
+@router.get("/unread-count")
+async def get_unread_count(
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get number of unread notifications for current user"""
+    return {"unread": crud.count_unread_notifications(db, current_user.id)}
+
+
+@router.post("", response_model=NotificationResponse)
+@router.post("/", response_model=NotificationResponse, include_in_schema=False)
 async def create_notification(
-    data: dict,
+    data: NotificationCreate,
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new notification for current user"""
-    # This endpoint creates a simple notification response
-    return {
-        "id": 1,
-        "title": data.get("title", "Notification"),
-        "message": data.get("message", ""),
-        "type": data.get("type", "info"),
-        "order": data.get("order", ""),
-        "street": data.get("street", ""),
-        "read": False,
-        "created_at": "2024-01-08T00:00:00"
-    }
+    notification = crud.create_notification(
+        db,
+        user_id=current_user.id,
+        title=data.title,
+        message=data.message or "",
+        type=data.type,
+        order=data.order,
+        street=data.street
+    )
+    return _notification_to_dict(notification)
+
+
+@router.patch("/{notification_id}/read")
+async def mark_notification_read(
+    notification_id: int,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark a notification as read"""
+    if not crud.mark_notification_read(db, current_user.id, notification_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notification not found"
+        )
+    return {"id": notification_id, "read": True}
+
+
+@router.post("/read-all")
+async def mark_all_notifications_read(
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Mark all notifications of current user as read"""
+    updated = crud.mark_all_notifications_read(db, current_user.id)
+    return {"updated": updated}
+
+
+@router.delete("/{notification_id}")
+async def delete_notification(
+    notification_id: int,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a notification from current user's inbox"""
+    if not crud.delete_notification(db, current_user.id, notification_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notification not found"
+        )
+    return {"message": "Notification deleted"}
 
 
 @router.get("/subscriptions", response_model=List[SubscriptionResponse])
@@ -1,42 +1,189 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from dataclasses import asdict
+from pydantic import BaseModel, Field
 from database import get_db
 from crud import (
     get_all_parcel_lockers, get_parcel_locker_by_id, create_parcel_locker,
-    deactivate_parcel_locker
+    deactivate_parcel_locker, get_delivery_by_id
 )
-from models import ParcelLockerResponse, MessageResponse, ErrorResponse
-from services.auth_service import get_current_user
+from models import (
+    LockerReservationDB, LockerReservationResponse, ParcelLockerResponse, MessageResponse, ErrorResponse
+)
+from routes.auth import get_current_user
+from services.job_queue import job_queue
+from services.locker_assignment import DEFAULT_BATCH_LIMIT, locker_assigner
+from services.locker_index import locker_index
+from services.locker_reservations import DeliveryAlreadyHeld, LockerHolds, locker_reservations
+from services.routing_service import Location, routing_service
 
 router = APIRouter(prefix="/api/parcel-lockers", tags=["parcel-lockers"])
 
 
+class ReserveSlotRequest(BaseModel):
+    delivery_id: Optional[int] = None
+    hold_minutes: Optional[float] = Field(None, gt=0, le=24 * 60)
+
+
+class NearestLockerResponse(BaseModel):
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    total_capacity: int
+    available_slots: int
+    distance_km: float
+    road_distance_km: Optional[float] = None
+
+
+class NearestLockersResponse(BaseModel):
+    lockers: List[NearestLockerResponse]
+    # "haversine" when road distances were asked for but the router was unavailable
+    road_distance_source: Optional[str] = None
+
+
+class AssignLockersRequest(BaseModel):
+    delivery_ids: Optional[List[int]] = Field(None, max_length=20000)
+    limit: int = Field(DEFAULT_BATCH_LIMIT, ge=1, le=20000)
+    strategy: Literal["optimal", "greedy"] = "optimal"
+    hold_minutes: Optional[float] = Field(None, gt=0, le=7 * 24 * 60)
+    background: bool = False
+
+
+class LockerAssignmentResponse(BaseModel):
+    delivery_id: int
+    locker_id: int
+    reservation_id: int
+    distance_km: float
+
+
+class LockerAssignmentRunResponse(BaseModel):
+    queued: bool = False
+    strategy: str
+    deliveries: int = 0
+    lockers: int = 0
+    assigned: int = 0
+    total_km: float = 0.0
+    elapsed_ms: float = 0.0
+    assignments: List[LockerAssignmentResponse] = []
+
+
+def _locker_response(locker, holds: Optional[LockerHolds] = None) -> dict:
+    holds = holds or LockerHolds()
+    # Occupancy counts every held slot; lapsed holds the sweeper has not reached yet are free
+    available = locker.total_capacity - locker.current_occupancy + holds.stale
+    return {
+        "id": locker.id,
+        "name": locker.name,
+        "address": locker.address,
+        "latitude": locker.latitude,
+        "longitude": locker.longitude,
+        "total_capacity": locker.total_capacity,
+        "current_occupancy": locker.current_occupancy,
+        "is_active": locker.is_active,
+        "available_slots": max(available, 0) if locker.is_active else 0,
+        "reserved_slots": holds.live,
+        "created_at": locker.created_at,
+        "updated_at": locker.updated_at
+    }
+
+
+def _get_own_reservation(db: Session, reservation_id: int, current_user) -> LockerReservationDB:
+    reservation = db.get(LockerReservationDB, reservation_id)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Бронь не найдена")
+    if reservation.user_id != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Это чужая бронь")
+    return reservation
+
+
+def _check_delivery_access(db: Session, delivery_id: int, current_user):
+    """Only the delivery's courier, its project's owner or an admin may hold a slot for it"""
+    delivery = get_delivery_by_id(db, delivery_id)
+    if not delivery:
+        raise HTTPException(status_code=404, detail="Доставка не найдена")
+    if current_user.is_admin or current_user.id in (delivery.courier_id, delivery.project.owner_id):
+        return
+    raise HTTPException(status_code=403, detail="Это чужая доставка")
+
+
 @router.get("", response_model=list[ParcelLockerResponse])
 def get_parcel_lockers(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
-    """Get all active parcel lockers"""
+    """Get all active parcel lockers with their real free slots"""
     lockers = get_all_parcel_lockers(db, skip=skip, limit=limit)
+    holds = locker_reservations.holds(db, [locker.id for locker in lockers])
+    return [_locker_response(locker, holds.get(locker.id)) for locker in lockers]
+
+
+@router.get("/nearest", response_model=NearestLockersResponse)
+async def get_nearest_lockers(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=50),
+    min_slots: int = Query(1, ge=0),
+    max_km: Optional[float] = Query(None, gt=0),
+    road: bool = Query(False, description="Also return road distances from the routing service"),
+    db: Session = Depends(get_db)
+):
+    """The k nearest active lockers with at least min_slots free slots"""
+    locker_index.ensure_loaded(db)
+    found = locker_index.nearest(lat, lon, k=k, min_slots=min_slots, max_km=max_km)
+    lockers = [
+        NearestLockerResponse(
+            id=locker.id,
+            name=locker.name,
+            address=locker.address,
+            latitude=locker.latitude,
+            longitude=locker.longitude,
+            total_capacity=locker.total_capacity,
+            available_slots=locker.free_slots,
+            distance_km=round(distance, 3)
+        )
+        for distance, locker in found
+    ]
+    
+    source = None
+    if road and lockers:
+        distances, source = await routing_service.get_distances_from(
+            Location(id="origin", lat=lat, lon=lon),
+            [Location(id=locker.id, lat=locker.latitude, lon=locker.longitude) for locker in lockers]
+        )
+        for locker, meters in zip(lockers, distances):
+            locker.road_distance_km = round(meters / 1000, 3)
+        # Road distance is what the courier actually travels, so it decides the order
+        lockers.sort(key=lambda locker: locker.road_distance_km)
+    
+    return NearestLockersResponse(lockers=lockers, road_distance_source=source)
+
+
+@router.post("/assign", response_model=LockerAssignmentRunResponse)
+def assign_deliveries_to_lockers(
+    request: AssignLockersRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Reserve locker slots for pending deliveries, minimising total distance (admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Только администратор может распределять доставки")
     
-    result = []
-    for locker in lockers:
-        result.append({
-            "id": locker.id,
-            "name": locker.name,
-            "address": locker.address,
-            "latitude": locker.latitude,
-            "longitude": locker.longitude,
-            "total_capacity": locker.total_capacity,
-            "current_occupancy": locker.current_occupancy,
-            "is_active": locker.is_active,
-            "available_slots": locker.total_capacity - locker.current_occupancy,
-            "created_at": locker.created_at,
-            "updated_at": locker.updated_at
+    if request.background:
+        job_queue.enqueue("assign_deliveries_to_lockers", {
+            "delivery_ids": request.delivery_ids,
+            "limit": request.limit,
+            "strategy": request.strategy,
+            "hold_minutes": request.hold_minutes
         })
+        return LockerAssignmentRunResponse(queued=True, strategy=request.strategy)
     
-    return result
+    summary = locker_assigner.run(db, request.delivery_ids, request.limit,
+                                  request.strategy, request.hold_minutes)
+    return asdict(summary)
 
 
 @router.get("/{locker_id}", response_model=ParcelLockerResponse)
@@ -46,19 +193,61 @@ def get_locker_details(locker_id: int, db: Session = Depends(get_db)):
     if not locker:
         raise HTTPException(status_code=404, detail="Почтомат не найден")
     
-    return {
-        "id": locker.id,
-        "name": locker.name,
-        "address": locker.address,
-        "latitude": locker.latitude,
-        "longitude": locker.longitude,
-        "total_capacity": locker.total_capacity,
-        "current_occupancy": locker.current_occupancy,
-        "is_active": locker.is_active,
-        "available_slots": locker.total_capacity - locker.current_occupancy,
-        "created_at": locker.created_at,
-        "updated_at": locker.updated_at
-    }
+    return _locker_response(locker, locker_reservations.holds(db, [locker.id]).get(locker.id))
+
+
+@router.post("/{locker_id}/reservations", response_model=LockerReservationResponse, status_code=201)
+def reserve_locker_slot(
+    locker_id: int,
+    request: Optional[ReserveSlotRequest] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Hold a slot in the locker until the drop-off (or until the hold expires)"""
+    locker = get_parcel_locker_by_id(db, locker_id)
+    if not locker or not locker.is_active:
+        raise HTTPException(status_code=404, detail="Почтомат не найден")
+    
+    request = request or ReserveSlotRequest()
+    if request.delivery_id is not None:
+        _check_delivery_access(db, request.delivery_id, current_user)
+    try:
+        reservation = locker_reservations.reserve(
+            db, locker_id, user_id=current_user.id,
+            delivery_id=request.delivery_id, hold_minutes=request.hold_minutes
+        )
+    except DeliveryAlreadyHeld:
+        raise HTTPException(status_code=409, detail="Для этой доставки ячейка уже забронирована")
+    if not reservation:
+        raise HTTPException(status_code=409, detail="В почтомате нет свободных ячеек")
+    return reservation
+
+
+@router.post("/reservations/{reservation_id}/confirm", response_model=LockerReservationResponse)
+def confirm_locker_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Mark the held slot as occupied once the parcel is dropped off"""
+    reservation = _get_own_reservation(db, reservation_id, current_user)
+    if not locker_reservations.confirm(db, reservation_id):
+        raise HTTPException(status_code=409, detail="Бронь истекла или уже использована")
+    db.refresh(reservation)
+    return reservation
+
+
+@router.delete("/reservations/{reservation_id}", response_model=LockerReservationResponse)
+def release_locker_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Cancel a hold or free the slot after pickup"""
+    reservation = _get_own_reservation(db, reservation_id, current_user)
+    if not locker_reservations.release(db, reservation_id):
+        raise HTTPException(status_code=409, detail="Бронь уже закрыта")
+    return reservation
 
 
 @router.post("/{locker_id}/deactivate", response_model=MessageResponse)
@@ -1,6 +1,7 @@
 """Charity project management routes with transparent donation tracking"""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import crud
@@ -12,6 +13,8 @@ from models import (
 )
 from database import get_db
 from routes.auth import get_current_user
+from services.notification_service import notification_fanout
+from services import donation_export
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
@@ -231,12 +234,29 @@ async def donate_to_project(
             detail="Failed to process donation"
         )
     
+    notification_fanout.publish(
+        project_id=project_id,
+        title="Новое пожертвование",
+        message=f"Проект «{project.name}» получил пожертвование {donation.amount:.2f}",
+        type="donation",
+        order=project.name,
+        street=project.description,
+        exclude_user_id=current_user.id,
+        event_key=f"donation:{donation.id}"
+    )
+    
     return DonationResponse.from_orm(donation)
 
 
 @router.get("/{project_id}/donations", response_model=List[DonationPublicResponse])
-async def get_public_donations(project_id: int, db: Session = Depends(get_db)):
-    """Get public donation list (respects anonymity settings)"""
+async def get_public_donations(
+    project_id: int,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor value from the previous page"),
+    limit: int = Query(100, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Get public donation list one page at a time (respects anonymity settings)"""
     project = crud.get_project_by_id(db, project_id)
     
     if not project:
@@ -245,10 +265,34 @@ async def get_public_donations(project_id: int, db: Session = Depends(get_db)):
             detail="Project not found"
         )
     
-    public_donations = crud.get_public_donations(db, project_id)
+    public_donations = crud.get_public_donations(db, project_id, after_id=cursor, limit=limit)
+    if len(public_donations) == limit:
+        response.headers["X-Next-Cursor"] = str(public_donations[-1]["id"])
     return public_donations
 
 
+@router.get("/{project_id}/donations/export")
+async def export_public_donations(
+    project_id: int,
+    format: str = Query(donation_export.CSV, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    """Stream the whole public donation ledger as CSV or NDJSON (respects anonymity settings)"""
+    project = crud.get_project_by_id(db, project_id)
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    return StreamingResponse(
+        donation_export.stream_public_donations(project_id, format),
+        media_type=donation_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="project-{project_id}-donations.{format}"'}
+    )
+
+
 @router.get("/{project_id}/donation-summary")
 async def get_donation_summary(project_id: int, db: Session = Depends(get_db)):
     """Get donation summary with progress"""
@@ -82,10 +82,7 @@ async def get_distance_matrix(request: RouteRequest):
         
         logger.info(f"Calculating distance matrix for {len(request.locations)} locations")
         
-        matrix = await routing_service.get_distance_matrix(
-            request.locations,
-            costing=request.costing
-        )
+        matrix = routing_service.get_distance_matrix(request.locations)
         
         if not matrix:
             raise HTTPException(
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel
+from database import get_db
+from services.search import DOC_TYPES, search_index
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+MAX_PAGE_SIZE = 50
+# Deeper pages rank ever larger pools for broad queries; nobody reads 5000 results
+MAX_PAGE = 100
+
+
+class SearchHitResponse(BaseModel):
+    type: str
+    id: int
+    project_id: int
+    title: str
+    # HTML-escaped, matched words wrapped in <mark>
+    snippet: str
+    score: float
+    distance_km: Optional[float] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    has_more: bool
+    results: List[SearchHitResponse]
+
+
+@router.get("", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None, description="project, issue, comment; all by default"),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=500),
+    page: int = Query(1, ge=1, le=MAX_PAGE),
+    page_size: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Projects, issues and comments matching every word of q, most relevant first"""
+    if types is not None:
+        unknown = set(types) - set(DOC_TYPES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестный тип: {', '.join(sorted(unknown))}")
+    if (lat is None) != (lon is None) or (radius_km is not None and lat is None):
+        raise HTTPException(status_code=400, detail="Для поиска по радиусу нужны lat, lon и radius_km")
+
+    found = search_index.search(
+        db.connection(), q, types=types or DOC_TYPES, latitude=lat, longitude=lon,
+        radius_km=radius_km, page=page, page_size=page_size
+    )
+    return SearchResponse(
+        query=q,
+        page=found.page,
+        page_size=found.page_size,
+        has_more=found.has_more,
+        results=[
+            SearchHitResponse(
+                type=hit.doc_type,
+                id=hit.doc_id,
+                project_id=hit.project_id,
+                title=hit.title,
+                snippet=hit.snippet,
+                score=hit.score,
+                distance_km=hit.distance_km
+            )
+            for hit in found.hits
+        ]
+    )
@@ -6,7 +6,7 @@ import crud
 from models import UserResponse, UserUpdate
 from database import get_db
 from routes.auth import get_current_user
-from auth import verify_password
+from auth import verify_password_async
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
@@ -45,7 +45,7 @@ async def update_profile(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Old password required to change password"
             )
-        if not verify_password(user_update.old_password, current_user.password_hash):
+        if not await verify_password_async(user_update.old_password, current_user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect current password"
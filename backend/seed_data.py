@@ -157,10 +157,8 @@ def seed_database():
             },
         ]
         
-        for project_data in projects_data:
-            project = ProjectDB(**project_data)
-            db.add(project)
-        
+        # Through the ORM so the search hooks registered by crud index them
+        db.add_all([ProjectDB(**project_data) for project_data in projects_data])
         db.commit()
         print(f"[OK] {len(projects_data)} sample projects created successfully")
         
@@ -2,6 +2,8 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import func, insert
+
 from database import SessionLocal
 from models import DeliveryDB, ProjectDB
 from datetime import datetime
@@ -9,30 +11,34 @@ from datetime import datetime
 def seed_deliveries():
     db = SessionLocal()
     try:
-        projects = db.query(ProjectDB).filter(ProjectDB.owner_id != None).limit(10).all()
+        project_ids = [
+            project_id for (project_id,) in
+            db.query(ProjectDB.id).filter(ProjectDB.owner_id != None).limit(10)
+        ]
         
-        if not projects:
+        if not project_ids:
             print("No projects found to create deliveries")
             return
         
-        existing_deliveries = db.query(DeliveryDB).count()
+        existing_deliveries = db.query(func.count(DeliveryDB.id)).scalar()
         print(f"Existing deliveries: {existing_deliveries}")
         
-        for project in projects:
-            existing = db.query(DeliveryDB).filter(DeliveryDB.project_id == project.id).first()
-            if not existing:
-                delivery = DeliveryDB(
-                    project_id=project.id,
-                    status="pending",
-                    created_at=datetime.utcnow()
-                )
-                db.add(delivery)
+        with_delivery = {
+            project_id for (project_id,) in
+            db.query(DeliveryDB.project_id).filter(DeliveryDB.project_id.in_(project_ids)).distinct()
+        }
+        now = datetime.utcnow()
+        new_rows = [
+            {"project_id": project_id, "status": "pending", "created_at": now}
+            for project_id in project_ids if project_id not in with_delivery
+        ]
+        if new_rows:
+            db.execute(insert(DeliveryDB), new_rows)
         
         db.commit()
         print(f"Deliveries created successfully")
         
-        deliveries = db.query(DeliveryDB).all()
-        print(f"Total deliveries in DB: {len(deliveries)}")
+        print(f"Total deliveries in DB: {db.query(func.count(DeliveryDB.id)).scalar()}")
         
     except Exception as e:
         print(f"Error: {e}")
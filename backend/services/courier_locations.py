@@ -0,0 +1,163 @@
+"""
+Courier location store
+Recent positions per courier, kept in process memory so location pings never
+touch the database. Each courier has a fixed-size ring buffer backed by a
+flat array of doubles (timestamp, latitude, longitude), so memory is bounded
+by capacity x couriers and an append is a few slot writes. Positions older
+than the TTL count as offline for matching; whole tracks are dropped once
+they have been silent for the retention period.
+"""
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from database import settings
+
+DEFAULT_LOCATION_TTL_SECONDS = 120.0
+DEFAULT_TRACK_CAPACITY = 360
+DEFAULT_RETENTION_SECONDS = 3600.0
+
+# (recorded_at, latitude, longitude)
+TrackPoint = Tuple[float, float, float]
+
+
+@dataclass(frozen=True)
+class CourierPosition:
+    courier_id: int
+    latitude: float
+    longitude: float
+    recorded_at: float  # time.time() seconds
+
+
+class LocationTrack:
+    """Ring buffer of the last `capacity` points, oldest overwritten first"""
+
+    __slots__ = ("capacity", "_data", "_next", "_count")
+
+    def __init__(self, capacity: int = DEFAULT_TRACK_CAPACITY):
+        self.capacity = capacity
+        self._data = array("d", bytes(8 * 3 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, recorded_at: float, latitude: float, longitude: float) -> bool:
+        """Store a point; points older than the latest one are dropped"""
+        if self._count and recorded_at < self._data[self._slot(self._count - 1)]:
+            return False
+        offset = self._next * 3
+        self._data[offset] = recorded_at
+        self._data[offset + 1] = latitude
+        self._data[offset + 2] = longitude
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        return True
+
+    def _slot(self, age_index: int) -> int:
+        """Array offset of the age_index-th oldest point"""
+        start = (self._next - self._count) % self.capacity
+        return ((start + age_index) % self.capacity) * 3
+
+    def latest(self) -> Optional[TrackPoint]:
+        if not self._count:
+            return None
+        offset = self._slot(self._count - 1)
+        return self._data[offset], self._data[offset + 1], self._data[offset + 2]
+
+    def points(self, since: Optional[float] = None, limit: Optional[int] = None) -> List[TrackPoint]:
+        """Points oldest first, optionally only those after `since` and only the last `limit`"""
+        data = self._data
+        result = []
+        for index in range(self._count):
+            offset = self._slot(index)
+            if since is not None and data[offset] <= since:
+                continue
+            result.append((data[offset], data[offset + 1], data[offset + 2]))
+        if limit is not None:
+            result = result[-limit:] if limit > 0 else []
+        return result
+
+
+class CourierLocationStore:
+    """Thread-safe map of courier_id -> recent track"""
+
+    def __init__(self, ttl_seconds: float = DEFAULT_LOCATION_TTL_SECONDS,
+                 capacity: int = DEFAULT_TRACK_CAPACITY,
+                 retention_seconds: float = DEFAULT_RETENTION_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        self.retention_seconds = retention_seconds
+        self._tracks: Dict[int, LocationTrack] = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.time()
+
+    def update(self, courier_id: int, latitude: float, longitude: float,
+               recorded_at: Optional[float] = None) -> CourierPosition:
+        """Record a ping and return the courier's latest position"""
+        now = time.time()
+        # Client clocks run ahead; a future timestamp would freeze the track
+        recorded_at = min(recorded_at, now) if recorded_at is not None else now
+        with self._lock:
+            track = self._tracks.get(courier_id)
+            if track is None:
+                track = self._tracks[courier_id] = LocationTrack(self.capacity)
+            track.append(recorded_at, latitude, longitude)
+            latest = track.latest()
+        # Silent tracks are swept at most once per retention period
+        if now - self._last_prune > self.retention_seconds:
+            self.prune(now)
+        return CourierPosition(courier_id, latest[1], latest[2], latest[0])
+
+    def get(self, courier_id: int, now: Optional[float] = None) -> Optional[CourierPosition]:
+        """Last position, or None if unknown or stale"""
+        track = self._tracks.get(courier_id)
+        latest = track.latest() if track is not None else None
+        now = now if now is not None else time.time()
+        if latest is None or now - latest[0] > self.ttl_seconds:
+            return None
+        return CourierPosition(courier_id, latest[1], latest[2], latest[0])
+
+    def track(self, courier_id: int, since: Optional[float] = None,
+              limit: Optional[int] = None) -> List[TrackPoint]:
+        """Recent points for replay, oldest first"""
+        with self._lock:
+            track = self._tracks.get(courier_id)
+            return track.points(since, limit) if track is not None else []
+
+    def active(self, now: Optional[float] = None) -> Dict[int, CourierPosition]:
+        """Snapshot of couriers that reported within the TTL"""
+        now = now if now is not None else time.time()
+        active = {}
+        with self._lock:
+            for courier_id, track in self._tracks.items():
+                latest = track.latest()
+                if latest is not None and now - latest[0] <= self.ttl_seconds:
+                    active[courier_id] = CourierPosition(courier_id, latest[1], latest[2], latest[0])
+        return active
+
+    def remove(self, courier_id: int):
+        with self._lock:
+            self._tracks.pop(courier_id, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop tracks silent for longer than the retention; returns how many"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._last_prune = now
+            silent = [courier_id for courier_id, track in self._tracks.items()
+                      if now - track.latest()[0] > self.retention_seconds]
+            for courier_id in silent:
+                del self._tracks[courier_id]
+        return len(silent)
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+
+# Global singleton instance
+courier_locations = CourierLocationStore(capacity=settings.courier_track_capacity)
@@ -0,0 +1,298 @@
+"""
+Courier matching service
+Pairs couriers who recently pinged their location with pending deliveries
+so that the total pickup distance is minimal, and holds the result as
+short-lived offers. A periodic batch solves the assignment optimally over
+each courier's nearest candidates; between batches a courier without an
+offer gets the nearest delivery nobody else was offered, straight from the
+spatial index. Offers are advisory: accepting one still goes through the
+dispatch engine, which settles any race.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import DeliveryDB, ProjectDB
+from services.assignment import greedy_assign, min_cost_assignment
+from services.courier_locations import CourierLocationStore, CourierPosition, courier_locations
+from services.geo import bounding_box
+from services.geo_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANDIDATES = 24
+DEFAULT_MAX_PICKUP_KM = 15.0
+DEFAULT_OFFER_TTL_SECONDS = 60.0
+# Oldest pending deliveries considered per batch
+MAX_PENDING_PER_RUN = 20000
+# Above this many candidate edges a batch falls back to greedy matching
+OPTIMAL_EDGE_LIMIT = 200000
+
+
+@dataclass(frozen=True)
+class PendingDelivery:
+    delivery_id: int
+    project_id: int
+    latitude: float
+    longitude: float
+
+
+@dataclass(frozen=True)
+class DeliveryOffer:
+    courier_id: int
+    delivery_id: int
+    project_id: int
+    latitude: float
+    longitude: float
+    distance_km: float
+    expires_at: float
+
+    def as_pending(self) -> PendingDelivery:
+        return PendingDelivery(self.delivery_id, self.project_id, self.latitude, self.longitude)
+
+
+@dataclass
+class MatchSummary:
+    strategy: str
+    couriers: int
+    deliveries: int
+    offers: int
+    total_km: float
+    elapsed_ms: float
+
+
+def match_couriers(couriers: Sequence[CourierPosition], deliveries: Sequence[PendingDelivery],
+                   strategy: str = "auto", candidates: int = DEFAULT_CANDIDATES,
+                   max_pickup_km: Optional[float] = DEFAULT_MAX_PICKUP_KM
+                   ) -> Tuple[str, List[Tuple[CourierPosition, PendingDelivery, float]]]:
+    """
+    Pair couriers with deliveries, at most one delivery per courier.
+
+    "optimal" minimises total pickup distance over each node's `candidates`
+    nearest counterparts; "greedy" gives the longest-waiting courier the
+    nearest free delivery; "auto" picks optimal unless the candidate graph
+    would exceed OPTIMAL_EDGE_LIMIT. Returns the strategy used and
+    (courier, delivery, distance_km) triples.
+    """
+    if not couriers or not deliveries:
+        return strategy, []
+
+    if strategy == "auto":
+        smaller = min(len(couriers), len(deliveries))
+        strategy = "optimal" if smaller * candidates <= OPTIMAL_EDGE_LIMIT else "greedy"
+
+    if strategy == "greedy":
+        index = GridIndex.build((j, d.latitude, d.longitude) for j, d in enumerate(deliveries))
+        waiting = sorted(range(len(couriers)), key=lambda i: couriers[i].recorded_at)
+        requests = [(i, couriers[i].latitude, couriers[i].longitude) for i in waiting]
+        return strategy, [
+            (couriers[i], deliveries[j], distance)
+            for i, j, distance in greedy_assign(requests, index, max_km=max_pickup_km)
+        ]
+
+    # Solve from the smaller side so every node gets its nearest candidates
+    couriers_left = len(couriers) <= len(deliveries)
+    left = couriers if couriers_left else deliveries
+    right = deliveries if couriers_left else couriers
+
+    index = GridIndex.build(((j, p.latitude, p.longitude) for j, p in enumerate(right)), per_cell=candidates)
+    edges = [
+        [(j, int(distance * 1000)) for distance, j in
+         index.nearest(point.latitude, point.longitude, k=candidates, max_km=max_pickup_km)]
+        for point in left
+    ]
+    match = min_cost_assignment(edges, len(right))
+
+    pairs = []
+    for i, j in enumerate(match):
+        if j < 0:
+            continue
+        distance = next(cost for right_index, cost in edges[i] if right_index == j) / 1000
+        courier, delivery = (left[i], right[j]) if couriers_left else (right[j], left[i])
+        pairs.append((courier, delivery, distance))
+    return strategy, pairs
+
+
+class CourierMatcher:
+    """Periodic batch matching plus on-demand greedy offers"""
+
+    def __init__(self, locations: CourierLocationStore = courier_locations,
+                 candidates: int = DEFAULT_CANDIDATES,
+                 max_pickup_km: float = DEFAULT_MAX_PICKUP_KM,
+                 offer_ttl_seconds: float = DEFAULT_OFFER_TTL_SECONDS):
+        self.locations = locations
+        self.candidates = candidates
+        self.max_pickup_km = max_pickup_km
+        self.offer_ttl_seconds = offer_ttl_seconds
+        self.last_run: Optional[MatchSummary] = None
+        self._offers: Dict[int, DeliveryOffer] = {}   # courier_id -> offer
+        self._offered: Dict[int, int] = {}            # delivery_id -> courier_id
+        # Pending deliveries from the last batch that nobody is offered
+        self._open = GridIndex()
+        self._open_rows: Dict[int, PendingDelivery] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def load_pending(self, db: Session, couriers: Sequence[CourierPosition]) -> List[PendingDelivery]:
+        """Oldest pending deliveries within pickup range of any active courier"""
+        if not couriers:
+            return []
+        boxes = [bounding_box(c.latitude, c.longitude, self.max_pickup_km) for c in couriers]
+        rows = db.execute(
+            select(DeliveryDB.id, DeliveryDB.project_id, ProjectDB.latitude, ProjectDB.longitude)
+            .join(ProjectDB, ProjectDB.id == DeliveryDB.project_id)
+            .where(
+                DeliveryDB.status == "pending",
+                ProjectDB.latitude.between(min(b[0] for b in boxes), max(b[1] for b in boxes)),
+                ProjectDB.longitude.between(min(b[2] for b in boxes), max(b[3] for b in boxes))
+            )
+            .order_by(DeliveryDB.id)
+            .limit(MAX_PENDING_PER_RUN)
+        ).all()
+        return [PendingDelivery(row.id, row.project_id, row.latitude, row.longitude) for row in rows]
+
+    def run(self, db: Session, strategy: str = "auto") -> MatchSummary:
+        """Match every active courier without an offer to a free pending delivery"""
+        started = time.perf_counter()
+        now = time.time()
+        active = self.locations.active(now)
+        deliveries = self.load_pending(db, list(active.values()))
+        with self._lock:
+            offered_ids = set(self._offered)
+        still_pending = set(db.execute(
+            select(DeliveryDB.id).where(DeliveryDB.id.in_(list(offered_ids)), DeliveryDB.status == "pending")
+        ).scalars()) if offered_ids else set()
+
+        with self._lock:
+            self._expire(now)
+            # Offers whose delivery went to someone else in the meantime are void
+            for offer in list(self._offers.values()):
+                if offer.delivery_id not in still_pending and offer.delivery_id in offered_ids:
+                    self._drop(offer)
+            couriers = [p for p in active.values() if p.courier_id not in self._offers]
+            free = [d for d in deliveries if d.delivery_id not in self._offered]
+
+        used, pairs = match_couriers(couriers, free, strategy, self.candidates, self.max_pickup_km)
+
+        offered = []
+        with self._lock:
+            for courier, delivery, distance in pairs:
+                # A courier may have grabbed an on-demand offer while we solved
+                if courier.courier_id in self._offers or delivery.delivery_id in self._offered:
+                    continue
+                offered.append(self._store(courier.courier_id, delivery, distance, now))
+            self._open_rows = {d.delivery_id: d for d in free if d.delivery_id not in self._offered}
+            self._open = GridIndex.build(
+                (d.delivery_id, d.latitude, d.longitude) for d in self._open_rows.values()
+            )
+
+        summary = MatchSummary(
+            strategy=used,
+            couriers=len(couriers),
+            deliveries=len(free),
+            offers=len(offered),
+            total_km=round(sum(offer.distance_km for offer in offered), 3),
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+        )
+        self.last_run = summary
+        return summary
+
+    def offer_for(self, courier_id: int, now: Optional[float] = None) -> Optional[DeliveryOffer]:
+        """Current offer for the courier, or the nearest open delivery if none"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            offer = self._offers.get(courier_id)
+            if offer is not None and offer.expires_at > now:
+                return offer
+            if offer is not None:
+                self._release_offer(offer)
+
+            position = self.locations.get(courier_id, now)
+            if position is None:
+                return None
+            nearest = self._open.nearest(position.latitude, position.longitude, k=1,
+                                         max_km=self.max_pickup_km)
+            if not nearest:
+                return None
+            distance, delivery_id = nearest[0]
+            return self._store(courier_id, self._open_rows[delivery_id], distance, now)
+
+    def release(self, delivery_id: int):
+        """Forget a delivery that has been claimed"""
+        with self._lock:
+            courier_id = self._offered.get(delivery_id)
+            if courier_id is not None:
+                self._drop(self._offers[courier_id])
+            self._open.remove(delivery_id)
+            self._open_rows.pop(delivery_id, None)
+
+    def _store(self, courier_id: int, delivery: PendingDelivery, distance: float, now: float) -> DeliveryOffer:
+        offer = DeliveryOffer(
+            courier_id=courier_id,
+            delivery_id=delivery.delivery_id,
+            project_id=delivery.project_id,
+            latitude=delivery.latitude,
+            longitude=delivery.longitude,
+            distance_km=round(distance, 3),
+            expires_at=now + self.offer_ttl_seconds
+        )
+        self._offers[courier_id] = offer
+        self._offered[delivery.delivery_id] = courier_id
+        self._open.remove(delivery.delivery_id)
+        self._open_rows.pop(delivery.delivery_id, None)
+        return offer
+
+    def _drop(self, offer: DeliveryOffer):
+        self._offers.pop(offer.courier_id, None)
+        self._offered.pop(offer.delivery_id, None)
+
+    def _release_offer(self, offer: DeliveryOffer):
+        """Drop an expired offer and put its delivery back up for grabs"""
+        self._drop(offer)
+        delivery = offer.as_pending()
+        self._open.insert(delivery.delivery_id, delivery.latitude, delivery.longitude)
+        self._open_rows[delivery.delivery_id] = delivery
+
+    def _expire(self, now: float):
+        for offer in [o for o in self._offers.values() if o.expires_at <= now]:
+            self._release_offer(offer)
+
+    def start(self, interval_seconds: float):
+        """Run batch matching every interval_seconds on a background thread"""
+        if interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, args=(interval_seconds,),
+                                        name="courier-matcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run_forever(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            if not self.locations.active():
+                continue
+            db = SessionLocal()
+            try:
+                summary = self.run(db)
+                logger.debug("Courier matching: %s", summary)
+            except Exception:
+                logger.exception("Courier matching run failed")
+            finally:
+                db.close()
+
+
+# Global singleton instance
+courier_matcher = CourierMatcher()
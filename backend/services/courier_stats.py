@@ -0,0 +1,283 @@
+"""
+Courier statistics
+Every completed delivery is folded into pre-aggregated rows, one per courier
+(plus courier_id 0 for everyone) for all time, its ISO week and its day:
+count, Welford mean and variance of delivery time, a t-digest for time
+percentiles and rating sums. Aggregates are mergeable, so a single delivery
+and a rebuilt batch go through the same path. Rows are updated with a
+compare-and-swap on their version column, so concurrent workers never lose
+an update; read endpoints only touch these rows, never the deliveries table.
+"""
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import CourierStatsDB, UserDB
+from services.tdigest import TDigest
+
+logger = logging.getLogger(__name__)
+
+ALL_COURIERS = 0
+PERIODS = ("all", "week", "day")
+ALL_TIME = date(1970, 1, 1)
+MAX_CAS_ATTEMPTS = 10
+
+# (courier_id, period, window_start)
+StatsKey = Tuple[int, str, date]
+
+
+def window_start(period: str, at: datetime) -> date:
+    """First day of the window of the given period containing `at`"""
+    if period == "all":
+        return ALL_TIME
+    day = at.date()
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "day":
+        return day
+    raise ValueError(f"Unknown stats period: {period}")
+
+
+@dataclass
+class Aggregate:
+    """Mergeable summary of a set of completed deliveries"""
+    deliveries: int = 0
+    time_mean: float = 0.0
+    time_m2: float = 0.0
+    time_min: Optional[float] = None
+    time_max: Optional[float] = None
+    digest: TDigest = field(default_factory=TDigest)
+    rating_count: int = 0
+    rating_sum: float = 0.0
+
+    @classmethod
+    def single(cls, delivery_time_minutes: Optional[float], rating: Optional[float]) -> "Aggregate":
+        aggregate = cls(deliveries=1)
+        if delivery_time_minutes is not None:
+            aggregate.time_mean = float(delivery_time_minutes)
+            aggregate.time_min = aggregate.time_max = float(delivery_time_minutes)
+            aggregate.digest.add(float(delivery_time_minutes))
+        if rating is not None:
+            aggregate.rating_count = 1
+            aggregate.rating_sum = float(rating)
+        return aggregate
+
+    @property
+    def timed(self) -> int:
+        """Deliveries that reported a delivery time"""
+        return int(self.digest.total)
+
+    def merge(self, other: "Aggregate"):
+        # Chan et al. pairwise update of mean and M2 over the timed deliveries
+        n_a, n_b = self.timed, other.timed
+        if n_b:
+            n = n_a + n_b
+            delta = other.time_mean - self.time_mean
+            self.time_mean += delta * n_b / n
+            self.time_m2 += other.time_m2 + delta * delta * n_a * n_b / n
+            self.time_min = other.time_min if self.time_min is None else min(self.time_min, other.time_min)
+            self.time_max = other.time_max if self.time_max is None else max(self.time_max, other.time_max)
+            self.digest.merge(other.digest)
+        self.deliveries += other.deliveries
+        self.rating_count += other.rating_count
+        self.rating_sum += other.rating_sum
+
+    @property
+    def time_stddev(self) -> Optional[float]:
+        if self.timed < 2:
+            return None
+        return math.sqrt(self.time_m2 / (self.timed - 1))
+
+    @property
+    def rating_avg(self) -> Optional[float]:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def summary(self) -> dict:
+        quantile = self.digest.quantile
+        return {
+            "deliveries": self.deliveries,
+            "avg_time_minutes": round(self.time_mean, 2) if self.timed else None,
+            "stddev_time_minutes": _round(self.time_stddev),
+            "min_time_minutes": self.time_min,
+            "max_time_minutes": self.time_max,
+            "p50_time_minutes": _round(quantile(0.5)),
+            "p90_time_minutes": _round(quantile(0.9)),
+            "p99_time_minutes": _round(quantile(0.99)),
+            "avg_rating": _round(self.rating_avg),
+            "ratings": self.rating_count,
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "Aggregate":
+        return cls(
+            deliveries=row.deliveries,
+            time_mean=row.time_mean,
+            time_m2=row.time_m2,
+            time_min=row.time_min,
+            time_max=row.time_max,
+            digest=TDigest.from_bytes(row.time_digest),
+            rating_count=row.rating_count,
+            rating_sum=row.rating_sum,
+        )
+
+    def row_values(self) -> dict:
+        return {
+            "deliveries": self.deliveries,
+            "time_mean": self.time_mean,
+            "time_m2": self.time_m2,
+            "time_min": self.time_min,
+            "time_max": self.time_max,
+            "time_digest": self.digest.to_bytes() if self.timed else None,
+            "rating_count": self.rating_count,
+            "rating_sum": self.rating_sum,
+        }
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def keys_for(courier_id: int, completed_at: datetime) -> List[StatsKey]:
+    """Every aggregate row a delivery completed at `completed_at` contributes to"""
+    return [
+        (owner, period, window_start(period, completed_at))
+        for owner in (courier_id, ALL_COURIERS)
+        for period in PERIODS
+    ]
+
+
+def _key_filter(key: StatsKey):
+    courier_id, period, start = key
+    return and_(
+        CourierStatsDB.courier_id == courier_id,
+        CourierStatsDB.period == period,
+        CourierStatsDB.window_start == start,
+    )
+
+
+def _ensure_row(db: Session, key: StatsKey):
+    values = {"courier_id": key[0], "period": key[1], "window_start": key[2], "version": 0}
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(sqlite.insert(CourierStatsDB).values(**values).on_conflict_do_nothing())
+    elif dialect == "postgresql":
+        db.execute(postgresql.insert(CourierStatsDB).values(**values).on_conflict_do_nothing())
+    elif db.get(CourierStatsDB, key) is None:
+        db.execute(insert(CourierStatsDB).values(**values))
+
+
+def merge_into(db: Session, key: StatsKey, delta: Aggregate) -> Aggregate:
+    """
+    Atomically fold delta into the aggregate row for key and return the result.
+
+    Read, merge in Python, then UPDATE ... WHERE version = <read version>; a
+    concurrent writer makes the UPDATE match nothing and we retry on fresh data.
+    """
+    _ensure_row(db, key)
+    for _ in range(MAX_CAS_ATTEMPTS):
+        row = db.execute(select(CourierStatsDB.__table__).where(_key_filter(key))).one()
+        merged = Aggregate.from_row(row)
+        merged.merge(delta)
+        swapped = db.execute(
+            update(CourierStatsDB)
+            .where(_key_filter(key), CourierStatsDB.version == row.version)
+            .values(**merged.row_values(), version=row.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if swapped.rowcount == 1:
+            return merged
+    raise RuntimeError(f"Courier stats row {key} is too contended, giving up after {MAX_CAS_ATTEMPTS} attempts")
+
+
+def apply(db: Session, deltas: Dict[StatsKey, Aggregate]):
+    """
+    Merge per-key deltas and refresh the denormalised courier fields on users
+    from the all-time rows. Runs in the caller's transaction.
+    """
+    # Fixed key order keeps concurrent writers from deadlocking on each other
+    for key in sorted(deltas, key=lambda k: (k[0], k[1], k[2])):
+        merged = merge_into(db, key, deltas[key])
+        courier_id, period, _ = key
+        if period == "all" and courier_id != ALL_COURIERS:
+            db.execute(
+                update(UserDB)
+                .where(UserDB.id == courier_id)
+                .values(
+                    courier_deliveries=merged.deliveries,
+                    courier_rating=merged.rating_avg if merged.rating_avg is not None else 5.0,
+                    courier_avg_delivery_time=merged.time_mean
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+
+def record_delivery(db: Session, courier_id: int, delivery_time_minutes: Optional[float],
+                    rating: Optional[float], completed_at: datetime):
+    """Fold one completed delivery into all of its aggregates"""
+    apply(db, {
+        key: Aggregate.single(delivery_time_minutes, rating)
+        for key in keys_for(courier_id, completed_at)
+    })
+
+
+def aggregate_deliveries(rows: Iterable) -> Dict[StatsKey, Aggregate]:
+    """Pre-merge (courier_id, delivery_time_minutes, rating, completed_at) rows by key"""
+    deltas: Dict[StatsKey, Aggregate] = {}
+    for courier_id, delivery_time_minutes, rating, completed_at in rows:
+        single = Aggregate.single(delivery_time_minutes, rating)
+        for key in keys_for(courier_id, completed_at):
+            deltas.setdefault(key, Aggregate()).merge(single)
+    return deltas
+
+
+# ---------- reads ----------
+
+def get_window(db: Session, courier_id: int, period: str, start: date) -> Optional[Aggregate]:
+    row = db.execute(
+        select(CourierStatsDB.__table__).where(_key_filter((courier_id, period, start)))
+    ).first()
+    return Aggregate.from_row(row) if row else None
+
+
+def get_history(db: Session, courier_id: int, period: str, windows: int) -> List[Tuple[date, Aggregate]]:
+    """Most recent `windows` aggregates for the courier, newest first"""
+    rows = db.execute(
+        select(CourierStatsDB.__table__)
+        .where(CourierStatsDB.courier_id == courier_id, CourierStatsDB.period == period)
+        .order_by(CourierStatsDB.window_start.desc())
+        .limit(windows)
+    ).all()
+    return [(row.window_start, Aggregate.from_row(row)) for row in rows]
+
+
+def leaderboard(db: Session, period: str, start: date, metric: str = "deliveries",
+                limit: int = 20, min_deliveries: int = 1) -> List[Tuple[int, str, Aggregate]]:
+    """Top couriers of one window as (courier_id, name, aggregate)"""
+    order = {
+        "deliveries": (CourierStatsDB.deliveries.desc(),),
+        "rating": ((CourierStatsDB.rating_sum / CourierStatsDB.rating_count).desc(),
+                   CourierStatsDB.deliveries.desc()),
+        "speed": (CourierStatsDB.time_mean.asc(), CourierStatsDB.deliveries.desc()),
+    }[metric]
+    query = (
+        select(CourierStatsDB.__table__, UserDB.name)
+        .join(UserDB, UserDB.id == CourierStatsDB.courier_id)
+        .where(
+            CourierStatsDB.period == period,
+            CourierStatsDB.window_start == start,
+            CourierStatsDB.courier_id != ALL_COURIERS,
+            CourierStatsDB.deliveries >= min_deliveries,
+        )
+    )
+    if metric == "rating":
+        query = query.where(CourierStatsDB.rating_count > 0)
+    if metric == "speed":
+        query = query.where(CourierStatsDB.time_digest.isnot(None))
+    rows = db.execute(query.order_by(*order, CourierStatsDB.courier_id).limit(limit)).all()
+    return [(row.courier_id, row.name, Aggregate.from_row(row)) for row in rows]
@@ -0,0 +1,163 @@
+"""
+Delivery dispatch engine
+Couriers claim deliveries with a single conditional UPDATE, so exactly one
+of any number of concurrent claimants wins. Batch claims pick the nearest
+pending deliveries; on PostgreSQL candidates are locked with
+FOR UPDATE SKIP LOCKED so competing couriers skip each other's rows instead
+of queueing behind them.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, exists, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from models import DeliveryDB, ProjectDB
+from services.geo import bounding_box, distance_key_sql, km_to_distance_key
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_CLAIM = 20
+MAX_CLAIM_ROUNDS = 5
+
+
+@dataclass
+class ClaimResult:
+    """Outcome of a single claim; courier_id is whoever holds the delivery"""
+    delivery_id: int
+    won: bool
+    found: bool = True
+    courier_id: Optional[int] = None
+    status: Optional[str] = None
+
+
+@dataclass
+class BatchClaimResult:
+    courier_id: int
+    delivery_ids: List[int] = field(default_factory=list)
+    contended: int = 0
+
+
+class DispatchEngine:
+    """Race-free claiming of pending deliveries"""
+
+    def claim(self, db: Session, delivery_id: int, courier_id: int) -> ClaimResult:
+        """
+        Atomically assign a pending delivery to the courier.
+
+        The UPDATE only matches while the row is still pending, so the
+        database decides the winner; losers read back who holds it.
+        """
+        claimed = db.execute(
+            update(DeliveryDB)
+            .where(DeliveryDB.id == delivery_id, DeliveryDB.status == "pending")
+            .values(status="accepted", courier_id=courier_id, accepted_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return ClaimResult(delivery_id=delivery_id, won=True, courier_id=courier_id, status="accepted")
+
+        current = db.execute(
+            select(DeliveryDB.courier_id, DeliveryDB.status).where(DeliveryDB.id == delivery_id)
+        ).first()
+        if current is None:
+            return ClaimResult(delivery_id=delivery_id, won=False, found=False)
+        return ClaimResult(delivery_id=delivery_id, won=False,
+                           courier_id=current.courier_id, status=current.status)
+
+    def claim_nearest(self, db: Session, courier_id: int, latitude: float, longitude: float,
+                      count: int = 1, radius_km: Optional[float] = None) -> BatchClaimResult:
+        """
+        Claim up to count pending deliveries nearest to the courier.
+
+        Each round selects exactly the number still needed and claims them
+        with one conditional UPDATE; rows taken by someone else in between
+        simply do not match and the next round looks further out.
+        """
+        count = max(1, min(count, MAX_BATCH_CLAIM))
+        result = BatchClaimResult(courier_id=courier_id)
+        postgres = db.get_bind().dialect.name == "postgresql"
+
+        for _ in range(MAX_CLAIM_ROUNDS):
+            needed = count - len(result.delivery_ids)
+            if needed <= 0:
+                break
+
+            candidates = self._nearest_pending_query(latitude, longitude, radius_km, needed)
+            if postgres:
+                candidates = candidates.with_for_update(of=DeliveryDB, skip_locked=True)
+            candidate_ids = db.execute(candidates).scalars().all()
+            if not candidate_ids:
+                db.rollback()
+                break
+
+            won = db.execute(
+                update(DeliveryDB)
+                .where(DeliveryDB.id.in_(candidate_ids), DeliveryDB.status == "pending")
+                .values(status="accepted", courier_id=courier_id, accepted_at=datetime.utcnow())
+                .returning(DeliveryDB.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+
+            result.delivery_ids.extend(won)
+            result.contended += len(candidate_ids) - len(won)
+
+        return result
+
+    def claim_for_project(self, db: Session, project_id: int, courier_id: int) -> ClaimResult:
+        """
+        Claim the order for a project, opening a pending delivery first if the
+        project has none yet, so retries do not multiply deliveries.
+
+        Under READ COMMITTED two couriers could both pass the NOT EXISTS check
+        of the conditional insert, so on PostgreSQL the project row is locked
+        first and the second courier's check waits for the first to commit.
+        SQLite runs the INSERT ... SELECT under its database write lock.
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(select(ProjectDB.id).where(ProjectDB.id == project_id).with_for_update())
+        db.execute(
+            insert(DeliveryDB).from_select(
+                ["project_id", "status", "created_at"],
+                select(literal(project_id), literal("pending"), literal(datetime.utcnow()))
+                .where(~exists().where(DeliveryDB.project_id == project_id))
+            )
+        )
+        db.commit()
+
+        delivery_id = db.execute(
+            select(DeliveryDB.id)
+            .where(DeliveryDB.project_id == project_id)
+            .order_by((DeliveryDB.status != "pending"), DeliveryDB.id)
+            .limit(1)
+        ).scalar()
+        return self.claim(db, delivery_id, courier_id)
+
+    def _nearest_pending_query(self, latitude: float, longitude: float,
+                               radius_km: Optional[float], limit: int):
+        distance_key = distance_key_sql(ProjectDB.latitude, ProjectDB.longitude, latitude, longitude)
+        query = (
+            select(DeliveryDB.id)
+            .join(ProjectDB, ProjectDB.id == DeliveryDB.project_id)
+            .where(
+                DeliveryDB.status == "pending",
+                ProjectDB.latitude.isnot(None),
+                ProjectDB.longitude.isnot(None)
+            )
+        )
+        if radius_km is not None:
+            min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+            query = query.where(and_(
+                ProjectDB.latitude.between(min_lat, max_lat),
+                ProjectDB.longitude.between(min_lon, max_lon),
+                distance_key <= km_to_distance_key(radius_km)
+            ))
+        return query.order_by(distance_key, DeliveryDB.id).limit(limit)
+
+
+# Global singleton instance
+dispatch_engine = DispatchEngine()
@@ -0,0 +1,216 @@
+"""
+In-memory spatial index
+Uniform lat/lon grid with ring-by-ring nearest-neighbour search. Points are
+bucketed into cells of roughly cell_km on a side; a k-nearest query scans
+rings of cells outward from the query point and stops once no unscanned
+cell can hold anything closer than the k-th best found so far. Once the
+rings would cover more cells than are occupied, the occupied cells left are
+visited directly instead, so a search with no distance limit reaches points
+however far away they are without walking every empty ring in between.
+Distances are equirectangular, like services.geo's SQL ordering key.
+"""
+import heapq
+import math
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from services.geo import KM_PER_DEGREE
+
+DEFAULT_CELL_KM = 1.0
+MIN_CELL_KM = 0.05
+MAX_CELL_KM = 10.0
+
+
+class GridIndex:
+    """Grid index over (latitude, longitude) points keyed by any hashable id"""
+
+    def __init__(self, cell_km: float = DEFAULT_CELL_KM, ref_latitude: float = 55.75):
+        self.cell_km = cell_km
+        self.cell_lat = cell_km / KM_PER_DEGREE
+        self.cell_lon = self.cell_lat / max(math.cos(math.radians(ref_latitude)), 1e-6)
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = defaultdict(set)
+        self._points: Dict[Hashable, Tuple[float, float, Tuple[int, int]]] = {}
+
+    @classmethod
+    def build(cls, points: Iterable[Tuple[Hashable, float, float]], per_cell: int = 16) -> "GridIndex":
+        """
+        Index (key, latitude, longitude) points with the cell size fitted to
+        their density, so a typical point shares its cell with about
+        per_cell others whether the data is one dense district or a country.
+        """
+        points = list(points)
+        if not points:
+            return cls()
+        ref_latitude = sum(point[1] for point in points) / len(points)
+        index = cls(ref_latitude=ref_latitude)
+        for key, latitude, longitude in points:
+            index.insert(key, latitude, longitude)
+
+        # Average size of the cell a random point falls into
+        occupancy = sum(len(bucket) ** 2 for bucket in index._cells.values()) / len(points)
+        if per_cell / 2 <= occupancy <= per_cell * 2:
+            return index
+        cell_km = min(max(index.cell_km * math.sqrt(per_cell / occupancy), MIN_CELL_KM), MAX_CELL_KM)
+        fitted = cls(cell_km=cell_km, ref_latitude=ref_latitude)
+        for key, latitude, longitude in points:
+            fitted.insert(key, latitude, longitude)
+        return fitted
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._points
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_lat), math.floor(longitude / self.cell_lon)
+
+    def insert(self, key: Hashable, latitude: float, longitude: float):
+        """Add a point, moving it if the key is already indexed"""
+        if key in self._points:
+            self.remove(key)
+        cell = self._cell(latitude, longitude)
+        self._cells[cell].add(key)
+        self._points[key] = (latitude, longitude, cell)
+
+    def remove(self, key: Hashable) -> bool:
+        point = self._points.pop(key, None)
+        if point is None:
+            return False
+        bucket = self._cells[point[2]]
+        bucket.discard(key)
+        if not bucket:
+            del self._cells[point[2]]
+        return True
+
+    def position(self, key: Hashable) -> Optional[Tuple[float, float]]:
+        point = self._points.get(key)
+        return (point[0], point[1]) if point else None
+
+    def _ring(self, center: Tuple[int, int], radius: int):
+        """Cells at Chebyshev distance exactly radius from center"""
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for dc in range(-radius, radius + 1):
+            yield row - radius, col + dc
+            yield row + radius, col + dc
+        for dr in range(-radius + 1, radius):
+            yield row + dr, col - radius
+            yield row + dr, col + radius
+
+    def _rings(self, center: Tuple[int, int], max_rings: float) -> Iterator[Tuple[int, Iterable[Tuple[int, int]]]]:
+        """
+        (radius, cells) outward from center up to max_rings; the occupied
+        cells not reached once a ring walk would cost more come as one last group
+        """
+        row, col = center
+        radius = 0
+        while radius <= max_rings:
+            if (2 * radius + 1) ** 2 > len(self._cells):
+                yield radius, [cell for cell in self._cells
+                               if radius <= max(abs(cell[0] - row), abs(cell[1] - col)) <= max_rings]
+                return
+            yield radius, self._ring(center, radius)
+            radius += 1
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1,
+                max_km: Optional[float] = None,
+                exclude: Optional[Set[Hashable]] = None,
+                accept: Optional[Callable[[Hashable], bool]] = None) -> List[Tuple[float, Hashable]]:
+        """
+        Up to k (distance_km, key) pairs nearest to the point, closest first.
+        Keys in exclude, or rejected by accept, are skipped during the scan.
+        """
+        if k <= 0 or not self._points:
+            return []
+        center = self._cell(latitude, longitude)
+        # Smallest real cell side at this latitude bounds how far ring r can be
+        cell_side_km = min(
+            self.cell_km,
+            self.cell_lon * KM_PER_DEGREE * math.cos(math.radians(latitude))
+        )
+        max_rings = math.inf if max_km is None else int(max_km / max(cell_side_km, 1e-9)) + 2
+
+        # Equirectangular squared distance in km^2: no trigonometry per point
+        lon_scale = KM_PER_DEGREE * math.cos(math.radians(latitude))
+        max_sq = max_km * max_km if max_km is not None else math.inf
+        best: List[Tuple[float, Hashable]] = []  # max-heap via negated distances
+        seen = 0
+        for radius, cells in self._rings(center, max_rings):
+            if len(best) == k and ((radius - 1) * cell_side_km) ** 2 > -best[0][0]:
+                break
+            if seen == len(self._points):
+                break
+            for cell in cells:
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                seen += len(bucket)
+                for key in bucket:
+                    if exclude and key in exclude:
+                        continue
+                    lat, lon, _ = self._points[key]
+                    dy = (lat - latitude) * KM_PER_DEGREE
+                    dx = (lon - longitude) * lon_scale
+                    distance_sq = dx * dx + dy * dy
+                    if distance_sq > max_sq:
+                        continue
+                    if len(best) == k and distance_sq >= -best[0][0]:
+                        continue
+                    if accept is not None and not accept(key):
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance_sq, key))
+                    elif distance_sq < -best[0][0]:
+                        heapq.heapreplace(best, (-distance_sq, key))
+
+        return sorted((math.sqrt(-negated), key) for negated, key in best)
+
+    def iter_nearest(self, latitude: float, longitude: float,
+                     max_km: Optional[float] = None) -> Iterator[Tuple[float, Hashable]]:
+        """
+        (distance_km, key) pairs closest first, found lazily ring by ring, for
+        callers that do not know up front how many points they will need
+        """
+        if not self._points:
+            return
+        center = self._cell(latitude, longitude)
+        cell_side_km = min(
+            self.cell_km,
+            self.cell_lon * KM_PER_DEGREE * math.cos(math.radians(latitude))
+        )
+        max_rings = math.inf if max_km is None else int(max_km / max(cell_side_km, 1e-9)) + 2
+
+        lon_scale = KM_PER_DEGREE * math.cos(math.radians(latitude))
+        max_sq = max_km * max_km if max_km is not None else math.inf
+        pending: List[Tuple[float, Hashable]] = []  # min-heap of found, not yet yielded points
+        seen = 0
+        for radius, cells in self._rings(center, max_rings):
+            if seen == len(self._points) and not pending:
+                return
+            for cell in cells:
+                bucket = self._cells.get(cell)
+                if not bucket:
+                    continue
+                seen += len(bucket)
+                for key in bucket:
+                    lat, lon, _ = self._points[key]
+                    dy = (lat - latitude) * KM_PER_DEGREE
+                    dx = (lon - longitude) * lon_scale
+                    distance_sq = dx * dx + dy * dy
+                    if distance_sq <= max_sq:
+                        heapq.heappush(pending, (distance_sq, key))
+            # Points in cells not scanned yet are at least this far away
+            done_sq = (radius * cell_side_km) ** 2 if seen < len(self._points) else math.inf
+            while pending and pending[0][0] <= done_sq:
+                distance_sq, key = heapq.heappop(pending)
+                yield math.sqrt(distance_sq), key
+        while pending:
+            distance_sq, key = heapq.heappop(pending)
+            yield math.sqrt(distance_sq), key
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, Hashable]]:
+        """All (distance_km, key) pairs within radius_km, closest first"""
+        return self.nearest(latitude, longitude, k=len(self._points), max_km=radius_km)
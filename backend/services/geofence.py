@@ -0,0 +1,243 @@
+"""
+Geofence monitor
+Checks every courier ping against the destinations of the courier's accepted
+deliveries and emits events: "arrived" once the courier is inside the
+arrival radius, and "eta" at most every ETA interval while en route, with
+the remaining time estimated from speed over the recent track. Destinations
+are cached per courier; the dispatch routes register them on claim, and the
+cache is refreshed from the database at most once per refresh interval so a
+restart or an out-of-band claim is picked up without a query per ping.
+Every prune interval the deliveries still tracked are checked against the
+database, and those no longer accepted are forgotten along with couriers
+left with nothing to watch, so completions that skip unwatch() and couriers
+that stop pinging do not pile up in memory.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+
+from database import SessionLocal, settings
+from models import DeliveryDB, ProjectDB
+from services.courier_locations import CourierLocationStore, courier_locations
+from services.geo import haversine_km
+from services.notification_service import notification_fanout
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARRIVAL_RADIUS_M = 20.0
+DEFAULT_ETA_INTERVAL_SECONDS = 30.0
+DEFAULT_REFRESH_SECONDS = 30.0
+DEFAULT_PRUNE_SECONDS = 300.0
+# Track window used to estimate travel speed
+SPEED_WINDOW_SECONDS = 120.0
+# Arrival re-arms only after moving this many radii away again
+REARM_FACTOR = 3.0
+# Below this speed (m/s) the courier counts as stopped and no ETA is given
+MIN_SPEED_MPS = 0.5
+
+
+@dataclass(frozen=True)
+class Destination:
+    delivery_id: int
+    project_id: int
+    latitude: float
+    longitude: float
+
+
+@dataclass(frozen=True)
+class CourierEvent:
+    type: str  # "arrived" | "eta"
+    courier_id: int
+    delivery_id: int
+    project_id: int
+    distance_m: float
+    eta_seconds: Optional[float]
+    at: float
+
+
+@dataclass
+class _CourierWatch:
+    destinations: Dict[int, Destination] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    arrived: set = field(default_factory=set)
+    last_eta_at: Dict[int, float] = field(default_factory=dict)
+
+
+class GeofenceMonitor:
+    """Server-side arrival detection and ETA updates for couriers"""
+
+    def __init__(self, locations: CourierLocationStore = courier_locations,
+                 arrival_radius_m: float = DEFAULT_ARRIVAL_RADIUS_M,
+                 eta_interval_seconds: float = DEFAULT_ETA_INTERVAL_SECONDS,
+                 refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+                 prune_seconds: float = DEFAULT_PRUNE_SECONDS,
+                 session_factory=SessionLocal):
+        self.locations = locations
+        self.arrival_radius_m = arrival_radius_m
+        self.eta_interval_seconds = eta_interval_seconds
+        self.refresh_seconds = refresh_seconds
+        self.prune_seconds = prune_seconds
+        self.session_factory = session_factory
+        self._watches: Dict[int, _CourierWatch] = {}
+        # Last ETA event per delivery, for tracking views
+        self._last_eta: Dict[int, CourierEvent] = {}
+        self._last_prune = time.time()
+        self._lock = threading.Lock()
+
+    def watch(self, courier_id: int, destination: Destination):
+        """Start monitoring a delivery the courier just claimed"""
+        with self._lock:
+            self._watches.setdefault(courier_id, _CourierWatch()).destinations[destination.delivery_id] = destination
+
+    def unwatch(self, courier_id: int, delivery_id: int):
+        """Stop monitoring a delivery (completed or handed over)"""
+        with self._lock:
+            watch = self._watches.get(courier_id)
+            if watch is not None:
+                watch.destinations.pop(delivery_id, None)
+                watch.arrived.discard(delivery_id)
+                watch.last_eta_at.pop(delivery_id, None)
+            self._last_eta.pop(delivery_id, None)
+
+    def last_eta(self, delivery_id: int) -> Optional[CourierEvent]:
+        return self._last_eta.get(delivery_id)
+
+    def _load_destinations(self, courier_id: int) -> Dict[int, Destination]:
+        db = self.session_factory()
+        try:
+            rows = db.execute(
+                select(DeliveryDB.id, DeliveryDB.project_id, ProjectDB.latitude, ProjectDB.longitude)
+                .join(ProjectDB, ProjectDB.id == DeliveryDB.project_id)
+                .where(
+                    DeliveryDB.courier_id == courier_id,
+                    DeliveryDB.status == "accepted",
+                    ProjectDB.latitude.isnot(None),
+                    ProjectDB.longitude.isnot(None)
+                )
+            ).all()
+        finally:
+            db.close()
+        return {row.id: Destination(row.id, row.project_id, row.latitude, row.longitude) for row in rows}
+
+    def _destinations(self, courier_id: int, now: float) -> _CourierWatch:
+        with self._lock:
+            watch = self._watches.get(courier_id)
+            fresh = watch is not None and now - watch.loaded_at < self.refresh_seconds
+        if fresh:
+            return watch
+
+        destinations = self._load_destinations(courier_id)
+        with self._lock:
+            watch = self._watches.setdefault(courier_id, _CourierWatch())
+            watch.destinations = destinations
+            watch.loaded_at = now
+            watch.arrived &= destinations.keys()
+            for delivery_id in watch.last_eta_at.keys() - destinations.keys():
+                self._last_eta.pop(delivery_id, None)
+            watch.last_eta_at = {d: t for d, t in watch.last_eta_at.items() if d in destinations}
+        return watch
+
+    def _accepted(self, delivery_ids: Set[int]) -> Set[int]:
+        db = self.session_factory()
+        try:
+            return set(db.execute(
+                select(DeliveryDB.id).where(DeliveryDB.id.in_(delivery_ids), DeliveryDB.status == "accepted")
+            ).scalars())
+        finally:
+            db.close()
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forget deliveries that are no longer accepted; returns how many"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._last_prune = now
+            tracked = set(self._last_eta)
+            for watch in self._watches.values():
+                tracked.update(watch.destinations)
+        closed = tracked - self._accepted(tracked) if tracked else set()
+        with self._lock:
+            for delivery_id in closed:
+                self._last_eta.pop(delivery_id, None)
+            for courier_id, watch in list(self._watches.items()):
+                for delivery_id in closed & watch.destinations.keys():
+                    del watch.destinations[delivery_id]
+                    watch.arrived.discard(delivery_id)
+                    watch.last_eta_at.pop(delivery_id, None)
+                # A courier still pinging has it rebuilt on the next refresh anyway
+                if not watch.destinations and now - watch.loaded_at > self.refresh_seconds:
+                    del self._watches[courier_id]
+        return len(closed)
+
+    def speed_mps(self, courier_id: int, now: float) -> Optional[float]:
+        """Average speed over the recent track, or None without enough points"""
+        points = self.locations.track(courier_id, since=now - SPEED_WINDOW_SECONDS)
+        if len(points) < 2:
+            return None
+        travelled_km = sum(
+            haversine_km(a[1], a[2], b[1], b[2]) for a, b in zip(points, points[1:])
+        )
+        elapsed = points[-1][0] - points[0][0]
+        if elapsed <= 0:
+            return None
+        return travelled_km * 1000 / elapsed
+
+    def check(self, courier_id: int, latitude: float, longitude: float,
+              now: Optional[float] = None) -> List[CourierEvent]:
+        """Events triggered by the courier being at (latitude, longitude)"""
+        now = now if now is not None else time.time()
+        if now - self._last_prune > self.prune_seconds:
+            self.prune(now)
+        watch = self._destinations(courier_id, now)
+        if not watch.destinations:
+            return []
+
+        events = []
+        speed = None
+        # Pings run on the thread pool; the lock keeps two of one courier's from both announcing arrival
+        with self._lock:
+            for destination in list(watch.destinations.values()):
+                distance_m = haversine_km(latitude, longitude, destination.latitude, destination.longitude) * 1000
+                if destination.delivery_id in watch.arrived:
+                    # Hysteresis: GPS jitter at the fence edge must not re-announce arrival
+                    if distance_m <= self.arrival_radius_m * REARM_FACTOR:
+                        continue
+                    watch.arrived.discard(destination.delivery_id)
+
+                if distance_m <= self.arrival_radius_m:
+                    watch.arrived.add(destination.delivery_id)
+                    event = CourierEvent("arrived", courier_id, destination.delivery_id,
+                                         destination.project_id, round(distance_m, 1), 0.0, now)
+                    events.append(event)
+                    self._last_eta[destination.delivery_id] = event
+                    continue
+
+                if now - watch.last_eta_at.get(destination.delivery_id, 0.0) < self.eta_interval_seconds:
+                    continue
+                if speed is None:
+                    speed = self.speed_mps(courier_id, now) or 0.0
+                eta = round(distance_m / speed, 0) if speed >= MIN_SPEED_MPS else None
+                watch.last_eta_at[destination.delivery_id] = now
+                event = CourierEvent("eta", courier_id, destination.delivery_id,
+                                     destination.project_id, round(distance_m, 1), eta, now)
+                events.append(event)
+                self._last_eta[destination.delivery_id] = event
+
+        # Outside the lock: publishing writes a job row
+        for event in events:
+            if event.type == "arrived":
+                notification_fanout.publish(
+                    project_id=event.project_id,
+                    title="Курьер прибыл",
+                    message=f"Курьер прибыл по доставке #{event.delivery_id}",
+                    type="delivery",
+                    event_key=f"arrival:{event.delivery_id}:{int(now)}"
+                )
+        return events
+
+
+# Global singleton instance
+geofence_monitor = GeofenceMonitor(arrival_radius_m=settings.geofence_radius_m)
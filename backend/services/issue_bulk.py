@@ -0,0 +1,196 @@
+"""
+Bulk issue operations
+Applies a list of operations (assign, close, set_priority) over lists of
+issue ids in one transaction with a fixed number of statements however many
+issues are involved: one SELECT reads every issue with its project owner
+(locking the rows on PostgreSQL) to check permissions set-wise, each
+operation is one UPDATE ... WHERE id IN (...), closing awards XP through
+services.xp (one INSERT of events, one UPDATE per assignee), and the issue
+counters are adjusted with one upsert of the net change.
+
+Operations run in order and see each other's effects, so "assign then
+close" works within one request. An issue an operation cannot apply to
+(missing, not allowed, closed, unassigned) is reported in its result and
+skipped; the rest go through.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from models import IssueDB, ProjectDB, UserDB
+from services import issue_stats, xp
+from services.issue_recommendations import issue_recommender
+from services.leaderboard import leaderboard
+
+ASSIGN = "assign"
+CLOSE = "close"
+SET_PRIORITY = "set_priority"
+OPERATIONS = (ASSIGN, CLOSE, SET_PRIORITY)
+
+MAX_BULK_ISSUES = 1000
+
+
+@dataclass
+class IssueOperation:
+    op: str
+    issue_ids: List[int]
+    # assign: who takes the issues (the caller when None)
+    assignee_id: Optional[int] = None
+    # set_priority: the new priority
+    priority: Optional[str] = None
+
+
+@dataclass
+class OperationResult:
+    issue_id: int
+    op: str
+    ok: bool
+    error: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    assignee_id: Optional[int] = None
+
+
+@dataclass
+class _Issue:
+    """Working copy of an issue's row as the operations change it"""
+    id: int
+    project_id: int
+    reporter_id: int
+    owner_id: int
+    status: str
+    category: object
+    priority: str
+    assignee_id: Optional[int]
+
+    def counted(self):
+        return issue_stats.counter_keys(self.project_id, self.assignee_id,
+                                        issue_stats.cell(self.status, self.category, self.priority))
+
+
+class BulkIssueError(ValueError):
+    """The request as a whole is invalid; nothing was applied"""
+
+
+def _can_manage(user, issue: _Issue) -> bool:
+    """Same rule as the single-issue routes: reporter, project owner or admin"""
+    return bool(user.is_admin) or user.id in (issue.reporter_id, issue.owner_id)
+
+
+def _check(user, operation: IssueOperation, issue: Optional[_Issue], assignee_exists: bool) -> Optional[str]:
+    """Why the operation cannot apply to the issue, or None"""
+    if issue is None:
+        return "Issue not found"
+    if operation.op == ASSIGN:
+        if operation.assignee_id != user.id and not _can_manage(user, issue):
+            return "Only issue reporter or project owner can assign someone else"
+        if not assignee_exists:
+            return "Assignee not found"
+        if issue.status == "closed":
+            return "Cannot assign to closed issue"
+        return None
+    if not _can_manage(user, issue):
+        return f"Only issue reporter or project owner can {'close' if operation.op == CLOSE else 'reprioritise'}"
+    if operation.op == CLOSE and issue.assignee_id is None:
+        return "Issue must be assigned to a volunteer before closing"
+    return None
+
+
+def validate(user, operations: Sequence[IssueOperation]):
+    """Reject malformed requests before touching the database"""
+    if not operations:
+        raise BulkIssueError("No operations given")
+    issue_ids = set()
+    for operation in operations:
+        if operation.op not in OPERATIONS:
+            raise BulkIssueError(f"Unknown operation: {operation.op}")
+        if operation.op == SET_PRIORITY and operation.priority not in issue_stats.PRIORITIES:
+            raise BulkIssueError(f"set_priority needs a priority of {', '.join(issue_stats.PRIORITIES)}")
+        if operation.op == ASSIGN and operation.assignee_id is None:
+            operation.assignee_id = user.id
+        issue_ids.update(operation.issue_ids)
+    if len(issue_ids) > MAX_BULK_ISSUES:
+        raise BulkIssueError(f"At most {MAX_BULK_ISSUES} distinct issues per request")
+
+
+def _load(db: Session, issue_ids) -> Dict[int, _Issue]:
+    rows = db.execute(
+        select(IssueDB.id, IssueDB.project_id, IssueDB.reporter_id, ProjectDB.owner_id, IssueDB.status,
+               IssueDB.category, IssueDB.priority, IssueDB.assignee_id)
+        .join(ProjectDB, ProjectDB.id == IssueDB.project_id)
+        .where(IssueDB.id.in_(sorted(issue_ids)))
+        .order_by(IssueDB.id)
+        # Rows stay as read until commit, so the counter deltas computed from them are exact
+        .with_for_update(of=IssueDB)
+    ).tuples()
+    return {row[0]: _Issue(*row) for row in rows}
+
+
+def apply(db: Session, user, operations: Sequence[IssueOperation]) -> List[OperationResult]:
+    """
+    Apply the operations in order and commit once; returns one result per
+    (operation, issue id) in request order. Raises BulkIssueError, before
+    any change, if the request itself is malformed.
+    """
+    validate(user, operations)
+    issues = _load(db, {issue_id for operation in operations for issue_id in operation.issue_ids})
+    before = {issue_id: list(issue.counted()) for issue_id, issue in issues.items()}
+    assignee_ids = {operation.assignee_id for operation in operations if operation.op == ASSIGN}
+    existing_users = set(db.execute(select(UserDB.id).where(UserDB.id.in_(assignee_ids))).scalars()) \
+        if assignee_ids else set()
+
+    results: List[OperationResult] = []
+    closed: Dict[int, _Issue] = {}
+    for operation in operations:
+        applied = []
+        for issue_id in dict.fromkeys(operation.issue_ids):
+            issue = issues.get(issue_id)
+            error = _check(user, operation, issue, operation.assignee_id in existing_users)
+            if error is None:
+                applied.append(issue_id)
+                if operation.op == ASSIGN:
+                    issue.assignee_id, issue.status = operation.assignee_id, "in-progress"
+                elif operation.op == CLOSE:
+                    issue.status = "closed"
+                    closed[issue_id] = issue
+                else:
+                    issue.priority = operation.priority
+            results.append(OperationResult(
+                issue_id, operation.op, error is None, error,
+                *((issue.status, issue.priority, issue.assignee_id) if issue else (None, None, None))
+            ))
+        if not applied:
+            continue
+        if operation.op == ASSIGN:
+            values = {"assignee_id": operation.assignee_id, "status": "in-progress"}
+        elif operation.op == CLOSE:
+            values = {"status": "closed"}
+        else:
+            values = {"priority": operation.priority}
+        db.execute(
+            update(IssueDB).where(IssueDB.id.in_(applied)).values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    # Set-based updates skip the ORM hooks that keep the counters in step; apply the net change once
+    deltas: Dict[tuple, int] = defaultdict(int)
+    for issue_id, issue in issues.items():
+        for key in before[issue_id]:
+            deltas[key] -= 1
+        for key in issue.counted():
+            deltas[key] += 1
+    issue_stats.apply(db.connection(), deltas)
+
+    # Keyed like close_issue's awards, so an issue closed either way, or twice, awards once
+    awarded = xp.award(db, [xp.issue_closed(issue.id, issue.assignee_id, issue.priority)
+                            for issue in closed.values()])
+    db.commit()
+    if awarded:
+        leaderboard.sync(db)
+    issue_recommender.refresh(db, list(issues))
+    for assignee_id in assignee_ids:
+        issue_recommender.forget_profile(assignee_id)
+    return results
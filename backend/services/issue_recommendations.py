@@ -0,0 +1,407 @@
+"""
+Volunteer issue recommendations
+Open, unassigned issues ranked for one volunteer by a weighted sum of:
+
+- proximity of the issue's project to the volunteer (a point they send, or
+  else the centre of the projects they have worked on),
+- how much of the volunteer's history is in the issue's category,
+- priority,
+- how soon the issue is due.
+
+Open issues are kept in memory in nine tiers, one per category and
+priority. Each tier has its projects on a grid index and its issues in
+due-date order. A query near a point walks every tier's projects outward
+at once, always taking the next project from the tier that could still
+score highest, and stops when no tier can beat the current top K:
+proximity only falls with distance, and within a tier category and
+priority are fixed and urgency is bounded. Tiers the volunteer is unlikely
+to want are cut off after a few projects. Without any location only the
+head of each tier's due-date queue is scored. Writers refresh the issues
+they touched after their commit, and the whole index is rebuilt every
+refresh_seconds like the locker index.
+
+Category profiles come from the volunteer's issue counters (see
+services.issue_stats) and are cached per user for profile_ttl_seconds.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import IssueDB, ProjectDB, IssueCategory
+from services import issue_stats
+from services.geo_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_SECONDS = 300.0
+DEFAULT_PROFILE_TTL_SECONDS = 300.0
+MAX_PROFILES = 10000
+
+# Score weights; proximity, category share, priority and urgency are each in [0, 1]
+W_DISTANCE = 1.0
+W_CATEGORY = 0.6
+W_PRIORITY = 0.4
+W_DUE = 0.4
+
+# Proximity halves at this distance
+DISTANCE_SCALE_KM = 5.0
+# Urgency halves when this many days are left
+DUE_SCALE_DAYS = 7.0
+PRIORITY_SCORES = {"low": 0.0, "medium": 0.5, "high": 1.0}
+
+_COLUMNS = (
+    IssueDB.id, IssueDB.project_id, IssueDB.reporter_id, IssueDB.category,
+    IssueDB.priority, IssueDB.due_date, IssueDB.status, IssueDB.assignee_id,
+)
+
+
+@dataclass(frozen=True)
+class OpenIssue:
+    id: int
+    project_id: int
+    reporter_id: int
+    category: str
+    priority: str
+    due_date: Optional[datetime]
+
+    @property
+    def tier(self) -> Tuple[str, str]:
+        return self.category, self.priority
+
+    @property
+    def due_key(self) -> Tuple[float, int]:
+        # Soonest due first, undated last
+        return (self.due_date.timestamp() if self.due_date else float("inf"), self.id)
+
+
+@dataclass(frozen=True)
+class VolunteerProfile:
+    # Share of the volunteer's issues per category value
+    categories: Dict[str, float]
+    # Centre of the projects they worked on, if any had coordinates
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    issue_id: int
+    score: float
+    distance_km: Optional[float]
+
+
+def proximity(distance_km: float) -> float:
+    return 1.0 / (1.0 + distance_km / DISTANCE_SCALE_KM)
+
+
+def urgency(due_date: Optional[datetime], now: datetime) -> float:
+    if due_date is None:
+        return 0.0
+    days_left = (due_date - now).total_seconds() / 86400
+    return 1.0 / (1.0 + max(days_left, 0.0) / DUE_SCALE_DAYS)
+
+
+def _entry(row) -> Optional[OpenIssue]:
+    """Entry for a tuple in _COLUMNS order; None if the issue is not up for grabs"""
+    issue_id, project_id, reporter_id, category, priority, due_date, status, assignee_id = row
+    if (status or "open") != "open" or assignee_id is not None:
+        return None
+    _, category, priority = issue_stats.cell(status, category, priority)
+    return OpenIssue(issue_id, project_id, reporter_id, category, priority, due_date)
+
+
+def _tie_break(entry: OpenIssue) -> Tuple[float, int]:
+    """Among equal scores the sooner due, then the older issue wins: the order of the tiers' queues"""
+    due, issue_id = entry.due_key
+    return -due, -issue_id
+
+
+class _Tier:
+    """Open issues of one category and priority"""
+
+    def __init__(self):
+        self.grid = GridIndex()
+        self.by_project: Dict[int, Dict[int, OpenIssue]] = {}
+        # (due_key, issue_id), soonest due first
+        self.queue: List[Tuple[Tuple[float, int], int]] = []
+
+
+class IssueRecommender:
+    """Top-K open issues for a volunteer"""
+
+    def __init__(self, refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+                 profile_ttl_seconds: float = DEFAULT_PROFILE_TTL_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.profile_ttl_seconds = profile_ttl_seconds
+        self._issues: Dict[int, OpenIssue] = {}
+        self._tiers: Dict[Tuple[str, str], _Tier] = {}
+        self._project_positions: Dict[int, Tuple[float, float]] = {}
+        self._profiles: "OrderedDict[int, Tuple[float, VolunteerProfile]]" = OrderedDict()
+        self._loaded_at: Optional[float] = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._issues)
+
+    # ---------- loading ----------
+
+    def load(self, db: Session):
+        """Rebuild the index from every open issue"""
+        issues: Dict[int, OpenIssue] = {}
+        tiers: Dict[Tuple[str, str], _Tier] = {}
+        for row in db.execute(select(*_COLUMNS).where(IssueDB.status == "open",
+                                                      IssueDB.assignee_id.is_(None))).tuples():
+            entry = _entry(row)
+            if entry is not None:
+                issues[entry.id] = entry
+                tier = tiers.setdefault(entry.tier, _Tier())
+                tier.by_project.setdefault(entry.project_id, {})[entry.id] = entry
+                tier.queue.append((entry.due_key, entry.id))
+        positions = self._read_positions(db, {entry.project_id for entry in issues.values()})
+        for tier in tiers.values():
+            tier.queue.sort()
+            tier.grid = GridIndex.build(
+                (project_id, *positions[project_id]) for project_id in tier.by_project if project_id in positions
+            )
+        with self._lock:
+            self._issues, self._tiers, self._project_positions = issues, tiers, positions
+            self._loaded_at = time.monotonic()
+        logger.info("Issue recommender loaded with %d open issues in %d projects", len(issues), len(positions))
+
+    @staticmethod
+    def _read_positions(db: Session, project_ids: Iterable[int]) -> Dict[int, Tuple[float, float]]:
+        project_ids = list(project_ids)
+        positions = {}
+        for start in range(0, len(project_ids), 10000):
+            rows = db.execute(
+                select(ProjectDB.id, ProjectDB.latitude, ProjectDB.longitude)
+                .where(ProjectDB.id.in_(project_ids[start:start + 10000]),
+                       ProjectDB.latitude.isnot(None), ProjectDB.longitude.isnot(None))
+            ).tuples()
+            positions.update({project_id: (latitude, longitude) for project_id, latitude, longitude in rows})
+        return positions
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            self.load(db)
+        elif time.monotonic() - loaded_at > self.refresh_seconds and not self._reloading:
+            self._reloading = True
+            threading.Thread(target=self._reload, name="issue-recommender-reload", daemon=True).start()
+
+    def _reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception:
+            logger.exception("Issue recommender reload failed")
+        finally:
+            self._reloading = False
+            db.close()
+
+    # ---------- writes ----------
+
+    def refresh(self, db: Session, issue_ids: Iterable[int]):
+        """Re-read issues that were just created, assigned, closed, edited or deleted"""
+        if self._loaded_at is None:
+            # Nothing cached yet; the first query loads everything anyway
+            return
+        issue_ids = list(issue_ids)
+        if not issue_ids:
+            return
+        entries = {issue_id: None for issue_id in issue_ids}
+        for row in db.execute(select(*_COLUMNS).where(IssueDB.id.in_(issue_ids))).tuples():
+            entries[row[0]] = _entry(row)
+        new_projects = {entry.project_id for entry in entries.values()
+                        if entry is not None and entry.project_id not in self._project_positions}
+        positions = self._read_positions(db, new_projects) if new_projects else {}
+        with self._lock:
+            self._project_positions.update(positions)
+            for issue_id, entry in entries.items():
+                self._remove(issue_id)
+                if entry is not None:
+                    self._add(entry)
+
+    def move_project(self, project_id: int, latitude: Optional[float], longitude: Optional[float]):
+        """Follow a project's new coordinates"""
+        with self._lock:
+            if latitude is None or longitude is None:
+                self._project_positions.pop(project_id, None)
+            else:
+                self._project_positions[project_id] = (latitude, longitude)
+            for tier in self._tiers.values():
+                if project_id not in tier.by_project:
+                    continue
+                if latitude is None or longitude is None:
+                    tier.grid.remove(project_id)
+                else:
+                    tier.grid.insert(project_id, latitude, longitude)
+
+    def _add(self, entry: OpenIssue):
+        self._issues[entry.id] = entry
+        tier = self._tiers.setdefault(entry.tier, _Tier())
+        siblings = tier.by_project.setdefault(entry.project_id, {})
+        siblings[entry.id] = entry
+        position = self._project_positions.get(entry.project_id)
+        if len(siblings) == 1 and position is not None:
+            tier.grid.insert(entry.project_id, *position)
+        bisect.insort(tier.queue, (entry.due_key, entry.id))
+
+    def _remove(self, issue_id: int):
+        entry = self._issues.pop(issue_id, None)
+        if entry is None:
+            return
+        tier = self._tiers[entry.tier]
+        siblings = tier.by_project.get(entry.project_id, {})
+        siblings.pop(issue_id, None)
+        if not siblings:
+            tier.by_project.pop(entry.project_id, None)
+            tier.grid.remove(entry.project_id)
+        position = bisect.bisect_left(tier.queue, (entry.due_key, entry.id))
+        if position < len(tier.queue) and tier.queue[position][1] == issue_id:
+            del tier.queue[position]
+
+    # ---------- profiles ----------
+
+    def profile(self, db: Session, user_id: int) -> VolunteerProfile:
+        """A volunteer's category shares and home area, cached for profile_ttl_seconds"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._profiles.get(user_id)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+
+        per_category: Dict[str, int] = {}
+        for (_, category, _), count in issue_stats.breakdown(db, issue_stats.ASSIGNEE, user_id).items():
+            per_category[category] = per_category.get(category, 0) + count
+        total = sum(per_category.values())
+        latitude, longitude = db.execute(
+            select(func.avg(ProjectDB.latitude), func.avg(ProjectDB.longitude))
+            .where(ProjectDB.id.in_(select(IssueDB.project_id).where(IssueDB.assignee_id == user_id)))
+        ).one()
+        profile = VolunteerProfile(
+            categories={category: count / total for category, count in per_category.items()} if total else {},
+            latitude=latitude,
+            longitude=longitude
+        )
+
+        with self._lock:
+            self._profiles[user_id] = (now + self.profile_ttl_seconds, profile)
+            self._profiles.move_to_end(user_id)
+            while len(self._profiles) > MAX_PROFILES:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def forget_profile(self, user_id: int):
+        """Drop a cached profile, e.g. after the volunteer took an issue"""
+        with self._lock:
+            self._profiles.pop(user_id, None)
+
+    # ---------- queries ----------
+
+    @staticmethod
+    def _base_score(entry: OpenIssue, profile: VolunteerProfile, now: datetime) -> float:
+        return (W_CATEGORY * profile.categories.get(entry.category, 0.0)
+                + W_PRIORITY * PRIORITY_SCORES.get(entry.priority, 0.5)
+                + W_DUE * urgency(entry.due_date, now))
+
+    def recommend(self, user_id: int, profile: VolunteerProfile, k: int = 10,
+                  latitude: Optional[float] = None, longitude: Optional[float] = None,
+                  max_km: Optional[float] = None,
+                  category: Optional[IssueCategory] = None) -> List[Recommendation]:
+        """
+        Top k open issues for the volunteer, best first. Near a point (or
+        their profile's home area) only issues of projects with coordinates
+        are considered; with neither, distance plays no part.
+        """
+        if latitude is None or longitude is None:
+            latitude, longitude = profile.latitude, profile.longitude
+        wanted = category.value if category else None
+        now = datetime.utcnow()
+        with self._lock:
+            if latitude is None or longitude is None:
+                best = self._by_queue(user_id, profile, k, wanted, now)
+            else:
+                best = self._by_distance(user_id, profile, k, latitude, longitude, max_km, wanted, now)
+        return [Recommendation(issue_id, round(score, 4), distance)
+                for score, _, issue_id, distance in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _tier_bound(tier_key: Tuple[str, str], profile: VolunteerProfile) -> float:
+        """Best score any issue of the tier can reach apart from proximity"""
+        category, priority = tier_key
+        return (W_CATEGORY * profile.categories.get(category, 0.0)
+                + W_PRIORITY * PRIORITY_SCORES.get(priority, 0.5)
+                + W_DUE)
+
+    @staticmethod
+    def _offer(best: list, k: int, item):
+        if len(best) < k:
+            heapq.heappush(best, item)
+        elif item > best[0]:
+            heapq.heapreplace(best, item)
+
+    def _by_distance(self, user_id, profile, k, latitude, longitude, max_km, wanted, now):
+        # Min-heap of (score, tie-break, issue_id, distance_km) holding the best k so far
+        best: list = []
+        # Max-heap of tiers by the best score their next project could give:
+        # (-bound, tier order, distance_km, project_id, tier, walk, tier_bound)
+        frontier = []
+        for order, (tier_key, tier) in enumerate(self._tiers.items()):
+            if wanted and tier_key[0] != wanted:
+                continue
+            walk = tier.grid.iter_nearest(latitude, longitude, max_km=max_km)
+            found = next(walk, None)
+            if found is not None:
+                bound = self._tier_bound(tier_key, profile)
+                frontier.append((-(W_DISTANCE * proximity(found[0]) + bound), order, *found, tier, walk, bound))
+        heapq.heapify(frontier)
+
+        while frontier:
+            negated, order, distance, project_id, tier, walk, bound = frontier[0]
+            if len(best) == k and -negated <= best[0][0]:
+                break
+            near = W_DISTANCE * proximity(distance)
+            for entry in tier.by_project[project_id].values():
+                if entry.reporter_id != user_id:
+                    self._offer(best, k, (near + self._base_score(entry, profile, now), _tie_break(entry),
+                                          entry.id, round(distance, 3)))
+            found = next(walk, None)
+            if found is None:
+                heapq.heappop(frontier)
+            else:
+                heapq.heapreplace(frontier, (-(W_DISTANCE * proximity(found[0]) + bound), order, *found,
+                                             tier, walk, bound))
+        return best
+
+    def _by_queue(self, user_id, profile, k, wanted, now):
+        # Within a tier the score only falls along due order, so the top k
+        # overall are among the first k eligible issues of each tier
+        best: list = []
+        for (category, _), tier in self._tiers.items():
+            if wanted and category != wanted:
+                continue
+            taken = 0
+            for _, issue_id in tier.queue:
+                entry = self._issues[issue_id]
+                if entry.reporter_id == user_id:
+                    continue
+                self._offer(best, k, (self._base_score(entry, profile, now), _tie_break(entry), entry.id, None))
+                taken += 1
+                if taken == k:
+                    break
+        return best
+
+# Global singleton instance
+issue_recommender = IssueRecommender()
@@ -0,0 +1,201 @@
+"""
+Issue statistics
+How a project's or a volunteer's issues break down by status, category and
+priority. Two sources give the same counts:
+
+- one GROUP BY status, category, priority over the issues, covered by the
+  ix_issues_*_breakdown indexes so it reads index entries only, but still
+  grows with the number of issues;
+- the issue_stats counters table, one row per (scope, owner, status,
+  category, priority), kept in step by ORM hooks on every create, assign,
+  close, edit and delete, in the same transaction as the change. A read is
+  a few dozen rows at most, however many issues there are.
+
+settings.issue_stats_counters picks the source. Writes that bypass the ORM
+(Core inserts and deletes) must adjust the counters themselves, see
+forget(), or be followed by rebuild_issue_stats.py.
+"""
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import settings
+from models import IssueDB, IssueStatsDB, IssueCategory
+
+PROJECT = "project"
+ASSIGNEE = "assignee"
+
+STATUSES = ("open", "in-progress", "closed")
+PRIORITIES = ("low", "medium", "high")
+
+# Attributes of an issue that move it between counters
+TRACKED = ("project_id", "assignee_id", "status", "category", "priority")
+KEY_COLUMNS = ("scope", "owner_id", "status", "category", "priority")
+
+# (status, category, priority)
+Cell = Tuple[str, str, str]
+# (scope, owner_id, status, category, priority)
+CounterKey = Tuple[str, int, str, str, str]
+
+
+def cell(status: Optional[str], category, priority: Optional[str]) -> Cell:
+    """Normalise raw column values; missing ones count as the column defaults"""
+    return (
+        status or "open",
+        IssueCategory(category or IssueCategory.HANDS).value,
+        priority or "medium",
+    )
+
+
+def counter_keys(project_id: int, assignee_id: Optional[int], issue_cell: Cell):
+    """Every counter an issue with these values is counted in"""
+    yield (PROJECT, project_id) + issue_cell
+    if assignee_id is not None:
+        yield (ASSIGNEE, assignee_id) + issue_cell
+
+
+def apply(connection: Connection, deltas: Dict[CounterKey, int]):
+    """Add deltas to the counters, creating missing rows; runs in the caller's transaction"""
+    # Sorted keys: concurrent writers take the row locks in the same order
+    rows = [dict(zip(KEY_COLUMNS, key), count=delta) for key, delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    table = IssueStatsDB.__table__
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={"count": table.c.count + statement.excluded["count"]}
+        ), rows)
+        return
+    for row in rows:
+        key_filter = and_(*[table.c[column] == row[column] for column in KEY_COLUMNS])
+        if connection.execute(update(table).where(key_filter)
+                              .values(count=table.c.count + row["count"])).rowcount == 0:
+            connection.execute(insert(table).values(**row))
+
+
+def grouped_counts(connection, where) -> Dict[CounterKey, int]:
+    """Counters of the issues matching `where`, from two GROUP BY queries"""
+    counts: Dict[CounterKey, int] = defaultdict(int)
+    for scope, owner in ((PROJECT, IssueDB.project_id), (ASSIGNEE, IssueDB.assignee_id)):
+        rows = connection.execute(
+            select(owner, IssueDB.status, IssueDB.category, IssueDB.priority, func.count())
+            .where(where, owner.isnot(None))
+            .group_by(owner, IssueDB.status, IssueDB.category, IssueDB.priority)
+        )
+        for owner_id, status, category, priority, count in rows:
+            counts[(scope, owner_id) + cell(status, category, priority)] += count
+    return counts
+
+
+def forget(connection: Connection, where):
+    """Take the issues matching `where` out of the counters, before deleting them behind the ORM's back"""
+    apply(connection, {key: -count for key, count in grouped_counts(connection, where).items()})
+
+
+# ---------- reads ----------
+
+def _owner_column(scope: str):
+    return IssueDB.project_id if scope == PROJECT else IssueDB.assignee_id
+
+
+def breakdown(db: Session, scope: str, owner_id: int,
+              use_counters: Optional[bool] = None) -> Dict[Cell, int]:
+    """Issue counts of a project or volunteer per (status, category, priority), zero cells left out"""
+    if use_counters is None:
+        use_counters = settings.issue_stats_counters
+    counts: Dict[Cell, int] = defaultdict(int)
+    if use_counters:
+        rows = db.execute(
+            select(IssueStatsDB.status, IssueStatsDB.category, IssueStatsDB.priority, IssueStatsDB.count)
+            .where(IssueStatsDB.scope == scope, IssueStatsDB.owner_id == owner_id, IssueStatsDB.count > 0)
+        )
+        for status, category, priority, count in rows:
+            counts[(status, category, priority)] += count
+    else:
+        owner = _owner_column(scope)
+        rows = db.execute(
+            select(IssueDB.status, IssueDB.category, IssueDB.priority, func.count())
+            .where(owner == owner_id)
+            .group_by(IssueDB.status, IssueDB.category, IssueDB.priority)
+        )
+        for status, category, priority, count in rows:
+            counts[cell(status, category, priority)] += count
+    return dict(counts)
+
+
+def summarize(counts: Dict[Cell, int]) -> dict:
+    """Totals per status and priority, overall and per category, for dashboards"""
+
+    def tally(cells) -> dict:
+        by_status = {status: 0 for status in STATUSES}
+        by_priority = {priority: 0 for priority in PRIORITIES}
+        total = 0
+        for (status, _, priority), count in cells:
+            by_status[status] = by_status.get(status, 0) + count
+            by_priority[priority] = by_priority.get(priority, 0) + count
+            total += count
+        return {"total": total, "by_status": by_status, "by_priority": by_priority}
+
+    summary = tally(counts.items())
+    summary["by_category"] = {
+        category.value: tally((key, count) for key, count in counts.items() if key[1] == category.value)
+        for category in IssueCategory
+    }
+    return summary
+
+
+def closed_count(db: Session, user_id: int) -> int:
+    """Issues a volunteer has closed"""
+    return sum(count for (status, _, _), count in breakdown(db, ASSIGNEE, user_id).items() if status == "closed")
+
+
+# ---------- ORM hooks ----------
+
+def _values(target, before: bool):
+    """Tracked attribute values of an issue, as last flushed (before) or as about to be written"""
+    state = inspect(target)
+    values = []
+    for attribute in TRACKED:
+        history = state.attrs[attribute].history
+        if before and history.has_changes():
+            values.append(history.deleted[0] if history.deleted else None)
+        else:
+            values.append(getattr(target, attribute))
+    return values
+
+
+def _counted(values, sign: int) -> Dict[CounterKey, int]:
+    project_id, assignee_id, status, category, priority = values
+    return {key: sign for key in counter_keys(project_id, assignee_id, cell(status, category, priority))}
+
+
+def _after_insert(mapper, connection, target):
+    apply(connection, _counted(_values(target, False), 1))
+
+
+def _after_update(mapper, connection, target):
+    before, after = _values(target, True), _values(target, False)
+    if before == after:
+        return
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for key, sign in list(_counted(before, -1).items()) + list(_counted(after, 1).items()):
+        deltas[key] += sign
+    apply(connection, deltas)
+
+
+def _before_delete(mapper, connection, target):
+    # Before, not after: the row must still be there to load expired attributes from
+    apply(connection, _counted(_values(target, True), -1))
+
+
+# The tracked columns are mapped with active_history, so the history holds the old value
+event.listen(IssueDB, "after_insert", _after_insert)
+event.listen(IssueDB, "after_update", _after_update)
+event.listen(IssueDB, "before_delete", _before_delete)
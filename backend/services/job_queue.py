@@ -0,0 +1,329 @@
+"""
+Lightweight in-process job queue
+Jobs are persisted in the jobs table so they survive restarts; a small pool
+of worker threads claims them with a conditional UPDATE, retries failures
+with exponential backoff and deduplicates by idempotency key.
+
+A claimed job carries a lease: the claiming process's worker id and a
+locked_until time that a heartbeat thread keeps pushing forward while the
+job runs. Only jobs whose lease has run out, because their process died or
+stalled, are claimed again, so several processes can share the table and a
+restarting one leaves the jobs of the others alone.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, settings
+from models import JobDB
+from services.metrics import jobs_processed_total, job_queue_wait_seconds, job_run_seconds
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 300.0
+POLL_INTERVAL_SECONDS = 1.0
+LATENCY_SAMPLES = 1000
+
+
+class JobQueue:
+    """Persistent job queue with a worker thread pool"""
+
+    def __init__(self, num_workers: int = 2, lease_seconds: float = 300.0):
+        self.num_workers = num_workers
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0}
+        self._wait_seconds: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._run_seconds: deque = deque(maxlen=LATENCY_SAMPLES)
+
+    # ---------- registration & enqueueing ----------
+
+    def task(self, name: str):
+        """Decorator registering a handler called as handler(db, **payload)"""
+        def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+            self._handlers[name] = fn
+            return fn
+        return decorator
+
+    def enqueue(self, name: str, payload: Optional[dict] = None,
+                idempotency_key: Optional[str] = None, delay_seconds: float = 0,
+                max_attempts: int = 5, db: Optional[Session] = None) -> bool:
+        """
+        Persist a job and wake a worker.
+
+        When db is given the job row joins the caller's transaction and is
+        only visible once the caller commits; otherwise it is committed
+        immediately. Returns False if a job with the same idempotency key
+        already exists.
+        """
+        now = datetime.utcnow()
+        values = {
+            "name": name,
+            "payload": json.dumps(payload or {}),
+            "idempotency_key": idempotency_key,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "run_at": now + timedelta(seconds=delay_seconds),
+            "created_at": now,
+        }
+
+        own_session = db is None
+        session = SessionLocal() if own_session else db
+        try:
+            result = session.execute(_insert_ignore(session).values(**values))
+            if own_session:
+                session.commit()
+        finally:
+            if own_session:
+                session.close()
+
+        inserted = result.rowcount > 0
+        if inserted:
+            with self._lock:
+                self._counters["enqueued"] += 1
+            self._wakeup.set()
+        return inserted
+
+    # ---------- worker lifecycle ----------
+
+    def start(self):
+        """Start the workers and the lease heartbeat; jobs of dead processes are claimed as their leases run out"""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Signal workers to exit after their current job"""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=timeout)
+            self._heartbeat_thread = None
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """Process due jobs on the calling thread (scripts and benchmarks)"""
+        processed = 0
+        while limit is None or processed < limit:
+            if not self._run_one():
+                break
+            processed += 1
+        return processed
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                ran = self._run_one()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                ran = False
+            if not ran:
+                self._wakeup.wait(POLL_INTERVAL_SECONDS)
+                self._wakeup.clear()
+
+    def _heartbeat(self):
+        """Renew the leases of this process's running jobs well before they run out"""
+        while not self._stop.wait(self.lease_seconds / 3):
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(JobDB)
+                    .where(JobDB.status == "running", JobDB.worker_id == self.worker_id)
+                    .values(locked_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+                )
+                db.commit()
+            except Exception as e:
+                logger.error(f"Job lease renewal failed: {e}")
+            finally:
+                db.close()
+
+    # ---------- execution ----------
+
+    @staticmethod
+    def _claimable(now: datetime):
+        # Running rows without a lease were left by a version that did not set one
+        return or_(
+            and_(JobDB.status == "queued", JobDB.run_at <= now),
+            and_(JobDB.status == "running", or_(JobDB.locked_until < now, JobDB.locked_until.is_(None))),
+        )
+
+    def _claim(self, db: Session) -> Optional[JobDB]:
+        now = datetime.utcnow()
+        candidates = db.execute(
+            select(JobDB.id)
+            .where(self._claimable(now))
+            .order_by(JobDB.run_at, JobDB.id)
+            .limit(self.num_workers + 1)
+        ).scalars().all()
+
+        for job_id in candidates:
+            claimed = db.execute(
+                update(JobDB)
+                .where(JobDB.id == job_id, self._claimable(now))
+                .values(status="running", started_at=now, attempts=JobDB.attempts + 1,
+                        worker_id=self.worker_id, locked_until=now + timedelta(seconds=self.lease_seconds))
+            )
+            db.commit()
+            if claimed.rowcount == 1:
+                return db.get(JobDB, job_id)
+        return None
+
+    def _run_one(self) -> bool:
+        db = SessionLocal()
+        try:
+            job = self._claim(db)
+            if job is None:
+                return False
+
+            wait = (job.started_at - job.run_at).total_seconds()
+            job_queue_wait_seconds.observe(wait, job=job.name)
+            with self._lock:
+                self._wait_seconds.append(wait)
+
+            handler = self._handlers.get(job.name)
+            started = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for job '{job.name}'")
+                handler(db, **json.loads(job.payload))
+                # The handler's writes and the completion mark commit together, unless the lease
+                # was lost: then another worker has the job and this run's writes are dropped
+                finished = db.execute(
+                    update(JobDB)
+                    .where(JobDB.id == job.id, *self._held(job))
+                    .values(status="done", finished_at=datetime.utcnow(), last_error=None, locked_until=None)
+                )
+                if finished.rowcount == 0:
+                    db.rollback()
+                    logger.warning(f"Job {job.id} ({job.name}) lost its lease, its result is discarded")
+                    return True
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self._record_failure(db, job, e)
+                return True
+            finally:
+                elapsed = time.perf_counter() - started
+                job_run_seconds.observe(elapsed, job=job.name)
+                with self._lock:
+                    self._run_seconds.append(elapsed)
+
+            jobs_processed_total.inc(job=job.name, outcome="completed")
+            with self._lock:
+                self._counters["completed"] += 1
+            return True
+        finally:
+            db.close()
+
+    def _held(self, job: JobDB):
+        """Criteria matching the job only while this claim of it still holds the lease"""
+        return JobDB.status == "running", JobDB.worker_id == self.worker_id, JobDB.attempts == job.attempts
+
+    def _record_failure(self, db: Session, job: JobDB, error: Exception):
+        if job.attempts < job.max_attempts:
+            backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (job.attempts - 1))
+            backoff *= random.uniform(0.8, 1.2)
+            values = {
+                "status": "queued",
+                "run_at": datetime.utcnow() + timedelta(seconds=backoff),
+                "last_error": str(error),
+            }
+            counter = "retried"
+            logger.warning(f"Job {job.id} ({job.name}) failed, retrying in {backoff:.1f}s: {error}")
+        else:
+            values = {
+                "status": "failed",
+                "finished_at": datetime.utcnow(),
+                "last_error": str(error),
+            }
+            counter = "failed"
+            logger.error(f"Job {job.id} ({job.name}) failed permanently: {error}")
+
+        recorded = db.execute(
+            update(JobDB).where(JobDB.id == job.id, *self._held(job)).values(locked_until=None, **values)
+        )
+        if recorded.rowcount == 0:
+            # Lease lost; the failure belongs to whichever worker holds the job now
+            db.rollback()
+            return
+        db.commit()
+        jobs_processed_total.inc(job=job.name, outcome=counter)
+        with self._lock:
+            self._counters[counter] += 1
+
+    # ---------- monitoring ----------
+
+    def stats(self, db: Session) -> dict:
+        """Queue depth per status, latency summaries and failure counters"""
+        depth = dict(
+            db.query(JobDB.status, func.count(JobDB.id)).group_by(JobDB.status).all()
+        )
+        with self._lock:
+            counters = dict(self._counters)
+            wait = sorted(self._wait_seconds)
+            run = sorted(self._run_seconds)
+        return {
+            "workers": len(self._threads),
+            "depth": {
+                "queued": depth.get("queued", 0),
+                "running": depth.get("running", 0),
+                "done": depth.get("done", 0),
+                "failed": depth.get("failed", 0),
+            },
+            "counters": counters,
+            "queue_wait_seconds": _summary(wait),
+            "run_seconds": _summary(run),
+        }
+
+
+def _insert_ignore(db: Session):
+    """INSERT that silently skips rows violating the idempotency key"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(JobDB).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    if dialect == "postgresql":
+        return postgresql.insert(JobDB).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    return insert(JobDB)
+
+
+def _summary(samples: List[float]) -> dict:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    return {
+        "count": len(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "max": samples[-1],
+    }
+
+
+# Global singleton instance
+job_queue = JobQueue(num_workers=settings.job_workers, lease_seconds=settings.job_lease_seconds)
@@ -0,0 +1,68 @@
+"""Background job handlers for work deferred off the request path"""
+import logging
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+from services import courier_stats
+from services.job_queue import job_queue
+from services.locker_assignment import DEFAULT_BATCH_LIMIT, locker_assigner
+from services.notification_service import FAN_OUT_JOB, notification_fanout
+
+logger = logging.getLogger(__name__)
+
+
+@job_queue.task("award_xp")
+def award_xp(db: Session, user_id: int, amount: int, reason: Optional[str] = None,
+             idempotency_key: Optional[str] = None):
+    """Award gamification XP to a volunteer"""
+    crud.add_xp_to_user(db, user_id, amount, reason, idempotency_key)
+
+
+@job_queue.task("recompute_courier_stats")
+def recompute_courier_stats(db: Session, courier_id: int):
+    """Refresh courier delivery count, rating and average time"""
+    crud.recompute_courier_stats(db, courier_id)
+
+
+@job_queue.task("record_courier_delivery")
+def record_courier_delivery(db: Session, delivery_id: int):
+    """Fold a completed delivery into the courier statistics aggregates"""
+    delivery = crud.get_delivery_by_id(db, delivery_id)
+    if delivery is None or delivery.status != "completed" or delivery.courier_id is None:
+        logger.warning(f"Skipping courier stats for delivery {delivery_id}: not a completed delivery")
+        return
+    courier_stats.record_delivery(
+        db,
+        delivery.courier_id,
+        delivery.delivery_time_minutes,
+        delivery.rating,
+        delivery.completed_at
+    )
+
+
+@job_queue.task("assign_deliveries_to_lockers")
+def assign_deliveries_to_lockers(db: Session, delivery_ids: Optional[List[int]] = None,
+                                 limit: int = DEFAULT_BATCH_LIMIT, strategy: str = "optimal",
+                                 hold_minutes: Optional[float] = None):
+    """Reserve locker slots for a batch of pending deliveries"""
+    summary = locker_assigner.run(db, delivery_ids, limit, strategy, hold_minutes)
+    logger.info(f"Assigned {summary.assigned} of {summary.deliveries} deliveries to "
+                f"{summary.lockers} lockers, {summary.total_km} km in {summary.elapsed_ms} ms")
+
+
+@job_queue.task("log_moderation_action")
+def log_moderation_action(db: Session, action: str, user_id: int, email: str,
+                          reason: Optional[str] = None):
+    """Record an admin ban/unban action"""
+    if reason is not None:
+        logger.info(f"User {user_id} ({email}) {action}. Reason: {reason}")
+    else:
+        logger.info(f"User {user_id} ({email}) {action}")
+
+
+@job_queue.task(FAN_OUT_JOB)
+def fan_out_notification(db: Session, **event):
+    """Write one chunk of subscriber inbox rows for a project event"""
+    notification_fanout.run_job(db, event)
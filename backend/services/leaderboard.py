@@ -0,0 +1,315 @@
+"""
+Leaderboards
+XP rankings kept in memory on order-statistic trees, one per board: all-time
+XP from users.xp, and XP earned over the rolling last 7 and 30 days summed
+from the xp_events log, each overall and per role. Moving a user on a board
+is a remove and an insert, O(log n), and a user's rank, the top N and the
+users around someone are read off subtree sizes without scanning the users
+ahead of them.
+
+Rolling boards count XP in hourly buckets; a bucket leaves the board as a
+whole once it is older than the window, so "this week" is accurate to the
+hour. The boards are built from the database once; after that they catch
+up incrementally with users changed since the newest updated_at seen and
+events logged past the last event id, so XP awarded by other processes or
+scripts shows up too without rereading a million users. Writers sync right
+after their commit, readers when the last sync is over sync_seconds old.
+Banned users are left off every board.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import Session
+
+from models import UserDB, UserRole, XpEventDB
+from services.rank_tree import RankTree
+
+logger = logging.getLogger(__name__)
+
+# How stale a read may be before it first catches up with other writers
+DEFAULT_SYNC_SECONDS = 5.0
+LOAD_BATCH_SIZE = 10000
+
+# None is the all-time board
+PERIODS: Dict[str, Optional[timedelta]] = {
+    "all": None,
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+}
+
+# Rating levels by the XP needed to reach them, highest first
+RATING_LEVELS = [(1000, "Gold"), (500, "Silver"), (0, "Bronze")]
+
+
+def rating_level_for(xp: int) -> str:
+    return next((level for threshold, level in RATING_LEVELS if xp >= threshold), RATING_LEVELS[-1][1])
+
+
+def _role_name(role) -> str:
+    return UserRole(role or UserRole.DONOR).value
+
+
+def _hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    rank: int  # 1-based
+    user_id: int
+    xp: int
+
+
+class _Board:
+    """Scores of one period, ranked overall (role None) and per role"""
+
+    def __init__(self, keep_zero: bool):
+        self.keep_zero = keep_zero
+        self.entries: Dict[int, Tuple[int, str]] = {}
+        self.trees: Dict[Optional[str], RankTree] = {None: RankTree()}
+
+    @classmethod
+    def build(cls, scores: Dict[int, int], roles: Dict[int, str], keep_zero: bool) -> "_Board":
+        board = cls(keep_zero)
+        board.entries = {
+            user_id: (score, roles[user_id]) for user_id, score in scores.items()
+            if user_id in roles and (score > 0 or keep_zero)
+        }
+        # Most XP first, the earlier account first among equals
+        keys: Dict[Optional[str], List[Tuple[int, int]]] = {None: []}
+        for user_id, (score, role) in board.entries.items():
+            keys[None].append((-score, user_id))
+            keys.setdefault(role, []).append((-score, user_id))
+        board.trees = {role: RankTree(role_keys) for role, role_keys in keys.items()}
+        return board
+
+    def score(self, user_id: int) -> int:
+        entry = self.entries.get(user_id)
+        return entry[0] if entry else 0
+
+    def set(self, user_id: int, score: int, role: str):
+        if self.entries.get(user_id) == (score, role):
+            return
+        self.discard(user_id)
+        if score <= 0 and not self.keep_zero:
+            return
+        self.entries[user_id] = (score, role)
+        key = (-score, user_id)
+        self.trees[None].insert(key)
+        self.trees.setdefault(role, RankTree()).insert(key)
+
+    def discard(self, user_id: int):
+        entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            score, role = entry
+            self.trees[None].remove((-score, user_id))
+            self.trees[role].remove((-score, user_id))
+
+    def tree(self, role: Optional[str]) -> RankTree:
+        return self.trees.get(role) or RankTree()
+
+
+class _RollingBoard(_Board):
+    """XP earned within the last `window`, from hourly buckets of events"""
+
+    def __init__(self, window: timedelta):
+        super().__init__(keep_zero=False)
+        self.window = window
+        self.buckets: Dict[datetime, Dict[int, int]] = {}
+        self.expired_before: Optional[datetime] = None
+
+    def cutoff(self, now: datetime) -> datetime:
+        """Oldest hour still inside the window"""
+        return _hour(now - self.window) + timedelta(hours=1)
+
+    def add(self, user_id: int, amount: int, at: datetime, role: Optional[str]):
+        if at < self.cutoff(datetime.utcnow()):
+            return
+        bucket = self.buckets.setdefault(_hour(at), {})
+        bucket[user_id] = bucket.get(user_id, 0) + amount
+        if role is not None:
+            self.set(user_id, self.score(user_id) + amount, role)
+
+    def expire(self, now: datetime, roles: Dict[int, str]):
+        """Take buckets that fell out of the window off the board"""
+        cutoff = self.cutoff(now)
+        if self.expired_before == cutoff:
+            return
+        self.expired_before = cutoff
+        for hour in sorted(hour for hour in self.buckets if hour < cutoff):
+            for user_id, amount in self.buckets.pop(hour).items():
+                if user_id in roles:
+                    self.set(user_id, self.score(user_id) - amount, roles[user_id])
+
+
+class Leaderboard:
+    """Global, per-role and rolling XP rankings"""
+
+    def __init__(self, sync_seconds: float = DEFAULT_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._roles: Dict[int, str] = {}
+        self._boards: Dict[str, _Board] = self._empty_boards()
+        self._loaded_at: Optional[float] = None
+        self._synced_at = 0.0
+        # Users changed at or after this (database clock), events after this id, are not on the boards yet
+        self._users_since: Optional[datetime] = None
+        self._events_after = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    @staticmethod
+    def _empty_boards() -> Dict[str, _Board]:
+        return {period: _Board(keep_zero=True) if window is None else _RollingBoard(window)
+                for period, window in PERIODS.items()}
+
+    def load(self, db: Session):
+        """Rebuild every board from users and the XP event log"""
+        with self._sync_lock:
+            # Watermarks first: whatever changes while the rows stream in is caught by the next sync
+            users_since = db.execute(select(func.max(UserDB.updated_at))).scalar()
+            events_after = db.execute(select(func.max(XpEventDB.id))).scalar() or 0
+
+            roles: Dict[int, str] = {}
+            totals: Dict[int, int] = {}
+            rows = db.execute(
+                select(UserDB.id, UserDB.role, UserDB.xp)
+                .where(UserDB.is_banned.isnot(True))
+                .order_by(UserDB.xp.desc(), UserDB.id)
+                .execution_options(yield_per=LOAD_BATCH_SIZE)
+            ).tuples()
+            for user_id, role, xp in rows:
+                roles[user_id] = _role_name(role)
+                totals[user_id] = xp or 0
+            boards = {"all": _Board.build(totals, roles, keep_zero=True)}
+
+            now = datetime.utcnow()
+            rolling = {period: _RollingBoard(window) for period, window in PERIODS.items() if window is not None}
+            cutoffs = [(board.cutoff(now), board) for board in rolling.values()]
+            events = db.execute(
+                select(XpEventDB.user_id, XpEventDB.amount, XpEventDB.created_at)
+                .where(XpEventDB.created_at >= min(cutoff for cutoff, _ in cutoffs), XpEventDB.id <= events_after)
+                .execution_options(yield_per=LOAD_BATCH_SIZE)
+            ).tuples()
+            for user_id, amount, created_at in events:
+                for cutoff, board in cutoffs:
+                    if created_at >= cutoff:
+                        bucket = board.buckets.setdefault(_hour(created_at), {})
+                        bucket[user_id] = bucket.get(user_id, 0) + amount
+            for period, board in rolling.items():
+                scores: Dict[int, int] = {}
+                for bucket in board.buckets.values():
+                    for user_id, amount in bucket.items():
+                        scores[user_id] = scores.get(user_id, 0) + amount
+                built = _Board.build(scores, roles, keep_zero=False)
+                board.entries, board.trees = built.entries, built.trees
+                board.expired_before = board.cutoff(now)
+                boards[period] = board
+
+            with self._lock:
+                self._roles, self._boards = roles, boards
+                self._users_since, self._events_after = users_since, events_after
+                self._loaded_at = self._synced_at = time.monotonic()
+        logger.info("Leaderboards loaded with %d users", len(roles))
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_at is None:
+            self.load(db)
+        elif time.monotonic() - self._synced_at > self.sync_seconds:
+            self.sync(db)
+
+    # ---------- writes ----------
+
+    def sync(self, db: Session):
+        """
+        Catch up with users changed and XP events logged since the last load
+        or sync, whichever process or script wrote them. Writers call this
+        after their commit; both reads are range scans on an index.
+        """
+        if self._loaded_at is None:
+            # Nothing cached yet; the first query loads everything anyway
+            return
+        with self._sync_lock:
+            changed = true()
+            if self._users_since is not None:
+                # A second of overlap: SQLite compares timestamps as text, and CURRENT_TIMESTAMP
+                # has no fractional part to sort after the bound parameter's
+                changed = UserDB.updated_at >= self._users_since - timedelta(seconds=1)
+            users = db.execute(
+                select(UserDB.id, UserDB.role, UserDB.xp, UserDB.is_banned, UserDB.updated_at).where(changed)
+            ).tuples().all()
+            events = db.execute(
+                select(XpEventDB.id, XpEventDB.user_id, XpEventDB.amount, XpEventDB.created_at)
+                .where(XpEventDB.id > self._events_after)
+                .order_by(XpEventDB.id)
+            ).tuples().all()
+            with self._lock:
+                for user_id, role, xp, is_banned, _ in users:
+                    if is_banned:
+                        self._drop(user_id)
+                        continue
+                    role = self._roles[user_id] = _role_name(role)
+                    for period, board in self._boards.items():
+                        board.set(user_id, (xp or 0) if period == "all" else board.score(user_id), role)
+                for _, user_id, amount, created_at in events:
+                    for board in self._boards.values():
+                        if isinstance(board, _RollingBoard):
+                            board.add(user_id, amount, created_at, self._roles.get(user_id))
+                # Rows stamped in the newest second are read again next time; setting the same
+                # XP twice is harmless, while a strict > could miss a write in that second
+                self._users_since = max((updated_at for *_, updated_at in users if updated_at is not None),
+                                        default=self._users_since)
+                if events:
+                    self._events_after = events[-1][0]
+                self._synced_at = time.monotonic()
+
+    def _drop(self, user_id: int):
+        self._roles.pop(user_id, None)
+        for board in self._boards.values():
+            board.discard(user_id)
+
+    # ---------- reads ----------
+
+    def _board(self, period: str) -> _Board:
+        board = self._boards[period]
+        if isinstance(board, _RollingBoard):
+            board.expire(datetime.utcnow(), self._roles)
+        return board
+
+    def size(self, period: str = "all", role: Optional[str] = None) -> int:
+        with self._lock:
+            return len(self._board(period).tree(role))
+
+    def top(self, period: str = "all", role: Optional[str] = None, limit: int = 10,
+            offset: int = 0) -> List[LeaderboardEntry]:
+        """limit entries from rank offset + 1 down"""
+        with self._lock:
+            tree = self._board(period).tree(role)
+            return [LeaderboardEntry(offset + i + 1, user_id, -score)
+                    for i, (score, user_id) in enumerate(tree.slice(offset, offset + limit))]
+
+    def position(self, user_id: int, period: str = "all",
+                 role: Optional[str] = None) -> Optional[LeaderboardEntry]:
+        """A user's place on a board; None if they are not on it"""
+        with self._lock:
+            board = self._board(period)
+            entry = board.entries.get(user_id)
+            if entry is None or (role is not None and entry[1] != role):
+                return None
+            return LeaderboardEntry(board.tree(role).rank((-entry[0], user_id)) + 1, user_id, entry[0])
+
+    def around(self, user_id: int, period: str = "all", role: Optional[str] = None,
+               radius: int = 5) -> List[LeaderboardEntry]:
+        """The user with up to radius neighbours above and below; empty if not on the board"""
+        found = self.position(user_id, period, role)
+        if found is None:
+            return []
+        return self.top(period, role, limit=2 * radius + 1, offset=max(found.rank - 1 - radius, 0))
+
+
+# Global singleton instance
+leaderboard = Leaderboard()
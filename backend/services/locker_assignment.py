@@ -0,0 +1,209 @@
+"""
+Locker assignment
+Routes pending deliveries into parcel lockers in batches. Each delivery's
+pickup point gets its nearest lockers with free slots as candidates, and a
+capacitated min-cost assignment picks the lockers so that total pickup to
+locker distance is minimal while no locker takes more deliveries than it
+has free slots. The plan is written as locker reservations in a single
+transaction; slots are taken with the same conditional UPDATE as single
+reservations, so a plan computed against slightly stale occupancy can only
+come out smaller, never overfill a locker.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+
+from models import DeliveryDB, LockerReservationDB, ParcelLockerDB, ProjectDB
+from services.assignment import min_cost_assignment
+from services.courier_matching import PendingDelivery
+from services.geo_index import GridIndex
+from services.locker_index import IndexedLocker, locker_index
+from services.locker_reservations import HELD, OCCUPIED, locker_reservations
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANDIDATES = 8
+DEFAULT_MAX_KM = 10.0
+# Deliveries considered per run, oldest first
+DEFAULT_BATCH_LIMIT = 5000
+# Holds made by the optimiser last until the courier could plausibly arrive
+DEFAULT_ASSIGNMENT_HOLD_MINUTES = 240.0
+
+
+@dataclass(frozen=True)
+class LockerAssignment:
+    delivery_id: int
+    locker_id: int
+    reservation_id: int
+    distance_km: float
+
+
+@dataclass
+class AssignmentSummary:
+    strategy: str
+    deliveries: int
+    lockers: int
+    assigned: int
+    total_km: float
+    elapsed_ms: float
+    assignments: List[LockerAssignment] = field(default_factory=list)
+
+
+def plan_locker_assignment(deliveries: Sequence[PendingDelivery], lockers: Sequence[IndexedLocker],
+                           strategy: str = "optimal", candidates: int = DEFAULT_CANDIDATES,
+                           max_km: Optional[float] = DEFAULT_MAX_KM
+                           ) -> List[Tuple[PendingDelivery, IndexedLocker, float]]:
+    """
+    Pair deliveries with lockers, each locker taking up to its free slots.
+
+    "optimal" minimises total distance over each delivery's `candidates`
+    nearest lockers; "greedy" walks deliveries oldest first and gives each
+    the nearest locker with a slot left. Returns (delivery, locker, km).
+    """
+    lockers = [locker for locker in lockers if locker.free_slots > 0]
+    if not deliveries or not lockers:
+        return []
+    capacity = [locker.free_slots for locker in lockers]
+    index = GridIndex.build(((j, locker.latitude, locker.longitude) for j, locker in enumerate(lockers)),
+                            per_cell=candidates)
+
+    if strategy == "greedy":
+        remaining = list(capacity)
+        pairs = []
+        for delivery in deliveries:
+            found = index.nearest(delivery.latitude, delivery.longitude, k=1, max_km=max_km,
+                                  accept=lambda j: remaining[j] > 0)
+            if found:
+                distance, j = found[0]
+                remaining[j] -= 1
+                pairs.append((delivery, lockers[j], distance))
+        return pairs
+
+    edges = [
+        [(j, int(distance * 1000)) for distance, j in
+         index.nearest(delivery.latitude, delivery.longitude, k=candidates, max_km=max_km)]
+        for delivery in deliveries
+    ]
+    # A delivery stays for the next run rather than pushing others further
+    # away by more than max_km in total to make room for it
+    unassigned_cost = int((max_km if max_km is not None else DEFAULT_MAX_KM) * 1000) + 1
+    match = min_cost_assignment(edges, len(lockers), capacity, unassigned_cost)
+    pairs = []
+    for i, j in enumerate(match):
+        if j < 0:
+            continue
+        distance = next(cost for locker_j, cost in edges[i] if locker_j == j) / 1000
+        pairs.append((deliveries[i], lockers[j], distance))
+    return pairs
+
+
+class LockerAssigner:
+    """Batch assignment of pending deliveries to parcel lockers"""
+
+    def __init__(self, candidates: int = DEFAULT_CANDIDATES, max_km: float = DEFAULT_MAX_KM,
+                 hold_minutes: float = DEFAULT_ASSIGNMENT_HOLD_MINUTES):
+        self.candidates = candidates
+        self.max_km = max_km
+        self.hold_minutes = hold_minutes
+        self.last_run: Optional[AssignmentSummary] = None
+        # One run at a time per process; across processes the unique index on
+        # live reservations per delivery makes hold_batch skip the deliveries
+        # another run (or a single reservation) already holds
+        self._run_lock = threading.Lock()
+
+    def load_pending(self, db: Session, delivery_ids: Optional[Sequence[int]] = None,
+                     limit: int = DEFAULT_BATCH_LIMIT) -> List[PendingDelivery]:
+        """Oldest pending deliveries with a pickup point and no locker slot yet"""
+        has_slot = exists().where(
+            LockerReservationDB.delivery_id == DeliveryDB.id,
+            LockerReservationDB.status.in_((HELD, OCCUPIED))
+        )
+        query = (
+            select(DeliveryDB.id, DeliveryDB.project_id, ProjectDB.latitude, ProjectDB.longitude)
+            .join(ProjectDB, ProjectDB.id == DeliveryDB.project_id)
+            .where(
+                DeliveryDB.status == "pending",
+                ProjectDB.latitude.isnot(None),
+                ProjectDB.longitude.isnot(None),
+                ~has_slot
+            )
+        )
+        if delivery_ids is not None:
+            query = query.where(DeliveryDB.id.in_(list(delivery_ids)))
+        rows = db.execute(query.order_by(DeliveryDB.id).limit(limit)).tuples()
+        return [PendingDelivery(*row) for row in rows]
+
+    def load_lockers(self, db: Session) -> List[IndexedLocker]:
+        """Active lockers with at least one free slot, read fresh for planning"""
+        rows = db.execute(
+            select(ParcelLockerDB.id, ParcelLockerDB.name, ParcelLockerDB.address,
+                   ParcelLockerDB.latitude, ParcelLockerDB.longitude,
+                   ParcelLockerDB.total_capacity, ParcelLockerDB.current_occupancy)
+            .where(
+                ParcelLockerDB.is_active == True,
+                ParcelLockerDB.current_occupancy < ParcelLockerDB.total_capacity
+            )
+        ).tuples()
+        return [
+            IndexedLocker(locker_id, name, address, latitude, longitude, total, total - occupancy)
+            for locker_id, name, address, latitude, longitude, total, occupancy in rows
+        ]
+
+    def run(self, db: Session, delivery_ids: Optional[Sequence[int]] = None,
+            limit: int = DEFAULT_BATCH_LIMIT, strategy: str = "optimal",
+            hold_minutes: Optional[float] = None) -> AssignmentSummary:
+        """Plan and reserve locker slots for a batch of pending deliveries"""
+        with self._run_lock:
+            return self._run(db, delivery_ids, limit, strategy, hold_minutes)
+
+    def _run(self, db: Session, delivery_ids: Optional[Sequence[int]], limit: int,
+             strategy: str, hold_minutes: Optional[float]) -> AssignmentSummary:
+        started = time.perf_counter()
+        deliveries = self.load_pending(db, delivery_ids, limit)
+        lockers = self.load_lockers(db) if deliveries else []
+        pairs = plan_locker_assignment(deliveries, lockers, strategy, self.candidates, self.max_km)
+
+        by_locker: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        for delivery, locker, distance in pairs:
+            by_locker[locker.id].append((delivery.delivery_id, distance))
+
+        hold = hold_minutes if hold_minutes is not None else self.hold_minutes
+        assignments: List[LockerAssignment] = []
+        for locker_id, planned in by_locker.items():
+            # Should the locker have filled up meanwhile, the closest deliveries keep their slots
+            planned.sort(key=lambda item: item[1])
+            held = locker_reservations.hold_batch(
+                db, locker_id, [delivery_id for delivery_id, _ in planned], hold
+            )
+            distances = dict(planned)
+            assignments.extend(
+                LockerAssignment(delivery_id, locker_id, reservation_id, round(distances[delivery_id], 3))
+                for delivery_id, reservation_id in held
+            )
+        db.commit()
+        locker_index.refresh(db, by_locker)
+
+        summary = AssignmentSummary(
+            strategy=strategy,
+            deliveries=len(deliveries),
+            lockers=len(lockers),
+            assigned=len(assignments),
+            total_km=round(sum(a.distance_km for a in assignments), 3),
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 2),
+            assignments=assignments
+        )
+        self.last_run = summary
+        if len(assignments) < len(pairs):
+            logger.info("Locker assignment: %d of %d planned slots were taken concurrently",
+                        len(pairs) - len(assignments), len(pairs))
+        return summary
+
+
+# Global singleton instance
+locker_assigner = LockerAssigner()
@@ -0,0 +1,153 @@
+"""
+Parcel locker index
+Active lockers with their free slots, kept in memory on a grid index so a
+nearest-locker query is a ring scan over a few cells instead of a table
+scan. Writers (locker creation, deactivation and every occupancy change)
+push the affected locker back into the index after their commit, and the
+whole index is rebuilt from the database every refresh_seconds to pick up
+rows written behind its back (seeding, maintenance scripts). Only the very
+first load blocks a request; later rebuilds run on a background thread while
+lookups keep using the previous index.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ParcelLockerDB
+from services.geo_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_SECONDS = 300.0
+
+_COLUMNS = (
+    ParcelLockerDB.id, ParcelLockerDB.name, ParcelLockerDB.address,
+    ParcelLockerDB.latitude, ParcelLockerDB.longitude,
+    ParcelLockerDB.total_capacity, ParcelLockerDB.current_occupancy, ParcelLockerDB.is_active,
+)
+
+
+@dataclass(frozen=True)
+class IndexedLocker:
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    total_capacity: int
+    free_slots: int
+
+
+class LockerIndex:
+    """Nearest-locker lookups over active lockers"""
+
+    def __init__(self, refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._index = GridIndex()
+        self._lockers: Dict[int, IndexedLocker] = {}
+        self._loaded_at: Optional[float] = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lockers)
+
+    @staticmethod
+    def _entry(row) -> Optional[IndexedLocker]:
+        """Entry for a tuple in _COLUMNS order; None if the locker should not be indexed"""
+        locker_id, name, address, latitude, longitude, total_capacity, occupancy, is_active = row
+        if not is_active or latitude is None or longitude is None:
+            return None
+        total_capacity = total_capacity or 0
+        return IndexedLocker(locker_id, name, address, latitude, longitude, total_capacity,
+                             max(total_capacity - (occupancy or 0), 0))
+
+    def load(self, db: Session):
+        """Rebuild the index from every active locker"""
+        rows = db.execute(select(*_COLUMNS).where(ParcelLockerDB.is_active == True)).tuples()
+        lockers = {}
+        for row in rows:
+            entry = self._entry(row)
+            if entry is not None:
+                lockers[entry.id] = entry
+        index = GridIndex.build((entry.id, entry.latitude, entry.longitude) for entry in lockers.values())
+        with self._lock:
+            self._index, self._lockers = index, lockers
+            self._loaded_at = time.monotonic()
+        logger.info("Locker index loaded with %d active lockers", len(lockers))
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            self.load(db)
+        elif time.monotonic() - loaded_at > self.refresh_seconds and not self._reloading:
+            self._reloading = True
+            threading.Thread(target=self._reload, name="locker-index-reload", daemon=True).start()
+
+    def _reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception:
+            logger.exception("Locker index reload failed")
+        finally:
+            self._reloading = False
+            db.close()
+
+    def upsert(self, locker: ParcelLockerDB):
+        """Index a locker (or drop it if it is no longer active)"""
+        self._put(locker.id, self._entry((
+            locker.id, locker.name, locker.address, locker.latitude, locker.longitude,
+            locker.total_capacity, locker.current_occupancy, locker.is_active
+        )))
+
+    def _put(self, locker_id: int, entry: Optional[IndexedLocker]):
+        with self._lock:
+            if entry is None:
+                self._lockers.pop(locker_id, None)
+                self._index.remove(locker_id)
+                return
+            self._lockers[entry.id] = entry
+            self._index.insert(entry.id, entry.latitude, entry.longitude)
+
+    def remove(self, locker_id: int):
+        with self._lock:
+            self._lockers.pop(locker_id, None)
+            self._index.remove(locker_id)
+
+    def refresh(self, db: Session, locker_ids: Iterable[int]):
+        """Re-read lockers whose occupancy or status just changed"""
+        if self._loaded_at is None:
+            # Nothing cached yet; the first query loads everything anyway
+            return
+        locker_ids = list(locker_ids)
+        if not locker_ids:
+            return
+        rows = db.execute(select(*_COLUMNS).where(ParcelLockerDB.id.in_(locker_ids))).tuples()
+        found = set()
+        for row in rows:
+            found.add(row[0])
+            self._put(row[0], self._entry(row))
+        for locker_id in set(locker_ids) - found:
+            self.remove(locker_id)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 5, min_slots: int = 1,
+                max_km: Optional[float] = None) -> List[Tuple[float, IndexedLocker]]:
+        """Up to k (distance_km, locker) with at least min_slots free, closest first"""
+        with self._lock:
+            lockers = self._lockers
+            found = self._index.nearest(
+                latitude, longitude, k=k, max_km=max_km,
+                accept=lambda locker_id: lockers[locker_id].free_slots >= min_slots
+            )
+            return [(distance, lockers[locker_id]) for distance, locker_id in found]
+
+
+# Global singleton instance
+locker_index = LockerIndex()
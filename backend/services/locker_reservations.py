@@ -0,0 +1,266 @@
+"""
+Parcel locker reservations
+A reservation holds one slot of a locker from the moment a drop-off is
+planned: the slot is taken with a conditional UPDATE on the locker's
+occupancy, so concurrent reservations can never overfill it. Holds that are
+not confirmed by a drop-off before they expire are released by a background
+sweeper; confirmed (occupied) slots stay taken until the parcel is picked up.
+Every status change is itself a conditional UPDATE on the reservation, so a
+slot is given back exactly once however the release and the sweeper race.
+A delivery has at most one live reservation, enforced by a partial unique
+index: a second reserve() for it fails with its slot given back, and batch
+holds skip deliveries that got a slot elsewhere in the meantime.
+"""
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import crud
+from database import SessionLocal, settings
+from models import LockerReservationDB, ParcelLockerDB
+from services.locker_index import locker_index
+
+logger = logging.getLogger(__name__)
+
+HELD = "held"
+OCCUPIED = "occupied"
+RELEASED = "released"
+EXPIRED = "expired"
+SWEEP_BATCH_SIZE = 1000
+MAX_HOLD_ATTEMPTS = 5
+LIVE = (HELD, OCCUPIED)
+
+
+class DeliveryAlreadyHeld(ValueError):
+    """The delivery already has a live reservation; nothing was reserved"""
+
+
+@dataclass
+class LockerHolds:
+    """Held reservations of one locker, split by whether the hold has lapsed"""
+    live: int = 0
+    stale: int = 0
+
+
+class LockerReservationService:
+    """Slot-level accounting for parcel lockers"""
+
+    def __init__(self, hold_minutes: float = 30):
+        self.hold_minutes = hold_minutes
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def reserve(self, db: Session, locker_id: int, user_id: Optional[int] = None,
+                delivery_id: Optional[int] = None,
+                hold_minutes: Optional[float] = None) -> Optional[LockerReservationDB]:
+        """
+        Hold a slot until the hold expires; None if the locker has no free
+        slot. Raises DeliveryAlreadyHeld if the delivery already has a live
+        reservation.
+        """
+        taken = crud.take_locker_slots(db, locker_id)
+        if not taken and self.expire(db, locker_id=locker_id, commit=False):
+            # Lapsed holds the sweeper has not reached yet were pinning the locker
+            taken = crud.take_locker_slots(db, locker_id)
+        if not taken:
+            db.commit()
+            locker_index.refresh(db, [locker_id])
+            return None
+
+        hold = hold_minutes if hold_minutes is not None else self.hold_minutes
+        reservation = LockerReservationDB(
+            locker_id=locker_id,
+            user_id=user_id,
+            delivery_id=delivery_id,
+            status=HELD,
+            expires_at=datetime.utcnow() + timedelta(minutes=hold)
+        )
+        db.add(reservation)
+        try:
+            db.commit()
+        except IntegrityError:
+            # The rollback also undoes the slot taken above
+            db.rollback()
+            raise DeliveryAlreadyHeld(delivery_id)
+        db.refresh(reservation)
+        locker_index.refresh(db, [locker_id])
+        return reservation
+
+    def hold_batch(self, db: Session, locker_id: int, delivery_ids: List[int],
+                   hold_minutes: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        Hold one slot per delivery, in the caller's transaction; returns
+        (delivery_id, reservation_id) of the holds made, in the order given.
+
+        If other writers took slots since the caller last looked, as many
+        deliveries as still fit are held, in the order given; the rest are
+        left out of the result. Deliveries that already have a live
+        reservation are left out too and their slots given back.
+        """
+        wanted = len(delivery_ids)
+        for _ in range(MAX_HOLD_ATTEMPTS):
+            if wanted <= 0 or crud.take_locker_slots(db, locker_id, wanted):
+                break
+            row = db.execute(
+                select(ParcelLockerDB.total_capacity, ParcelLockerDB.current_occupancy, ParcelLockerDB.is_active)
+                .where(ParcelLockerDB.id == locker_id)
+            ).first()
+            free = row.total_capacity - row.current_occupancy if row and row.is_active else 0
+            wanted = min(wanted, max(free, 0))
+        else:
+            wanted = 0
+        if wanted <= 0:
+            return []
+
+        hold = hold_minutes if hold_minutes is not None else self.hold_minutes
+        expires_at = datetime.utcnow() + timedelta(minutes=hold)
+        inserted = dict(db.execute(
+            _insert_unless_held(db).returning(LockerReservationDB.delivery_id, LockerReservationDB.id),
+            [{"locker_id": locker_id, "delivery_id": delivery_id, "status": HELD, "expires_at": expires_at}
+             for delivery_id in delivery_ids[:wanted]]
+        ).tuples().all())
+        if len(inserted) < wanted:
+            crud.free_locker_slots(db, locker_id, wanted - len(inserted))
+        return [(delivery_id, inserted[delivery_id]) for delivery_id in delivery_ids[:wanted]
+                if delivery_id in inserted]
+
+    def confirm(self, db: Session, reservation_id: int) -> bool:
+        """Turn a live hold into an occupied slot once the parcel is dropped off"""
+        confirmed = db.execute(
+            update(LockerReservationDB)
+            .where(
+                LockerReservationDB.id == reservation_id,
+                LockerReservationDB.status == HELD,
+                LockerReservationDB.expires_at >= datetime.utcnow()
+            )
+            .values(status=OCCUPIED, expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return confirmed.rowcount == 1
+
+    def release(self, db: Session, reservation_id: int) -> bool:
+        """Give the slot back, for a cancelled hold or a picked-up parcel"""
+        reservation = db.get(LockerReservationDB, reservation_id)
+        if reservation is None:
+            return False
+        released = db.execute(
+            update(LockerReservationDB)
+            .where(
+                LockerReservationDB.id == reservation_id,
+                LockerReservationDB.status.in_((HELD, OCCUPIED))
+            )
+            .values(status=RELEASED)
+            .execution_options(synchronize_session=False)
+        )
+        if released.rowcount == 1:
+            crud.free_locker_slots(db, reservation.locker_id)
+        db.commit()
+        db.refresh(reservation)
+        if released.rowcount == 1:
+            locker_index.refresh(db, [reservation.locker_id])
+        return released.rowcount == 1
+
+    def expire(self, db: Session, locker_id: Optional[int] = None, now: Optional[datetime] = None,
+               limit: int = SWEEP_BATCH_SIZE, commit: bool = True) -> int:
+        """Release up to limit lapsed holds (of one locker, or all); returns how many"""
+        now = now or datetime.utcnow()
+        query = select(LockerReservationDB.id, LockerReservationDB.locker_id).where(
+            LockerReservationDB.status == HELD,
+            LockerReservationDB.expires_at < now
+        )
+        if locker_id is not None:
+            query = query.where(LockerReservationDB.locker_id == locker_id)
+        by_locker: Dict[int, List[int]] = defaultdict(list)
+        for reservation_id, owner_locker in db.execute(query.limit(limit)):
+            by_locker[owner_locker].append(reservation_id)
+
+        expired = 0
+        freed_lockers = []
+        for owner_locker, ids in by_locker.items():
+            # Only holds still held by the time we write count; a concurrent
+            # release or confirm of the same row makes it drop out here
+            count = db.execute(
+                update(LockerReservationDB)
+                .where(LockerReservationDB.id.in_(ids), LockerReservationDB.status == HELD)
+                .values(status=EXPIRED)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if count:
+                crud.free_locker_slots(db, owner_locker, count)
+                freed_lockers.append(owner_locker)
+                expired += count
+        if commit:
+            db.commit()
+            locker_index.refresh(db, freed_lockers)
+        return expired
+
+    def holds(self, db: Session, locker_ids: Iterable[int]) -> Dict[int, LockerHolds]:
+        """Live and lapsed-but-unswept holds per locker, in one grouped query"""
+        locker_ids = list(locker_ids)
+        if not locker_ids:
+            return {}
+        now = datetime.utcnow()
+        rows = db.execute(
+            select(
+                LockerReservationDB.locker_id,
+                func.sum(case((LockerReservationDB.expires_at >= now, 1), else_=0)),
+                func.sum(case((LockerReservationDB.expires_at < now, 1), else_=0))
+            )
+            .where(LockerReservationDB.locker_id.in_(locker_ids), LockerReservationDB.status == HELD)
+            .group_by(LockerReservationDB.locker_id)
+        ).all()
+        return {locker_id: LockerHolds(int(live or 0), int(stale or 0)) for locker_id, live, stale in rows}
+
+    def start(self, interval_seconds: float):
+        """Sweep lapsed holds every interval_seconds on a background thread"""
+        if interval_seconds <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_forever, args=(interval_seconds,),
+                                        name="locker-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run_forever(self, interval_seconds: float):
+        while not self._stop.wait(interval_seconds):
+            db = SessionLocal()
+            try:
+                # Drain in batches so one pass never holds a long write transaction
+                while self.expire(db) == SWEEP_BATCH_SIZE:
+                    pass
+            except Exception:
+                db.rollback()
+                logger.exception("Locker reservation sweep failed")
+            finally:
+                db.close()
+
+
+def _insert_unless_held(db: Session):
+    """INSERT that skips deliveries which already have a live reservation"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(LockerReservationDB.__table__).on_conflict_do_nothing(
+            index_elements=["delivery_id"], index_where=LockerReservationDB.status.in_(LIVE))
+    if dialect == "postgresql":
+        return postgresql.insert(LockerReservationDB.__table__).on_conflict_do_nothing(
+            index_elements=["delivery_id"], index_where=LockerReservationDB.status.in_(LIVE))
+    return insert(LockerReservationDB)
+
+
+# Global singleton instance
+locker_reservations = LockerReservationService(hold_minutes=settings.locker_hold_minutes)
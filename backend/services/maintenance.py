@@ -0,0 +1,206 @@
+"""
+Maintenance task framework
+Data fixes walk the target table in keyset-ordered id batches. Each batch is
+either one set-based statement or a short yield_per stream of rows, and is
+committed together with a checkpoint so an interrupted run resumes where it
+stopped. Supports dry runs, configurable batch size and progress output.
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from sqlalchemy import delete, func, select, true
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import MaintenanceCheckpointDB
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class MaintenanceTask:
+    """
+    Base class for a resumable data fix.
+
+    Subclasses set model and name, narrow the rows with criteria(), and
+    either override apply() with a set-based statement over a batch of ids
+    or override process() to handle rows one at a time.
+    """
+    name: str = ""
+    description: str = ""
+    model = None
+
+    def criteria(self):
+        """SQL condition selecting rows that still need the fix"""
+        return true()
+
+    def apply(self, db: Session, ids: List[int]):
+        """Fix one batch; the default streams the rows through process()"""
+        rows = db.execute(
+            select(self.model).where(self.model.id.in_(ids)).order_by(self.model.id)
+            .execution_options(yield_per=len(ids))
+        ).scalars()
+        for row in rows:
+            self.process(db, row)
+
+    def process(self, db: Session, row):
+        raise NotImplementedError(f"{type(self).__name__} must override apply() or process()")
+
+
+@dataclass
+class TaskResult:
+    task: str
+    processed: int
+    batches: int
+    last_id: int
+    seconds: float
+    dry_run: bool
+
+
+# ---------- checkpoints ----------
+
+def load_checkpoint(db: Session, task_name: str) -> Optional[MaintenanceCheckpointDB]:
+    return db.get(MaintenanceCheckpointDB, task_name)
+
+
+def _save_checkpoint(db: Session, task_name: str, last_id: int, processed: int):
+    checkpoint = db.get(MaintenanceCheckpointDB, task_name)
+    if checkpoint is None:
+        checkpoint = MaintenanceCheckpointDB(task=task_name)
+        db.add(checkpoint)
+    checkpoint.last_id = last_id
+    checkpoint.processed = processed
+    checkpoint.updated_at = datetime.utcnow()
+
+
+def clear_checkpoint(db: Session, task_name: str):
+    db.execute(delete(MaintenanceCheckpointDB).where(MaintenanceCheckpointDB.task == task_name))
+    db.commit()
+
+
+# ---------- runner ----------
+
+def _report(task: MaintenanceTask, processed: int, total: int, started: float, final: bool = False):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    rate = processed / elapsed
+    line = f"\r  {task.name}: {processed:,}/{total:,}"
+    if total:
+        line += f" ({100 * processed / total:.1f}%)"
+    line += f" {rate:,.0f} rows/s"
+    if not final and rate and total > processed:
+        line += f", ETA {(total - processed) / rate:,.0f}s"
+    print(line.ljust(79), end="\n" if final else "", flush=True)
+
+
+def run_task(task: MaintenanceTask, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False,
+             restart: bool = False, progress: bool = True, db: Optional[Session] = None,
+             after_id: int = 0) -> TaskResult:
+    """
+    Run a task to completion in batches of batch_size ids.
+
+    Each batch and its checkpoint commit in one transaction. A dry run only
+    counts the rows that would change and never writes. restart ignores a
+    checkpoint left by an earlier interrupted run. after_id skips the rows
+    up to it, e.g. to cover only what a bulk load appended.
+    """
+    own_session = db is None
+    session = SessionLocal() if own_session else db
+    model = task.model
+    try:
+        checkpoint = None if restart else load_checkpoint(session, task.name)
+        last_id = checkpoint.last_id if checkpoint else after_id
+        processed = checkpoint.processed if checkpoint else 0
+        if checkpoint and progress:
+            print(f"  {task.name}: resuming after id {last_id} ({processed:,} rows already done)")
+
+        remaining = session.execute(
+            select(func.count(model.id)).where(task.criteria(), model.id > last_id)
+        ).scalar()
+        total = processed + remaining
+
+        started = time.perf_counter()
+        done_before = processed
+        batches = 0
+        while True:
+            ids = session.execute(
+                select(model.id)
+                .where(task.criteria(), model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+
+            last_id = ids[-1]
+            processed += len(ids)
+            batches += 1
+            if dry_run:
+                session.rollback()
+            else:
+                task.apply(session, ids)
+                _save_checkpoint(session, task.name, last_id, processed)
+                session.commit()
+
+            if progress:
+                _report(task, processed - done_before, total - done_before, started)
+
+        if not dry_run:
+            clear_checkpoint(session, task.name)
+        if progress:
+            _report(task, processed - done_before, total - done_before, started, final=True)
+
+        return TaskResult(
+            task=task.name,
+            processed=processed,
+            batches=batches,
+            last_id=last_id,
+            seconds=time.perf_counter() - started,
+            dry_run=dry_run,
+        )
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+
+# ---------- command line ----------
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per batch/transaction (default {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--dry-run", action="store_true", help="Count affected rows without writing")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints from an interrupted run")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+    return parser
+
+
+def run_cli(tasks: Sequence[MaintenanceTask], args: argparse.Namespace) -> List[TaskResult]:
+    """Run tasks in order with the shared command-line options and print a summary"""
+    mode = "DRY RUN" if args.dry_run else "APPLY"
+    print(f"\n{'='*60}")
+    print(f"Maintenance ({mode}), batch size {args.batch_size}")
+    print(f"{'='*60}")
+
+    results = []
+    try:
+        for task in tasks:
+            if task.description:
+                print(f"\n{task.description}")
+            results.append(run_task(task, batch_size=args.batch_size, dry_run=args.dry_run,
+                                    restart=args.restart, progress=not args.quiet))
+    except KeyboardInterrupt:
+        print("\nInterrupted - rerun the same command to resume from the last checkpoint")
+        sys.exit(130)
+
+    print()
+    for result in results:
+        verb = "would process" if result.dry_run else "processed"
+        print(f"{result.task}: {verb} {result.processed:,} rows in {result.batches} batches "
+              f"({result.seconds:.1f}s)")
+    return results
@@ -0,0 +1,437 @@
+"""
+Map marker clusters
+Projects and active parcel lockers aggregated into grid clusters per zoom
+level, so the map fetches a few dozen clusters per screen instead of every
+marker. Positions are projected to Web Mercator and bucketed into cells of
+CELL_PX screen pixels at each zoom from 0 to MAX_CLUSTER_ZOOM. A cell's
+children one zoom deeper are exactly the four cells that halve it, so the
+levels form a tree: every cluster keeps its count, coordinate sums (for its
+centroid) and a representative marker, the one of its largest child, and a
+marker write touches one cell per level. Each kind has its own tree and
+mixed queries merge them.
+
+Changes reach the index from ORM hooks on projects and lockers, applied
+once their transaction commits; writes that bypass the ORM are picked up by
+the full rebuild every refresh_seconds. Results are served per XYZ tile
+(256 px, Web Mercator) from an LRU cache; a marker change drops the one
+tile per zoom that contains it. Each cached tile keeps a hash of its
+clusters, which the routes use as the ETag: it follows the content, so it
+cannot repeat after a restart or differ between workers for the same tile.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ParcelLockerDB, ProjectDB
+
+logger = logging.getLogger(__name__)
+
+PROJECT = "project"
+LOCKER = "locker"
+KINDS = (PROJECT, LOCKER)
+
+TILE_PX = 256
+CELL_PX = 64
+# Cell side is TILE_PX / CELL_PX = 2**CELL_SHIFT cells per tile side
+CELL_SHIFT = 2
+MAX_CLUSTER_ZOOM = 16
+# Beyond this, tiles list the individual markers of the finest cells
+MAX_ZOOM = 20
+MAX_LATITUDE = 85.05112878
+
+DEFAULT_REFRESH_SECONDS = 300.0
+MAX_CACHED_TILES = 4096
+
+# (kind, id)
+MarkerKey = Tuple[str, int]
+Cell = Tuple[int, int]
+TileKey = Tuple[int, int, int]
+
+
+def project(latitude: float, longitude: float) -> Tuple[float, float]:
+    """Web Mercator position in [0, 1) x [0, 1), y growing southwards"""
+    latitude = max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE)
+    x = (longitude + 180.0) / 360.0
+    sin_lat = math.sin(math.radians(latitude))
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return min(max(x, 0.0), 1 - 1e-12), min(max(y, 0.0), 1 - 1e-12)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of an XYZ tile"""
+    n = 2 ** z
+
+    def latitude(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_of(latitude: float, longitude: float, z: int) -> Tuple[int, int]:
+    x, y = project(latitude, longitude)
+    return int(x * 2 ** z), int(y * 2 ** z)
+
+
+@dataclass(frozen=True)
+class Marker:
+    kind: str
+    id: int
+    latitude: float
+    longitude: float
+
+
+@dataclass(frozen=True)
+class Cluster:
+    """One map marker: a single point when count is 1, else an aggregate"""
+    key: str
+    latitude: float
+    longitude: float
+    count: int
+    projects: int
+    lockers: int
+    representative: Marker
+
+
+class _Node:
+    """Aggregate of one cell of one kind"""
+    __slots__ = ("count", "lat_sum", "lon_sum", "representative")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.representative: Optional[Marker] = None
+
+
+class _Tree:
+    """Cluster levels 0..MAX_CLUSTER_ZOOM of one kind, plus the markers of each finest cell"""
+
+    def __init__(self):
+        self.levels: List[Dict[Cell, _Node]] = [{} for _ in range(MAX_CLUSTER_ZOOM + 1)]
+        self.members: Dict[Cell, Dict[int, Marker]] = {}
+        self.markers: Dict[int, Marker] = {}
+
+    @staticmethod
+    def finest_cell(marker: Marker) -> Cell:
+        x, y = project(marker.latitude, marker.longitude)
+        side = 2 ** (MAX_CLUSTER_ZOOM + CELL_SHIFT)
+        return int(x * side), int(y * side)
+
+    def build(self, markers: Iterable[Marker]):
+        """Bulk load: fill the finest level, then aggregate upwards level by level"""
+        finest = self.levels[MAX_CLUSTER_ZOOM]
+        for marker in markers:
+            self.markers[marker.id] = marker
+            cell = self.finest_cell(marker)
+            self.members.setdefault(cell, {})[marker.id] = marker
+        for cell, members in self.members.items():
+            node = finest[cell] = _Node()
+            node.count = len(members)
+            node.lat_sum = sum(marker.latitude for marker in members.values())
+            node.lon_sum = sum(marker.longitude for marker in members.values())
+            node.representative = members[min(members)]
+        for zoom in range(MAX_CLUSTER_ZOOM - 1, -1, -1):
+            level, children = self.levels[zoom], self.levels[zoom + 1]
+            for (cx, cy), child in children.items():
+                node = level.get((cx >> 1, cy >> 1))
+                if node is None:
+                    node = level[(cx >> 1, cy >> 1)] = _Node()
+                node.count += child.count
+                node.lat_sum += child.lat_sum
+                node.lon_sum += child.lon_sum
+            for cell in level:
+                self._pick_representative(zoom, cell)
+
+    def _pick_representative(self, zoom: int, cell: Cell):
+        """Representative of a non-finest cell: that of its largest child, the lowest cell among equals"""
+        node = self.levels[zoom][cell]
+        children = self.levels[zoom + 1]
+        cx, cy = cell
+        best = None
+        for child_cell in ((2 * cx, 2 * cy), (2 * cx + 1, 2 * cy), (2 * cx, 2 * cy + 1), (2 * cx + 1, 2 * cy + 1)):
+            child = children.get(child_cell)
+            if child is not None and (best is None or child.count > best.count):
+                best = child
+        node.representative = best.representative if best else None
+
+    def _apply(self, marker: Marker, sign: int) -> List[Cell]:
+        """Add or take away one marker along its path; returns the touched cell per zoom"""
+        cell = self.finest_cell(marker)
+        members = self.members.setdefault(cell, {})
+        if sign > 0:
+            members[marker.id] = marker
+        else:
+            members.pop(marker.id, None)
+            if not members:
+                del self.members[cell]
+        path = []
+        for zoom in range(MAX_CLUSTER_ZOOM, -1, -1):
+            level = self.levels[zoom]
+            node = level.get(cell)
+            if node is None:
+                node = level[cell] = _Node()
+            node.count += sign
+            node.lat_sum += sign * marker.latitude
+            node.lon_sum += sign * marker.longitude
+            if node.count <= 0:
+                del level[cell]
+            elif zoom == MAX_CLUSTER_ZOOM:
+                node.representative = members[min(members)]
+            else:
+                self._pick_representative(zoom, cell)
+            path.append(cell)
+            cell = (cell[0] >> 1, cell[1] >> 1)
+        path.reverse()
+        return path
+
+    def put(self, marker: Optional[Marker], marker_id: int) -> List[Marker]:
+        """Set or clear a marker; returns the markers whose tiles changed (old and new position)"""
+        touched = []
+        old = self.markers.pop(marker_id, None)
+        if old is not None:
+            if old == marker:
+                self.markers[marker_id] = old
+                return []
+            self._apply(old, -1)
+            touched.append(old)
+        if marker is not None:
+            self.markers[marker_id] = marker
+            self._apply(marker, 1)
+            touched.append(marker)
+        return touched
+
+
+class MapClusterIndex:
+    """Tile and bbox cluster queries over projects and parcel lockers"""
+
+    def __init__(self, refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._trees: Dict[str, _Tree] = {kind: _Tree() for kind in KINDS}
+        # (tile, kinds) -> (clusters, ETag)
+        self._tiles: "OrderedDict[Tuple[TileKey, Tuple[str, ...]], Tuple[List[Cluster], str]]" = OrderedDict()
+        self._loaded_at: Optional[float] = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(tree.markers) for tree in self._trees.values())
+
+    # ---------- loading ----------
+
+    def load(self, db: Session):
+        """Rebuild every level from the projects and active lockers with coordinates"""
+        trees = {kind: _Tree() for kind in KINDS}
+        trees[PROJECT].build(
+            Marker(PROJECT, project_id, latitude, longitude)
+            for project_id, latitude, longitude in db.execute(
+                select(ProjectDB.id, ProjectDB.latitude, ProjectDB.longitude)
+                .where(ProjectDB.latitude.isnot(None), ProjectDB.longitude.isnot(None))
+            ).tuples()
+        )
+        trees[LOCKER].build(
+            Marker(LOCKER, locker_id, latitude, longitude)
+            for locker_id, latitude, longitude in db.execute(
+                select(ParcelLockerDB.id, ParcelLockerDB.latitude, ParcelLockerDB.longitude)
+                .where(ParcelLockerDB.is_active == True, ParcelLockerDB.latitude.isnot(None),
+                       ParcelLockerDB.longitude.isnot(None))
+            ).tuples()
+        )
+        with self._lock:
+            self._trees = trees
+            self._tiles.clear()
+            self._loaded_at = time.monotonic()
+        logger.info("Map clusters loaded with %d projects and %d lockers",
+                    len(trees[PROJECT].markers), len(trees[LOCKER].markers))
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            self.load(db)
+        elif time.monotonic() - loaded_at > self.refresh_seconds and not self._reloading:
+            self._reloading = True
+            threading.Thread(target=self._reload, name="map-clusters-reload", daemon=True).start()
+
+    def _reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception:
+            logger.exception("Map cluster reload failed")
+        finally:
+            self._reloading = False
+            db.close()
+
+    # ---------- writes ----------
+
+    def put(self, kind: str, marker_id: int, latitude: Optional[float], longitude: Optional[float],
+            visible: bool = True):
+        """Place, move or (when not visible or without coordinates) remove a marker"""
+        if self._loaded_at is None:
+            # Nothing cached yet; the first query loads everything anyway
+            return
+        marker = Marker(kind, marker_id, latitude, longitude) \
+            if visible and latitude is not None and longitude is not None else None
+        with self._lock:
+            for moved in self._trees[kind].put(marker, marker_id):
+                self._invalidate(moved)
+
+    def _invalidate(self, marker: Marker):
+        x, y = project(marker.latitude, marker.longitude)
+        for z in range(MAX_ZOOM + 1):
+            tile = (z, int(x * 2 ** z), int(y * 2 ** z))
+            for kinds in ((PROJECT,), (LOCKER,), KINDS):
+                self._tiles.pop((tile, kinds), None)
+
+    # ---------- queries ----------
+
+    def tile(self, z: int, x: int, y: int, kinds: Sequence[str] = KINDS) -> List[Cluster]:
+        """Clusters (or, past MAX_CLUSTER_ZOOM, markers) of one XYZ tile"""
+        return self._cached(z, x, y, kinds)[0]
+
+    def etag(self, z: int, x: int, y: int, kinds: Sequence[str] = KINDS) -> str:
+        """Hash of the tile's clusters"""
+        return self._cached(z, x, y, kinds)[1]
+
+    def _cached(self, z: int, x: int, y: int, kinds: Sequence[str]) -> Tuple[List[Cluster], str]:
+        kinds = tuple(kind for kind in KINDS if kind in kinds)
+        key = ((z, x, y), kinds)
+        with self._lock:
+            cached = self._tiles.get(key)
+            if cached is not None:
+                self._tiles.move_to_end(key)
+                return cached
+            clusters = self._markers(z, x, y, kinds) if z > MAX_CLUSTER_ZOOM else self._clusters(z, x, y, kinds)
+            # Dataclass reprs spell out every field, floats included
+            etag = '"' + hashlib.sha1(repr(clusters).encode()).hexdigest()[:16] + '"'
+            cached = self._tiles[key] = (clusters, etag)
+            while len(self._tiles) > MAX_CACHED_TILES:
+                self._tiles.popitem(last=False)
+            return cached
+
+    def _clusters(self, z: int, x: int, y: int, kinds: Tuple[str, ...]) -> List[Cluster]:
+        side = 1 << CELL_SHIFT
+        clusters = []
+        for cy in range(y * side, (y + 1) * side):
+            for cx in range(x * side, (x + 1) * side):
+                nodes = [(kind, self._trees[kind].levels[z].get((cx, cy))) for kind in kinds]
+                nodes = [(kind, node) for kind, node in nodes if node is not None]
+                if not nodes:
+                    continue
+                count = sum(node.count for _, node in nodes)
+                per_kind = {kind: node.count for kind, node in nodes}
+                largest = max(nodes, key=lambda item: item[1].count)[1]
+                if count == 1:
+                    marker = largest.representative
+                    latitude, longitude = marker.latitude, marker.longitude
+                else:
+                    latitude = sum(node.lat_sum for _, node in nodes) / count
+                    longitude = sum(node.lon_sum for _, node in nodes) / count
+                clusters.append(Cluster(
+                    key=f"{z}/{cx}/{cy}",
+                    latitude=latitude,
+                    longitude=longitude,
+                    count=count,
+                    projects=per_kind.get(PROJECT, 0),
+                    lockers=per_kind.get(LOCKER, 0),
+                    representative=largest.representative
+                ))
+        return clusters
+
+    def _markers(self, z: int, x: int, y: int, kinds: Tuple[str, ...]) -> List[Cluster]:
+        # Finest cells overlapping the tile, then the markers actually inside it
+        shift = z - MAX_CLUSTER_ZOOM - CELL_SHIFT
+        if shift >= 0:
+            cells = [(x >> shift, y >> shift)]
+        else:
+            side = 1 << -shift
+            cells = [(cx, cy) for cy in range(y * side, (y + 1) * side) for cx in range(x * side, (x + 1) * side)]
+        clusters = []
+        for kind in kinds:
+            members = self._trees[kind].members
+            for cell in cells:
+                for marker in members.get(cell, {}).values():
+                    if tile_of(marker.latitude, marker.longitude, z) != (x, y):
+                        continue
+                    clusters.append(Cluster(
+                        key=f"{kind}/{marker.id}",
+                        latitude=marker.latitude,
+                        longitude=marker.longitude,
+                        count=1,
+                        projects=int(kind == PROJECT),
+                        lockers=int(kind == LOCKER),
+                        representative=marker
+                    ))
+        return clusters
+
+    def tiles_covering(self, south: float, west: float, north: float, east: float, z: int) -> List[TileKey]:
+        x0, y0 = tile_of(north, west, z)
+        x1, y1 = tile_of(south, east, z)
+        return [(z, x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+
+# Global singleton instance
+map_clusters = MapClusterIndex()
+
+
+# ---------- ORM hooks ----------
+
+_PENDING = "map_cluster_changes"
+
+
+def _project_change(target):
+    return PROJECT, target.id, target.latitude, target.longitude, True
+
+
+def _locker_change(target):
+    return LOCKER, target.id, target.latitude, target.longitude, bool(target.is_active)
+
+
+_WATCHED = {
+    ProjectDB: (_project_change, ("latitude", "longitude")),
+    ParcelLockerDB: (_locker_change, ("latitude", "longitude", "is_active")),
+}
+
+
+def _record(target, change):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_PENDING, []).append(change)
+
+
+def _after_write(mapper, connection, target):
+    describe, attributes = _WATCHED[mapper.class_]
+    state = inspect(target)
+    if state.has_identity and not any(state.attrs[name].history.has_changes() for name in attributes):
+        return
+    _record(target, describe(target))
+
+
+def _after_delete(mapper, connection, target):
+    kind = _WATCHED[mapper.class_][0](target)[0]
+    _record(target, (kind, target.id, None, None, False))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    for change in session.info.pop(_PENDING, ()):
+        map_clusters.put(*change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop(_PENDING, None)
+
+
+for _model in _WATCHED:
+    event.listen(_model, "after_insert", _after_write)
+    event.listen(_model, "after_update", _after_write)
+    event.listen(_model, "after_delete", _after_delete)
@@ -0,0 +1,309 @@
+"""
+Map points export
+Every project with coordinates and every active parcel locker as a compact
+binary payload for drawing raw markers at street zoom, instead of full JSON
+records. Points are held per kind as id-ordered columns (array.array) that
+writes update in place, and the encoded, gzipped payload is cached until
+the next change together with a hash of its bytes, the route's ETag.
+
+Payload format (little-endian):
+    b"SFMP", u8 format version (1), u8 section count, then per section:
+    u8 kind (0 project, 1 locker), u32 count, u32 coordinate units per degree,
+    followed by the columns, each byte-shuffled (all first bytes of the
+    column, then all second bytes, ...), which lets gzip squeeze the nearly
+    constant high bytes:
+        u32 id delta from the previous point (the first is the id itself)
+        i32 latitude * units, i32 longitude * units
+        u8 flags: projects bits 0-1 status (0 active, 1 in progress,
+                  2 completed, 3 archived), bit 2 verified;
+                  lockers bit 0 full
+        u8 progress: projects percent of goal collected (255 without a goal),
+                  lockers percent of capacity occupied
+
+Changes reach the snapshot from ORM hooks on projects and lockers: the ids
+written in a committed transaction are re-read on the next export. Core
+UPDATEs that matter to the map, like the locker slot accounting in crud,
+record their ids with mark_after_commit(); any other write that bypasses
+the ORM is picked up by the full reload every refresh_seconds.
+"""
+import gzip
+import hashlib
+import logging
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ParcelLockerDB, ProjectDB, ProjectStatus
+
+logger = logging.getLogger(__name__)
+
+PROJECT = "project"
+LOCKER = "locker"
+KINDS = (PROJECT, LOCKER)
+KIND_CODES = {PROJECT: 0, LOCKER: 1}
+
+MAGIC = b"SFMP"
+FORMAT_VERSION = 1
+# 1e-5 degrees is about 1 m, finer than a marker can show
+UNITS_PER_DEGREE = 100_000
+NO_GOAL = 255
+STATUS_BITS = {status: index for index, status in enumerate(
+    (ProjectStatus.ACTIVE, ProjectStatus.IN_PROGRESS, ProjectStatus.COMPLETED, ProjectStatus.ARCHIVED))}
+VERIFIED = 0b100
+LOCKER_FULL = 0b1
+
+DEFAULT_REFRESH_SECONDS = 300.0
+# Shuffled columns leave little for higher levels to find; level 1 is as small and 3x faster
+GZIP_LEVEL = 1
+
+# (id, latitude units, longitude units, flags, progress)
+Point = Tuple[int, int, int, int, int]
+
+
+def _percent(part: Optional[float], whole: Optional[float]) -> int:
+    if not whole or whole <= 0:
+        return NO_GOAL
+    return max(0, min(100, int(100 * (part or 0) / whole)))
+
+
+def project_point(project_id: int, latitude, longitude, status, is_verified, current_amount,
+                  goal_amount) -> Optional[Point]:
+    if latitude is None or longitude is None:
+        return None
+    flags = STATUS_BITS.get(ProjectStatus(status) if status else ProjectStatus.ACTIVE, 0)
+    if is_verified:
+        flags |= VERIFIED
+    return (project_id, round(latitude * UNITS_PER_DEGREE), round(longitude * UNITS_PER_DEGREE), flags,
+            _percent(current_amount, goal_amount))
+
+
+def locker_point(locker_id: int, latitude, longitude, is_active, current_occupancy,
+                 total_capacity) -> Optional[Point]:
+    if not is_active or latitude is None or longitude is None:
+        return None
+    occupied = _percent(current_occupancy, total_capacity)
+    return (locker_id, round(latitude * UNITS_PER_DEGREE), round(longitude * UNITS_PER_DEGREE),
+            LOCKER_FULL if occupied == 100 else 0, 0 if occupied == NO_GOAL else occupied)
+
+
+_COLUMNS = {
+    PROJECT: (ProjectDB, (ProjectDB.id, ProjectDB.latitude, ProjectDB.longitude, ProjectDB.status,
+                          ProjectDB.is_verified, ProjectDB.current_amount, ProjectDB.goal_amount), project_point),
+    LOCKER: (ParcelLockerDB, (ParcelLockerDB.id, ParcelLockerDB.latitude, ParcelLockerDB.longitude,
+                              ParcelLockerDB.is_active, ParcelLockerDB.current_occupancy,
+                              ParcelLockerDB.total_capacity), locker_point),
+}
+
+
+def _shuffle(column: array) -> bytes:
+    """Byte planes of a column: every item's first byte, then every second byte, ..."""
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    raw = column.tobytes()
+    return b"".join(raw[plane::column.itemsize] for plane in range(column.itemsize))
+
+
+class _Columns:
+    """Points of one kind as parallel arrays ordered by id"""
+
+    def __init__(self):
+        self.ids = array("I")
+        self.latitudes = array("i")
+        self.longitudes = array("i")
+        self.flags = array("B")
+        self.progress = array("B")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _arrays(self):
+        return self.ids, self.latitudes, self.longitudes, self.flags, self.progress
+
+    def build(self, points: Iterable[Point]):
+        for point in sorted(points):
+            for column, value in zip(self._arrays(), point):
+                column.append(value)
+
+    def put(self, point_id: int, point: Optional[Point]) -> bool:
+        """Insert, update or (point None) remove one point; True if anything changed"""
+        position = bisect_left(self.ids, point_id)
+        present = position < len(self.ids) and self.ids[position] == point_id
+        if point is None:
+            if not present:
+                return False
+            for column in self._arrays():
+                del column[position]
+            return True
+        if present:
+            if tuple(column[position] for column in self._arrays()) == point:
+                return False
+            for column, value in zip(self._arrays(), point):
+                column[position] = value
+        else:
+            for column, value in zip(self._arrays(), point):
+                column.insert(position, value)
+        return True
+
+    def encode(self, kind: str) -> bytes:
+        ids = self.ids
+        deltas = array("I", ids[:1])
+        deltas.extend(current - previous for previous, current in zip(ids, ids[1:]))
+        return b"".join((
+            struct.pack("<BII", KIND_CODES[kind], len(ids), UNITS_PER_DEGREE),
+            _shuffle(deltas), _shuffle(self.latitudes), _shuffle(self.longitudes),
+            self.flags.tobytes(), self.progress.tobytes(),
+        ))
+
+
+class MapPointsExport:
+    """Columnar snapshot of map points with a cached encoded payload per kind selection"""
+
+    def __init__(self, refresh_seconds: float = DEFAULT_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._columns: Dict[str, _Columns] = {kind: _Columns() for kind in KINDS}
+        self._pending: Dict[str, Set[int]] = {kind: set() for kind in KINDS}
+        # kinds -> (version, content hash, raw payload, gzipped payload)
+        self._payloads: Dict[Tuple[str, ...], Tuple[int, str, bytes, bytes]] = {}
+        self._version = 0
+        self._loaded_at: Optional[float] = None
+        self._reloading = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(columns) for columns in self._columns.values())
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # ---------- loading ----------
+
+    def load(self, db: Session):
+        """Rebuild every column from the database"""
+        columns = {}
+        for kind, (_, fields, to_point) in _COLUMNS.items():
+            columns[kind] = _Columns()
+            columns[kind].build(point for point in (to_point(*row) for row in db.execute(select(*fields)).tuples())
+                                if point is not None)
+        with self._lock:
+            # Marks stay: re-reading a row the load already saw is harmless, missing a write is not
+            self._columns = columns
+            self._version += 1
+            self._loaded_at = time.monotonic()
+        logger.info("Map points loaded with %d projects and %d lockers",
+                    len(columns[PROJECT]), len(columns[LOCKER]))
+
+    def ensure_loaded(self, db: Session):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            self.load(db)
+        elif time.monotonic() - loaded_at > self.refresh_seconds and not self._reloading:
+            self._reloading = True
+            threading.Thread(target=self._reload, name="map-points-reload", daemon=True).start()
+
+    def _reload(self):
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception:
+            logger.exception("Map points reload failed")
+        finally:
+            self._reloading = False
+            db.close()
+
+    # ---------- writes ----------
+
+    def mark(self, kind: str, ids: Iterable[int]):
+        """Ids whose rows changed; re-read before the next export"""
+        with self._lock:
+            self._pending[kind].update(ids)
+
+    def refresh(self, db: Session):
+        """Re-read the rows of every marked id and apply them to the columns"""
+        with self._lock:
+            pending, self._pending = self._pending, {kind: set() for kind in KINDS}
+        changed = False
+        for kind, ids in pending.items():
+            if not ids:
+                continue
+            model, fields, to_point = _COLUMNS[kind]
+            found = {row[0]: to_point(*row) for row in
+                     db.execute(select(*fields).where(model.id.in_(sorted(ids)))).tuples()}
+            with self._lock:
+                for point_id in ids:
+                    changed |= self._columns[kind].put(point_id, found.get(point_id))
+        if changed:
+            with self._lock:
+                self._version += 1
+
+    # ---------- export ----------
+
+    def payload(self, db: Session, kinds: Sequence[str] = KINDS, compressed: bool = True) -> Tuple[str, bytes]:
+        """
+        (content hash, payload) of the selected kinds, gzipped unless
+        compressed is False. The hash is of the raw payload, so it is the same
+        in every process that holds the same points.
+        """
+        self.ensure_loaded(db)
+        if any(self._pending.values()):
+            self.refresh(db)
+        kinds = tuple(kind for kind in KINDS if kind in kinds)
+        with self._lock:
+            version = self._version
+            cached = self._payloads.get(kinds)
+            if cached is None or cached[0] != version:
+                raw = b"".join([MAGIC, struct.pack("<BB", FORMAT_VERSION, len(kinds))] +
+                               [self._columns[kind].encode(kind) for kind in kinds])
+                cached = self._payloads[kinds] = (version, hashlib.sha1(raw).hexdigest()[:16], raw,
+                                                  gzip.compress(raw, GZIP_LEVEL, mtime=0))
+        return cached[1], cached[3] if compressed else cached[2]
+
+
+# Global singleton instance
+map_points = MapPointsExport()
+
+
+# ---------- ORM hooks ----------
+
+_PENDING = "map_point_changes"
+_KIND_OF = {ProjectDB: PROJECT, ParcelLockerDB: LOCKER}
+
+
+def mark_after_commit(session: Session, kind: str, ids: Iterable[int]):
+    """Have the ids re-read once the session's transaction commits, for writes the ORM hooks do not see"""
+    session.info.setdefault(_PENDING, []).extend((kind, point_id) for point_id in ids)
+
+
+def _record(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        mark_after_commit(session, _KIND_OF[mapper.class_], [target.id])
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    changes = session.info.pop(_PENDING, ())
+    for kind in KINDS:
+        ids = {point_id for changed_kind, point_id in changes if changed_kind == kind}
+        if ids:
+            map_points.mark(kind, ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop(_PENDING, None)
+
+
+for _model in _KIND_OF:
+    event.listen(_model, "after_insert", _record)
+    event.listen(_model, "after_update", _record)
+    event.listen(_model, "after_delete", _record)
@@ -0,0 +1,271 @@
+"""
+Prometheus-style application metrics
+A small dependency-free registry rendered in the Prometheus text exposition
+format, plus SQLAlchemy engine instrumentation and an event-loop lag probe.
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution with sum and count"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts followed by sum and count
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them for /metrics"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def on_collect(self, callback: Callable[[], None]):
+        """Register a callback that refreshes gauges right before rendering"""
+        self._collectors.append(callback)
+
+    def render(self) -> str:
+        for callback in self._collectors:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = MetricsRegistry()
+
+# HTTP
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status",
+    ("method", "route", "status"))
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"))
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "Database statements issued per HTTP request",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in the database per HTTP request",
+    ("method", "route"))
+
+# Database
+db_queries_total = registry.counter("db_queries_total", "Database statements executed")
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds", "Database statement latency")
+db_pool_connections = registry.gauge(
+    "db_pool_connections", "Connection pool usage", ("state",))
+
+# Routing service
+routing_cache_requests_total = registry.counter(
+    "routing_cache_requests_total", "Route cache lookups", ("result",))
+routing_backend_duration_seconds = registry.histogram(
+    "routing_backend_duration_seconds", "Routing backend request latency", ("backend", "outcome"))
+
+# Password hashing
+bcrypt_pool_pending = registry.gauge(
+    "bcrypt_pool_pending", "bcrypt operations queued or running in the hashing pool")
+
+# Event loop
+event_loop_lag_seconds = registry.histogram(
+    "event_loop_lag_seconds", "Event loop scheduling delay",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+# Background jobs
+jobs_depth = registry.gauge("jobs_depth", "Background jobs by status", ("status",))
+jobs_processed_total = registry.counter(
+    "jobs_processed_total", "Background job executions by outcome", ("job", "outcome"))
+job_queue_wait_seconds = registry.histogram(
+    "job_queue_wait_seconds", "Delay between a job becoming due and a worker starting it", ("job",))
+job_run_seconds = registry.histogram(
+    "job_run_seconds", "Background job execution time", ("job",))
+
+
+# ---------- per-request database accounting ----------
+
+class RequestDBStats:
+    """Mutable holder so queries on worker threads still reach the request"""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_request_db: ContextVar[Optional[RequestDBStats]] = ContextVar("current_request_db", default=None)
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every statement executed on the engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start_time"].pop()
+        elapsed = time.perf_counter() - started
+        db_queries_total.inc()
+        db_query_duration_seconds.observe(elapsed)
+        stats = current_request_db.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+
+def collect_pool_usage(engine: Engine):
+    """Refresh connection-pool gauges from the engine's pool"""
+    pool = engine.pool
+    for state, attr in (("size", "size"), ("checked_out", "checkedout"),
+                        ("checked_in", "checkedin"), ("overflow", "overflow")):
+        getter = getattr(pool, attr, None)
+        if getter is not None:
+            db_pool_connections.set(getter(), state=state)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Measure how late the loop wakes a sleeping task; runs until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - started - interval))
@@ -0,0 +1,107 @@
+"""
+Notification fan-out service
+Writes one inbox row per project subscriber in chunked bulk inserts. Events
+go through the persistent job queue so the publishing request returns
+immediately and a queued or half-done fan-out survives a restart: each job
+writes one chunk of subscribers and, in the same transaction, enqueues the
+job for the next chunk under a key derived from the source event, so a
+retried job neither loses nor repeats inbox rows.
+"""
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from models import JobDB, NotificationDB, SubscriptionDB
+from services.job_queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+FAN_OUT_JOB = "fan_out_notification"
+
+
+class NotificationFanout:
+    """Fan-out of project events into subscriber inboxes through the job queue"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def publish(self, project_id: int, title: str, message: str = "", type: str = "info",
+                order: Optional[str] = None, street: Optional[str] = None,
+                exclude_user_id: Optional[int] = None, event_key: Optional[str] = None,
+                db: Optional[Session] = None) -> bool:
+        """
+        Queue an event for every subscriber of a project (non-blocking).
+
+        event_key names the source event (e.g. "donation:42"); publishing the
+        same event twice fans it out once. With db the job commits with the
+        caller's transaction. Returns False for an already published event.
+        """
+        event = {
+            "project_id": project_id,
+            "title": title,
+            "message": message,
+            "type": type,
+            "order_name": order,
+            "street": street,
+            "exclude_user_id": exclude_user_id,
+            "event_key": event_key,
+            "after_id": 0,
+        }
+        return job_queue.enqueue(FAN_OUT_JOB, event,
+                                 idempotency_key=f"notify:{event_key}:0" if event_key else None, db=db)
+
+    def pending(self, db: Session) -> int:
+        """Number of fan-out jobs waiting to run"""
+        return db.execute(
+            select(func.count(JobDB.id)).where(JobDB.name == FAN_OUT_JOB, JobDB.status.in_(("queued", "running")))
+        ).scalar()
+
+    def fan_out_chunk(self, db: Session, event: dict, after_id: int = 0) -> Tuple[int, Optional[int]]:
+        """
+        Write inbox rows for the next chunk of subscribers after subscription
+        after_id, without committing. Returns (rows written, last subscription
+        id) where the id is None once every subscriber is covered.
+        """
+        project_id = event["project_id"]
+        exclude_user_id = event.get("exclude_user_id")
+        rows = db.execute(
+            select(SubscriptionDB.id, SubscriptionDB.user_id)
+            .where(SubscriptionDB.project_id == project_id, SubscriptionDB.id > after_id)
+            .order_by(SubscriptionDB.id)
+            .limit(self.chunk_size)
+        ).all()
+        values = [
+            {
+                "user_id": row.user_id,
+                "project_id": project_id,
+                "type": event["type"],
+                "title": event["title"],
+                "message": event["message"],
+                "order_name": event.get("order_name"),
+                "street": event.get("street"),
+                "is_read": False,
+            }
+            for row in rows
+            if row.user_id != exclude_user_id
+        ]
+        if values:
+            db.execute(insert(NotificationDB), values)
+        return len(values), rows[-1].id if len(rows) == self.chunk_size else None
+
+    def run_job(self, db: Session, event: dict) -> int:
+        """Job handler: one chunk, plus the job for the next one in the same transaction"""
+        written, last_id = self.fan_out_chunk(db, event, event.get("after_id", 0))
+        if last_id is not None:
+            event_key = event.get("event_key")
+            job_queue.enqueue(FAN_OUT_JOB, {**event, "after_id": last_id},
+                              idempotency_key=f"notify:{event_key}:{last_id}" if event_key else None, db=db)
+        else:
+            logger.info(f"Fanned out notification for project {event['project_id']}")
+        return written
+
+
+# Global singleton instance
+notification_fanout = NotificationFanout()
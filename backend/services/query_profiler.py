@@ -0,0 +1,93 @@
+"""
+Per-request SQL profiler
+Records statement counts, database time and the slowest statements (with
+normalised SQL) for sampled requests, and flags N+1 patterns where the same
+normalised statement repeats many times within one request.
+"""
+import heapq
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NAMED_PARAM = re.compile(r"(?::\w+|%\(\w+\)s|\$\d+)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse literals, bind parameters and IN-lists so equivalent queries group together"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _NAMED_PARAM.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _PARAM_LIST.sub("(?...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class RequestProfile:
+    """Statements executed while serving one request"""
+    __slots__ = ("count", "seconds", "groups", "_slowest", "_keep")
+
+    def __init__(self, keep_slowest: int = 5):
+        self.count = 0
+        self.seconds = 0.0
+        # normalised sql -> [executions, total seconds]
+        self.groups: Dict[str, List[float]] = {}
+        self._slowest: List[tuple] = []
+        self._keep = keep_slowest
+
+    def record(self, statement: str, elapsed: float):
+        normalized = normalize_sql(statement)
+        self.count += 1
+        self.seconds += elapsed
+        group = self.groups.get(normalized)
+        if group is None:
+            self.groups[normalized] = [1, elapsed]
+        else:
+            group[0] += 1
+            group[1] += elapsed
+        entry = (elapsed, self.count, normalized)
+        if len(self._slowest) < self._keep:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[dict]:
+        return [
+            {"sql": sql, "ms": round(elapsed * 1000, 3)}
+            for elapsed, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def repeated(self, threshold: int) -> List[dict]:
+        """Normalised statements executed more than threshold times (likely N+1)"""
+        return [
+            {"sql": sql, "count": int(count), "ms": round(total * 1000, 3)}
+            for sql, (count, total) in sorted(self.groups.items(), key=lambda item: -item[1][0])
+            if count > threshold
+        ]
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def attach_profiler(engine: Engine):
+    """Hook the engine so statements land in the active request profile"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profiler_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is None:
+            return
+        starts = conn.info.get("profiler_start_time")
+        if starts:
+            profile.record(statement, time.perf_counter() - starts.pop())
@@ -0,0 +1,187 @@
+"""
+Order-statistic treap
+A balanced search tree over distinct sortable keys in which every node also
+knows the size of its subtree, so besides insert and remove in O(log n) it
+answers "how many keys sort before this one" (rank) and "which key is k-th"
+(select) in O(log n) without walking the keys in between. Balance comes from
+random heap priorities; a tree built from already sorted keys is assembled
+in O(n) with the Cartesian tree construction instead of n inserts.
+"""
+import random
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key: Any, priority: float):
+        self.key = key
+        self.priority = priority
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.size = 1
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node: Optional[_Node], key: Any) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """Keys < key to the left tree, keys >= key to the right one"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """Join two trees where every key of left sorts before every key of right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+class RankTree:
+    """Sorted set with rank and select by position"""
+
+    def __init__(self, keys: Iterable[Any] = (), seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._root: Optional[_Node] = None
+        self._root = self._build(sorted(keys))
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __contains__(self, key: Any) -> bool:
+        node = self._root
+        while node is not None:
+            if key == node.key:
+                return True
+            node = node.left if key < node.key else node.right
+        return False
+
+    def _build(self, keys: List[Any]) -> Optional[_Node]:
+        """Cartesian tree over sorted keys: a right-spine stack, then sizes bottom-up"""
+        spine: List[_Node] = []
+        for key in keys:
+            node = _Node(key, self._random.random())
+            last = None
+            while spine and spine[-1].priority < node.priority:
+                last = spine.pop()
+            node.left = last
+            if spine:
+                spine[-1].right = node
+            spine.append(node)
+        if not spine:
+            return None
+        # Children before parents: reverse of a pre-order walk
+        order, stack = [], [spine[0]]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(child for child in (node.left, node.right) if child is not None)
+        for node in reversed(order):
+            _update(node)
+        return spine[0]
+
+    def insert(self, key: Any) -> bool:
+        """Add key; False if it was already present"""
+        if key in self:
+            return False
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, self._random.random())), right)
+        return True
+
+    def remove(self, key: Any) -> bool:
+        """Drop key; False if it was not present"""
+        parent, node = None, self._root
+        while node is not None and node.key != key:
+            parent, node = node, node.left if key < node.key else node.right
+        if node is None:
+            return False
+        joined = _merge(node.left, node.right)
+        if parent is None:
+            self._root = joined
+        elif parent.left is node:
+            parent.left = joined
+        else:
+            parent.right = joined
+        # Every ancestor lost exactly one descendant
+        ancestor = self._root
+        while ancestor is not joined and ancestor is not None:
+            ancestor.size -= 1
+            if ancestor is parent:
+                break
+            ancestor = ancestor.left if key < ancestor.key else ancestor.right
+        return True
+
+    def rank(self, key: Any) -> int:
+        """Number of keys sorting before key (its 0-based position if present)"""
+        position, node = 0, self._root
+        while node is not None:
+            if key <= node.key:
+                node = node.left
+            else:
+                position += _size(node.left) + 1
+                node = node.right
+        return position
+
+    def select(self, position: int) -> Any:
+        """Key at 0-based position; IndexError when out of range"""
+        if not 0 <= position < len(self):
+            raise IndexError("RankTree position out of range")
+        node = self._root
+        while True:
+            left = _size(node.left)
+            if position < left:
+                node = node.left
+            elif position == left:
+                return node.key
+            else:
+                position -= left + 1
+                node = node.right
+
+    def slice(self, start: int, stop: int) -> Iterator[Any]:
+        """Keys at positions start..stop-1 in order, in O(log n + stop - start)"""
+        start, stop = max(start, 0), min(stop, len(self))
+        if start >= stop:
+            return
+        # Descend to the start key, remembering the ancestors still to the right
+        stack, node, position = [], self._root, start
+        while node is not None:
+            left = _size(node.left)
+            if position < left:
+                stack.append(node)
+                node = node.left
+            elif position == left:
+                stack.append(node)
+                break
+            else:
+                position -= left + 1
+                node = node.right
+        remaining = stop - start
+        while stack and remaining:
+            node = stack.pop()
+            yield node.key
+            remaining -= 1
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
@@ -9,6 +9,9 @@ from typing import List, Dict, Optional, Tuple, Union
 from pydantic import BaseModel
 import httpx
 import logging
+import time
+
+from services.metrics import routing_cache_requests_total, routing_backend_duration_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -47,6 +50,7 @@ class RoutingService:
         self.valhalla_url = valhalla_url
         self.session = None
         self.osrm_url = "https://router.project-osrm.org/route/v1/driving"
+        self.osrm_table_url = "https://router.project-osrm.org/table/v1/driving"
         
     async def init_session(self):
         """Initialize async HTTP session"""
@@ -136,7 +140,9 @@ class RoutingService:
         cache_key = self._get_cache_key(locations)
         if cache_key in _route_cache:
             logger.info(f"✓ Route cache hit")
+            routing_cache_requests_total.inc(result="hit")
             return _route_cache[cache_key]
+        routing_cache_requests_total.inc(result="miss")
         
         # 2. Try OSRM with strict timeout (1-3 seconds max)
         osrm_route = await self._try_osrm_route(locations)
@@ -152,6 +158,8 @@ class RoutingService:
     
     async def _try_osrm_route(self, locations: List[Location]) -> Optional[RouteResponse]:
         """Try OSRM with 3-second timeout"""
+        started = time.perf_counter()
+        outcome = "error"
         try:
             coords_str = ";".join([f"{loc.lon},{loc.lat}" for loc in locations])
             url = f"{self.osrm_url}/{coords_str}?overview=full&geometries=geojson&steps=false"
@@ -180,6 +188,7 @@ class RoutingService:
                     duration = route.get("duration", 0)  # seconds
                     
                     logger.info(f"✓ OSRM route: {distance/1000:.2f} km, {duration:.0f} sec")
+                    outcome = "ok"
                     
                     return RouteResponse(
                         distance=distance,
@@ -189,9 +198,14 @@ class RoutingService:
                     )
         
         except asyncio.TimeoutError:
+            outcome = "timeout"
             logger.warning("⏱ OSRM timeout (3s), using fallback")
         except Exception as e:
             logger.warning(f"⚠ OSRM error: {e}")
+        finally:
+            routing_backend_duration_seconds.observe(
+                time.perf_counter() - started, backend="osrm", outcome=outcome
+            )
         
         return None
     
@@ -211,6 +225,51 @@ class RoutingService:
         
         return matrix
     
+    async def get_distances_from(self, origin: Location, destinations: List[Location]) -> Tuple[List[float], str]:
+        """
+        Road distances in meters from origin to each destination, one row of
+        the OSRM table, with the straight-line distance as fallback.
+        Returns (distances, source) where source is "osrm" or "haversine".
+        """
+        if not destinations:
+            return [], "haversine"
+        
+        cache_key = "table_" + self._get_cache_key([origin] + destinations)
+        if cache_key in _route_cache:
+            routing_cache_requests_total.inc(result="hit")
+            return _route_cache[cache_key], "osrm"
+        routing_cache_requests_total.inc(result="miss")
+        
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            coords_str = ";".join(f"{loc.lon},{loc.lat}" for loc in [origin] + destinations)
+            url = f"{self.osrm_table_url}/{coords_str}?sources=0&annotations=distance"
+            await self.init_session()
+            response = await asyncio.wait_for(self.session.get(url), timeout=3.0)
+            if response.status_code == 200:
+                data = response.json()
+                row = (data.get("distances") or [None])[0]
+                if data.get("code") == "Ok" and row and None not in row:
+                    outcome = "ok"
+                    distances = [float(d) for d in row[1:]]
+                    _route_cache[cache_key] = distances
+                    return distances, "osrm"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning("⏱ OSRM table timeout (3s), using fallback")
+        except Exception as e:
+            logger.warning(f"⚠ OSRM table error: {e}")
+        finally:
+            routing_backend_duration_seconds.observe(
+                time.perf_counter() - started, backend="osrm_table", outcome=outcome
+            )
+        
+        return [
+            self._get_haversine_distance(origin.lat, origin.lon, loc.lat, loc.lon) * 1000
+            for loc in destinations
+        ], "haversine"
+    
     def optimize_route(self, locations: List[Location]) -> List[int]:
         """Quick greedy optimization: nearest unvisited neighbor"""
         if len(locations) <= 2:
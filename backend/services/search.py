@@ -0,0 +1,687 @@
+"""
+Full-text search
+Projects (name, description), issues (title, description) and comments
+(content) are indexed into one search table: an FTS5 virtual table on
+SQLite, a tsvector column with a GIN index on PostgreSQL. Results are
+ranked by relevance (BM25 on SQLite, ts_rank_cd on PostgreSQL) with titles
+weighted above bodies. Result pages are filled from the base tables, so
+hits always show current text and rows deleted behind the index's back
+simply drop out.
+
+Every document also carries its project's location, so "bread within 3 km"
+is a single index query. On SQLite the location is stored as grid-cell
+tokens at a few resolutions; a radius query ORs the cells covering its
+bounding box into the MATCH expression, so text and area are intersected
+inside FTS5 before the exact distance check.
+
+Ranking cost grows with the number of matches (on SQLite BM25 is scored
+here, with document frequencies cached, since FTS5's bm25() rereads every
+term's full posting list on each query), and scoring every document a
+common word occurs in takes seconds. A query with at most
+RANK_ALL_MATCHES matches has all of them ranked (on SQLite: one whose
+rarest word is in at most that many documents). A broader one ranks a
+pool picked by a relevance proxy instead: documents with every query word
+in the title first, as a title occurrence outweighs TITLE_WEIGHT body
+ones, then the rest, newest first within each tier. The pool holds
+RANK_CANDIDATES documents, or as many as the requested page reaches.
+
+Tokenisation: FTS5 ships no Russian stemmer, so on SQLite words are
+stemmed here before indexing and querying alike, with a light suffix strip
+for Russian case endings and English plurals and verb forms; ё is folded
+to е. PostgreSQL's 'russian' configuration stems Cyrillic words with Snowball
+and Latin ones with the English stemmer by itself.
+
+The index is maintained from ORM flush events in the same transaction as
+the write. Bulk Core statements (datagen, maintenance scripts) bypass those
+events; rebuild_search_index.py re-indexes everything from the base tables.
+"""
+import html
+import json
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.engine import Connection
+
+from database import Base
+from models import CommentDB, IssueDB, ProjectDB
+from services.geo import bounding_box, haversine_km, km_to_distance_key
+
+logger = logging.getLogger(__name__)
+
+PROJECT = "project"
+ISSUE = "issue"
+COMMENT = "comment"
+DOC_TYPES = (PROJECT, ISSUE, COMMENT)
+_TYPE_CODES = {PROJECT: 1, ISSUE: 2, COMMENT: 3}
+
+MAX_QUERY_TERMS = 8
+MIN_TERM_LENGTH = 2
+RANK_ALL_MATCHES = 2000
+RANK_CANDIDATES = 500
+BM25_K1 = 1.2
+BM25_B = 0.75
+FREQUENCY_CACHE_SIZE = 10000
+FREQUENCY_CACHE_SECONDS = 600.0
+# Title matches count this many times a body match
+TITLE_WEIGHT = 10.0
+SNIPPET_TOKENS = 16
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# Grid cell sizes in degrees, finest first; a radius query uses the finest
+# level whose cover of the bounding box stays within MAX_QUERY_CELLS
+CELL_LEVELS = (0.01, 0.1, 1.0)
+MAX_QUERY_CELLS = 16
+
+_TOKEN_RE = re.compile(r"\w+")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+# Suffix -> replacement; the longest matching suffix wins
+_RUSSIAN_ENDINGS = dict.fromkeys((
+    "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ией", "ием", "иях",
+    "ах", "ях", "ов", "ев", "ей", "ой", "ом", "ем", "ам", "ям", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ый", "ий", "ую", "юю", "ых", "их", "ия", "ью", "ье",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), "")
+_ENGLISH_ENDINGS = {
+    "sses": "ss", "ches": "ch", "shes": "sh", "ies": "y", "xes": "x",
+    "ing": "", "ed": "", "s": "",
+}
+_ENDING_LENGTHS = (4, 3, 2, 1)
+MIN_STEM_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    doc_type: str
+    doc_id: int
+    project_id: int
+    title: str
+    body: str
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+    @property
+    def key(self) -> int:
+        return document_key(self.doc_type, self.doc_id)
+
+
+@dataclass
+class SearchHit:
+    doc_type: str
+    doc_id: int
+    project_id: int
+    title: str
+    snippet: str
+    score: float
+    distance_km: Optional[float] = None
+
+
+@dataclass
+class SearchPage:
+    hits: List[SearchHit]
+    page: int
+    page_size: int
+    has_more: bool
+
+
+def document_key(doc_type: str, doc_id: int) -> int:
+    """Row id in the search table; one id space shared by all document types"""
+    return doc_id * 4 + _TYPE_CODES[doc_type]
+
+
+def normalize_text(value: Optional[str]) -> str:
+    # unicode61 folds diacritics but keeps ё distinct from е
+    return (value or "").lower().replace("ё", "е")
+
+
+def stem_term(token: str) -> str:
+    """Light stemmer: strip a Russian inflectional ending or an English plural/verb suffix"""
+    if _CYRILLIC_RE.search(token):
+        endings = _RUSSIAN_ENDINGS
+    elif token.endswith(("ss", "us", "is")):
+        return token
+    else:
+        endings = _ENGLISH_ENDINGS
+    for length in _ENDING_LENGTHS:
+        if len(token) - length < MIN_STEM_LENGTH:
+            continue
+        replacement = endings.get(token[-length:])
+        if replacement is not None:
+            return token[:-length] + replacement
+    return token
+
+
+def index_text(value: Optional[str]) -> str:
+    return " ".join(stem_term(token) for token in _TOKEN_RE.findall(normalize_text(value)))
+
+
+def parse_query(query: str) -> List[str]:
+    """Stemmed search terms of a user query; every one of them must match"""
+    terms = []
+    for token in _TOKEN_RE.findall(normalize_text(query)):
+        if len(token) < MIN_TERM_LENGTH:
+            continue
+        term = stem_term(token)
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def make_snippet(value: Optional[str], terms: Sequence[str], tokens: int = SNIPPET_TOKENS) -> str:
+    """HTML-escaped excerpt around the first match, matched words wrapped in <mark>"""
+    value = value or ""
+    words = list(_TOKEN_RE.finditer(value))
+    if not words:
+        return html.escape(value.strip())
+    terms = set(terms)
+    marked = [stem_term(normalize_text(word.group())) in terms for word in words]
+    first = marked.index(True) if True in marked else 0
+    start = max(0, min(first - tokens // 4, len(words) - tokens))
+    end = min(start + tokens, len(words))
+
+    parts = ["…" if start > 0 else ""]
+    position = words[start].start()
+    for word, is_match in zip(words[start:end], marked[start:end]):
+        parts.append(html.escape(value[position:word.start()]))
+        parts.append(f"{HIGHLIGHT_START}{html.escape(word.group())}{HIGHLIGHT_END}" if is_match
+                     else html.escape(word.group()))
+        position = word.end()
+    parts.append("…" if end < len(words) else html.escape(value[position:]))
+    return "".join(parts).strip()
+
+
+def _cell_token(level: int, lat_index: int, lon_index: int) -> str:
+    return f"g{level}{'p' if lat_index >= 0 else 'm'}{abs(lat_index)}{'p' if lon_index >= 0 else 'm'}{abs(lon_index)}"
+
+
+def cell_tokens(latitude: Optional[float], longitude: Optional[float]) -> List[str]:
+    """Grid cell of a point at every level"""
+    if latitude is None or longitude is None:
+        return []
+    return [_cell_token(level, math.floor(latitude / size), math.floor(longitude / size))
+            for level, size in enumerate(CELL_LEVELS)]
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> Optional[List[str]]:
+    """Cells covering a circle at the finest usable level; None if it is too large for any"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    for level, size in enumerate(CELL_LEVELS):
+        lat_range = range(math.floor(min_lat / size), math.floor(max_lat / size) + 1)
+        lon_range = range(math.floor(min_lon / size), math.floor(max_lon / size) + 1)
+        if len(lat_range) * len(lon_range) <= MAX_QUERY_CELLS:
+            return [_cell_token(level, i, j) for i in lat_range for j in lon_range]
+    return None
+
+
+@dataclass
+class _GeoFilter:
+    latitude: float
+    longitude: float
+    radius_km: float
+
+    def __post_init__(self):
+        self.cos2 = math.cos(math.radians(self.latitude)) ** 2
+        self.max_key = km_to_distance_key(self.radius_km)
+
+    def distance_key(self, latitude: float, longitude: float) -> float:
+        """Same squared-degree key as geo.distance_key_sql"""
+        return (latitude - self.latitude) ** 2 + (longitude - self.longitude) ** 2 * self.cos2
+
+    def distance_params(self) -> Dict[str, float]:
+        return {"lat": self.latitude, "lon": self.longitude, "cos2": self.cos2, "max_key": self.max_key}
+
+
+_DISTANCE_FILTER = """
+    AND (latitude - :lat) * (latitude - :lat) + (longitude - :lon) * (longitude - :lon) * :cos2 <= :max_key
+"""
+
+
+class _SqliteBackend:
+    """
+    FTS5 virtual table; rowid is the document key.
+
+    FTS5 finds the matching documents and hands back the candidates in
+    rowid order, which only walks doclists: every match when the rarest
+    query word is in at most RANK_ALL_MATCHES documents, else the title
+    tier and then the others.
+    BM25 is then computed here over those candidates: FTS5's own bm25()
+    reads the full doclist of every phrase in the query (including the
+    type and cell tokens) to work out its IDF on each call, which costs far
+    more than the ranking itself once a term is in a large share of rows.
+    Document frequencies are cached instead. With nothing positional left
+    to compute the index keeps no token offsets (detail=column), which
+    roughly halves its posting lists and the cost of multi-word AND queries.
+    """
+
+    schema = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+            title, body, tags,
+            latitude UNINDEXED, longitude UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2',
+            detail = column
+        )
+        """,
+    ]
+
+    def __init__(self):
+        self._frequencies: Dict[str, Tuple[int, float]] = {}
+        self._documents: Optional[Tuple[int, float]] = None
+
+    def write(self, conn: Connection, documents: Sequence[SearchDocument]):
+        self.delete(conn, [document.key for document in documents])
+        conn.execute(
+            text("INSERT INTO search_fts (rowid, title, body, tags, latitude, longitude) "
+                 "VALUES (:key, :title, :body, :tags, :latitude, :longitude)"),
+            [
+                {
+                    "key": document.key,
+                    "title": index_text(document.title),
+                    "body": index_text(document.body),
+                    # Document type and location as tokens, so both filter inside the MATCH
+                    "tags": " ".join([f"t{_TYPE_CODES[document.doc_type]}"]
+                                     + cell_tokens(document.latitude, document.longitude)),
+                    "latitude": document.latitude,
+                    "longitude": document.longitude,
+                }
+                for document in documents
+            ]
+        )
+
+    def delete(self, conn: Connection, keys: Sequence[int]):
+        if keys:
+            conn.execute(text("DELETE FROM search_fts WHERE rowid = :key"), [{"key": key} for key in keys])
+
+    def is_empty(self, conn: Connection) -> bool:
+        return conn.execute(text("SELECT 1 FROM search_fts LIMIT 1")).first() is None
+
+    def clear(self, conn: Connection):
+        conn.execute(text("DELETE FROM search_fts"))
+        self._frequencies.clear()
+        self._documents = None
+
+    def _document_count(self, conn: Connection) -> int:
+        now = time.monotonic()
+        if self._documents is None or self._documents[1] <= now:
+            # One row per document in the docsize shadow table; a count over search_fts reads every row
+            count = conn.execute(text("SELECT count(*) FROM search_fts_docsize")).scalar()
+            self._documents = (count, now + FREQUENCY_CACHE_SECONDS)
+        return self._documents[0]
+
+    def _document_frequency(self, conn: Connection, term: str) -> int:
+        now = time.monotonic()
+        cached = self._frequencies.get(term)
+        if cached is None or cached[1] <= now:
+            count = conn.execute(
+                text("SELECT count(*) FROM search_fts WHERE search_fts MATCH :match"),
+                {"match": f'{{title body}} : "{term}"'}
+            ).scalar()
+            if len(self._frequencies) >= FREQUENCY_CACHE_SIZE:
+                self._frequencies.clear()
+            cached = self._frequencies[term] = (count, now + FREQUENCY_CACHE_SECONDS)
+        return cached[0]
+
+    @staticmethod
+    def _newest(conn: Connection, match: str, limit: int) -> List[int]:
+        return conn.execute(
+            text("SELECT rowid FROM search_fts WHERE search_fts MATCH :match ORDER BY rowid DESC LIMIT :limit"),
+            {"match": match, "limit": limit}
+        ).scalars().all()
+
+    def search(self, conn: Connection, query: str, terms: List[str], types: Sequence[str],
+               geo: Optional[_GeoFilter], limit: int, offset: int) -> List[Tuple[int, float]]:
+        words = "(" + " AND ".join(f'"{term}"' for term in terms) + ")"
+        filters = ""
+        if len(types) < len(DOC_TYPES):
+            filters += " AND tags : (" + " OR ".join(f"t{_TYPE_CODES[t]}" for t in types) + ")"
+        if geo is not None:
+            cells = covering_cells(geo.latitude, geo.longitude, geo.radius_km)
+            if cells is not None:
+                filters += " AND tags : (" + " OR ".join(cells) + ")"
+        match = "{title body} : " + words + filters
+        frequencies = {term: self._document_frequency(conn, term) for term in terms}
+        # The rarest word bounds the number of matches
+        if min(frequencies.values()) <= RANK_ALL_MATCHES:
+            keys = self._newest(conn, match, RANK_ALL_MATCHES)
+        else:
+            pool = max(RANK_CANDIDATES, offset + limit)
+            keys = self._newest(conn, "title : " + words + filters, pool)
+            if len(keys) < pool:
+                in_title = set(keys)
+                keys += [key for key in self._newest(conn, match, pool + len(keys))
+                         if key not in in_title][:pool - len(keys)]
+        # Stemmed text and location straight from the content shadow table (c0 title, c1 body,
+        # c3 latitude, c4 longitude): a primary key lookup, several times faster than reading
+        # the same columns through search_fts
+        candidates = conn.execute(
+            text("SELECT id, c0, c1, c3, c4 FROM search_fts_content WHERE id IN (SELECT value FROM json_each(:keys))"),
+            {"keys": json.dumps(keys)}
+        ).all() if keys else []
+        if geo is not None:
+            # The cells cover the bounding box; keep what lies inside the circle
+            candidates = [row for row in candidates if row[3] is not None and row[4] is not None
+                          and geo.distance_key(row[3], row[4]) <= geo.max_key]
+        if len(candidates) <= offset:
+            return []
+
+        documents = self._document_count(conn)
+        idf = {term: math.log(1 + (documents - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+        # BM25 over title and body as one field, a title occurrence counting TITLE_WEIGHT times
+        fields = [(key, title.split(), body.split()) for key, title, body, _, _ in candidates]
+        lengths = [TITLE_WEIGHT * len(title) + len(body) for _, title, body in fields]
+        average = sum(lengths) / len(lengths) or 1.0
+        scored = []
+        for (key, title, body), length in zip(fields, lengths):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average)
+            score = 0.0
+            for term, weight in idf.items():
+                tf = TITLE_WEIGHT * title.count(term) + body.count(term)
+                score += weight * tf * (BM25_K1 + 1) / (tf + norm)
+            scored.append((score, key))
+        # Best first, newest first among equals
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return [(key, score) for score, key in scored[offset:offset + limit]]
+
+
+class _PostgresBackend:
+    """Plain table with a generated tsvector; the 'russian' config stems both languages"""
+
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS search_documents (
+            id BIGINT PRIMARY KEY,
+            doc_type VARCHAR(16) NOT NULL,
+            title TEXT NOT NULL DEFAULT '',
+            body TEXT NOT NULL DEFAULT '',
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION,
+            document TSVECTOR GENERATED ALWAYS AS (
+                setweight(to_tsvector('russian', title), 'A') || setweight(to_tsvector('russian', body), 'D')
+            ) STORED
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_document ON search_documents USING GIN (document)",
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_latitude_longitude ON search_documents (latitude, longitude)",
+    ]
+
+    def write(self, conn: Connection, documents: Sequence[SearchDocument]):
+        if not documents:
+            return
+        conn.execute(
+            text("""
+                INSERT INTO search_documents (id, doc_type, title, body, latitude, longitude)
+                VALUES (:key, :doc_type, :title, :body, :latitude, :longitude)
+                ON CONFLICT (id) DO UPDATE SET
+                    title = EXCLUDED.title, body = EXCLUDED.body,
+                    latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude
+            """),
+            [
+                {
+                    "key": document.key,
+                    "doc_type": document.doc_type,
+                    "title": normalize_text(document.title),
+                    "body": normalize_text(document.body),
+                    "latitude": document.latitude,
+                    "longitude": document.longitude,
+                }
+                for document in documents
+            ]
+        )
+
+    def delete(self, conn: Connection, keys: Sequence[int]):
+        if keys:
+            conn.execute(text("DELETE FROM search_documents WHERE id = ANY(:keys)"), {"keys": list(keys)})
+
+    def is_empty(self, conn: Connection) -> bool:
+        return conn.execute(text("SELECT 1 FROM search_documents LIMIT 1")).first() is None
+
+    def clear(self, conn: Connection):
+        conn.execute(text("TRUNCATE search_documents"))
+
+    def search(self, conn: Connection, query: str, terms: List[str], types: Sequence[str],
+               geo: Optional[_GeoFilter], limit: int, offset: int) -> List[Tuple[int, float]]:
+        words = _TOKEN_RE.findall(normalize_text(query))
+        params: Dict[str, object] = {"query": normalize_text(query), "types": list(types), "limit": limit,
+                                     "offset": offset, "all": RANK_ALL_MATCHES,
+                                     "pool": max(RANK_CANDIDATES, offset + limit),
+                                     # Every word, in the title (weight A) only
+                                     "title_query": " & ".join(f"{word}:A" for word in words)}
+        filters = "doc_type = ANY(:types)"
+        if geo is not None:
+            min_lat, max_lat, min_lon, max_lon = bounding_box(geo.latitude, geo.longitude, geo.radius_km)
+            filters += (" AND latitude BETWEEN :min_lat AND :max_lat AND longitude BETWEEN :min_lon AND :max_lon"
+                        + _DISTANCE_FILTER)
+            params.update(geo.distance_params(), min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+        matches = f"""
+            SELECT id, document FROM search_documents, plainto_tsquery('russian', :query) AS query
+            WHERE document @@ query AND {filters}
+        """
+        broad = conn.execute(
+            text(f"SELECT count(*) FROM ({matches} LIMIT :all + 1) AS found"), params
+        ).scalar() > RANK_ALL_MATCHES
+        if broad:
+            # Pool picked by title matches first, then the other matches; newest first in each tier
+            matches = f"""
+                SELECT id, document FROM (
+                    (SELECT id, document, 0 AS tier FROM search_documents
+                     WHERE document @@ to_tsquery('russian', :title_query) AND {filters}
+                     ORDER BY id DESC LIMIT :pool)
+                    UNION ALL
+                    (SELECT id, document, 1 AS tier FROM search_documents, plainto_tsquery('russian', :query) AS query
+                     WHERE document @@ query AND NOT document @@ to_tsquery('russian', :title_query) AND {filters}
+                     ORDER BY id DESC LIMIT :pool)
+                ) AS tiers
+                ORDER BY tier, id DESC LIMIT :pool
+            """
+        return conn.execute(
+            text(f"""
+                SELECT id, ts_rank_cd('{{0.1, 0.2, 0.4, 1.0}}', document, q.query) AS score
+                FROM ({matches}) AS candidates, plainto_tsquery('russian', :query) AS q(query)
+                ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset
+            """),
+            params
+        ).all()
+
+
+_BACKENDS = {"sqlite": _SqliteBackend(), "postgresql": _PostgresBackend()}
+
+
+class SearchIndex:
+    """Search over projects, issues and comments, kept in step with ORM writes"""
+
+    @staticmethod
+    def backend(conn: Connection):
+        return _BACKENDS.get(conn.dialect.name)
+
+    def ensure_schema(self, conn: Connection):
+        """Create the search table if it is missing, in the caller's transaction"""
+        backend = self.backend(conn)
+        if backend is None:
+            logger.warning("Full-text search is not available on %s", conn.dialect.name)
+            return
+        for statement in backend.schema:
+            conn.execute(text(statement))
+
+    # ---------- documents from the base tables ----------
+
+    @staticmethod
+    def project_documents(conn: Connection, project_ids: Iterable[int]) -> List[SearchDocument]:
+        rows = conn.execute(
+            select(ProjectDB.id, ProjectDB.name, ProjectDB.description, ProjectDB.latitude, ProjectDB.longitude)
+            .where(ProjectDB.id.in_(list(project_ids)))
+        ).tuples()
+        return [SearchDocument(PROJECT, project_id, project_id, name or "", description or "", latitude, longitude)
+                for project_id, name, description, latitude, longitude in rows]
+
+    @staticmethod
+    def issue_documents(conn: Connection, issue_ids: Iterable[int] = (),
+                        project_id: Optional[int] = None) -> List[SearchDocument]:
+        query = (
+            select(IssueDB.id, IssueDB.project_id, IssueDB.title, IssueDB.description,
+                   ProjectDB.latitude, ProjectDB.longitude)
+            .join(ProjectDB, ProjectDB.id == IssueDB.project_id)
+        )
+        query = query.where(IssueDB.project_id == project_id) if project_id is not None \
+            else query.where(IssueDB.id.in_(list(issue_ids)))
+        return [SearchDocument(ISSUE, issue_id, owner, title or "", description or "", latitude, longitude)
+                for issue_id, owner, title, description, latitude, longitude in conn.execute(query).tuples()]
+
+    @staticmethod
+    def comment_documents(conn: Connection, comment_ids: Iterable[int] = (),
+                          project_id: Optional[int] = None) -> List[SearchDocument]:
+        query = (
+            select(CommentDB.id, CommentDB.project_id, CommentDB.content, ProjectDB.latitude, ProjectDB.longitude)
+            .join(ProjectDB, ProjectDB.id == CommentDB.project_id)
+        )
+        query = query.where(CommentDB.project_id == project_id) if project_id is not None \
+            else query.where(CommentDB.id.in_(list(comment_ids)))
+        return [SearchDocument(COMMENT, comment_id, owner, "", content or "", latitude, longitude)
+                for comment_id, owner, content, latitude, longitude in conn.execute(query).tuples()]
+
+    def documents(self, conn: Connection, doc_type: str, ids: Iterable[int]) -> List[SearchDocument]:
+        loader = {PROJECT: self.project_documents, ISSUE: self.issue_documents,
+                  COMMENT: self.comment_documents}[doc_type]
+        return loader(conn, ids)
+
+    # ---------- index maintenance ----------
+
+    def index(self, conn: Connection, documents: Sequence[SearchDocument]):
+        backend = self.backend(conn)
+        if backend is not None and documents:
+            backend.write(conn, documents)
+
+    def reindex(self, conn: Connection, doc_type: str, ids: Iterable[int]):
+        """Re-read documents from their base rows; ids that no longer exist are dropped"""
+        ids = list(ids)
+        documents = self.documents(conn, doc_type, ids)
+        found = {document.doc_id for document in documents}
+        self.remove(conn, doc_type, [doc_id for doc_id in ids if doc_id not in found])
+        self.index(conn, documents)
+
+    def remove(self, conn: Connection, doc_type: str, ids: Iterable[int]):
+        backend = self.backend(conn)
+        if backend is not None:
+            backend.delete(conn, [document_key(doc_type, doc_id) for doc_id in ids])
+
+    def remove_projects(self, conn: Connection, project_ids: Sequence[int]):
+        """Drop projects and everything filed under them, ahead of a bulk delete"""
+        project_ids = list(project_ids)
+        issue_ids = conn.execute(select(IssueDB.id).where(IssueDB.project_id.in_(project_ids))).scalars().all()
+        comment_ids = conn.execute(select(CommentDB.id).where(CommentDB.project_id.in_(project_ids))).scalars().all()
+        self.remove(conn, PROJECT, project_ids)
+        self.remove(conn, ISSUE, issue_ids)
+        self.remove(conn, COMMENT, comment_ids)
+
+    def is_empty(self, conn: Connection) -> bool:
+        """True when nothing is indexed; False also without a backend, as there is nothing to fill"""
+        backend = self.backend(conn)
+        return backend is not None and backend.is_empty(conn)
+
+    def clear(self, conn: Connection):
+        backend = self.backend(conn)
+        if backend is not None:
+            backend.clear(conn)
+
+    # ---------- queries ----------
+
+    def search(self, conn: Connection, query: str, types: Sequence[str] = DOC_TYPES,
+               latitude: Optional[float] = None, longitude: Optional[float] = None,
+               radius_km: Optional[float] = None, page: int = 1, page_size: int = 20) -> SearchPage:
+        """
+        Rank documents matching every word of query, best first.
+
+        With latitude, longitude and radius_km only documents whose project
+        lies within radius_km are returned, still ordered by relevance.
+        """
+        terms = parse_query(query)
+        types = [t for t in DOC_TYPES if t in types]
+        backend = self.backend(conn)
+        if not terms or not types or backend is None:
+            return SearchPage([], page, page_size, False)
+        geo = None
+        if latitude is not None and longitude is not None and radius_km is not None:
+            geo = _GeoFilter(latitude, longitude, radius_km)
+
+        # One row past the page tells whether there is a next one without counting all matches
+        ranked = backend.search(conn, query, terms, types, geo, page_size + 1, (page - 1) * page_size)
+        page_rows = ranked[:page_size]
+        documents = {}
+        for doc_type in DOC_TYPES:
+            ids = [key // 4 for key, _ in page_rows if key % 4 == _TYPE_CODES[doc_type]]
+            if ids:
+                documents.update({document.key: document for document in self.documents(conn, doc_type, ids)})
+
+        hits = []
+        for key, score in page_rows:
+            document = documents.get(key)
+            if document is None:
+                continue
+            distance = None
+            if latitude is not None and longitude is not None and document.latitude is not None \
+                    and document.longitude is not None:
+                distance = round(haversine_km(latitude, longitude, document.latitude, document.longitude), 3)
+            hits.append(SearchHit(
+                doc_type=document.doc_type,
+                doc_id=document.doc_id,
+                project_id=document.project_id,
+                title=document.title,
+                snippet=make_snippet(document.body, terms),
+                score=round(score, 4),
+                distance_km=distance
+            ))
+        return SearchPage(hits, page, page_size, len(ranked) > page_size)
+
+
+# Global singleton instance
+search_index = SearchIndex()
+
+
+# ---------- ORM hooks ----------
+
+_WATCHED = {
+    ProjectDB: (PROJECT, ("name", "description")),
+    IssueDB: (ISSUE, ("title", "description", "project_id")),
+    CommentDB: (COMMENT, ("content", "project_id")),
+}
+
+
+def _changed(target, attributes) -> bool:
+    state = inspect(target)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+def _after_insert(mapper, connection, target):
+    doc_type, _ = _WATCHED[mapper.class_]
+    search_index.reindex(connection, doc_type, [target.id])
+
+
+def _after_update(mapper, connection, target):
+    doc_type, attributes = _WATCHED[mapper.class_]
+    moved = doc_type == PROJECT and _changed(target, ("latitude", "longitude"))
+    if moved or _changed(target, attributes):
+        search_index.reindex(connection, doc_type, [target.id])
+    if moved:
+        # Issues and comments are found by their project's location
+        search_index.index(connection, search_index.issue_documents(connection, project_id=target.id))
+        search_index.index(connection, search_index.comment_documents(connection, project_id=target.id))
+
+
+def _after_delete(mapper, connection, target):
+    doc_type, _ = _WATCHED[mapper.class_]
+    search_index.remove(connection, doc_type, [target.id])
+
+
+for _model in _WATCHED:
+    event.listen(_model, "after_insert", _after_insert)
+    event.listen(_model, "after_update", _after_update)
+    event.listen(_model, "after_delete", _after_delete)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_schema(metadata, connection, **kw):
+    search_index.ensure_schema(connection)
@@ -0,0 +1,97 @@
+"""
+Frontend static files
+Serves the built React app (project/build) from the API process. A file
+with a precompressed sibling (main.js.br, main.js.gz, written by
+precompress_frontend.py) is sent as that sibling when the client accepts
+its encoding, so nothing is compressed per request. Fingerprinted assets
+(main.30525bde.js) never change under their name and are cached as
+immutable; everything else, index.html included, is revalidated through
+its ETag. Paths without a file extension fall back to index.html so client
+side routes such as /map load the app.
+
+It is installed as the router's default app rather than mounted at "/", so
+API routes, including their trailing-slash redirects, always match first.
+"""
+import os
+import re
+import stat
+from mimetypes import guess_type
+from typing import Optional, Tuple
+
+from starlette.types import ASGIApp
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from middleware.compression_middleware import accepted_encodings
+
+# Content hash before the extension, as the React build names its output
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8,}(?:\.[a-z0-9]+)+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Sibling suffix per content coding, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+# Paths the API owns; a miss there is a 404, not the app's index.html
+API_PREFIXES = ("api/", "docs", "openapi.json", "health", "metrics")
+
+
+class FrontendFiles(StaticFiles):
+    """StaticFiles serving precompressed siblings, cache headers and the SPA fallback"""
+
+    def __init__(self, directory: str, not_found: ASGIApp):
+        super().__init__(directory=directory, html=True)
+        # What the router did for unmatched paths; still used for the API's paths and websockets
+        self.not_found = not_found
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].lstrip("/").startswith(API_PREFIXES):
+            await self.not_found(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+    async def get_response(self, path: str, scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or "." in os.path.basename(path):
+                raise
+        full_path, stat_result = self.lookup_path("index.html")
+        if stat_result is None:
+            raise HTTPException(status_code=404)
+        return self.file_response(full_path, stat_result, scope)
+
+    def _precompressed(self, full_path: str, request_headers: Headers) -> Optional[Tuple[str, str, os.stat_result]]:
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED:
+            if accepted.get(encoding, accepted.get("*", 0.0)) <= 0:
+                continue
+            try:
+                sibling_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            if stat.S_ISREG(sibling_stat.st_mode):
+                return encoding, full_path + suffix, sibling_stat
+        return None
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {
+            "Cache-Control": IMMUTABLE if FINGERPRINTED.search(full_path) else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        sibling = self._precompressed(full_path, request_headers)
+        if sibling is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        else:
+            encoding, sibling_path, sibling_stat = sibling
+            # Type of the original file, bytes of the compressed one
+            media_type = guess_type(full_path)[0] or "text/plain"
+            headers["Content-Encoding"] = encoding
+            response = FileResponse(sibling_path, status_code=status_code, stat_result=sibling_stat,
+                                    headers=headers, media_type=media_type)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
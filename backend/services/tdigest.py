@@ -0,0 +1,135 @@
+"""
+Merging t-digest
+Streaming quantile sketch (Dunning & Ertl): values are kept as weighted
+centroids that stay small near the tails and grow in the middle, so p50 to
+p99 come out within a fraction of a percent in rank from about
+compression / 2 centroids (~1 KB) however many values were added. Digests merge, which lets
+per-window aggregates be built incrementally or combined after the fact,
+and serialise to a flat array of doubles for storage in a BLOB column.
+"""
+import math
+from array import array
+from typing import Iterable, List, Optional
+
+DEFAULT_COMPRESSION = 100.0
+
+
+class TDigest:
+    """Mergeable quantile sketch with the k1 (arcsine) scale function"""
+
+    __slots__ = ("compression", "_means", "_weights", "_buffer", "total", "min", "max")
+
+    def __init__(self, compression: float = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[tuple] = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def __len__(self) -> int:
+        self._flush()
+        return len(self._means)
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.total += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 4:
+            self._flush()
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "TDigest"):
+        """Fold another digest into this one"""
+        other._flush()
+        self._buffer.extend(zip(other._means, other._weights))
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._flush()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k: float) -> float:
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+        total = self.total
+        means, weights = [], []
+        mean, weight = items[0]
+        so_far = 0.0
+        limit = total * self._q(self._k(0.0) + 1)
+        for value, w in items[1:]:
+            if so_far + weight + w <= limit:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                so_far += weight
+                limit = total * self._q(self._k(min(so_far / total, 1.0)) + 1)
+                mean, weight = value, w
+        means.append(mean)
+        weights.append(weight)
+        self._means, self._weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q in [0, 1], or None if empty"""
+        self._flush()
+        if not self._means:
+            return None
+        if len(self._means) == 1:
+            return self._means[0]
+        q = min(max(q, 0.0), 1.0)
+        target = q * self.total
+        means, weights = self._means, self._weights
+
+        # Each centroid's mass is centred on its mean; interpolate between centres
+        if target < weights[0] / 2:
+            # A singleton at either end is the min/max itself
+            if weights[0] == 1:
+                return means[0]
+            return self.min + (means[0] - self.min) * target / (weights[0] / 2)
+        cumulative = weights[0] / 2
+        for i in range(len(means) - 1):
+            step = (weights[i] + weights[i + 1]) / 2
+            if cumulative + step > target:
+                # Singletons are exact values; do not smear between them
+                if weights[i] == 1 and weights[i + 1] == 1:
+                    return means[i] if target - cumulative < step / 2 else means[i + 1]
+                return means[i] + (means[i + 1] - means[i]) * (target - cumulative) / step
+            cumulative += step
+        if weights[-1] == 1:
+            return means[-1]
+        return means[-1] + (self.max - means[-1]) * min((target - cumulative) / (weights[-1] / 2), 1.0)
+
+    def to_bytes(self) -> bytes:
+        """[compression, total, min, max, means..., weights...] as float64"""
+        self._flush()
+        data = array("d", [self.compression, self.total, self.min, self.max])
+        data.extend(self._means)
+        data.extend(self._weights)
+        return data.tobytes()
+
+    @classmethod
+    def from_bytes(cls, blob: Optional[bytes]) -> "TDigest":
+        if not blob:
+            return cls()
+        data = array("d")
+        data.frombytes(blob)
+        digest = cls(compression=data[0])
+        digest.total, digest.min, digest.max = data[1], data[2], data[3]
+        n = (len(data) - 4) // 2
+        digest._means = data[4:4 + n].tolist()
+        digest._weights = data[4 + n:].tolist()
+        return digest
@@ -0,0 +1,106 @@
+"""
+XP awards
+Every award is a row in the append-only xp_events log, and users.xp and
+rating_level are the running total of it. An award that carries an
+idempotency key (the action it is for, e.g. "issue-close:42") is logged at
+most once however often the action is repeated or retried, and only awards
+that were actually logged count towards XP.
+
+Awards are applied in batches inside the caller's transaction: the events
+go in with one multi-row INSERT that skips keys already in the log, and all
+of a user's new events collapse into a single UPDATE users SET xp = xp +
+:delta, so closing a thousand issues costs a few statements, not a commit
+per award. rebuild_xp.py recomputes the totals from the log.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import bindparam, case, func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import UserDB, XpEventDB
+from services.leaderboard import RATING_LEVELS
+
+ISSUE_CLOSED = "issue_closed"
+
+# XP for the assignee of a closed issue, by priority
+ISSUE_CLOSE_XP = {"low": 10, "medium": 25, "high": 50}
+DEFAULT_ISSUE_CLOSE_XP = 25
+
+
+@dataclass(frozen=True)
+class XpAward:
+    user_id: int
+    amount: int
+    reason: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+def issue_close_key(issue_id: int) -> str:
+    return f"issue-close:{issue_id}"
+
+
+def issue_closed(issue_id: int, assignee_id: int, priority: Optional[str]) -> XpAward:
+    """The award for closing an issue, keyed so it is granted once per issue"""
+    return XpAward(assignee_id, ISSUE_CLOSE_XP.get(priority, DEFAULT_ISSUE_CLOSE_XP),
+                   ISSUE_CLOSED, issue_close_key(issue_id))
+
+
+def rating_level_case(xp):
+    """SQL twin of leaderboard.rating_level_for over an XP expression"""
+    return case(*[(xp >= threshold, level) for threshold, level in RATING_LEVELS[:-1]],
+                else_=RATING_LEVELS[-1][1])
+
+
+def _insert_ignore(db: Session):
+    """INSERT that silently skips events whose idempotency key is already logged"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(XpEventDB).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    if dialect == "postgresql":
+        return postgresql.insert(XpEventDB).on_conflict_do_nothing(index_elements=["idempotency_key"])
+    return insert(XpEventDB)
+
+
+def log_events(db: Session, awards: Sequence[XpAward]) -> Dict[int, int]:
+    """
+    Append awards to the log without touching users.xp; returns the XP
+    actually logged per user. Awards whose key is already logged (or
+    repeated within the batch) are skipped.
+    """
+    rows, keys = [], set()
+    for item in awards:
+        if item.idempotency_key is not None:
+            if item.idempotency_key in keys:
+                continue
+            keys.add(item.idempotency_key)
+        rows.append({"user_id": item.user_id, "amount": item.amount, "reason": item.reason,
+                     "idempotency_key": item.idempotency_key})
+    if not rows:
+        return {}
+    events = XpEventDB.__table__
+    logged = db.connection().execute(
+        _insert_ignore(db).returning(events.c.user_id, events.c.amount), rows
+    ).tuples()
+    deltas: Dict[int, int] = defaultdict(int)
+    for user_id, amount in logged:
+        deltas[user_id] += amount
+    return {user_id: delta for user_id, delta in deltas.items() if delta}
+
+
+def award(db: Session, awards: Sequence[XpAward]) -> Dict[int, int]:
+    """Log awards and add them to their users' XP, without committing; returns the XP added per user"""
+    deltas = log_events(db, awards)
+    if deltas:
+        users = UserDB.__table__
+        new_xp = func.coalesce(users.c.xp, 0) + bindparam("delta")
+        # Core executemany: one statement per user, sent as a single batch
+        db.connection().execute(
+            update(users)
+            .where(users.c.id == bindparam("user_id"))
+            .values(xp=new_xp, rating_level=rating_level_case(new_xp)),
+            [{"user_id": user_id, "delta": delta} for user_id, delta in deltas.items()]
+        )
+    return deltas